@@ -36,6 +36,23 @@ SMA_LONG = 25
 KDJ_LENGTH = 9
 KDJ_SIGNAL = 3
 ZIGZAG_ORDER = 5
+# 多階層 ZigZag: 同時計算這些 order 的轉折點 (context['pivot_pyramid'])
+ZIGZAG_PYRAMID_ORDERS = [3, 5, 8, 13]
+
+# 指標計算引擎: "numpy" (utils/indicators.py，較快) | "pandas_ta" (原本流程)
+#              | "incremental" (每個幣種保留指標狀態，新 K 線 O(1) 更新)
+INDICATOR_ENGINE = "numpy"
+
+# 延遲計算 (numpy 引擎): 只計算策略用到的指標，報告文字在被讀取時才產生
+LAZY_INDICATORS = True
+
+# 指標結果快取 (同一根 K 線內的重複計算直接回傳，LRU 淘汰)
+ENABLE_INDICATOR_CACHE = True
+INDICATOR_CACHE_MAX_ENTRIES = 256
+INDICATOR_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# 批次指標計算: 所有幣種對齊成 (幣種 x K 線) 面板後一次計算 (僅同步輪詢模式)
+ENABLE_BATCH_ANALYSIS = False
 
 # 🔥 新增：啟用策略清單
 # 系統會依序載入這些策略
@@ -45,9 +62,77 @@ ACTIVE_STRATEGIES = [
     # "RsiReversalStrategy"
 ]
 
-# 風控 (0.02 = 2%)
+# 其他策略的載入路徑 (名稱 -> "模組:類別")，只有列在 ACTIVE_STRATEGIES 的才會被 import
+# 也可由已安裝套件的 entry points (group = STRATEGY_ENTRY_POINT_GROUP) 提供
+STRATEGY_PATHS = {}
+STRATEGY_ENTRY_POINT_GROUP = "crypto_bot.strategies"
+
+# 策略執行: 0 代表依序執行 (只計時)；> 0 代表以多執行緒同時執行，每個策略有自己的期限
+STRATEGY_EXECUTOR_WORKERS = 0
+STRATEGY_TIMEOUT_SEC = 2.0          # 逾時的策略視為棄權 (僅多執行緒模式)
+STRATEGY_TIMEOUTS = {}              # 個別策略的期限，例如 {"HarmonicStrategy": 5.0}
+# 每個循環的策略耗時 JSONL，例如 "logs/strategy_latency.jsonl" (每個循環一行、不會自動輪替，只在需要分析時開啟)
+STRATEGY_LATENCY_LOG = None
+
+# 多策略訊號整合 (即時下單與回測共用 strategies/voting.SignalEnsemble)
+# "veto": 多空衝突即觀望 (原本的規則) | "weighted": 加權分數超過門檻 | "quorum": 同方向權重合計達標
+ENSEMBLE_MODE = "veto"
+ENSEMBLE_WEIGHTS = {}               # 策略權重，例如 {"HarmonicStrategy": 2.0}；未列出為 1，0 代表不參與
+ENSEMBLE_THRESHOLD = 0.5            # weighted 模式: |Σ權重x信心x訊號 / Σ權重| 的進場門檻
+ENSEMBLE_QUORUM = 2                 # quorum 模式: 同方向至少需要的權重合計
+
+# 風控 (0.02 = 2%)，由止損監控與回測執行
 STOP_LOSS_PCT = 0.02      
 TAKE_PROFIT_PCT = 0.04 
+MAX_OPEN_POSITIONS = 0    # 同時持倉的幣種上限 (0 代表不限)，達到上限後不再開新倉
+
+# 分片模式 (poll): COIN_LIST 依 crc32 分給 N 個子程序，各自抓資料、算指標、跑策略並決策
+# 下單、倉位簿、風控與交易紀錄只在主程序 (協調者)；0 代表全部在主程序執行 (原本的流程)
+TRADING_WORKERS = 0
+SHARD_CYCLE_TIMEOUT_SEC = 300       # 每個循環等待分片回覆的秒數，逾時或當掉的分片重新啟動、其幣種稍後重試
+
+# 倉位簿: 每個交易循環以一次 fetch_positions() 載入，之後由自己的成交更新
+# 超過這個秒數沒有載入 (例如串流模式) 時，查詢倉位前會先與交易所對帳
+POSITION_RECONCILE_SEC = 300
+
+# 送單佇列 (utils/order_queue.py): 交易循環與止損監控只排入訂單，由專用執行緒送出，不等交易所回應
+# 每筆訂單的 clientOrderId 由決策依據 (K 線收盤時間 / 要平的倉位) 決定，重試不會重複進場
+ENABLE_ORDER_QUEUE = True
+ORDER_MAX_ATTEMPTS = 4              # 網路錯誤時最多送出幾次 (重送前先查詢是否已送達)
+ORDER_RETRY_BACKOFF_SEC = 0.5       # 第一次重試前等待的秒數，之後每次加倍
+ORDER_CONFIRM_TIMEOUT_SEC = 10      # 查不到成交資訊時，多久後以參考價視為成交 (下次對帳修正)
+
+# 止損 / 止盈監控 (services/exit_watcher_service.py，與策略循環分開的背景執行緒)
+ENABLE_EXIT_WATCHER = True
+EXIT_WATCHER_INTERVAL_SEC = 2       # poll 模式每隔幾秒以一次 fetch_tickers 檢查所有持倉 (串流模式即時檢查)
+USE_STRATEGY_EXIT_LEVELS = True     # 開倉時策略提供的止損止盈價 (例如諧波型態) 優先於上面的百分比，回測同樣適用
+EXIT_WATCHER_LOG = "logs/exit_watcher.jsonl"  # 每次觸發的價位與 觸發→下單 延遲 (None 不寫檔)
+
+# --- 市場數據快取 ---
+# K 線快取 (每個 symbol/時框保留最近 N 根，之後每次只抓新 K 線)
+ENABLE_CANDLE_CACHE = True
+CANDLE_CACHE_SIZE = 1000
+MAX_FETCH_LIMIT = 1000  # 單次 fetch_ohlcv 最多要求的根數 (交易所上限，fetch_resampled 超過時改為直接抓大時框)
+
+# 本地 K 線資料庫 (已收盤的 K 線會寫入此目錄，重啟後不用重新下載)
+ENABLE_CANDLE_STORE = True
+CANDLE_STORE_DIR = "data/candles"
+
+# 交易所市場資訊快取 (避免每次重啟都重新下載完整市場清單)
+MARKETS_CACHE_DIR = "data"
+MARKETS_CACHE_TTL = 12 * 60 * 60  # 秒
+
+# --- 併發抓取 (非同步模式) ---
+# True: 所有幣種的 K 線與倉位同時抓取 (ccxt.async_support)
+ENABLE_ASYNC_FETCH = False
+# 共用速率額度 (Token Bucket): 每秒補充 N 個 token，最多累積 BURST 個
+RATE_LIMIT_PER_SEC = 10
+RATE_LIMIT_BURST = 20
+# 各 API 的權重 (未列出的預設為 1)
+RATE_LIMIT_WEIGHTS = {
+    "fetch_ohlcv": 1,
+    "fetch_positions": 2,
+}
 
 # --- 系統服務設定 ---
 
@@ -73,6 +158,12 @@ ENABLE_QA_SYSTEM = True        # 是否開啟問答系統
 ENABLE_TRADING_SYSTEM = True   # 是否開啟交易策略檢查
 ENABLE_PERIODIC_REPORT = False  # 是否開啟定期報告
 
+# 行情來源
+# "poll": 依 TRADING_SCHEDULE 定時以 REST 抓取
+# "stream": 透過 WebSocket 接收 K 線，每根 K 線收盤立即跑策略
+MARKET_DATA_MODE = "poll"
+STREAM_MIN_CANDLES = 200  # 串流模式下至少累積幾根 K 線才開始判斷
+
 # --------------------------------------------------------
 # ⏱️ 服務執行頻率設定 (單位: 秒)
 # --------------------------------------------------------
@@ -82,7 +173,16 @@ ENABLE_PERIODIC_REPORT = False  # 是否開啟定期報告
 # QA 問答檢查頻率 (建議 5~10 秒)
 INTERVAL_QA_CHECK = 5 
 
-# 交易策略檢查頻率 (建議配合 K 線時框，例如 15 分鐘)
+# 交易檢查排程 (poll 模式)
+# "candle_close": 以交易所時鐘在每根 TRADE_TIMEFRAME K 線收盤後觸發，只用已收盤 K 線，沒有新 K 線的幣種跳過
+# "interval": 依 INTERVAL_TRADING_CHECK 固定間隔 (從啟動時間起算)
+TRADING_SCHEDULE = "candle_close"
+CANDLE_CLOSE_DELAY_SEC = 3          # 收盤後等待交易所產生 K 線的秒數
+CANDLE_CLOSE_RETRY_SEC = 5          # 仍有幣種沒有新 K 線時，幾秒後重試
+CANDLE_CLOSE_MAX_RETRIES = 3        # 同一根 K 線最多重試次數
+CLOCK_SYNC_INTERVAL_SEC = 60 * 60   # 重新校正交易所時間差的間隔
+
+# 交易策略檢查頻率 (TRADING_SCHEDULE = "interval" 時使用，建議配合 K 線時框，例如 15 分鐘)
 # INTERVAL_TRADING_CHECK = 15 * 60
 INTERVAL_TRADING_CHECK = 1 * 60 * 60
 
@@ -8,7 +8,9 @@ from services.report_service import ReportService
 from services.qa_service import QAService
 from services.email_service import EmailService
 from services.market_data_service import MarketDataService
+from services.exit_watcher_service import ExitWatcherService
 from utils.data_loader import BingXLoader
+from utils.candle_feed import WebSocketCandleFeed
 
 def main():
     print(f"🤖 Crypto Bot 架構重構版啟動...")
@@ -19,8 +21,27 @@ def main():
     market_data = MarketDataService() 
     qa_service = QAService("questions.json")
 
+    # 交易所物件由 exchange_registry 統一建立 (市場資訊有本地快取)，loader 與 trader 共用
     loader = BingXLoader()
-    trader = TradingService(report_service=reporter, email_service=mailer) 
+    trader = TradingService(report_service=reporter, email_service=mailer, loader=loader, market_data_service=market_data) 
+
+    # 🔥 串流模式: K 線收盤由 WebSocket 推送，交易檢查不再靠定時輪詢
+    use_stream = config.ENABLE_TRADING_SYSTEM and getattr(config, 'MARKET_DATA_MODE', 'poll') == 'stream'
+    if use_stream:
+        trader.warm_up()
+        feed = WebSocketCandleFeed(config.COIN_LIST, config.TRADE_TIMEFRAME)
+        feed.subscribe(trader.on_candle)
+        feed.start_background()
+
+    # 🔥 止損 / 止盈監控: 與策略循環分開，持倉期間以一次 bulk ticker 查詢 (串流模式直接用 K 線更新) 快速檢查
+    watcher = None
+    if config.ENABLE_TRADING_SYSTEM and getattr(config, 'ENABLE_EXIT_WATCHER', False):
+        watcher = ExitWatcherService(trader.executor, trade_logger=trader.logger,
+                                     log_path=getattr(config, 'EXIT_WATCHER_LOG', None))
+        if use_stream:
+            feed.subscribe(watcher.on_candle)
+        else:
+            watcher.start_background()
 
     # 2. 設定時間鎖 (Time Locks)
     timers = {
@@ -32,7 +53,17 @@ def main():
     # 顯示目前的頻率設定
     print("🚀 系統進入極速監聽模式...")
     print(f"   ⏱️ QA檢查: 每 {config.INTERVAL_QA_CHECK} 秒")
-    print(f"   ⏱️ 交易檢查: 每 {config.INTERVAL_TRADING_CHECK / 60:.0f} 分鐘")
+    # 🔥 K 線收盤排程: 以交易所時鐘在每根 K 線收盤 (+延遲) 後觸發，而不是從啟動時間起算的固定間隔
+    align_to_close = not use_stream and trader.schedule == 'candle_close'
+    if use_stream:
+        print(f"   ⏱️ 交易檢查: 串流模式 (每根 {config.TRADE_TIMEFRAME} K 線收盤)")
+    elif align_to_close:
+        print(f"   ⏱️ 交易檢查: 每根 {config.TRADE_TIMEFRAME} K 線收盤後 {trader.clock.delay_ms / 1000:.0f} 秒 "
+              f"(交易所時間差 {trader.clock.sync()} ms)")
+    else:
+        print(f"   ⏱️ 交易檢查: 每 {config.INTERVAL_TRADING_CHECK / 60:.0f} 分鐘")
+    if watcher is not None:
+        print(f"   ⏱️ 止損監控: {'串流即時' if use_stream else f'每 {watcher.interval:g} 秒'}")
     print(f"   ⏱️ 定期報告: 每 {config.INTERVAL_PERIODIC_REPORT / 60:.0f} 分鐘")
     print("-" * 50) # 初始分隔線
 
@@ -54,13 +85,31 @@ def main():
                 # print() 
 
             # --- 任務 2: 交易檢查 ---
-            if config.ENABLE_TRADING_SYSTEM and now >= timers['trade']:
+            traded = False
+            close_ms = trader.clock.due() if config.ENABLE_TRADING_SYSTEM and align_to_close else None
+            if close_ms is not None:
+                close_time = datetime.fromtimestamp(close_ms / 1000).strftime('%H:%M')
+                print(f"💰 執行交易策略檢查... {now.strftime('%H:%M:%S')} (K 線收盤 {close_time})")
+                complete = trader.run_cycle()
+                # 有幣種還沒拿到最新收盤的 K 線時稍後重試 (已判斷過的幣種會被跳過)
+                trader.clock.done(close_ms, complete=complete)
+                traded = True
+
+            if config.ENABLE_TRADING_SYSTEM and not use_stream and not align_to_close and now >= timers['trade']:
                 print(f"💰 執行交易策略檢查... {now.strftime('%H:%M')}")
                 trader.run_cycle() 
-                
+
                 # 重設計時器
                 timers['trade'] = now + timedelta(seconds=config.INTERVAL_TRADING_CHECK)
-                
+                traded = True
+
+            # 兩種排程共用的循環結尾
+            if traded:
+                stats = market_data.cache_stats()
+                if stats:
+                    print(f"   🗃️ 指標快取: 命中 {stats['hits']} / 未命中 {stats['misses']} "
+                          f"({stats['entries']} 筆, {stats['bytes'] / 1024:.0f} KB)")
+
                 # 🔥 優化：任務結束後多印一行空行
                 print("-" * 30 + "\n") 
 
@@ -71,12 +120,12 @@ def main():
                 # 針對監控清單中的每一個幣種生成報告
                 for symbol in config.COIN_LIST:
                     try:
-                        # 1. 抓資料 (抓 1 小時線來看大趨勢)
-                        df = loader.fetch_data(timeframe='1h', symbol=symbol, limit=50)
+                        # 1. 抓資料 (1 小時線看大趨勢，由交易時框的快取 K 線合成，不另外打 API)
+                        df = loader.fetch_resampled(timeframe='1h', symbol=symbol, limit=50)
                         
                         if df is not None and not df.empty:
                             # 2. 算指標
-                            context = market_data.analyze_technicals(df)
+                            context = market_data.analyze_technicals(df, symbol=symbol, timeframe='1h')
                             context['symbol'] = symbol
                             
                             # 3. 生成 HTML
@@ -98,11 +147,21 @@ def main():
                 # 🔥 優化：任務結束後多印一行空行
                 print("-" * 30 + "\n")
 
-            # 極速迴圈休息
-            time.sleep(1)
+            # 極速迴圈休息 (收盤排程快到時只睡到觸發時間，減少收盤到決策的延遲)
+            if config.ENABLE_TRADING_SYSTEM and align_to_close:
+                time.sleep(min(1.0, max(trader.clock.seconds_until_due(), 0.05)))
+            else:
+                time.sleep(1)
 
         except KeyboardInterrupt:
             print("\n🛑 程式手動停止")
+            if use_stream:
+                feed.stop()
+            if watcher is not None:
+                watcher.stop()
+            if trader.shards is not None:
+                trader.shards.close()
+            trader.executor.shutdown()  # 佇列中的訂單送完再結束
             break
         except Exception as e:
             print(f"❌ 主迴圈發生錯誤: {e}")
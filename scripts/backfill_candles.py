@@ -0,0 +1,37 @@
+# scripts/backfill_candles.py
+import os
+import sys
+import argparse
+import time
+
+# 🔥 將專案根目錄加入 Python 搜尋路徑
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+sys.path.append(PROJECT_ROOT)
+
+import config
+from utils.data_loader import BingXLoader
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回補歷史 K 線到本地資料庫 (可中斷後續傳)")
+    parser.add_argument('--symbols', nargs='+', default=config.COIN_LIST, help="交易對，例如 BTC-USDT ETH-USDT")
+    parser.add_argument('--timeframe', default=config.TRADE_TIMEFRAME, help="時框，例如 15m")
+    parser.add_argument('--days', type=float, default=365, help="回補最近幾天")
+    parser.add_argument('--page-limit', type=int, default=1000, help="每次 API 請求的 K 線數量")
+    args = parser.parse_args()
+
+    loader = BingXLoader()
+    since_ms = loader.exchange.milliseconds() - int(args.days * 24 * 60 * 60 * 1000)
+    since_ms -= since_ms % loader.timeframe_to_ms(args.timeframe)
+
+    for symbol in args.symbols:
+        start = time.time()
+        print(f"📥 回補 {symbol} {args.timeframe} (最近 {args.days:g} 天)...")
+        added = loader.backfill(symbol, args.timeframe, since_ms, page_limit=args.page_limit)
+        total = len(loader.store.read(symbol, args.timeframe))
+        print(f"✅ {symbol} 新增 {added} 根，本地共 {total} 根 ({time.time() - start:.1f} 秒)")
+
+
+if __name__ == "__main__":
+    main()
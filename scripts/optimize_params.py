@@ -0,0 +1,81 @@
+# scripts/optimize_params.py
+import os
+import sys
+import argparse
+import pandas as pd
+
+# 🔥 將專案根目錄加入 Python 搜尋路徑
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+sys.path.append(PROJECT_ROOT)
+
+import config
+from utils.candle_store import CandleStore
+from utils.data_loader import BingXLoader
+from services.optimizer_service import ParameterSweep, grid_candidates, random_candidates, param_key
+
+
+def to_ms(text):
+    return int(pd.Timestamp(text).timestamp() * 1000) if text else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="平行搜尋 SMA / KDJ / ZigZag 參數 (以本地 K 線回測，可中斷續跑)")
+    parser.add_argument('--symbols', nargs='+', default=config.COIN_LIST, help="交易對，例如 BTC-USDT ETH-USDT")
+    parser.add_argument('--timeframe', default=config.TRADE_TIMEFRAME, help="時框，例如 15m")
+    parser.add_argument('--start', default=None, help="開始日期，例如 2024-01-01")
+    parser.add_argument('--end', default=None, help="結束日期，例如 2025-01-01")
+    parser.add_argument('--search', choices=['grid', 'random'], default='grid', help="網格搜尋或隨機搜尋")
+    parser.add_argument('--samples', type=int, default=50, help="隨機搜尋的組數")
+    parser.add_argument('--seed', type=int, default=0, help="隨機搜尋的種子 (續跑時需相同)")
+    parser.add_argument('--sma-short', nargs='+', type=int, default=[5, 7, 9, 12], help="SMA_SHORT 候選值")
+    parser.add_argument('--sma-long', nargs='+', type=int, default=[20, 25, 30, 40, 50], help="SMA_LONG 候選值")
+    parser.add_argument('--kdj-length', nargs='+', type=int, default=None, help="KDJ_LENGTH 候選值")
+    parser.add_argument('--zigzag-order', nargs='+', type=int, default=[3, 4, 5, 6, 8], help="ZIGZAG_ORDER 候選值")
+    parser.add_argument('--workers', type=int, default=None, help="子程序數量 (預設 CPU 核心數)")
+    parser.add_argument('--results', default="logs/optimize_results.jsonl", help="結果檔 (JSONL，已存在則續跑)")
+    parser.add_argument('--metric', default='total_return', help="排序依據 (total_return / max_drawdown / win_rate / profit_factor)")
+    parser.add_argument('--top', type=int, default=10, help="列出前幾名")
+    args = parser.parse_args()
+
+    store = CandleStore()
+    frames = {}
+    for symbol in args.symbols:
+        records = store.read(symbol, args.timeframe, start_ms=to_ms(args.start), end_ms=to_ms(args.end))
+        if len(records) == 0:
+            print(f"⚠️ {symbol} 本地沒有 {args.timeframe} K 線，請先執行 backfill_candles.py")
+            continue
+        frames[symbol] = BingXLoader.to_dataframe(CandleStore.to_rows(records))
+
+    space = {'SMA_SHORT': args.sma_short, 'SMA_LONG': args.sma_long, 'ZIGZAG_ORDER': args.zigzag_order}
+    if args.kdj_length:
+        space['KDJ_LENGTH'] = args.kdj_length
+
+    sweep = ParameterSweep(frames, workers=args.workers)
+    space = sweep.prepare_space(space)
+    if args.search == 'grid':
+        candidates = grid_candidates(space)
+    else:
+        candidates = random_candidates(space, args.samples, seed=args.seed)
+
+    try:
+        records = sweep.run(candidates, args.results)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+
+    # 只排名這次搜尋空間內的組合 (結果檔可能包含其他搜尋的紀錄)
+    keys = {param_key(params) for params in candidates}
+    records = [r for r in records if r['key'] in keys]
+    if not records:
+        return
+    records.sort(key=lambda r: r['stats'].get(args.metric, 0), reverse=True)
+    print(f"\n🏆 前 {min(args.top, len(records))} 名 (依 {args.metric}):")
+    for rank, record in enumerate(records[:args.top], 1):
+        stats = record['stats']
+        print(f"   {rank:>2}. {record['params']} | 報酬 {stats['total_return']:.2%} | 回撤 {stats['max_drawdown']:.2%} | "
+              f"勝率 {stats['win_rate']:.1%} | {stats['trades']} 筆")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# scripts/run_backtest.py
+import os
+import sys
+import argparse
+import time
+import pandas as pd
+
+# 🔥 將專案根目錄加入 Python 搜尋路徑
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+sys.path.append(PROJECT_ROOT)
+
+import config
+from utils.candle_store import CandleStore
+from utils.data_loader import BingXLoader
+from services.backtest_service import BacktestService
+
+
+def to_ms(text):
+    return int(pd.Timestamp(text).timestamp() * 1000) if text else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以本地歷史 K 線回測 ACTIVE_STRATEGIES 的投票進出場規則")
+    parser.add_argument('--symbols', nargs='+', default=config.COIN_LIST, help="交易對，例如 BTC-USDT ETH-USDT")
+    parser.add_argument('--timeframe', default=config.TRADE_TIMEFRAME, help="時框，例如 15m")
+    parser.add_argument('--start', default=None, help="開始日期，例如 2024-01-01")
+    parser.add_argument('--end', default=None, help="結束日期，例如 2025-01-01")
+    parser.add_argument('--mode', choices=['vectorized', 'event'], default='vectorized',
+                        help="vectorized: 向量化 (快)；event: 逐根 K 線跑即時流程 (核對用)")
+    parser.add_argument('--window', type=int, default=None, help="event 模式每次分析的 K 線數量 (即時流程為 200)")
+    parser.add_argument('--capital', type=float, default=10000.0, help="每個幣種的初始資金")
+    parser.add_argument('--show', type=int, default=10, help="列出最近幾筆交易")
+    parser.add_argument('--output', default=None, help="交易明細輸出的 CSV 路徑")
+    args = parser.parse_args()
+
+    store = CandleStore()
+    frames = {}
+    for symbol in args.symbols:
+        records = store.read(symbol, args.timeframe, start_ms=to_ms(args.start), end_ms=to_ms(args.end))
+        if len(records) == 0:
+            print(f"⚠️ {symbol} 本地沒有 {args.timeframe} K 線，請先執行 backfill_candles.py")
+            continue
+        frames[symbol] = BingXLoader.to_dataframe(CandleStore.to_rows(records))
+
+    backtest = BacktestService(mode=args.mode, initial_capital=args.capital, window=args.window)
+    print(f"⚙️ 策略: {backtest.strategy_names} | 模式: {args.mode} | 槓桿 {backtest.leverage}x | "
+          f"手續費 {backtest.fee_rate:.4%} | 止損 {backtest.stop_loss_pct:.2%} | 止盈 {backtest.take_profit_pct:.2%}")
+
+    start = time.time()
+    result = backtest.run(frames)
+    if not result['symbols']:
+        return
+
+    stats = result['stats']
+    print(f"\n✅ 回測完成，耗時 {time.time() - start:.2f} 秒")
+    print(f"   交易 {stats['trades']} 筆 | 勝率 {stats['win_rate']:.1%} | 總報酬 {stats['total_return']:.2%} | "
+          f"最大回撤 {stats['max_drawdown']:.2%} | 獲利因子 {stats['profit_factor']:.2f} | 手續費 {stats['fees']:.2f}")
+    print("\n📊 策略貢獻 (損益依同向投票的策略平均分攤):")
+    print(result['attribution'].to_string(float_format=lambda x: f"{x:.2f}"))
+
+    trades = result['trades']
+    if len(trades) and args.show:
+        print(f"\n📝 最近 {min(args.show, len(trades))} 筆交易:")
+        print(trades.tail(args.show)[['symbol', 'side', 'entry_time', 'entry_price', 'exit_time', 'exit_price',
+                                      'exit_reason', 'return']].to_string(index=False))
+
+    if args.output:
+        trades.to_csv(args.output, index=False)
+        print(f"\n💾 交易明細已寫入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# scripts/scan_harmonics.py
+import os
+import sys
+import argparse
+import time
+import numpy as np
+
+# 🔥 將專案根目錄加入 Python 搜尋路徑
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+sys.path.append(PROJECT_ROOT)
+
+import config
+from utils.candle_store import CandleStore
+from utils.zigzag import find_pivot_pyramid
+from utils.harmonic_scanner import HarmonicScanner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="掃描本地歷史 K 線中的所有諧波型態 (研究用)")
+    parser.add_argument('--symbols', nargs='+', default=config.COIN_LIST, help="交易對，例如 BTC-USDT ETH-USDT")
+    parser.add_argument('--timeframe', default=config.TRADE_TIMEFRAME, help="時框，例如 15m")
+    parser.add_argument('--orders', nargs='+', type=int, default=getattr(config, 'ZIGZAG_PYRAMID_ORDERS', [3, 5, 8, 13]),
+                        help="ZigZag order (可多個)")
+    parser.add_argument('--tolerance', type=float, default=None, help="統一的比例容許誤差 (預設依型態表)")
+    parser.add_argument('--show', type=int, default=5, help="每個幣種列出最近幾筆型態")
+    args = parser.parse_args()
+
+    store = CandleStore()
+    scanner = HarmonicScanner(tolerance=args.tolerance)
+
+    for symbol in args.symbols:
+        data = store.read(symbol, args.timeframe)
+        if len(data) == 0:
+            print(f"⚠️ {symbol} 本地沒有 {args.timeframe} K 線，請先執行 backfill_candles.py")
+            continue
+
+        start = time.time()
+        pyramid = find_pivot_pyramid(data['high'], data['low'], args.orders)
+        results = []
+        for order in args.orders:
+            level = pyramid[pyramid['order'] == order]
+            results.append((order, level, scanner.scan(level)))
+        elapsed_ms = (time.time() - start) * 1000
+
+        print(f"🔍 {symbol} {args.timeframe}: {len(data)} 根 K 線，掃描耗時 {elapsed_ms:.1f} ms")
+        for order, level, matches in results:
+            counts = {name: int(np.sum(matches['pattern'] == i)) for i, name in enumerate(scanner.pattern_names)}
+            print(f"   order={order}: {len(level)} 個轉折點，{len(matches)} 個型態 {counts}")
+            for match in matches[-args.show:]:
+                d_time = np.datetime64(int(data['timestamp'][match['d_index']]), 'ms')
+                print(f"      - {d_time} {scanner.describe(match)} "
+                      f"PRZ {match['prz_low']:.2f}~{match['prz_high']:.2f} | SL {match['stop_loss']:.2f} | TP {match['take_profit']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
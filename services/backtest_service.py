@@ -0,0 +1,375 @@
+import sys
+import os
+
+# 🔥 取得目前檔案的路徑，並將「上一層目錄」加入 Python 搜尋路徑
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import config
+import time
+import numpy as np
+import pandas as pd
+
+from services.market_data_service import MarketDataService
+from strategies import STRATEGY_MAP
+from strategies.base_strategy import SIGNAL_CODES
+from strategies.voting import SignalEnsemble
+from utils.exit_rules import stop_exit, exit_levels, strategy_levels
+
+SIDE_NAMES = {1: "LONG", -1: "SHORT"}
+
+TRADE_COLUMNS = ['symbol', 'side', 'entry_time', 'entry_price', 'exit_time', 'exit_price',
+                 'exit_reason', 'bars', 'return', 'pnl', 'fees', 'strategies']
+
+
+class BacktestService:
+    """
+    以歷史 K 線重跑 TradingService 的進出場規則
+    - 空手時: SignalEnsemble 的決策 LONG 開多、SHORT 開空 (以收盤價成交，整合規則與即時流程相同)
+    - 持倉時: 出現反向訊號就平倉 (同一根不反手，下一根再依訊號開倉)
+    - 持倉期間每根 K 線檢查止損 / 止盈 (觸發後同一根收盤可再依訊號開倉)
+      價位規則與即時的 ExitWatcherService 相同: 同方向策略提供的價位優先，否則依 STOP_LOSS_PCT / TAKE_PROFIT_PCT
+    - 手續費 TRADING_FEE_RATE 以名目價值計 (開倉、平倉各一次)，保證金 = 當時權益，名目價值 = 權益 x LEVERAGE
+
+    兩種模式的交易結果相同:
+    - 'vectorized': 策略的 analyze_series 一次算出整段訊號，只在事件之間跳躍 (進場、反向訊號、止損止盈)
+    - 'event': 逐根 K 線呼叫 MarketDataService.analyze_technicals + strategy.analyze (與即時流程相同)，用來核對路徑
+    """
+    def __init__(self, strategies=None, mode='vectorized', initial_capital=10000.0,
+                 fee_rate=None, leverage=None, stop_loss_pct=None, take_profit_pct=None,
+                 warmup=None, window=None, strategy_params=None, market_data_service=None, ensemble=None,
+                 use_strategy_levels=None):
+        """
+        :param strategies: 策略物件清單 (預設依 config.ACTIVE_STRATEGIES 建立)
+        :param mode: 'vectorized' | 'event'
+        :param initial_capital: 每個幣種的初始資金
+        :param warmup: 前幾根 K 線只用來暖機、不交易 (預設與 MarketDataService 的最少資料長度相同)
+        :param window: event 模式每次分析的 K 線數量 (例如 200 與即時抓取相同)，None 代表用全部歷史
+        :param strategy_params: {策略名稱: params}，傳給 analyze_series (vectorized 模式)
+        :param ensemble: 多策略訊號整合 (預設依 config.ENSEMBLE_* 建立，與 TradingService 相同)
+        :param use_strategy_levels: 是否使用策略提供的止損止盈價位 (預設 config.USE_STRATEGY_EXIT_LEVELS)
+        """
+        if mode not in ('vectorized', 'event'):
+            raise ValueError(f"未知的回測模式: {mode}")
+        self.mode = mode
+
+        if strategies is None:
+            strategies = STRATEGY_MAP.create(config.ACTIVE_STRATEGIES)
+        self.strategies = strategies
+        self.strategy_names = [s.__class__.__name__ for s in self.strategies]
+        self.ensemble = ensemble if ensemble is not None else SignalEnsemble.from_config(self.strategy_names)
+
+        self.initial_capital = float(initial_capital)
+        self.fee_rate = fee_rate if fee_rate is not None else getattr(config, 'TRADING_FEE_RATE', 0.0005)
+        self.leverage = leverage if leverage is not None else getattr(config, 'LEVERAGE', 1)
+        self.stop_loss_pct = stop_loss_pct if stop_loss_pct is not None else getattr(config, 'STOP_LOSS_PCT', 0)
+        self.take_profit_pct = take_profit_pct if take_profit_pct is not None else getattr(config, 'TAKE_PROFIT_PCT', 0)
+        if use_strategy_levels is None:
+            use_strategy_levels = getattr(config, 'USE_STRATEGY_EXIT_LEVELS', False)
+        self.use_strategy_levels = use_strategy_levels
+        # 與 MarketDataService 的最少資料長度相同 (ma_slow / macd_slow / 30 取最大)
+        self.warmup = warmup if warmup is not None else max(getattr(config, 'SMA_LONG', 25), 26, 30)
+        self.window = window
+        self.strategy_params = strategy_params or {}
+
+        self._market_data_service = market_data_service
+        self.required_indicators = ['close']
+        for strategy in self.strategies:
+            for name in strategy.required_indicators or []:
+                if name not in self.required_indicators:
+                    self.required_indicators.append(name)
+
+        if mode == 'vectorized':
+            missing = [s.__class__.__name__ for s in self.strategies if not s.supports_series()]
+            if missing:
+                raise ValueError(f"以下策略沒有實作 analyze_series，請改用 event 模式: {missing}")
+
+    @property
+    def market_data_service(self):
+        # event 模式才需要，使用獨立的 MarketDataService 避免與即時流程共用快取
+        if self._market_data_service is None:
+            self._market_data_service = MarketDataService()
+        return self._market_data_service
+
+    # ------------------------------------------------------------------
+    # 訊號
+    # ------------------------------------------------------------------
+    def signal_matrix(self, df):
+        """各策略整段歷史的訊號 (K, T)，vectorized 模式使用"""
+        return self.series_matrices(df)[0]
+
+    def series_matrices(self, df):
+        """
+        各策略整段歷史的 (訊號, 信心, 止損價, 止盈價)，皆為 (K, T)
+        沒有提供信心的策略為 1，沒有提供價位為 NaN
+        """
+        shape = (len(self.strategies), len(df))
+        votes = np.zeros(shape, dtype=np.int8)
+        confidence = np.ones(shape)
+        stops, takes = np.full(shape, np.nan), np.full(shape, np.nan)
+        for k, strategy in enumerate(self.strategies):
+            params = self.strategy_params.get(self.strategy_names[k])
+            series = strategy.analyze_series(df, params)
+            votes[k] = series['signal']
+            if series.get('confidence') is not None:
+                confidence[k] = series['confidence']
+            stops[k], takes[k] = series['stop_loss'], series['take_profit']
+        return votes, confidence, stops, takes
+
+    def _live_votes(self, df, t):
+        """
+        第 t 根 K 線收盤時，即時流程各策略的 (訊號, 信心, 止損價, 止盈價)，皆為 (K,)
+        出錯的策略不投票
+        """
+        start = 0 if self.window is None else max(0, t + 1 - self.window)
+        window = df.iloc[start:t + 1]
+        context = self.market_data_service.analyze_technicals(window, required=self.required_indicators)
+        votes = np.zeros(len(self.strategies), dtype=np.int8)
+        confidence = np.ones(len(self.strategies))
+        stops, takes = np.full(len(self.strategies), np.nan), np.full(len(self.strategies), np.nan)
+        if not context:
+            return votes, confidence, stops, takes
+        for k, strategy in enumerate(self.strategies):
+            try:
+                result = strategy.analyze(window, context)
+                votes[k] = SIGNAL_CODES.get(result['signal'], 0)
+                if result.get('confidence') is not None:
+                    confidence[k] = result['confidence']
+                if result.get('stop_loss') is not None:
+                    stops[k] = result['stop_loss']
+                if result.get('take_profit') is not None:
+                    takes[k] = result['take_profit']
+            except Exception as e:
+                print(f"❌ 策略 {strategy} 執行錯誤: {e}")
+        return votes, confidence, stops, takes
+
+    # ------------------------------------------------------------------
+    # 撮合
+    # ------------------------------------------------------------------
+    def _levels(self, side, entry_price, bar=None):
+        """
+        止損 / 止盈價位 (規則在 utils.exit_rules，即時監控共用)
+        :param bar: 進場那根 K 線各策略的 (訊號, 信心, 止損價, 止盈價)，None 代表只用百分比
+        """
+        stop_price = take_price = None
+        if bar is not None and self.use_strategy_levels:
+            stop_price, take_price = strategy_levels(side, *bar)
+        return exit_levels(side, entry_price, self.stop_loss_pct, self.take_profit_pct, stop_price, take_price)
+
+    def _simulate_events(self, signal, open_, high, low, close, series=None):
+        """
+        事件跳躍: 每筆交易只需要
+        1. 下一個非 0 訊號 (進場)
+        2. 進場後第一個反向訊號 (searchsorted)
+        3. 兩者之間第一根觸發止損 / 止盈的 K 線 (對該段切片做向量比較)
+        :param series: series_matrices 的結果 (策略提供的止損止盈價位)，None 代表只用百分比
+        :return: [(進場 index, 出場 index, 方向, 進場價, 出場價, 出場原因)]
+        """
+        total = len(close)
+        trades = []
+        entries = np.flatnonzero(signal[:total - 1] != 0)  # 最後一根只平倉不開倉
+        opposite = {1: np.flatnonzero(signal == -1), -1: np.flatnonzero(signal == 1)}
+
+        cursor = self.warmup
+        while True:
+            k = np.searchsorted(entries, cursor)
+            if k >= len(entries):
+                break
+            entry = entries[k]
+            side = int(signal[entry])
+            entry_price = close[entry]
+            bar = None if series is None else tuple(matrix[:, entry] for matrix in series)
+            stop, take = self._levels(side, entry_price, bar)
+
+            j = np.searchsorted(opposite[side], entry + 1)
+            signal_exit = opposite[side][j] if j < len(opposite[side]) else None
+            last = signal_exit if signal_exit is not None else total - 1
+
+            seg = slice(entry + 1, last + 1)
+            if side > 0:
+                hit_stop, hit_take = low[seg] <= stop, high[seg] >= take
+            else:
+                hit_stop, hit_take = high[seg] >= stop, low[seg] <= take
+            hit = hit_stop | hit_take
+
+            if hit.any():
+                exit_index = entry + 1 + int(hit.argmax())
+                reason, price = stop_exit(side, open_[exit_index], high[exit_index], low[exit_index], stop, take)
+                trades.append((entry, exit_index, side, entry_price, price, reason))
+                cursor = exit_index  # 止損止盈後，同一根收盤仍可依訊號開倉
+            elif signal_exit is not None:
+                trades.append((entry, signal_exit, side, entry_price, close[signal_exit], "signal"))
+                cursor = signal_exit + 1  # 平倉的那一根不反手
+            else:
+                trades.append((entry, total - 1, side, entry_price, close[total - 1], "end"))
+                break
+        return trades
+
+    def _simulate_bars(self, df, open_, high, low, close):
+        """逐根 K 線: 先檢查止損止盈，再於收盤時依即時流程的訊號進出場"""
+        total = len(close)
+        votes = np.zeros((len(self.strategies), total), dtype=np.int8)
+        trades = []
+        position = None  # (進場 index, 方向, 進場價, 止損, 止盈)
+
+        for t in range(self.warmup, total):
+            if position is not None and t > position[0]:
+                entry, side, entry_price, stop, take = position
+                hit = stop_exit(side, open_[t], high[t], low[t], stop, take)
+                if hit is not None:
+                    trades.append((entry, t, side, entry_price, hit[1], hit[0]))
+                    position = None
+
+            bar = self._live_votes(df, t)
+            votes[:, t] = bar[0]
+            signal = int(self.ensemble.decide(bar[0][None], bar[1][None])[0])
+
+            if position is None:
+                if signal != 0 and t < total - 1:
+                    stop, take = self._levels(signal, close[t], bar)
+                    position = (t, signal, close[t], stop, take)
+            elif signal == -position[1]:
+                trades.append((position[0], t, position[1], position[2], close[t], "signal"))
+                position = None
+
+        if position is not None:
+            trades.append((position[0], total - 1, position[1], position[2], close[total - 1], "end"))
+        return trades, votes
+
+    # ------------------------------------------------------------------
+    # 結果
+    # ------------------------------------------------------------------
+    def _trade_return(self, side, entry_price, exit_price):
+        """單筆交易對保證金的報酬 (含開平倉手續費)，最多虧損全部保證金"""
+        ratio = exit_price / entry_price
+        gross = side * (ratio - 1) * self.leverage
+        fees = self.fee_rate * self.leverage * (1 + ratio)
+        return max(gross - fees, -1.0), fees
+
+    def _build_result(self, symbol, df, close, votes, raw_trades):
+        total = len(close)
+        times = pd.to_datetime(df['timestamp']) if 'timestamp' in df.columns else pd.Series(df.index)
+        times = pd.DatetimeIndex(times)
+
+        equity = np.full(total, np.nan)
+        equity[0] = self.initial_capital
+        capital = self.initial_capital
+        rows = []
+        attribution = {name: [0, 0, 0.0] for name in self.strategy_names}  # 交易數, 獲利數, 分攤損益
+
+        for entry, exit_index, side, entry_price, exit_price, reason in raw_trades:
+            ret, fee_ratio = self._trade_return(side, entry_price, exit_price)
+            # 持倉期間的市值 (已扣開倉手續費)
+            marks = close[entry:exit_index] / entry_price - 1
+            equity[entry:exit_index] = capital * (1 + self.leverage * (side * marks - self.fee_rate))
+            pnl = capital * ret
+            fees = capital * fee_ratio
+            capital += pnl
+            equity[exit_index] = capital
+
+            voters = [name for k, name in enumerate(self.strategy_names) if votes[k, entry] == side]
+            for name in voters:
+                stats = attribution[name]
+                stats[0] += 1
+                stats[1] += pnl > 0
+                stats[2] += pnl / len(voters)
+
+            rows.append((symbol, SIDE_NAMES[side], times[entry], float(entry_price), times[exit_index],
+                         float(exit_price), reason, int(exit_index - entry), ret, pnl, fees, ",".join(voters)))
+
+        equity = pd.Series(equity, index=times, name=symbol).ffill()
+        trades = pd.DataFrame(rows, columns=TRADE_COLUMNS)
+        attribution = pd.DataFrame(
+            [(name, n, wins, wins / n if n else 0.0, pnl) for name, (n, wins, pnl) in attribution.items()],
+            columns=['strategy', 'trades', 'wins', 'win_rate', 'pnl']).set_index('strategy')
+        return {
+            'trades': trades,
+            'equity': equity,
+            'drawdown': equity / equity.cummax() - 1,
+            'stats': self._stats(trades, equity),
+            'attribution': attribution,
+            'signals': votes,
+        }
+
+    def _stats(self, trades, equity):
+        pnl = trades['pnl'] if len(trades) else pd.Series(dtype=float)
+        gains = pnl[pnl > 0].sum()
+        losses = -pnl[pnl < 0].sum()
+        return {
+            'trades': len(trades),
+            'win_rate': float((pnl > 0).mean()) if len(pnl) else 0.0,
+            'total_return': float(equity.iloc[-1] / equity.iloc[0] - 1) if len(equity) else 0.0,
+            'max_drawdown': float((equity / equity.cummax() - 1).min()) if len(equity) else 0.0,
+            'profit_factor': float(gains / losses) if losses > 0 else float('inf') if gains > 0 else 0.0,
+            'fees': float(trades['fees'].sum()) if len(trades) else 0.0,
+            'final_equity': float(equity.iloc[-1]) if len(equity) else self.initial_capital,
+        }
+
+    # ------------------------------------------------------------------
+    # 對外介面
+    # ------------------------------------------------------------------
+    def run_symbol(self, symbol, df):
+        """
+        單一幣種回測
+        :param df: K 線 (timestamp, open, high, low, close, volume)，依時間排序且只含已收盤 K 線
+        :return: {'trades', 'equity', 'drawdown', 'stats', 'attribution', 'signals'}
+        """
+        df = df.reset_index(drop=True)
+        open_ = df['open'].to_numpy(dtype=np.float64)
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        close = df['close'].to_numpy(dtype=np.float64)
+
+        if self.mode == 'vectorized':
+            series = self.series_matrices(df)
+            votes = series[0]
+            signal = self.ensemble.decide(votes.T, series[1].T)
+            raw_trades = self._simulate_events(signal, open_, high, low, close, series) if len(df) else []
+        else:
+            raw_trades, votes = self._simulate_bars(df, open_, high, low, close)
+        return self._build_result(symbol, df, close, votes, raw_trades)
+
+    def run(self, frames):
+        """
+        多幣種回測 (每個幣種各自使用 initial_capital)
+        :param frames: {symbol: DataFrame}
+        :return: {'symbols': {symbol: run_symbol 結果}, 'trades', 'equity', 'drawdown', 'stats', 'attribution'}
+        """
+        results = {}
+        for symbol, df in frames.items():
+            if df is None or len(df) <= self.warmup:
+                print(f"⚠️ 跳過 {symbol}: K 線數量不足 ({0 if df is None else len(df)} <= {self.warmup})")
+                continue
+            start = time.time()
+            results[symbol] = self.run_symbol(symbol, df)
+            stats = results[symbol]['stats']
+            print(f"📊 {symbol}: {len(df)} 根 K 線，{stats['trades']} 筆交易，報酬 {stats['total_return']:.2%}，"
+                  f"最大回撤 {stats['max_drawdown']:.2%} ({(time.time() - start) * 1000:.0f} ms)")
+
+        return self.combine(results)
+
+    def combine(self, results):
+        """
+        合併各幣種的 run_symbol 結果 (每個幣種各自使用 initial_capital)
+        :param results: {symbol: run_symbol 結果}
+        """
+        if not results:
+            return {'symbols': {}, 'trades': pd.DataFrame(columns=TRADE_COLUMNS), 'equity': pd.Series(dtype=float),
+                    'drawdown': pd.Series(dtype=float), 'stats': {}, 'attribution': pd.DataFrame()}
+
+        # 組合權益: 各幣種權益依時間對齊 (開始前以初始資金計) 後加總
+        curves = pd.concat([r['equity'] for r in results.values()], axis=1).sort_index()
+        equity = curves.ffill().fillna(self.initial_capital).sum(axis=1)
+        trades = pd.concat([r['trades'] for r in results.values()], ignore_index=True).sort_values('exit_time')
+        attribution = sum(r['attribution'][['trades', 'wins', 'pnl']] for r in results.values())
+        attribution['win_rate'] = (attribution['wins'] / attribution['trades'].where(attribution['trades'] > 0)).fillna(0.0)
+
+        return {
+            'symbols': results,
+            'trades': trades.reset_index(drop=True),
+            'equity': equity,
+            'drawdown': equity / equity.cummax() - 1,
+            'stats': self._stats(trades, equity),
+            'attribution': attribution[['trades', 'wins', 'win_rate', 'pnl']],
+        }
@@ -0,0 +1,219 @@
+import sys
+import os
+
+# 🔥 取得目前檔案的路徑，並將「上一層目錄」加入 Python 搜尋路徑
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import config
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from utils.exit_rules import stop_exit, exit_levels
+from utils.position_book import PositionBook
+
+SIDE_CODES = {"LONG": 1, "SHORT": -1}
+
+
+class ExitWatcherService:
+    """
+    輕量的止損 / 止盈監控 (獨立於策略循環的背景執行緒)
+    - 持倉與開倉價來自 Executor 的倉位簿，不另外查詢倉位
+    - poll: 每 interval 秒以一次 fetch_tickers 取得所有持倉幣種的最新價 (沒有持倉時不打 API)
+    - stream: 訂閱 K 線串流 (on_candle)，每次價格更新立即檢查
+    - 價位規則與回測相同 (utils.exit_rules): 開倉時策略提供的價位優先，否則依 STOP_LOSS_PCT / TAKE_PROFIT_PCT
+    - 觸發後排入 reduceOnly 市價全平 (Executor.close_position 送單佇列)，記錄觸發到交易所接受訂單的延遲
+    """
+    def __init__(self, executor, exchange=None, trade_logger=None, interval=None, stop_loss_pct=None,
+                 take_profit_pct=None, use_strategy_levels=None, retry_after=5.0, log_path=None, history_size=100):
+        """
+        :param executor: BingXExecutor (倉位簿與平倉)
+        :param exchange: 查詢報價的 ccxt 交易所物件 (預設 executor.exchange)
+        :param trade_logger: TradeLogger，平倉時寫入交易紀錄
+        :param interval: poll 模式的檢查間隔 (秒)
+        :param retry_after: 平倉失敗後，同一幣種隔多久才再觸發 (秒)
+        :param log_path: 每次觸發的延遲紀錄 JSONL (None 不寫檔)
+        """
+        self.executor = executor
+        self.exchange = exchange if exchange is not None else executor.exchange
+        self.trade_logger = trade_logger
+        self.interval = interval if interval is not None else getattr(config, 'EXIT_WATCHER_INTERVAL_SEC', 2.0)
+        self.stop_loss_pct = stop_loss_pct if stop_loss_pct is not None else getattr(config, 'STOP_LOSS_PCT', 0)
+        self.take_profit_pct = take_profit_pct if take_profit_pct is not None else getattr(config, 'TAKE_PROFIT_PCT', 0)
+        if use_strategy_levels is None:
+            use_strategy_levels = getattr(config, 'USE_STRATEGY_EXIT_LEVELS', False)
+        self.use_strategy_levels = use_strategy_levels
+        self.retry_after = retry_after
+        self.log_path = log_path
+
+        self.history = deque(maxlen=history_size)  # 最近的觸發紀錄
+        self._failed_at = {}  # 幣種 -> 上次平倉失敗的時間
+        self._check_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # 價位
+    # ------------------------------------------------------------------
+    def levels(self, symbol, position):
+        """持倉的 (止損價, 止盈價)，開倉價未知時為 None"""
+        if not position.get('entry_price'):
+            return None
+        stop_price = take_price = None
+        if self.use_strategy_levels:
+            stop_price, take_price = self.executor.positions.get_levels(symbol)
+        return exit_levels(SIDE_CODES[position['side']], position['entry_price'],
+                           self.stop_loss_pct, self.take_profit_pct, stop_price, take_price)
+
+    def fetch_prices(self, symbols):
+        """
+        一次 fetch_tickers 取得多個幣種的出場參考價 (多單看 bid、空單看 ask，沒有則用 last)
+        :return: {symbol: {'bid', 'ask', 'last'}}
+        """
+        tickers = self.exchange.fetch_tickers([symbol.replace('-', '/') for symbol in symbols])
+        prices = {}
+        for ticker in tickers.values():
+            symbol = PositionBook.to_symbol(ticker['symbol'])
+            if symbol in symbols:
+                prices[symbol] = {'bid': ticker.get('bid'), 'ask': ticker.get('ask'), 'last': ticker.get('last')}
+        return prices
+
+    # ------------------------------------------------------------------
+    # 檢查
+    # ------------------------------------------------------------------
+    def check(self):
+        """
+        檢查所有持倉一次 (poll 模式每個間隔呼叫)
+        :return: 這次觸發的紀錄清單
+        """
+        positions = self.executor.positions.snapshot()
+        if not positions:
+            return []
+        try:
+            prices = self.fetch_prices(list(positions))
+        except Exception as e:
+            print(f"⚠️ [止損監控] 讀取報價失敗: {e}")
+            return []
+
+        exits = []
+        for symbol, position in positions.items():
+            quote = prices.get(symbol)
+            if not quote:
+                continue
+            price = quote['bid'] if position['side'] == 'LONG' else quote['ask']
+            record = self._check_symbol(symbol, position, price or quote['last'])
+            if record:
+                exits.append(record)
+        return exits
+
+    def on_price(self, symbol, price):
+        """串流價格更新 (單一幣種)，有持倉才檢查"""
+        position = self.executor.positions.get(symbol)
+        if position is None:
+            return None
+        return self._check_symbol(symbol, position, price)
+
+    def on_candle(self, event):
+        """BaseCandleFeed 的訂閱回呼: 形成中 K 線的收盤價即為最新成交價"""
+        return self.on_price(event['symbol'], float(event['candle'][4]))
+
+    def _check_symbol(self, symbol, position, price):
+        if price is None:
+            return None
+        levels = self.levels(symbol, position)
+        if levels is None:
+            return None
+        side = SIDE_CODES[position['side']]
+        hit = stop_exit(side, price, price, price, *levels)
+        if hit is None:
+            return None
+        failed_at = self._failed_at.get(symbol)
+        if failed_at is not None and time.time() - failed_at < self.retry_after:
+            return None
+        return self._exit(symbol, position, hit[0], price, levels)
+
+    def _exit(self, symbol, position, reason, price, levels):
+        """觸發後立即排入 reduceOnly 平倉單，交易所接受後記錄 觸發→送出 的延遲"""
+        triggered = time.perf_counter()
+        with self._check_lock:
+            # poll 執行緒與串流回呼可能同時觸發同一個倉位；平倉單還在佇列時也不再觸發
+            if self.executor.positions.get(symbol) is None or self.executor.has_pending(symbol):
+                return None
+            label = "止損" if reason == "stop_loss" else "止盈"
+            print(f"🛑 [止損監控] {symbol} {position['side']} 觸發{label} @ {price} "
+                  f"(開倉 {position['entry_price']}, 止損 {levels[0]:.6g} / 止盈 {levels[1]:.6g})")
+            ticket = self.executor.close_position(symbol, price=price)
+
+        record = {
+            'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'symbol': symbol,
+            'side': position['side'],
+            'reason': reason,
+            'price': float(price),
+            'entry_price': position['entry_price'],
+            'stop': float(levels[0]),
+            'take': float(levels[1]),
+            'contracts': position['contracts'],
+            'client_order_id': ticket.client_order_id if ticket else None,
+            'order_id': None,
+            'latency_ms': None,
+        }
+        if ticket is None:
+            self._on_closed(record, None, triggered, label)
+        else:
+            # 送單執行緒完成 (成交或失敗) 後才寫入紀錄，監控執行緒不等待
+            ticket.add_done_callback(lambda t: self._on_closed(record, t, triggered, label))
+        return record
+
+    def _on_closed(self, record, ticket, triggered, label):
+        symbol = record['symbol']
+        sent_at = ticket.sent_at if ticket is not None and ticket.sent_at is not None else time.perf_counter()
+        record['latency_ms'] = (sent_at - triggered) * 1000
+        record['order_id'] = ticket.order_id if ticket is not None else None
+        self.history.append(record)
+        self._write_log(record)
+
+        if ticket is None or not ticket.ok:
+            self._failed_at[symbol] = time.time()
+            print(f"❌ [止損監控] {symbol} 平倉失敗，{self.retry_after:.0f} 秒後重試 ({record['latency_ms']:.0f} ms)")
+            return
+        self._failed_at.pop(symbol, None)
+        print(f"   ⏱️ [止損監控] {symbol} 觸發→平倉送出 {record['latency_ms']:.0f} ms")
+        if self.trade_logger is not None:
+            self.trade_logger.log("CLOSE", ticket.fill_price or record['price'], ticket.filled, f"{label}出場",
+                                  symbol=symbol)
+
+    def _write_log(self, record):
+        if not self.log_path:
+            return
+        try:
+            log_dir = os.path.dirname(self.log_path)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"❌ [Log] 止損監控紀錄寫入失敗: {e}")
+
+    # ------------------------------------------------------------------
+    # 背景執行緒 (poll 模式)
+    # ------------------------------------------------------------------
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"❌ [止損監控] 檢查失敗: {e}")
+
+    def start_background(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop_event.set()
@@ -1,8 +1,11 @@
 # services/market_data_service.py
 import sys
 import os
+import json
+import time
+import threading
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 from datetime import datetime
 from typing import Dict, Any, Optional
 
@@ -13,10 +16,96 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
 import config
-from utils.zigzag import ZigZagIdentifier  # 🔥 引入 ZigZag 工具
+from utils.zigzag import ZigZagIdentifier, ZigZagTracker, find_pivot_pyramid  # 🔥 引入 ZigZag 工具
+from utils import indicators
+from utils.incremental_indicators import IncrementalIndicators
+from utils.indicator_cache import IndicatorCache
+from utils.lazy_context import LazyContext
+from utils.resampler import timeframe_to_ms
+
+# pandas_ta 只有在選擇 'pandas_ta' 引擎時才需要
+try:
+    import pandas_ta as ta
+except ImportError:
+    ta = None
+
+# analyze_technicals 最後一列需要讀取的指標欄位
+INDICATOR_COLUMNS = [
+    'close', 'ma_fast', 'ma_slow', 'bb_lower', 'bb_upper',
+    'macd_line', 'macd_hist', 'macd_signal', 'rsi',
+    'kdj_k', 'kdj_d', 'kdj_j', 'atr', 'obv', 'mfi', 'vwap'
+]
+
+# 延遲計算的相依關係: 欄位 -> 需要先算好的欄位 ('_' 開頭為內部中間結果)
+# 原始陣列 (_high/_low/_close/_volume/_times/_timestamps_ms) 在建立 context 時就已存在
+INDICATOR_DEPENDENCIES = {
+    'close': [],
+    'ma_fast': [],
+    'ma_slow': [],
+    'trend_signal': ['ma_fast', 'ma_slow'],
+    'trend': ['trend_signal'],
+    '_macd': [],
+    'macd_hist': ['_macd'],
+    '_macd_line': ['_macd'],
+    '_macd_signal': ['_macd'],
+    'rsi': [],
+    '_kdj': [],
+    'kdj_k': ['_kdj'],
+    '_kdj_d': ['_kdj'],
+    'kdj_j': ['_kdj'],
+    '_bbands': [],
+    'atr': ['close'],
+    '_obv': [],
+    'obv': ['_obv'],
+    '_prev_obv': ['_obv'],
+    'mfi': [],
+    'vwap': ['close', 'ma_slow'],
+    'pivots': [],
+    'pivot_pyramid': [],
+    'technical_analysis_text': ['close', 'ma_fast', 'ma_slow', '_macd_line', '_macd_signal', 'macd_hist',
+                                'rsi', 'kdj_k', '_kdj_d', 'kdj_j', '_bbands', 'atr', 'obv', '_prev_obv',
+                                'mfi', 'vwap', 'pivots'],
+}
+
+
+def resolve_dependencies(names) -> list:
+    """
+    展開相依關係並排序 (被依賴的欄位在前)
+    :param names: 策略宣告的欄位，例如 ['trend_signal', 'ma_fast']
+    :return: 需要計算的欄位清單
+    """
+    ordered = []
+    visiting = set()
+
+    def visit(name):
+        if name in ordered:
+            return
+        if name not in INDICATOR_DEPENDENCIES:
+            raise KeyError(f"未知的指標欄位: {name}")
+        if name in visiting:
+            raise ValueError(f"指標相依關係有循環: {name}")
+        visiting.add(name)
+        for dep in INDICATOR_DEPENDENCIES[name]:
+            visit(dep)
+        visiting.discard(name)
+        ordered.append(name)
+
+    for name in names:
+        visit(name)
+    return ordered
+
 
 class MarketDataService:
-    def __init__(self):
+    def __init__(self, engine=None):
+        # --- 0. 指標計算引擎 ---
+        # 'numpy': utils/indicators.py (直接在陣列上計算，較快)
+        # 'pandas_ta': 原本的 pandas_ta 流程
+        # 'incremental': 每個 (symbol, 時框) 保留指標狀態，每根新 K 線 O(1) 更新 (未指定 symbol 時退回 numpy)
+        self.engine = engine or getattr(config, 'INDICATOR_ENGINE', 'numpy')
+        if self.engine == 'pandas_ta' and ta is None:
+            print("⚠️ 未安裝 pandas_ta，改用 numpy 指標引擎")
+            self.engine = 'numpy'
+
         # --- 1. 基礎設定參數 (從 config 讀取) ---
         
         # A. 趨勢 (Trend)
@@ -45,23 +134,434 @@ class MarketDataService:
         self.zigzag_order = getattr(config, 'ZIGZAG_ORDER', 5)
         # 初始化 ZigZag 識別器
         self.zigzag = ZigZagIdentifier(order=self.zigzag_order)
+        # 多階層 ZigZag (一次算出多個 order 的轉折點，給不同尺度的型態判斷使用)
+        self.pyramid_orders = list(getattr(config, 'ZIGZAG_PYRAMID_ORDERS', [3, 5, 8, 13]))
+
+        # 🔥 延遲計算: numpy 引擎下只算策略真正讀取的指標，報告文字等到被讀取才產生
+        self.lazy = getattr(config, 'LAZY_INDICATORS', True)
+        self._lazy_resolvers = self._build_resolvers()
+
+        # 增量指標狀態: {(symbol, timeframe): IncrementalIndicators}
+        self.incremental_states = {}
+        # 串流式 ZigZag (incremental 引擎): {(symbol, timeframe): ZigZagTracker}
+        self.zigzag_trackers = {}
+        # 串流模式下 feed 執行緒 (update_candle) 與主迴圈 (analyze_technicals) 會同時更新上面兩份狀態
+        self._state_lock = threading.RLock()
+
+        # 🔥 指標結果快取: 交易循環與定期報告在同一根 K 線內重複呼叫時直接回傳
+        self.cache = None
+        if getattr(config, 'ENABLE_INDICATOR_CACHE', True):
+            self.cache = IndicatorCache(
+                max_entries=getattr(config, 'INDICATOR_CACHE_MAX_ENTRIES', 256),
+                max_bytes=getattr(config, 'INDICATOR_CACHE_MAX_BYTES', 16 * 1024 * 1024),
+            )
+
+    @property
+    def indicator_params(self) -> Dict[str, Any]:
+        """numpy 指標引擎使用的參數"""
+        return {
+            'ma_fast': self.ma_fast, 'ma_slow': self.ma_slow,
+            'bb_length': self.bb_length, 'bb_std': self.bb_std,
+            'macd_fast': self.macd_fast, 'macd_slow': self.macd_slow, 'macd_signal': self.macd_signal,
+            'rsi_length': self.rsi_length,
+            'kdj_length': self.kdj_length, 'kdj_signal': self.kdj_signal,
+            'atr_length': self.atr_length, 'mfi_length': self.mfi_length,
+        }
 
-    def analyze_technicals(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def analyze_technicals(self, df: pd.DataFrame, symbol: Optional[str] = None,
+                           timeframe: Optional[str] = None, required: Optional[list] = None) -> Dict[str, Any]:
         """
         計算技術指標並返回結構化數據與文字描述
         :param df: 包含 Open, High, Low, Close, Volume 的 DataFrame
-        :return: 包含數值與文字摘要的字典
+        :param symbol: 幣種 (incremental 引擎用來找對應的指標狀態，也是快取 key 的一部分)
+        :param timeframe: 時框 (判斷最後一根是否已收盤)
+        :param required: 延遲計算模式下先算好的欄位 (策略的 required_indicators)，其餘欄位讀取時才計算
+        :return: 包含數值與文字摘要的字典 (延遲計算模式下為 LazyContext)
         """
         # 1. 基礎資料檢查
         if df is None or df.empty:
             print("⚠️ 警告: 傳入的 DataFrame 為空")
             return {}
-        
+
+        # 有指定幣種與時框才能快取 (否則無法確定是同一組 K 線)
+        cache_key = None
+        if self.cache is not None and symbol and timeframe and 'timestamp' in df.columns:
+            cache_key = self._cache_key(df, symbol, timeframe)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if required and isinstance(cached, LazyContext):
+                    cached.resolve(resolve_dependencies(required))
+                return cached
+
+        context = self._analyze(df, symbol, timeframe, required)
+        if cache_key is not None and context:
+            self.cache.put(cache_key, context)
+        return context
+
+    def _cache_key(self, df: pd.DataFrame, symbol: str, timeframe: str) -> tuple:
+        """
+        快取 key: (幣種, 時框, 第一根時間, 最後收盤 K 線時間, 形成中 K 線內容, 根數, 參數)
+        - 第一根時間與根數: EMA/RMA 的結果與資料起點有關
+        - 形成中 K 線: 價格還在變動，內容不同就必須重算
+        """
+        first_ts = pd.Timestamp(df['timestamp'].iat[0]).value // 1_000_000
+        last_ts = pd.Timestamp(df['timestamp'].iat[-1]).value // 1_000_000
+        now_ms = int(time.time() * 1000)
+
+        if last_ts + timeframe_to_ms(timeframe) <= now_ms:
+            last_closed_ts, forming = last_ts, None
+        else:
+            last_closed_ts = pd.Timestamp(df['timestamp'].iat[-2]).value // 1_000_000 if len(df) > 1 else None
+            last_row = df.iloc[-1]
+            forming = (last_ts, float(last_row['open']), float(last_row['high']),
+                       float(last_row['low']), float(last_row['close']), float(last_row['volume']))
+
+        params = (self.engine, self.lazy, self.zigzag_order) + tuple(sorted(self.indicator_params.items()))
+        return (symbol, timeframe, first_ts, last_closed_ts, forming, len(df), params)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """指標快取的命中統計 (未啟用快取時為空字典)"""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def _analyze(self, df: pd.DataFrame, symbol: Optional[str], timeframe: Optional[str],
+                 required: Optional[list] = None) -> Dict[str, Any]:
+        """實際的指標計算 (未命中快取時)"""
         # 確保資料長度足夠計算長天期指標 (至少要比 ma_slow 長)
         min_required_len = max(self.ma_slow, self.macd_slow, 30)
         if len(df) < min_required_len:
             print(f"⚠️ 警告: 數據長度不足 ({len(df)} < {min_required_len})，指標可能不準確")
 
+        if self.engine == 'numpy' and self.lazy:
+            context = self._lazy_context(df)
+            if required:
+                context.resolve(resolve_dependencies(required))
+            return context
+
+        if self.engine == 'incremental' and symbol and timeframe and 'timestamp' in df.columns:
+            latest, prev_obv, last_pivots = self._compute_incremental(df, symbol, timeframe)
+        elif self.engine in ('numpy', 'incremental'):
+            latest, prev_obv, last_pivots = self._compute_numpy(df)
+        else:
+            result = self._compute_pandas_ta(df)
+            if result is None:
+                # 發生嚴重錯誤時，直接回傳空字典
+                return {}
+            latest, prev_obv, last_pivots = result
+
+        pyramid = self.get_pivot_pyramid(df['high'].to_numpy(dtype=np.float64), df['low'].to_numpy(dtype=np.float64))
+        return self._build_context(latest, prev_obv, last_pivots, pyramid)
+
+    def get_pivot_pyramid(self, highs: np.ndarray, lows: np.ndarray) -> np.ndarray:
+        """
+        多個 ZIGZAG_PYRAMID_ORDERS 的轉折點 (一次向量化計算)
+        :return: 結構陣列 (order, index, price, type)，type: 1=HIGH, -1=LOW
+        """
+        try:
+            return find_pivot_pyramid(highs, lows, self.pyramid_orders)
+        except Exception as e:
+            print(f"⚠️ ZigZag 多階層計算失敗: {e}")
+            return find_pivot_pyramid([], [], [])
+
+    def _lazy_context(self, df: pd.DataFrame) -> LazyContext:
+        """建立延遲計算的 context (只先取出原始陣列)"""
+        store = {
+            '_high': df['high'].to_numpy(dtype=np.float64),
+            '_low': df['low'].to_numpy(dtype=np.float64),
+            '_close': df['close'].to_numpy(dtype=np.float64),
+            '_volume': df['volume'].to_numpy(dtype=np.float64),
+            'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        if 'timestamp' in df.columns:
+            store['_times'] = pd.to_datetime(df['timestamp']).to_numpy()
+            store['_timestamps_ms'] = store['_times'].astype('datetime64[ms]').astype(np.int64)
+        else:
+            store['_times'] = df.index.values
+            store['_timestamps_ms'] = None
+        return LazyContext(self._lazy_resolvers, store)
+
+    def _build_resolvers(self) -> Dict[str, Any]:
+        """
+        每個 context 欄位的計算方式 (欄位順序與 _build_context 的回傳相同)
+        數值與 _compute_numpy + _build_context 完全一致
+        """
+        last = indicators.last_valid
+
+        def atr(ctx):
+            value = last(indicators.atr(ctx['_high'], ctx['_low'], ctx['_close'], self.atr_length))
+            return value if value > 0 else ctx['close'] * 0.01  # 防呆
+
+        def vwap(ctx):
+            if ctx['_timestamps_ms'] is None:
+                value = ctx['ma_slow']
+            else:
+                value = last(indicators.vwap(ctx['_high'], ctx['_low'], ctx['_close'], ctx['_volume'],
+                                             ctx['_timestamps_ms']))
+            return value if value != 0 else ctx['close']
+
+        def prev_obv(ctx):
+            return last(ctx['_obv'], offset=1) if len(ctx['_obv']) > 1 else ctx['obv']
+
+        def pivots(ctx):
+            try:
+                return self.zigzag.get_last_n_pivots_from_arrays(ctx['_high'], ctx['_low'], ctx['_times'], n=5)
+            except Exception as e:
+                print(f"⚠️ ZigZag 計算失敗: {e}")
+                return []
+
+        def text(ctx):
+            row = {
+                'close': ctx['close'], 'ma_fast': ctx['ma_fast'], 'ma_slow': ctx['ma_slow'],
+                'bb_lower': ctx['_bbands'][0], 'bb_upper': ctx['_bbands'][1],
+                'macd_line': ctx['_macd_line'], 'macd_hist': ctx['macd_hist'], 'macd_signal': ctx['_macd_signal'],
+                'rsi': ctx['rsi'], 'kdj_k': ctx['kdj_k'], 'kdj_d': ctx['_kdj_d'], 'kdj_j': ctx['kdj_j'],
+                'atr': ctx['atr'], 'obv': ctx['obv'], 'mfi': ctx['mfi'], 'vwap': ctx['vwap'],
+            }
+            return self._build_context(row, ctx['_prev_obv'], ctx['pivots'])['technical_analysis_text']
+
+        def bbands(ctx):
+            lower, _, upper = indicators.bbands(ctx['_close'], self.bb_length, self.bb_std)
+            return last(lower), last(upper)
+
+        return {
+            'close': lambda ctx: last(ctx['_close']),
+            'rsi': lambda ctx: last(indicators.rsi(ctx['_close'], self.rsi_length)),
+            'kdj_k': lambda ctx: last(ctx['_kdj'][0]),
+            'kdj_j': lambda ctx: last(ctx['_kdj'][2]),
+            'ma_fast': lambda ctx: last(indicators.sma(ctx['_close'], self.ma_fast)),
+            'ma_slow': lambda ctx: last(indicators.sma(ctx['_close'], self.ma_slow)),
+            'macd_hist': lambda ctx: last(ctx['_macd'][1]),
+            'atr': atr,
+            'obv': lambda ctx: last(ctx['_obv']),
+            'mfi': lambda ctx: last(indicators.mfi(ctx['_high'], ctx['_low'], ctx['_close'], ctx['_volume'],
+                                                   self.mfi_length)),
+            'vwap': vwap,
+            'trend': lambda ctx: "多頭排列 (Bullish)" if ctx['trend_signal'] == "LONG" else "空頭排列 (Bearish)",
+            'trend_signal': lambda ctx: "LONG" if ctx['ma_fast'] > ctx['ma_slow'] else "SHORT",
+            'pivots': pivots,
+            'pivot_pyramid': lambda ctx: self.get_pivot_pyramid(ctx['_high'], ctx['_low']),
+            'technical_analysis_text': text,
+            # --- 內部中間結果 ---
+            '_macd': lambda ctx: indicators.macd(ctx['_close'], self.macd_fast, self.macd_slow, self.macd_signal),
+            '_macd_line': lambda ctx: last(ctx['_macd'][0]),
+            '_macd_signal': lambda ctx: last(ctx['_macd'][2]),
+            '_kdj': lambda ctx: indicators.kdj(ctx['_high'], ctx['_low'], ctx['_close'],
+                                               self.kdj_length, self.kdj_signal),
+            '_kdj_d': lambda ctx: last(ctx['_kdj'][1]),
+            '_bbands': bbands,
+            '_obv': lambda ctx: indicators.obv(ctx['_close'], ctx['_volume']),
+            '_prev_obv': prev_obv,
+        }
+
+    def _compute_numpy(self, df: pd.DataFrame):
+        """
+        numpy 指標引擎: 只取出需要的欄位成連續陣列，直接計算最後兩根的數值
+        :return: (最後一根的指標 dict, 前一根 OBV, ZigZag 轉折點)
+        """
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        close = df['close'].to_numpy(dtype=np.float64)
+        volume = df['volume'].to_numpy(dtype=np.float64)
+
+        if 'timestamp' in df.columns:
+            times = pd.to_datetime(df['timestamp']).to_numpy()
+            timestamps_ms = times.astype('datetime64[ms]').astype(np.int64)
+        else:
+            times = df.index.values
+            timestamps_ms = None
+
+        values = indicators.compute_indicators(None, high, low, close, volume, timestamps_ms, self.indicator_params)
+
+        # 最後一根 (NaN 以前值補，等同 ffill().fillna(0))
+        latest = {name: indicators.last_valid(values[name]) for name in INDICATOR_COLUMNS}
+        prev_obv = indicators.last_valid(values['obv'], offset=1) if len(close) > 1 else latest['obv']
+
+        try:
+            last_pivots = self.zigzag.get_last_n_pivots_from_arrays(high, low, times, n=5)
+        except Exception as e:
+            print(f"⚠️ ZigZag 計算失敗: {e}")
+            last_pivots = []
+
+        return latest, prev_obv, last_pivots
+
+    def analyze_panel(self, symbols: list, panel: Dict[str, np.ndarray]) -> Dict[str, Dict[str, Any]]:
+        """
+        多幣種批次計算: 所有指標沿時間軸一次算完整個面板，再逐一組出 context
+        :param symbols: 幣種清單 (順序與面板的列相同)
+        :param panel: {'timestamp': (T,) ms, 'open'/'high'/'low'/'close'/'volume': (S, T)}
+                      可另帶 'time' (datetime64，ZigZag 顯示用)，即 BingXLoader.align_panel 的輸出
+        :return: {symbol: context}，內容與 analyze_technicals 相同
+        """
+        if not symbols or panel is None:
+            return {}
+
+        high, low, close, volume = panel['high'], panel['low'], panel['close'], panel['volume']
+        timestamps_ms = np.asarray(panel['timestamp'], dtype=np.int64)
+        min_required_len = max(self.ma_slow, self.macd_slow, 30)
+        if close.shape[-1] < min_required_len:
+            print(f"⚠️ 警告: 數據長度不足 ({close.shape[-1]} < {min_required_len})，指標可能不準確")
+
+        values = indicators.compute_indicators(
+            None, high, low, close, volume, np.broadcast_to(timestamps_ms, close.shape), self.indicator_params)
+
+        # (S,) 的最後一根數值
+        latest = {name: indicators.last_valid(values[name]) for name in INDICATOR_COLUMNS}
+        if close.shape[-1] > 1:
+            prev_obv = indicators.last_valid(values['obv'], offset=1)
+        else:
+            prev_obv = latest['obv']
+
+        # ZigZag 時間格式與 DataFrame 流程相同 (優先使用原本的時間欄)
+        times = panel.get('time')
+        if times is None:
+            times = pd.to_datetime(timestamps_ms, unit='ms').to_numpy()
+        contexts = {}
+        for i, symbol in enumerate(symbols):
+            try:
+                last_pivots = self.zigzag.get_last_n_pivots_from_arrays(high[i], low[i], times, n=5)
+            except Exception as e:
+                print(f"⚠️ [{symbol}] ZigZag 計算失敗: {e}")
+                last_pivots = []
+            row = {name: float(latest[name][i]) for name in INDICATOR_COLUMNS}
+            pyramid = self.get_pivot_pyramid(high[i], low[i])
+            contexts[symbol] = self._build_context(row, float(prev_obv[i]), last_pivots, pyramid)
+        return contexts
+
+    def get_incremental_state(self, symbol: str, timeframe: str) -> IncrementalIndicators:
+        """取得 (或建立) 某個幣種/時框的增量指標狀態"""
+        key = (symbol, timeframe)
+        with self._state_lock:
+            state = self.incremental_states.get(key)
+            if state is None or state.params != self.indicator_params:
+                state = IncrementalIndicators(self.indicator_params)
+                self.incremental_states[key] = state
+            return state
+
+    def update_candle(self, symbol: str, timeframe: str, candle, closed: bool = True) -> Dict[str, float]:
+        """
+        串流用: 單根 K 線的 O(1) 指標更新
+        :param candle: [timestamp(ms), open, high, low, close, volume]
+        :param closed: False 代表形成中的 K 線 (可重複更新，不會寫入狀態)
+        """
+        with self._state_lock:
+            state = self.get_incremental_state(symbol, timeframe)
+            already_seen = state.last_closed_ts is not None and int(candle[0]) <= state.last_closed_ts
+            values = state.update(candle, closed=closed)
+            if closed and not already_seen:
+                tracker = self.zigzag_trackers.get((symbol, timeframe))
+                if tracker is not None and tracker.count > 0:
+                    tracker.update(candle[2], candle[3], np.datetime64(int(candle[0]), 'ms'))
+        return values
+
+    def _sync_incremental(self, df: pd.DataFrame, symbol: str, timeframe: str):
+        """
+        讓增量狀態追上 df: 只處理狀態中還沒看過的 K 線
+        - 已收盤 (開盤時間 + 時框 <= 現在) 的 K 線寫入狀態 (指標與 ZigZag)
+        - 最後一根若尚未收盤，只做暫時更新
+        狀態與 df 接不上 (重啟後資料有缺口) 時，以 df 重新建立
+        :return: (指標狀態, ZigZag 追蹤器, df 中已收盤的根數, 形成中 K 線 (high, low, time) 或 None)
+        """
+        key = (symbol, timeframe)
+        times = pd.to_datetime(df['timestamp']).to_numpy()
+        timestamps = times.astype('datetime64[ms]').astype(np.int64)
+        highs = df['high'].to_numpy(dtype=np.float64)
+        lows = df['low'].to_numpy(dtype=np.float64)
+        rows = np.column_stack((
+            timestamps.astype(np.float64),
+            df['open'].to_numpy(dtype=np.float64),
+            highs,
+            lows,
+            df['close'].to_numpy(dtype=np.float64),
+            df['volume'].to_numpy(dtype=np.float64),
+        ))
+
+        state = self.get_incremental_state(symbol, timeframe)
+        tracker = self.zigzag_trackers.get(key)
+        last_closed = state.last_closed_ts
+        if last_closed is not None and timestamps[0] > last_closed and last_closed not in timestamps:
+            print(f"⚠️ [{symbol}] 增量指標狀態與資料不連續，重新建立")
+            state = IncrementalIndicators(self.indicator_params)
+            self.incremental_states[key] = state
+            tracker = None
+            last_closed = None
+
+        start = 0 if last_closed is None else int(np.searchsorted(timestamps, last_closed, side='right'))
+
+        # ZigZag 追蹤器不在序列化的狀態中，載入狀態後第一次以 df 中已處理過的 K 線重建
+        if tracker is None or (tracker.count == 0 and start > 0):
+            tracker = ZigZagTracker(order=self.zigzag_order)
+            for i in range(start):
+                tracker.update(highs[i], lows[i], times[i])
+            self.zigzag_trackers[key] = tracker
+
+        closed_before = int(time.time() * 1000) - timeframe_to_ms(timeframe)
+        forming = None
+        for i in range(start, len(rows)):
+            closed = timestamps[i] <= closed_before
+            state.update(rows[i], closed=closed)
+            if closed:
+                tracker.update(highs[i], lows[i], times[i])
+            else:
+                forming = (highs[i], lows[i], times[i])
+
+        n_closed = int(np.searchsorted(timestamps, state.last_closed_ts, side='right')) if state.last_closed_ts is not None else 0
+        return state, tracker, n_closed, forming
+
+    def _compute_incremental(self, df: pd.DataFrame, symbol: str, timeframe: str):
+        """
+        incremental 指標引擎: 第一次以 df 暖機，之後每次只處理新的 K 線
+        :return: (最後一根的指標 dict, 前一根 OBV, ZigZag 轉折點)
+        """
+        # 同步與讀取之間不能插入 update_candle (n_closed 與追蹤器的根數會對不上)
+        with self._state_lock:
+            state, tracker, n_closed, forming = self._sync_incremental(df, symbol, timeframe)
+            latest, prev_obv = state.latest()
+
+            try:
+                last_pivots = tracker.get_last_n_pivots(n=5, forming=forming)
+                # 追蹤器的 index 是串流序號，換算回 df 中的位置 (比 df 更早的轉折點會是負值)
+                offset = tracker.count - n_closed
+                for p in last_pivots:
+                    p['index'] -= offset
+            except Exception as e:
+                print(f"⚠️ ZigZag 計算失敗: {e}")
+                last_pivots = []
+
+        return latest, prev_obv, last_pivots
+
+    def save_indicator_states(self, path: str):
+        """將所有增量指標狀態寫成 JSON (重啟後用 load_indicator_states 接續)"""
+        with self._state_lock:
+            data = [
+                {'symbol': symbol, 'timeframe': timeframe, 'state': state.to_dict()}
+                for (symbol, timeframe), state in self.incremental_states.items()
+            ]
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load_indicator_states(self, path: str) -> int:
+        """讀取增量指標狀態 (參數不同的狀態會被略過)，回傳載入數量"""
+        if not os.path.exists(path):
+            return 0
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        loaded = 0
+        for item in data:
+            state = IncrementalIndicators.from_dict(item['state'])
+            if state.params != self.indicator_params:
+                continue
+            with self._state_lock:
+                self.incremental_states[(item['symbol'], item['timeframe'])] = state
+            loaded += 1
+        return loaded
+
+    def _compute_pandas_ta(self, df: pd.DataFrame):
+        """
+        pandas_ta 指標引擎 (原本的流程)
+        :return: (最後一根的指標 dict, 前一根 OBV, ZigZag 轉折點)，失敗時回傳 None
+        """
         # 複製並處理索引 (VWAP 需要時間索引)
         df = df.copy()
         if 'timestamp' in df.columns:
@@ -122,8 +622,7 @@ class MarketDataService:
 
         except Exception as e:
             print(f"❌ 指標計算發生錯誤: {e}")
-            # 發生嚴重錯誤時，直接回傳空字典或進行降級處理
-            return {}
+            return None
 
         # ==========================================
         # 3. 數據清理與取值
@@ -134,7 +633,20 @@ class MarketDataService:
         # 取得最後一筆數據
         row = df.iloc[-1]
         prev_row = df.iloc[-2] if len(df) > 1 else row
-        
+        latest = {name: float(row[name]) for name in INDICATOR_COLUMNS}
+
+        # 取得最近 5 個轉折點 (用來判斷 XABCD)
+        try:
+            last_pivots = self.zigzag.get_last_n_pivots(df, n=5)
+        except Exception as e:
+            print(f"⚠️ ZigZag 計算失敗: {e}")
+            last_pivots = []
+
+        return latest, float(prev_row['obv']), last_pivots
+
+    def _build_context(self, row: Dict[str, float], prev_obv: float, last_pivots: list,
+                       pivot_pyramid: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """由最後一根的指標數值組出 context (各引擎共用)"""
         # 取值 Helper (轉為 float 避免 numpy type 問題)
         close = float(row['close'])
         ma_fast = float(row['ma_fast'])
@@ -186,19 +698,11 @@ class MarketDataService:
         elif mfi_val < 20: mfi_status = "資金冷卻 (超賣 <20)"
         
         obv_val = float(row['obv'])
-        prev_obv = float(prev_row['obv'])
         obv_trend = "OBV上升 (資金流入)" if obv_val > prev_obv else "OBV下降 (資金流出)"
 
         # ==========================================
         # 🔥 4. ZigZag 結構分析
         # ==========================================
-        # 取得最近 5 個轉折點 (用來判斷 XABCD)
-        try:
-            last_pivots = self.zigzag.get_last_n_pivots(df, n=5)
-        except Exception as e:
-            print(f"⚠️ ZigZag 計算失敗: {e}")
-            last_pivots = []
-        
         # 轉成文字描述給 AI
         zigzag_text = "尚無足夠轉折點"
         if len(last_pivots) >= 3:
@@ -260,6 +764,7 @@ class MarketDataService:
             "trend": trend,
             "trend_signal": trend_signal,
             "pivots": last_pivots, 
+            "pivot_pyramid": pivot_pyramid,  # 多階層轉折點 (order, index, price, type)
             "technical_analysis_text": ta_text, 
             "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
@@ -0,0 +1,286 @@
+import sys
+import os
+
+# 🔥 取得目前檔案的路徑，並將「上一層目錄」加入 Python 搜尋路徑
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import config
+import hashlib
+import itertools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+from services.backtest_service import BacktestService
+from strategies import STRATEGY_MAP
+from utils.shared_arrays import SharedArrays
+from utils.zigzag import pivot_distances
+
+CANDLE_FIELDS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+DISTANCE_FIELDS = ['high_left', 'high_right', 'low_left', 'low_right']
+
+
+def param_key(params):
+    """參數組合的唯一字串 (結果檔續跑時用來判斷是否已跑過)"""
+    return json.dumps(params, sort_keys=True)
+
+
+def sweep_fingerprint(frames, strategy_names, backtest_kwargs):
+    """
+    結果檔的資料指紋 (寫在結果檔第一行)
+    param_key 只包含參數，幣種、K 線區間、策略或回測設定不同時，同一組參數的結果不能沿用
+    :return: {'fingerprint': sha1, 'symbols': {symbol: [第一根時間, 最後一根時間, 根數]}, 'strategies', 'backtest_kwargs'}
+    """
+    spec = {
+        'symbols': {
+            symbol: [pd.Timestamp(df['timestamp'].iat[0]).value // 1_000_000,
+                     pd.Timestamp(df['timestamp'].iat[-1]).value // 1_000_000, len(df)]
+            for symbol, df in frames.items()
+        },
+        'strategies': list(strategy_names),
+        'backtest_kwargs': backtest_kwargs,
+    }
+    text = json.dumps(spec, sort_keys=True, default=str)
+    return {'fingerprint': hashlib.sha1(text.encode('utf-8')).hexdigest(), **json.loads(text)}
+
+
+def is_valid(params):
+    """排除沒有意義的組合 (快線必須比慢線短)"""
+    if 'SMA_SHORT' in params and 'SMA_LONG' in params:
+        return params['SMA_SHORT'] < params['SMA_LONG']
+    return True
+
+
+def grid_candidates(space):
+    """
+    網格搜尋: 所有組合 (依參數名稱排序，順序固定)
+    :param space: {'SMA_SHORT': [5, 7], 'SMA_LONG': [25, 40], ...}
+    """
+    names = sorted(space)
+    combos = (dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names)))
+    return [params for params in combos if is_valid(params)]
+
+
+def random_candidates(space, samples, seed=0):
+    """
+    隨機搜尋: 在網格中不重複抽樣 samples 組 (同一個 seed 結果固定，才能續跑)
+    """
+    grid = grid_candidates(space)
+    if samples >= len(grid):
+        return grid
+    rng = np.random.default_rng(seed)
+    picked = rng.choice(len(grid), size=samples, replace=False)
+    return [grid[i] for i in picked]
+
+
+def load_results(path, fingerprint=None):
+    """
+    讀取已完成的結果 (JSONL)，中斷時寫到一半的最後一行會被略過
+    :param fingerprint: sweep_fingerprint 的 sha1，與結果檔第一行不同 (或沒有指紋) 時拋出 ValueError
+    """
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    header = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'fingerprint' in record:
+                header = header or record
+                continue
+            done[record['key']] = record
+
+    if fingerprint is not None and done and (header is None or header['fingerprint'] != fingerprint):
+        raise ValueError(f"{path} 的結果來自不同的幣種 / K 線區間 / 策略 / 回測設定，"
+                         f"請改用新的結果檔 (目前 {fingerprint[:12]}，檔案 "
+                         f"{header['fingerprint'][:12] if header else '沒有指紋'})")
+    return done
+
+
+def _truncate_partial_line(path):
+    """中斷時最後一行可能只寫了一半，續跑前先截掉，避免與新結果黏在同一行"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+# ==========================================
+# 子程序 (ProcessPool worker)
+# - initializer 只在每個子程序啟動時附加一次 shared memory
+# - 每個任務只傳一組參數 (dict)，K 線與預先計算的資料都不經過 pickle
+# ==========================================
+_WORKER = {}
+
+
+def _init_worker(manifest, symbols, strategy_names, backtest_kwargs):
+    shared = SharedArrays.attach(manifest)
+    frames, distances = {}, {}
+    for symbol in symbols:
+        frames[symbol] = pd.DataFrame({
+            'timestamp': pd.to_datetime(shared[f'{symbol}/timestamp'], unit='ms'),
+            **{field: shared[f'{symbol}/{field}'] for field in CANDLE_FIELDS[1:]}
+        }, copy=False)
+        distances[symbol] = {'max_order': int(shared[f'{symbol}/max_order'][0]),
+                             **{field: shared[f'{symbol}/{field}'] for field in DISTANCE_FIELDS}}
+
+    _WORKER.update({
+        'shared': shared,
+        'frames': frames,
+        'distances': distances,
+        'strategies': [STRATEGY_MAP[name]() for name in strategy_names],
+        'backtest_kwargs': backtest_kwargs,
+    })
+
+
+def _run_task(params, targets):
+    start = time.time()
+    strategy_params = {}
+    for name, value in params.items():
+        for strategy_name, arg in targets.get(name, []):
+            strategy_params.setdefault(strategy_name, {})[arg] = value
+
+    backtest = None
+    results = {}
+    for symbol, df in _WORKER['frames'].items():
+        # 預先算好的 pivot_distances 放進每個策略的 params，用不到的策略會忽略
+        symbol_params = {}
+        for strategy in _WORKER['strategies']:
+            name = strategy.__class__.__name__
+            symbol_params[name] = dict(strategy_params.get(name, {}), pivot_distances=_WORKER['distances'][symbol])
+        backtest = BacktestService(strategies=_WORKER['strategies'], strategy_params=symbol_params,
+                                   **_WORKER['backtest_kwargs'])
+        results[symbol] = backtest.run_symbol(symbol, df)
+
+    combined = backtest.combine(results)
+    return {
+        'key': param_key(params),
+        'params': params,
+        'stats': combined['stats'],
+        'symbols': {symbol: result['stats'] for symbol, result in results.items()},
+        'attribution': combined['attribution']['pnl'].to_dict(),
+        'elapsed': time.time() - start,
+        'pid': os.getpid(),
+    }
+
+
+class ParameterSweep:
+    """
+    平行參數搜尋 (SMA_SHORT / SMA_LONG / ZIGZAG_ORDER ...)
+    - 每組參數在所有幣種上跑 vectorized 回測 (BacktestService)
+    - K 線與跟參數無關的預先計算 (ZigZag 左右阻擋距離) 放進 shared memory，子程序零複製共用
+    - 結果逐筆寫入 JSONL，重新執行時略過已完成的組合 (可中斷續跑)
+    """
+    def __init__(self, frames, strategy_names=None, workers=None, backtest_kwargs=None):
+        """
+        :param frames: {symbol: DataFrame}
+        :param strategy_names: 參與投票的策略 (預設 config.ACTIVE_STRATEGIES)
+        :param workers: 子程序數量 (預設 CPU 核心數)
+        :param backtest_kwargs: 傳給 BacktestService 的其他參數 (fee_rate, leverage ...)
+        """
+        self.strategy_names = [n for n in (strategy_names or config.ACTIVE_STRATEGIES) if n in STRATEGY_MAP]
+        self.workers = workers or os.cpu_count() or 1
+        self.backtest_kwargs = backtest_kwargs or {}
+
+        warmup = BacktestService(strategies=[], **self.backtest_kwargs).warmup
+        self.frames = {s: df for s, df in frames.items() if df is not None and len(df) > warmup}
+        for symbol in set(frames) - set(self.frames):
+            print(f"⚠️ 跳過 {symbol}: K 線數量不足")
+
+        # config 參數名稱 -> [(策略名稱, analyze_series 參數名稱)]
+        self.targets = {}
+        for name in self.strategy_names:
+            for config_name, arg in STRATEGY_MAP[name].tunable_params.items():
+                self.targets.setdefault(config_name, []).append((name, arg))
+
+    def prepare_space(self, space):
+        """移除沒有任何策略使用的參數 (結果不會改變，只會浪費運算)"""
+        unused = [name for name in space if name not in self.targets]
+        for name in unused:
+            print(f"⚠️ {name} 目前沒有策略使用 (策略: {self.strategy_names})，已從搜尋空間移除")
+        return {name: values for name, values in space.items() if name in self.targets}
+
+    def _shared_inputs(self, candidates):
+        """K 線 + 每個幣種的 ZigZag 阻擋距離 (以所有候選與階層中最大的 order 計算一次)"""
+        orders = [p['ZIGZAG_ORDER'] for p in candidates if 'ZIGZAG_ORDER' in p]
+        orders += [getattr(config, 'ZIGZAG_ORDER', 5)] + list(getattr(config, 'ZIGZAG_PYRAMID_ORDERS', [3, 5, 8, 13]))
+        max_order = int(max(orders))
+
+        arrays = {}
+        for symbol, df in self.frames.items():
+            arrays[f'{symbol}/timestamp'] = pd.to_datetime(df['timestamp']).to_numpy().astype('datetime64[ms]').astype(np.int64)
+            for field in CANDLE_FIELDS[1:]:
+                arrays[f'{symbol}/{field}'] = df[field].to_numpy(dtype=np.float64)
+            distances = pivot_distances(arrays[f'{symbol}/high'], arrays[f'{symbol}/low'], max_order)
+            arrays[f'{symbol}/max_order'] = np.array([max_order], dtype=np.int64)
+            for field in DISTANCE_FIELDS:
+                arrays[f'{symbol}/{field}'] = distances[field].astype(np.int32)
+        return arrays
+
+    def run(self, candidates, results_path):
+        """
+        :param candidates: 參數組合清單 (grid_candidates / random_candidates)
+        :param results_path: 結果 JSONL 路徑 (已存在則續跑)
+        :return: 所有已完成的結果 (含先前跑過的)
+        :raises ValueError: 結果檔是用不同的資料或設定跑出來的 (見 sweep_fingerprint)
+        """
+        # 暖機長度涵蓋最長的均線，所有組合都從同一根 K 線開始交易，結果才能互相比較
+        backtest_kwargs = dict(self.backtest_kwargs)
+        if 'warmup' not in backtest_kwargs:
+            longest = max([p['SMA_LONG'] for p in candidates if 'SMA_LONG' in p], default=0)
+            backtest_kwargs['warmup'] = max(BacktestService(strategies=[]).warmup, longest)
+
+        header = sweep_fingerprint(self.frames, self.strategy_names, backtest_kwargs)
+        done = load_results(results_path, header['fingerprint'])
+        todo = [params for params in candidates if param_key(params) not in done]
+        print(f"🧮 參數組合 {len(candidates)} 組，已完成 {len(candidates) - len(todo)} 組，"
+              f"本次執行 {len(todo)} 組 ({len(self.frames)} 個幣種，{self.workers} 個子程序)")
+        if not todo or not self.frames:
+            return list(done.values())
+
+        result_dir = os.path.dirname(results_path)
+        if result_dir:
+            os.makedirs(result_dir, exist_ok=True)
+        _truncate_partial_line(results_path)
+        if not done:
+            # 新的結果檔 (或只有指紋與寫到一半的行): 重新寫入指紋
+            with open(results_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(header) + "\n")
+
+        start = time.time()
+        shared = SharedArrays.create(self._shared_inputs(todo))
+        print(f"📦 共用記憶體 {shared.nbytes / 1024 / 1024:.1f} MB")
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(shared.manifest, list(self.frames), self.strategy_names,
+                                               backtest_kwargs)) as pool, \
+                    open(results_path, 'a', encoding='utf-8') as f:
+                futures = [pool.submit(_run_task, params, self.targets) for params in todo]
+                for count, future in enumerate(as_completed(futures), 1):
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        print(f"   ❌ 參數組合執行失敗: {e}")
+                        continue
+                    f.write(json.dumps(record) + "\n")
+                    f.flush()  # 每筆寫入，中斷時已完成的結果不會遺失
+                    done[record['key']] = record
+                    stats = record['stats']
+                    print(f"   [{count}/{len(todo)}] {record['params']} -> 報酬 {stats['total_return']:.2%}，"
+                          f"回撤 {stats['max_drawdown']:.2%}，{stats['trades']} 筆 ({record['elapsed']:.2f}s)")
+        finally:
+            shared.close()
+            shared.unlink()
+
+        elapsed = max(time.time() - start, 1e-9)
+        print(f"✅ 完成 {len(todo)} 組，耗時 {elapsed:.1f} 秒 ({len(todo) / elapsed:.2f} 組/秒)")
+        return list(done.values())
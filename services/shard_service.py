@@ -0,0 +1,235 @@
+import sys
+import os
+
+# 🔥 取得目前檔案的路徑，並將「上一層目錄」加入 Python 搜尋路徑
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+import time
+import zlib
+import multiprocessing
+from multiprocessing.connection import wait
+
+from utils.lazy_context import LazyContext
+
+# 協調者下單與顯示用到的 context 欄位 (其餘指標留在子程序，不經過 pickle)
+RECORD_CONTEXT_KEYS = ['symbol', 'close']
+
+
+def shard_of(symbol, shards):
+    """幣種所屬的分片 (crc32，每次啟動、每個程序都相同；內建 hash() 每個程序不同，不能用)"""
+    return zlib.crc32(symbol.encode('utf-8')) % shards
+
+
+def shard_symbols(symbols, shards):
+    """:return: 每個分片的幣種清單 (保留原本順序)"""
+    groups = [[] for _ in range(shards)]
+    for symbol in symbols:
+        groups[shard_of(symbol, shards)].append(symbol)
+    return groups
+
+
+def portable_record(symbol, evaluation, decision, full_context=False):
+    """
+    子程序的分析結果轉成可以 pickle 回協調者的 dict (LazyContext 內含 resolver，無法 pickle)
+    :param full_context: 有進出場訊號時帶上完整 context (協調者要產生進場報告)，否則只帶顯示用的欄位
+    """
+    context = evaluation['context']
+    if full_context and decision != 0:
+        portable = {}
+        for key in context:
+            try:
+                portable[key] = context[key]
+            except Exception:
+                continue
+    else:
+        portable = {key: context[key] for key in RECORD_CONTEXT_KEYS if key in context}
+        # 策略沒用到就不為了顯示而計算
+        pivots = context.peek('pivots') if isinstance(context, LazyContext) else context.get('pivots')
+        if pivots is not None:
+            portable['pivots'] = pivots
+
+    record = {key: value for key, value in evaluation.items() if key != 'context'}
+    record.update({'symbol': symbol, 'decision': int(decision), 'context': portable})
+    return record
+
+
+# ==========================================
+# 子程序 (每個分片一個常駐程序)
+# - 自己的 BingXLoader / MarketDataService / 策略，K 線與指標快取跨循環保留
+# - 收到循環編號就跑一次自己的幣種 (抓資料、算指標、策略、SignalEnsemble)，回傳決策
+# ==========================================
+def run_shard_cycle(service, cycle_id, full_context=False):
+    """
+    子程序的一個循環 (單一幣種出錯只跳過該幣種)
+    :param service: analysis_only 的 TradingService
+    :return: {'cycle', 'records', 'pending', 'stats'}
+    """
+    service.strategy_runner.start_cycle()
+    service._pending = set()
+    records = []
+    try:
+        for symbol, evaluation, decision in service._decide_symbols(service._collect_items()):
+            try:
+                records.append(portable_record(symbol, evaluation, decision, full_context))
+            except Exception as e:
+                print(f"   ❌ 整理 {symbol} 的結果時發生錯誤: {e}")
+                service._pending.add(symbol)
+    except Exception as e:
+        print(f"   ❌ 分片循環失敗: {e}")
+        service._pending.update(service.symbols)
+    return {'cycle': cycle_id, 'records': records, 'pending': sorted(service._pending),
+            'stats': service.strategy_runner.end_cycle()}
+
+
+def _shard_main(shard_id, symbols, conn, full_context=False):
+    # 避免與 trading_service 互相 import
+    from services.trading_service import TradingService
+
+    service = TradingService(symbols=symbols, analysis_only=True)
+    service.strategy_runner.log_path = None  # 耗時統計由協調者合併後寫檔
+    print(f"🧩 分片 {shard_id} 就緒: {len(symbols)} 個幣種 (pid {os.getpid()})")
+    while True:
+        try:
+            cycle_id = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if cycle_id is None:
+            break
+        conn.send(run_shard_cycle(service, cycle_id, full_context))
+
+
+class _Shard:
+    def __init__(self, index, symbols):
+        self.index = index
+        self.symbols = symbols
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+
+
+class ShardPool:
+    """
+    多程序分片: 幣種依 crc32 分給 workers 個常駐子程序，CPU 密集的指標與型態計算可以用滿多核心
+    - 協調者 (主程序) 每個循環送出循環編號，等待所有分片回傳決策 (最多 timeout 秒)
+    - 單一幣種的例外只影響該幣種；子程序當掉或逾時只影響該分片 (重新啟動，這次的幣種列為 pending)
+    - 使用 spawn 建立子程序，不繼承主程序的交易所連線與執行緒
+    """
+    def __init__(self, symbols, workers, timeout=300, full_context=False, target=None):
+        """
+        :param workers: 分片 (子程序) 數量
+        :param timeout: 每個循環等待分片回覆的秒數
+        :param full_context: 有訊號時回傳完整 context (進場報告需要)
+        :param target: 子程序的進入點 (shard_id, symbols, conn, full_context)，預設 _shard_main
+        """
+        self.symbols = list(symbols)
+        self.workers = workers
+        self.timeout = timeout
+        self.full_context = full_context
+        self.target = target or _shard_main
+        self.shards = [_Shard(i, group) for i, group in enumerate(shard_symbols(self.symbols, workers)) if group]
+        self._ctx = multiprocessing.get_context('spawn')
+        self._cycle = 0
+
+    # ------------------------------------------------------------------
+    # 子程序管理
+    # ------------------------------------------------------------------
+    def _start(self, shard):
+        parent_conn, child_conn = self._ctx.Pipe()
+        shard.process = self._ctx.Process(target=self.target, name=f"shard-{shard.index}",
+                                          args=(shard.index, shard.symbols, child_conn, self.full_context),
+                                          daemon=True)
+        shard.process.start()
+        child_conn.close()
+        shard.conn = parent_conn
+
+    def _restart(self, shard):
+        self._stop(shard, graceful=False)
+        shard.restarts += 1
+        print(f"🔁 重新啟動分片 {shard.index} ({len(shard.symbols)} 個幣種，第 {shard.restarts} 次)")
+        self._start(shard)
+
+    @staticmethod
+    def _stop(shard, graceful=True, timeout=5):
+        if shard.process is None:
+            return
+        if graceful and shard.process.is_alive():
+            try:
+                shard.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            shard.process.join(timeout)
+        if shard.process.is_alive():
+            shard.process.terminate()
+            shard.process.join(timeout)
+        shard.conn.close()
+        shard.process = shard.conn = None
+
+    def start(self):
+        for shard in self.shards:
+            if shard.process is None:
+                self._start(shard)
+        counts = ", ".join(str(len(shard.symbols)) for shard in self.shards)
+        print(f"🧩 分片模式: {len(self.symbols)} 個幣種 / {len(self.shards)} 個子程序 (各 {counts} 個)")
+
+    def close(self):
+        for shard in self.shards:
+            self._stop(shard)
+
+    # ------------------------------------------------------------------
+    # 循環
+    # ------------------------------------------------------------------
+    def run_cycle(self):
+        """
+        所有分片各跑一次
+        :return: {'records': 依幣種順序排列的決策, 'pending': 沒有結果的幣種 set, 'stats': [各分片的策略耗時]}
+        """
+        if any(shard.process is None for shard in self.shards):
+            self.start()
+        self._cycle += 1
+
+        waiting = {}
+        for shard in self.shards:
+            if not shard.process.is_alive():
+                self._restart(shard)
+            try:
+                shard.conn.send(self._cycle)
+            except (OSError, ValueError):
+                self._restart(shard)
+                shard.conn.send(self._cycle)
+            waiting[shard.conn] = shard
+
+        replies, failed = [], []
+        deadline = time.monotonic() + self.timeout
+        while waiting:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for conn in wait(list(waiting), timeout=remaining):
+                shard = waiting[conn]
+                try:
+                    reply = conn.recv()
+                except (EOFError, OSError):
+                    print(f"❌ 分片 {shard.index} 子程序中止，這次略過 {len(shard.symbols)} 個幣種")
+                    failed.append(waiting.pop(conn))
+                    continue
+                if reply.get('cycle') != self._cycle:
+                    continue  # 重新啟動前送出的舊循環結果
+                replies.append(reply)
+                waiting.pop(conn)
+
+        for shard in waiting.values():
+            print(f"⏰ 分片 {shard.index} 超過 {self.timeout:g} 秒沒有回覆，這次略過 {len(shard.symbols)} 個幣種")
+            failed.append(shard)
+        # 當掉或卡住的分片重新啟動 (下個循環前就緒)，其他分片不受影響
+        for shard in failed:
+            self._restart(shard)
+
+        order = {symbol: i for i, symbol in enumerate(self.symbols)}
+        records = sorted((record for reply in replies for record in reply['records']),
+                         key=lambda record: order.get(record['symbol'], len(order)))
+        pending = {symbol for reply in replies for symbol in reply['pending']}
+        for shard in failed:
+            pending.update(shard.symbols)
+        return {'records': records, 'pending': pending, 'stats': [reply['stats'] for reply in replies]}
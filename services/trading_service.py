@@ -10,93 +10,242 @@ sys.path.append(parent_dir)
 import config
 from datetime import datetime
 import time
+import asyncio
+import numpy as np
+import pandas as pd
 
 # 引入核心工具
 from services.market_data_service import MarketDataService
 from utils.data_loader import BingXLoader
+from utils.async_loader import AsyncBingXLoader
 from utils.executor import BingXExecutor
 from utils.trade_logger import TradeLogger
+from utils.lazy_context import LazyContext
+from utils.strategy_runner import StrategyRunner, TIMEOUT, BUSY
+from utils.candle_clock import CandleClock
+from utils.exit_rules import strategy_levels
 
 # 引入策略對照表
 from strategies import STRATEGY_MAP
+from strategies.base_strategy import SIGNAL_CODES, SIGNAL_NAMES
+from strategies.voting import SignalEnsemble
+from services.shard_service import ShardPool
+
+# 用來區分「尚未查詢倉位」與「查詢結果為無倉位 (None)」
+UNKNOWN_POSITION = object()
 
 class TradingService:
-    def __init__(self, report_service=None, email_service=None):
+    def __init__(self, report_service=None, email_service=None, loader=None, market_data_service=None,
+                 symbols=None, analysis_only=False, executor=None, trade_logger=None, strategies=None,
+                 ensemble=None, clock=None, shards=None):
         """
         整合所有交易相關的元件 (支援多策略)
+        :param loader: 共用的 BingXLoader (與 main 的報告共用 K 線快取)，未傳入則自行建立
+        :param market_data_service: 共用的 MarketDataService，未傳入則自行建立
+        :param symbols: 監控的幣種 (預設 config.COIN_LIST)
+        :param analysis_only: 只抓資料、算指標與決策，不建立 Executor / TradeLogger (分片子程序使用)
+        :param executor: 下單元件，未傳入則建立 BingXExecutor
+        :param trade_logger: 交易紀錄，未傳入則建立 TradeLogger
+        :param strategies: 策略實例清單 (預設依 config.ACTIVE_STRATEGIES 建立)
+        :param ensemble: 多策略訊號整合 (預設 SignalEnsemble.from_config)
+        :param clock: K 線收盤時鐘 (預設使用 loader 的交易所時間)
+        :param shards: 分片池 (預設依 config.TRADING_WORKERS 建立)
         """
         self.report_service = report_service
         self.email_service = email_service
         
-        self.market_data_service = MarketDataService()
-        self.loader = BingXLoader()
-        self.executor = BingXExecutor(self.loader.exchange)
-        self.logger = TradeLogger()
-
-        # 初始化多策略系統
-        self.strategies = []
-        print(f"⚙️ 正在載入策略: {config.ACTIVE_STRATEGIES}")
-        
-        for strategy_name in config.ACTIVE_STRATEGIES:
-            strategy_class = STRATEGY_MAP.get(strategy_name)
-            if strategy_class:
-                self.strategies.append(strategy_class()) # 實例化策略物件
-            else:
-                print(f"⚠️ 警告: 找不到策略 {strategy_name}，請檢查拼字或 __init__.py")
+        self.market_data_service = market_data_service or MarketDataService()
+        self.loader = loader or BingXLoader()
+        if executor is None and not analysis_only:
+            executor = BingXExecutor(self.loader.exchange)
+        self.executor = executor
+        if trade_logger is None and not analysis_only:
+            trade_logger = TradeLogger()
+        self.logger = trade_logger
+
+        # 初始化多策略系統 (只 import 啟用的策略，並輸出各自的載入耗時)
+        if strategies is None:
+            print(f"⚙️ 正在載入策略: {config.ACTIVE_STRATEGIES}")
+            strategies = STRATEGY_MAP.create(config.ACTIVE_STRATEGIES)
+        self.strategies = list(strategies)
+
+        self.symbols = symbols if symbols is not None else config.COIN_LIST
+
+        # 所有策略宣告需要的指標 (加上下單需要的收盤價)，其餘指標延遲到被讀取時才計算
+        self.required_indicators = ['close']
+        for strategy in self.strategies:
+            for name in strategy.required_indicators or []:
+                if name not in self.required_indicators:
+                    self.required_indicators.append(name)
+
+        # 串流模式: 快取累積到這個數量才開始跑策略
+        self.stream_min_candles = getattr(config, 'STREAM_MIN_CANDLES', 200)
+
+        # 策略執行與耗時統計 (可選擇多執行緒 + 每個策略的期限，逾時視為棄權)
+        self.strategy_runner = StrategyRunner(
+            self.strategies,
+            workers=getattr(config, 'STRATEGY_EXECUTOR_WORKERS', 0),
+            timeout=getattr(config, 'STRATEGY_TIMEOUT_SEC', None),
+            timeouts=getattr(config, 'STRATEGY_TIMEOUTS', {}),
+            log_path=getattr(config, 'STRATEGY_LATENCY_LOG', None),
+        )
+        self._stream_cycle_ts = None  # 串流模式以 K 線時間劃分循環
+
+        # 多策略訊號整合 (幣種 x 策略 矩陣一次決策，回測共用同一套規則)
+        self.ensemble = ensemble if ensemble is not None else SignalEnsemble.from_config(self.strategy_runner.names)
+
+        # 交易檢查排程: "candle_close" 以交易所時鐘在每根 K 線收盤後觸發 (main 透過 self.clock 排程)，
+        # 只用已收盤的 K 線判斷，最後收盤 K 線沒變的幣種直接跳過；"interval" 為原本的固定間隔
+        self.schedule = getattr(config, 'TRADING_SCHEDULE', 'interval')
+        self.clock = clock if clock is not None else CandleClock(
+            self.loader.exchange, config.TRADE_TIMEFRAME,
+            delay=getattr(config, 'CANDLE_CLOSE_DELAY_SEC', 3),
+            sync_interval=getattr(config, 'CLOCK_SYNC_INTERVAL_SEC', 3600),
+            retry_delay=getattr(config, 'CANDLE_CLOSE_RETRY_SEC', 5),
+            max_retries=getattr(config, 'CANDLE_CLOSE_MAX_RETRIES', 3),
+        )
+        self._last_closed = {}    # 幣種 -> 上次判斷的已收盤 K 線開盤時間 (ms)
+        self._pending = set()     # 這個循環還沒拿到最新收盤 K 線的幣種 (稍後重試)
+        self._cycle_delays = []   # 這個循環每個幣種 K 線收盤到決策的延遲 (秒)
+
+        # 分片模式 (poll): COIN_LIST 依 crc32 分給 TRADING_WORKERS 個子程序，各自抓資料、算指標並決策，
+        # 本程序只當協調者 (唯一的 Executor、倉位簿與風控，所有下單與紀錄都在這裡)
+        self.shards = shards
+        workers = getattr(config, 'TRADING_WORKERS', 0)
+        if self.shards is None and workers and not analysis_only and getattr(config, 'MARKET_DATA_MODE', 'poll') == 'poll':
+            self.shards = ShardPool(self.symbols, workers, timeout=getattr(config, 'SHARD_CYCLE_TIMEOUT_SEC', 300),
+                                    full_context=bool(report_service and email_service))
+
+    def _evaluate_strategies(self, df, context):
+        """
+        執行所有策略，整理成訊號矩陣的一列
+        回傳: (訊號編碼 (K,), 信心 (K,), 各策略理由 (K,), detailed_logs, (止損價 (K,), 止盈價 (K,)))
+        出錯或逾時的策略棄權 (訊號 0)，沒有提供價位為 NaN
+        """
+        names = self.strategy_runner.names
+        signals = np.zeros(len(names), dtype=np.int8)
+        confidence = np.ones(len(names))
+        stops, takes = np.full(len(names), np.nan), np.full(len(names), np.nan)
+        reasons = [None] * len(names)
+        detailed_logs = [] # 🔥 給 Log 顯示用的詳細清單
 
-        self.symbols = config.COIN_LIST
+        for k, (name, result, status, latency, error) in enumerate(self.strategy_runner.evaluate(df, context)):
+            if status in (TIMEOUT, BUSY):
+                # 逾時 (或上次逾時仍在執行) 的策略棄權，不阻塞其他幣種
+                print(f"⏰ 策略 {name} 逾時 ({latency:.0f} ms)，本次棄權")
+                detailed_logs.append(f"[{name}] {status.upper()}: 棄權")
+                continue
+            if error is not None:
+                print(f"❌ 策略 {name} 執行錯誤: {error}")
+                detailed_logs.append(f"[{name}] ERROR: {error}")
+                continue
+
+            sig = result['signal']
+            reason = result['reason']
+
+            # 格式: [策略名] 訊號: 理由
+            detailed_logs.append(f"[{name}] {sig}: {reason}")
+            signals[k] = SIGNAL_CODES.get(sig, 0)
+            if result.get('confidence') is not None:
+                confidence[k] = result['confidence']
+            if result.get('stop_loss') is not None:
+                stops[k] = result['stop_loss']
+            if result.get('take_profit') is not None:
+                takes[k] = result['take_profit']
+            reasons[k] = f"[{name}] {reason}"
+
+        return signals, confidence, reasons, detailed_logs, (stops, takes)
+
+    def _decision_reason(self, decision, signals, reasons):
+        """給下單紀錄用的簡潔理由: 與決策同方向的策略理由，或觀望的原因"""
+        if decision != 0:
+            return " | ".join(reasons[k] for k in range(len(signals)) if signals[k] == decision)
+        if self.ensemble.conflicted(signals) and self.ensemble.mode == 'veto':
+            return "⚠️ 策略衝突 (多空互斥)，系統選擇觀望"
+        if (signals != 0).any():
+            return f"⚖️ 未達訊號整合門檻 ({self.ensemble.mode})，系統選擇觀望"
+        return ""
 
     def _get_combined_signal(self, df, context):
         """
-        🔥 核心：整合所有策略的投票結果
+        🔥 核心：整合所有策略的投票結果 (單一幣種)
         回傳: (final_signal, concise_reason, detailed_logs)
         """
-        final_signal = "NEUTRAL"
-        final_reasons = [] # 給下單紀錄用的簡潔理由
-        detailed_logs = [] # 🔥 給 Log 顯示用的詳細清單
-        
-        long_votes = 0
-        short_votes = 0
-        
-        for strategy in self.strategies:
-            try:
-                result = strategy.analyze(df, context)
-                sig = result['signal']
-                reason = result['reason']
-                name = strategy.__class__.__name__
-                
-                # 1. 收集詳細 Log
-                # 格式: [策略名] 訊號: 理由
-                detailed_logs.append(f"[{name}] {sig}: {reason}")
-
-                # 2. 統計投票
-                if sig == "LONG":
-                    long_votes += 1
-                    final_reasons.append(f"[{name}] {reason}")
-                elif sig == "SHORT":
-                    short_votes += 1
-                    final_reasons.append(f"[{name}] {reason}")
-            except Exception as e:
-                print(f"❌ 策略 {strategy} 執行錯誤: {e}")
-                detailed_logs.append(f"[{strategy.__class__.__name__}] ERROR: {e}")
-        
-        # --- 決策邏輯 ---
-        if long_votes > 0 and short_votes > 0:
-            final_signal = "NEUTRAL"
-            final_reasons = ["⚠️ 策略衝突 (多空互斥)，系統選擇觀望"]
-        elif long_votes > 0:
-            final_signal = "LONG"
-        elif short_votes > 0:
-            final_signal = "SHORT"
-            
-        return final_signal, " | ".join(final_reasons), detailed_logs
+        signals, confidence, reasons, detailed_logs, _ = self._evaluate_strategies(df, context)
+        decision = int(self.ensemble.decide(signals[None], confidence[None])[0])
+        return SIGNAL_NAMES[decision], self._decision_reason(decision, signals, reasons), detailed_logs
 
     def run_cycle(self):
         """
-        執行一次完整的交易循環
+        執行一次完整的交易循環 (結束時輸出各策略的耗時與 K 線收盤到決策的延遲)
+        :return: 所有幣種都已判斷到最新的收盤 K 線 (False 代表有幣種的 K 線還沒產生或抓取失敗，需要重試)
         """
+        self.strategy_runner.start_cycle()
+        self._pending = set()
+        try:
+            self._run_cycle()
+        finally:
+            self._end_cycle()
+        return not self._pending
+
+    def _end_cycle(self):
+        """輸出並記錄這個循環的統計 (策略耗時與收盤到決策的延遲寫在同一筆 log)"""
+        delays, self._cycle_delays = self._cycle_delays, []
+        extra = None
+        if delays:
+            extra = {'decision_delay': {'symbols': len(delays), 'avg_sec': sum(delays) / len(delays),
+                                        'max_sec': max(delays)}}
+        self._report_latency(self.strategy_runner.end_cycle(extra))
+        if extra:
+            delay = extra['decision_delay']
+            print(f"   ⏱️ 收盤→決策延遲: 平均 {delay['avg_sec']:.2f} 秒 / 最大 {delay['max_sec']:.2f} 秒 "
+                  f"({delay['symbols']} 個幣種)")
+
+    def _report_latency(self, stats):
+        """各策略在一個循環內的耗時統計"""
+        if not stats:
+            return
+        parts = []
+        for name, s in stats.items():
+            text = f"{name} {s['total_ms']:.1f}ms (平均 {s['avg_ms']:.1f} / 最大 {s['max_ms']:.1f}, {s['calls']} 次)"
+            if s['timeout'] or s['busy']:
+                text += f" ⏰逾時 {s['timeout'] + s['busy']}"
+            if s['error']:
+                text += f" ❌錯誤 {s['error']}"
+            parts.append(text)
+        print(f"   ⏱️ 策略耗時: " + " | ".join(parts))
+
+    def _run_cycle(self):
         print(f"🔨 TradingService: 開始掃描市場 ({config.TRADE_TIMEFRAME})...")
 
+        # 所有幣種的倉位一次載入 (之後由自己的成交更新倉位簿，不再逐一查詢)
+        self.executor.sync_positions()
+
+        # 🔥 分片模式: 各子程序平行分析自己的幣種，這裡只負責下單
+        if self.shards is not None:
+            self._run_cycle_sharded()
+            return
+
+        # 🔥 非同步模式: 所有幣種的 K 線與倉位同時抓取
+        if getattr(config, 'ENABLE_ASYNC_FETCH', False):
+            start = time.time()
+            asyncio.run(self._run_cycle_async())
+            print(f"   ⏱️ 非同步掃描 {len(self.symbols)} 個幣種耗時 {time.time() - start:.2f} 秒")
+            return
+
+        # 所有幣種的訊號矩陣一次決策
+        self._process_symbols(self._collect_items())
+
+    def _collect_items(self):
+        """
+        抓取所有幣種這次要判斷的 K 線 (同步/批次模式)
+        :return: [(symbol, df, context)]，context 為 None 時由 MarketDataService 計算
+        """
+        # 🔥 批次模式: 全部幣種對齊成面板，指標一次算完
+        if getattr(config, 'ENABLE_BATCH_ANALYSIS', False):
+            return self._collect_items_batch()
+
+        items = []
         for symbol in self.symbols:
             try:
                 # Step 1: 獲取數據
@@ -106,79 +255,319 @@ class TradingService:
                     limit=200
                 )
                 
-                if df is None or df.empty:
-                    print(f"   ⚠️ 跳過 {symbol}: 無法獲取數據")
+                df = self._select_candles(symbol, df)
+                if df is None:
                     continue
 
-                # Step 2: 計算指標
-                context = self.market_data_service.analyze_technicals(df)
-                
-                # 防呆：如果計算失敗回傳空字典，直接跳過
-                if not context:
-                    print(f"   ⚠️ 跳過 {symbol}: 技術指標計算失敗 (可能數據不足)")
-                    continue
-                    
-                context['symbol'] = symbol
-                
-                # Step 3: 檢查倉位
-                current_position = self.executor.get_open_position(symbol)
-                
-                # Step 4: 呼叫多策略整合邏輯
-                # 🔥 這裡接收 3 個回傳值
-                signal, reason, detailed_logs = self._get_combined_signal(df, context)
-                
-                close_price = context.get('close', 0.0)
-                order_amount = config.ORDER_SIZES.get(symbol, config.ORDER_AMOUNT)
+                items.append((symbol, df, None))
 
-                # 解析 ZigZag 資訊 (結構)
-                pivots = context.get('pivots', [])
-                pivot_status = "無結構"
-                if pivots and len(pivots) > 0:
-                    last_p = pivots[-1]
-                    pivot_status = f"{last_p.get('type')}@{last_p.get('price'):.1f}"
+            except Exception as e:
+                print(f"   ❌ 處理 {symbol} 時發生錯誤: {e}")
+                import traceback
+                traceback.print_exc()
+        return items
 
-                pos_status = current_position if current_position else "EMPTY"
-                
-                # 🔥 優化顯示：第一行顯示總結，下面列出所有策略詳情
-                print(f"   [{symbol}] ${close_price:.2f} | 總訊號:{signal} | 持倉:{pos_status} | 結構:{pivot_status}")
-                for log in detailed_logs:
-                    print(f"        👉 {log}")
-
-                # --- 進場邏輯 ---
-                if current_position is None:
-                    if signal == "LONG":
-                        self._execute_trade("buy", symbol, order_amount, close_price, reason, context)
-                    elif signal == "SHORT":
-                        self._execute_trade("sell", symbol, order_amount, close_price, reason, context)
-                
-                # --- 出場邏輯 ---
-                elif current_position == "LONG" and signal == "SHORT":
-                    self._close_trade(symbol, close_price, "訊號反轉平多")
-                
-                elif current_position == "SHORT" and signal == "LONG":
-                    self._close_trade(symbol, close_price, "訊號反轉平空")
+    def _collect_items_batch(self):
+        """抓取所有幣種後以 analyze_panel 一次計算指標 (對不齊的幣種退回逐一計算)"""
+        symbols, panel, frames = self.loader.fetch_panel(config.TRADE_TIMEFRAME, self.symbols, limit=200,
+                                                         select=self._select_candles)
+        contexts = self.market_data_service.analyze_panel(symbols, panel)
+        return [(symbol, frames[symbol], contexts.get(symbol)) for symbol in self.symbols if symbol in frames]
 
+    def _run_cycle_sharded(self):
+        """
+        收集所有分片的決策後依 COIN_LIST 順序下單
+        沒有回覆 (逾時或子程序當掉) 的分片，其幣種列為 pending，由 candle_close 排程稍後重試
+        """
+        result = self.shards.run_cycle()
+        self._pending |= result['pending']
+        for stats in result['stats']:
+            self.strategy_runner.merge(stats)
+
+        records = result['records']
+        self._record_decision_delay(records)
+        for record in records:
+            try:
+                self._act_on_symbol(record['symbol'], record, record['decision'])
+            except Exception as e:
+                print(f"   ❌ 處理 {record['symbol']} 時發生錯誤: {e}")
+                import traceback
+                traceback.print_exc()
+
+    async def _run_cycle_async(self):
+        """併發抓取所有幣種，哪個幣種的資料先到就先跑策略"""
+        async with AsyncBingXLoader(self.loader, self.executor) as aloader:
+            tasks = [
+                asyncio.create_task(aloader.fetch_symbol(symbol, config.TRADE_TIMEFRAME, limit=200))
+                for symbol in self.symbols
+            ]
+            for future in asyncio.as_completed(tasks):
+                try:
+                    symbol, df, current_position = await future
+                    df = self._select_candles(symbol, df)
+                    if df is None:
+                        continue
+                    self._process_symbol(symbol, df, current_position)
+                except Exception as e:
+                    print(f"   ❌ 處理幣種時發生錯誤: {e}")
+                    import traceback
+                    traceback.print_exc()
+
+    def _select_candles(self, symbol, df):
+        """
+        決定這個幣種這次要用哪些 K 線判斷
+        - 抓取失敗: 跳過 (candle_close 排程下稍後重試)
+        - candle_close 排程: 去掉形成中的 K 線；最後一根已收盤 K 線與上次判斷的相同就跳過
+        :return: 要判斷的 DataFrame，跳過時為 None
+        """
+        if df is None or df.empty:
+            print(f"   ⚠️ 跳過 {symbol}: 無法獲取數據")
+            self._pending.add(symbol)
+            return None
+        if self.schedule != 'candle_close':
+            return df
+
+        now_ms = self.clock.now_ms()
+        open_ms = pd.to_datetime(df['timestamp']).to_numpy().astype('datetime64[ms]').astype(np.int64)
+        closed = int(np.count_nonzero(open_ms + self.clock.timeframe_ms <= now_ms))
+        if closed == 0:
+            self._pending.add(symbol)
+            return None
+
+        last_open = int(open_ms[closed - 1])
+        if last_open + self.clock.timeframe_ms < self.clock.last_close_ms(now_ms):
+            # 交易所還沒產生最新收盤的 K 線 (延遲)，由排程稍後重試
+            self._pending.add(symbol)
+        if self._last_closed.get(symbol) == last_open:
+            print(f"   💤 跳過 {symbol}: 沒有新的收盤 K 線")
+            return None
+        self._last_closed[symbol] = last_open
+        return df.iloc[:closed]
+
+    def _record_decision_delay(self, evaluations):
+        """記錄 K 線收盤到決策的延遲 (形成中的 K 線沒有收盤時間，不列入)"""
+        now_ms = self.clock.now_ms()
+        for evaluation in evaluations:
+            close_ms = evaluation.get('close_ms')
+            if close_ms is not None and close_ms <= now_ms:
+                self._cycle_delays.append((now_ms - close_ms) / 1000)
+
+    def warm_up(self, limit=200):
+        """串流模式啟動前，先用 REST 把每個幣種的 K 線快取填滿"""
+        for symbol in self.symbols:
+            self.loader.fetch_data(timeframe=config.TRADE_TIMEFRAME, symbol=symbol, limit=limit)
+
+    def on_candle(self, event):
+        """
+        串流 K 線事件 (由 BaseCandleFeed 推送)
+        - 形成中的 K 線: 只更新快取 (incremental 引擎同時更新暫時指標)
+        - 已收盤的 K 線: 立即對該幣種跑一次策略
+        """
+        symbol = event['symbol']
+        timeframe = event['timeframe']
+        self.loader.ingest_candles(symbol, timeframe, [event['candle']])
+        if self.market_data_service.engine == 'incremental':
+            self.market_data_service.update_candle(symbol, timeframe, event['candle'], closed=event['closed'])
+
+        if not event['closed'] or timeframe != config.TRADE_TIMEFRAME:
+            return
+
+        df = self.loader.get_cached_data(timeframe, symbol, limit=self.stream_min_candles)
+        if df is None:
+            return  # 快取尚未累積足夠 K 線
+
+        # 串流模式沒有明確的循環，以收盤 K 線時間劃分: 換到下一根時輸出上一根所有幣種的策略耗時
+        candle_ts = event['candle'][0]
+        if candle_ts != self._stream_cycle_ts:
+            if self._stream_cycle_ts is not None:
+                self._end_cycle()
+            self._stream_cycle_ts = candle_ts
+            self.strategy_runner.start_cycle()
+
+        try:
+            self._process_symbol(symbol, df)
+        except Exception as e:
+            print(f"   ❌ 處理 {symbol} 時發生錯誤: {e}")
+            import traceback
+            traceback.print_exc()
+
+    def _process_symbol(self, symbol, df, current_position=UNKNOWN_POSITION, context=None):
+        """
+        單一幣種的分析與下單流程 (非同步/串流模式: 資料先到的幣種先處理)
+        :param current_position: 已取得的倉位，未傳入時由 Executor 查詢
+        :param context: 已算好的指標 (批次模式)，未傳入時由 MarketDataService 計算
+        """
+        evaluation = self._evaluate_symbol(symbol, df, context)
+        if evaluation is None:
+            return
+        decision = int(self.ensemble.decide(evaluation['signals'][None], evaluation['confidence'][None])[0])
+        self._record_decision_delay([evaluation])
+        self._act_on_symbol(symbol, evaluation, decision, current_position)
+
+    def _process_symbols(self, items):
+        """
+        多個幣種一起決策 (同步/批次模式)
+        Step 1: 每個幣種計算指標並執行策略，組成 幣種 x 策略 的訊號與信心矩陣
+        Step 2: SignalEnsemble 一次算出所有幣種的決策
+        Step 3: 逐一幣種下單 (單一幣種出錯不影響其他幣種)
+        :param items: [(symbol, df, context)]，context 為 None 時由 MarketDataService 計算
+        """
+        decided = self._decide_symbols(items)
+        if not decided:
+            return
+        self._record_decision_delay([evaluation for _, evaluation, _ in decided])
+
+        for symbol, evaluation, decision in decided:
+            try:
+                self._act_on_symbol(symbol, evaluation, decision)
             except Exception as e:
                 print(f"   ❌ 處理 {symbol} 時發生錯誤: {e}")
                 import traceback
                 traceback.print_exc()
 
-    def _execute_trade(self, side, symbol, amount, price, tag, context):
-        """執行下單"""
-        print(f"   🚀 觸發下單: {symbol} {side} ({tag})")
-        order = self.executor.place_order(side, symbol, amount)
+    def _decide_symbols(self, items):
+        """
+        計算指標、執行策略並一次決策 (不下單，分片子程序也使用)
+        :return: [(symbol, evaluation, 決策編碼)]，出錯的幣種不列入
+        """
+        evaluated = []
+        for symbol, df, context in items:
+            try:
+                evaluation = self._evaluate_symbol(symbol, df, context)
+                if evaluation is not None:
+                    evaluated.append((symbol, evaluation))
+            except Exception as e:
+                print(f"   ❌ 處理 {symbol} 時發生錯誤: {e}")
+                import traceback
+                traceback.print_exc()
+        if not evaluated:
+            return []
+
+        signals = np.stack([evaluation['signals'] for _, evaluation in evaluated])
+        confidence = np.stack([evaluation['confidence'] for _, evaluation in evaluated])
+        decisions = self.ensemble.decide(signals, confidence)
+        return [(symbol, evaluation, int(decision)) for (symbol, evaluation), decision in zip(evaluated, decisions)]
+
+    def _evaluate_symbol(self, symbol, df, context=None):
+        """
+        計算指標並執行所有策略 (不下單)
+        :return: {'context', 'signals', 'confidence', 'levels', 'reasons', 'logs', 'close_ms'}，指標計算失敗時為 None
+        """
+        # Step 2: 計算指標
+        if context is None:
+            context = self.market_data_service.analyze_technicals(
+                df, symbol=symbol, timeframe=config.TRADE_TIMEFRAME, required=self.required_indicators)
+        
+        # 防呆：如果計算失敗回傳空字典，直接跳過
+        if not context:
+            print(f"   ⚠️ 跳過 {symbol}: 技術指標計算失敗 (可能數據不足)")
+            return None
+            
+        context['symbol'] = symbol
+
+        # Step 3: 執行所有策略，整理成訊號矩陣的一列
+        signals, confidence, reasons, detailed_logs, levels = self._evaluate_strategies(df, context)
+        # 最後一根 K 線的收盤時間 (計算收盤到決策的延遲)
+        close_ms = None
+        if 'timestamp' in df.columns:
+            close_ms = int(pd.Timestamp(df['timestamp'].iloc[-1]).value // 1_000_000) + self.clock.timeframe_ms
+        return {'context': context, 'signals': signals, 'confidence': confidence, 'levels': levels,
+                'reasons': reasons, 'logs': detailed_logs, 'close_ms': close_ms}
+
+    def _act_on_symbol(self, symbol, evaluation, decision, current_position=UNKNOWN_POSITION):
+        """
+        依整合後的決策進出場
+        :param decision: SignalEnsemble 的決策編碼 (1/-1/0)
+        :param current_position: 已取得的倉位，未傳入時由 Executor 查詢
+        """
+        context = evaluation['context']
+        signal = SIGNAL_NAMES[decision]
+        reason = self._decision_reason(decision, evaluation['signals'], evaluation['reasons'])
+        detailed_logs = evaluation['logs']
+
+        # Step 4: 檢查倉位
+        if current_position is UNKNOWN_POSITION:
+            current_position = self.executor.get_open_position(symbol)
+        
+        close_price = context.get('close', 0.0)
+        order_amount = config.ORDER_SIZES.get(symbol, config.ORDER_AMOUNT)
+
+        # 解析 ZigZag 資訊 (結構)，延遲計算模式下策略沒用到就不為了顯示而計算
+        if isinstance(context, LazyContext):
+            pivots = context.peek('pivots', [])
+        else:
+            pivots = context.get('pivots', [])
+        pivot_status = "無結構"
+        if pivots and len(pivots) > 0:
+            last_p = pivots[-1]
+            pivot_status = f"{last_p.get('type')}@{last_p.get('price'):.1f}"
+
+        pos_status = current_position if current_position else "EMPTY"
+        
+        # 🔥 優化顯示：第一行顯示總結，下面列出所有策略詳情
+        print(f"   [{symbol}] ${close_price:.2f} | 總訊號:{signal} | 持倉:{pos_status} | 結構:{pivot_status}")
+        for log in detailed_logs:
+            print(f"        👉 {log}")
+
+        # 上一筆訂單還在送單佇列 (倉位簿尚未更新)，這次不再下單
+        if self.executor.has_pending(symbol):
+            print(f"   ⏳ {symbol} 有處理中的訂單，略過")
+            return
+
+        # --- 進場邏輯 ---
+        if current_position is None and decision != 0:
+            # 風控: 同時持倉數上限 (所有分片共用同一本倉位簿，處理中的訂單也算)
+            max_positions = getattr(config, 'MAX_OPEN_POSITIONS', 0)
+            open_symbols = set(self.executor.positions.snapshot()) | self.executor.pending_symbols()
+            if max_positions and len(open_symbols) >= max_positions:
+                print(f"   🚧 已達持倉上限 ({max_positions})，略過 {symbol} {signal}")
+                return
+            # 同方向策略提供的止損止盈價 (由 ExitWatcherService 監控，與回測規則相同)
+            levels = strategy_levels(decision, evaluation['signals'], evaluation['confidence'], *evaluation['levels'])
+            side = "buy" if signal == "LONG" else "sell"
+            self._execute_trade(side, symbol, order_amount, close_price, reason, context, levels,
+                                intent=evaluation.get('close_ms'))
         
-        if order or config.DRY_RUN:
-            self.logger.log(side.upper(), price, amount, tag, symbol=symbol)
+        # --- 出場邏輯 ---
+        elif current_position == "LONG" and signal == "SHORT":
+            self._close_trade(symbol, close_price, "訊號反轉平多")
+        
+        elif current_position == "SHORT" and signal == "LONG":
+            self._close_trade(symbol, close_price, "訊號反轉平空")
+
+    def _execute_trade(self, side, symbol, amount, price, tag, context, levels=None, intent=None):
+        """
+        執行下單 (排入送單佇列後立即返回，不等交易所回應；成交後才寫入交易紀錄並寄出進場通知)
+        :param levels: 策略提供的 (止損價, 止盈價)，成交後記錄在倉位簿給止損監控使用 (NaN 代表沒有)
+        :param intent: 決策依據的 K 線收盤時間，同一根 K 線重複判斷 (重試) 只會送出一次
+        """
+        print(f"   🚀 觸發下單: {symbol} {side} ({tag})")
+        if levels is not None:
+            levels = None if np.isnan(levels).all() else tuple(None if np.isnan(v) else v for v in levels)
+        ticket = self.executor.place_order(side, symbol, amount, price=price, intent=intent, levels=levels)
+        if ticket is None:
+            return
+
+        def on_done(t):
+            if not t.ok:
+                return  # 被拒絕或重試後仍失敗: 不記錄、不寄進場通知
+            self.logger.log(side.upper(), t.fill_price or price, t.filled or amount, tag, symbol=symbol)
             if self.report_service and self.email_service:
                 context['action'] = side.upper()
-                context['price'] = price
+                context['price'] = t.fill_price or price
                 html_report = self.report_service.generate_entry_report(context)
                 subject = f"🚀 交易快訊: {symbol} {side.upper()}"
                 self.email_service.send_report(subject, html_report)
+        ticket.add_done_callback(on_done)
 
     def _close_trade(self, symbol, price, tag):
-        """執行平倉"""
+        """執行平倉 (排入送單佇列，成交後寫入交易紀錄)"""
         print(f"   👋 觸發平倉: {symbol} ({tag})")
-        self.executor.close_position(symbol)
-        self.logger.log("CLOSE", price, 0, tag, symbol=symbol)
\ No newline at end of file
+        ticket = self.executor.close_position(symbol, price=price)
+        if ticket is None:
+            return
+
+        def on_done(t):
+            if t.ok:
+                self.logger.log("CLOSE", t.fill_price or price, t.filled, tag, symbol=symbol)
+        ticket.add_done_callback(on_done)
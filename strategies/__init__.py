@@ -1,12 +1,24 @@
 # strategies/__init__.py
+import config
 from .base_strategy import BaseStrategy
-from .ma_cross_strategy import MACrossStrategy
-from .harmonic_strategy import HarmonicStrategy
-# from .rsi_reversal_strategy import RsiReversalStrategy (如果有的話)
-
-# 🔥 建立一個對照表，方便字串轉物件
-STRATEGY_MAP = {
-    "MACrossStrategy": MACrossStrategy,
-    "HarmonicStrategy": HarmonicStrategy,
-    # "RsiReversalStrategy": RsiReversalStrategy
-}
\ No newline at end of file
+from .registry import StrategyRegistry
+
+# 🔥 策略對照表 (延遲載入): 只記錄路徑，被 ACTIVE_STRATEGIES 啟用時才 import
+# 新增策略時在這裡 (或 config.STRATEGY_PATHS / 套件 entry points) 註冊路徑即可
+BUILTIN_STRATEGIES = {
+    "MACrossStrategy": "strategies.ma_cross_strategy:MACrossStrategy",
+    "HarmonicStrategy": "strategies.harmonic_strategy:HarmonicStrategy",
+    # "RsiReversalStrategy": "strategies.rsi_reversal_strategy:RsiReversalStrategy"
+}
+
+STRATEGY_MAP = StrategyRegistry(
+    {**BUILTIN_STRATEGIES, **getattr(config, 'STRATEGY_PATHS', {})},
+    entry_point_group=getattr(config, 'STRATEGY_ENTRY_POINT_GROUP', 'crypto_bot.strategies'),
+)
+
+
+def __getattr__(name):
+    # 相容原本的 from strategies import MACrossStrategy (取用時才 import)
+    if name in BUILTIN_STRATEGIES:
+        return STRATEGY_MAP[name]
+    raise AttributeError(f"module 'strategies' has no attribute '{name}'")
@@ -1,8 +1,29 @@
 # strategies/base_strategy.py
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
 
+# analyze_series 的訊號編碼
+SIGNAL_CODES = {"LONG": 1, "SHORT": -1, "NEUTRAL": 0}
+SIGNAL_NAMES = {code: name for name, code in SIGNAL_CODES.items()}
+
+
+def empty_series(length: int) -> dict:
+    """全部 NEUTRAL、沒有止損止盈的訊號序列"""
+    return {
+        "signal": np.zeros(length, dtype=np.int8),
+        "stop_loss": np.full(length, np.nan),
+        "take_profit": np.full(length, np.nan)
+    }
+
+
 class BaseStrategy(ABC):
+    # 策略需要的 context 欄位 (例如 ['trend_signal', 'pivots'])
+    # MarketDataService 會依此先算好這些指標，其他指標只有被讀取時才計算；None 代表未宣告
+    required_indicators = None
+    # 參數搜尋可調整的 config 參數 -> analyze_series 的 params 名稱 (例如 {'SMA_SHORT': 'ma_fast'})
+    tunable_params = {}
+
     @abstractmethod
     def analyze(self, df: pd.DataFrame, context: dict) -> dict:
         """
@@ -13,7 +34,27 @@ class BaseStrategy(ABC):
             "signal": "LONG" | "SHORT" | "NEUTRAL",
             "reason": "策略觸發原因",
             "stop_loss": 建議止損價,
-            "take_profit": 建議止盈價
+            "take_profit": 建議止盈價,
+            "confidence": (選用) 訊號信心 0~1，未提供視為 1 (SignalEnsemble 的 weighted 模式使用)
         }
         """
-        pass
\ No newline at end of file
+        pass
+
+    def analyze_series(self, df: pd.DataFrame, params: dict = None) -> dict:
+        """
+        (選用) 向量化版本：一次算出整段歷史每根 K 線的訊號 (回測、核對即時訊號用)
+        第 t 個元素等同只拿 df.iloc[:t+1] 算 context 再呼叫 analyze 的結果
+        :param df: K線資料 (整段歷史)
+        :param params: 覆蓋策略參數 (例如 {'ma_fast': 5})，None 則使用 config
+        :return: {
+            "signal": int8 陣列 (1=LONG, -1=SHORT, 0=NEUTRAL),
+            "stop_loss": float 陣列 (沒有則為 NaN),
+            "take_profit": float 陣列 (沒有則為 NaN),
+            "confidence": (選用) float 陣列，與 analyze 的 confidence 相同
+        }
+        """
+        raise NotImplementedError(f"{type(self).__name__} 沒有實作 analyze_series")
+
+    def supports_series(self) -> bool:
+        """是否有實作 analyze_series"""
+        return type(self).analyze_series is not BaseStrategy.analyze_series
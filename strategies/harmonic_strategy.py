@@ -1,20 +1,32 @@
 # strategies/harmonic_strategy.py
-from .base_strategy import BaseStrategy
+import numpy as np
+import config
+from .base_strategy import BaseStrategy, empty_series
+from utils.harmonic_scanner import HarmonicScanner
+from utils.zigzag import rolling_last_pivots, pivot_distances
 
 class HarmonicStrategy(BaseStrategy):
+    required_indicators = ['pivots', 'pivot_pyramid']
+    tunable_params = {'ZIGZAG_ORDER': 'zigzag_order'}
+
     def __init__(self):
-        # 誤差容忍度 (例如 0.1 代表允許 10% 的誤差)
+        # 誤差容忍度 (例如 0.1 代表每個比例區間兩側各允許 0.1 的誤差)
         self.tolerance = 0.1
+        # 型態表 (Gartley / Bat / Butterfly / Crab) 與比例計算都在 HarmonicScanner
+        self.scanner = HarmonicScanner(tolerance=self.tolerance)
 
     def analyze(self, df, context) -> dict:
         """
-        諧波策略：分析 ZigZag 轉折點是否符合 Gartley 等型態
+        諧波策略：分析 ZigZag 轉折點是否剛完成 Gartley / Bat / Butterfly / Crab 型態
+        - 以 ZIGZAG_ORDER 的轉折點 (context['pivots']) 與多階層轉折點 (context['pivot_pyramid']) 各檢查一次
+        - 只看 D 點為最新轉折點的型態，多個符合時取分數最高者
         """
         # 1. 取得由 MarketDataService 算好的轉折點
         pivots = context.get('pivots', [])
-        
+        pyramid = context.get('pivot_pyramid')
+
         # 諧波型態至少需要 5 個點 (X, A, B, C, D)
-        if len(pivots) < 5:
+        if len(pivots) < 5 and (pyramid is None or len(pyramid) < 5):
             return {
                 "signal": "NEUTRAL",
                 "reason": "轉折點不足 (需5點)",
@@ -22,100 +34,78 @@ class HarmonicStrategy(BaseStrategy):
                 "take_profit": None
             }
 
-        # 2. 取出最近的 5 個點 (注意：pivots 列表是 舊 -> 新)
-        # 我們定義: X(0), A(1), B(2), C(3), D(4) 為最近的點 (D是最新價格附近)
-        # 所以要倒著取
-        P_D = pivots[-1] # 最新
-        P_C = pivots[-2]
-        P_B = pivots[-3]
-        P_A = pivots[-4]
-        P_X = pivots[-5] # 最舊
-
-        # 3. 取出價格與方向
-        price_X, type_X = P_X['price'], P_X['type']
-        price_A, type_A = P_A['price'], P_A['type']
-        price_B, type_B = P_B['price'], P_B['type']
-        price_C, type_C = P_C['price'], P_C['type']
-        # D點通常是「現在價格」或「剛形成的轉折」，這裡假設 D 點是最新轉折
-        price_D, type_D = P_D['price'], P_D['type']
-
-        signal = "NEUTRAL"
-        reason = ""
+        # 2. 收集各尺度上「D 為最新轉折點」的型態
+        candidates = []  # (match, 尺度說明)
+        for match in self.scanner.scan(pivots, only_last=True):
+            candidates.append((match, ""))
+        if pyramid is not None and len(pyramid):
+            for order in sorted(set(int(k) for k in pyramid['order'])):
+                level = pyramid[pyramid['order'] == order]
+                for match in self.scanner.scan(level, only_last=True):
+                    candidates.append((match, f" [order={order}]"))
 
-        # ==========================================
-        # 4. 判斷型態：Bullish Gartley (看漲)
-        # 結構: X(低) -> A(高) -> B(低) -> C(高) -> D(低)
-        # ==========================================
-        if type_X == "LOW" and type_A == "HIGH" and type_B == "LOW" and type_C == "HIGH" and type_D == "LOW":
-            
-            # --- 計算斐波那契比例 ---
-            XA_len = abs(price_X - price_A)
-            AB_len = abs(price_A - price_B)
-            BC_len = abs(price_B - price_C)
-            CD_len = abs(price_C - price_D)
-            XD_len = abs(price_X - price_D)
-
-            # B點回撤: AB / XA (Gartley 標準 0.618)
-            ratio_B = AB_len / XA_len
-            
-            # D點回撤: XD / XA (Gartley 標準 0.786)
-            ratio_D = XD_len / XA_len
+        if not candidates:
+            return {
+                "signal": "NEUTRAL",
+                "reason": "未偵測到諧波型態",
+                "stop_loss": None,
+                "take_profit": None
+            }
 
-            # 檢查誤差 (Tolerance)
-            is_B_valid = abs(ratio_B - 0.618) <= self.tolerance
-            is_D_valid = abs(ratio_D - 0.786) <= self.tolerance
-            
-            if is_B_valid and is_D_valid:
-                signal = "LONG"
-                reason = f"Bullish Gartley (B={ratio_B:.2f}, D={ratio_D:.2f})"
-                
-                # 建議止損: X 點下方
-                stop_loss = price_X * 0.995 
-                # 建議止盈: AD 的 0.618 回調處
-                take_profit = price_D + (abs(price_A - price_D) * 0.618)
-                
-                return {
-                    "signal": signal,
-                    "reason": reason,
-                    "stop_loss": stop_loss,
-                    "take_profit": take_profit
-                }
+        # 3. 取分數最高的型態: 看漲 (D 為低點) 做多，看跌做空
+        best, scale = max(candidates, key=lambda item: item[0]['score'])
+        return {
+            "signal": "LONG" if best['direction'] > 0 else "SHORT",
+            "reason": self.scanner.describe(best) + scale,
+            "stop_loss": float(best['stop_loss']),
+            "take_profit": float(best['take_profit']),
+            "confidence": float(best['score'])
+        }
 
-        # ==========================================
-        # 5. 判斷型態：Bearish Gartley (看跌)
-        # 結構: X(高) -> A(低) -> B(高) -> C(低) -> D(高)
-        # ==========================================
-        elif type_X == "HIGH" and type_A == "LOW" and type_B == "HIGH" and type_C == "LOW" and type_D == "HIGH":
-            
-            XA_len = abs(price_X - price_A)
-            AB_len = abs(price_A - price_B)
-            XD_len = abs(price_X - price_D)
+    def analyze_series(self, df, params=None):
+        """
+        每根 K 線當下的諧波訊號 (與 analyze 相同的尺度與取捨規則)
+        - 每個尺度用 rolling_last_pivots 得到每根 K 線當下的最後 5 個轉折點 (含暫定轉折點)
+        - 一次掃描所有 K 線的視窗，再依 analyze 的候選順序取分數最高者 (同分取先出現者)
+        :param params: 可覆蓋 zigzag_order / pyramid_orders / tolerance；
+                       pivot_distances 可傳入預先算好的 zigzag.pivot_distances (參數搜尋時共用)
+        """
+        params = params or {}
+        zigzag_order = params.get('zigzag_order', getattr(config, 'ZIGZAG_ORDER', 5))
+        pyramid_orders = params.get('pyramid_orders', getattr(config, 'ZIGZAG_PYRAMID_ORDERS', [3, 5, 8, 13]))
+        scanner = self.scanner
+        if params.get('tolerance', self.tolerance) != self.tolerance:
+            scanner = HarmonicScanner(tolerance=params['tolerance'])
 
-            ratio_B = AB_len / XA_len
-            ratio_D = XD_len / XA_len
+        highs = df['high'].to_numpy(dtype=np.float64)
+        lows = df['low'].to_numpy(dtype=np.float64)
+        result = empty_series(len(highs))
+        best_score = np.full(len(highs), -np.inf)
 
-            is_B_valid = abs(ratio_B - 0.618) <= self.tolerance
-            is_D_valid = abs(ratio_D - 0.786) <= self.tolerance
-            
-            if is_B_valid and is_D_valid:
-                signal = "SHORT"
-                reason = f"Bearish Gartley (B={ratio_B:.2f}, D={ratio_D:.2f})"
-                
-                # 建議止損: X 點上方
-                stop_loss = price_X * 1.005
-                take_profit = price_D - (abs(price_A - price_D) * 0.618)
+        # 候選順序與 analyze 相同: 先 ZIGZAG_ORDER 的轉折點，再依序各階層
+        # 左右阻擋距離與 order 無關，所有尺度共用一份
+        orders = [zigzag_order] + sorted(set(int(k) for k in pyramid_orders))
+        distances = params.get('pivot_distances')
+        if distances is None or distances['max_order'] < max(orders):
+            distances = pivot_distances(highs, lows, max(orders))
 
-                return {
-                    "signal": signal,
-                    "reason": reason,
-                    "stop_loss": stop_loss,
-                    "take_profit": take_profit
-                }
+        # 同一個 order 的結果相同 (例如 ZIGZAG_ORDER 也在階層中)，分數相同不會改變取捨，只需掃描一次
+        scanned = set()
+        for order in orders:
+            if order in scanned:
+                continue
+            scanned.add(order)
+            matches = scanner.scan_windows(*rolling_last_pivots(highs, lows, order, distances=distances))
+            for family in range(len(scanner.pattern_names)):
+                found = matches[matches['pattern'] == family]
+                rows = found['start']
+                better = found['score'] > best_score[rows]
+                found, rows = found[better], rows[better]
+                best_score[rows] = found['score']
+                result['signal'][rows] = found['direction']
+                result['stop_loss'][rows] = found['stop_loss']
+                result['take_profit'][rows] = found['take_profit']
 
-        # 若都不符合
-        return {
-            "signal": "NEUTRAL",
-            "reason": "未偵測到諧波型態",
-            "stop_loss": None,
-            "take_profit": None
-        }
\ No newline at end of file
+        # 型態分數 (0~1) 作為訊號信心，沒有訊號的 K 線為 0
+        result['confidence'] = np.where(result['signal'] != 0, best_score, 0.0)
+        return result
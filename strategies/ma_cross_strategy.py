@@ -1,7 +1,13 @@
 # strategies/ma_cross_strategy.py
-from .base_strategy import BaseStrategy
+import numpy as np
+import config
+from .base_strategy import BaseStrategy, empty_series
+from utils import indicators
 
 class MACrossStrategy(BaseStrategy):
+    required_indicators = ['trend_signal', 'ma_fast', 'ma_slow']
+    tunable_params = {'SMA_SHORT': 'ma_fast', 'SMA_LONG': 'ma_slow'}
+
     def analyze(self, df, context):
         # 從 context 取得已經算好的指標 (由 MarketDataService 提供)
         # 🔥 修改：使用 .get() 的第二個參數給予預設值，防止 None
@@ -29,4 +35,21 @@ class MACrossStrategy(BaseStrategy):
             "reason": reason,
             "stop_loss": None,   # 可在此加入 ATR 止損邏輯
             "take_profit": None
-        }
\ No newline at end of file
+        }
+
+    def analyze_series(self, df, params=None):
+        """
+        每根 K 線的均線多空: 快線 > 慢線為 LONG，否則 SHORT
+        與 MarketDataService 相同，均線暖機期的 NaN 以前值 / 0 補 (等同即時的 ma_fast / ma_slow)
+        """
+        params = params or {}
+        fast_length = params.get('ma_fast', getattr(config, 'SMA_SHORT', 7))
+        slow_length = params.get('ma_slow', getattr(config, 'SMA_LONG', 25))
+
+        close = df['close'].to_numpy(dtype=np.float64)
+        ma_fast = indicators.ffill(indicators.sma(close, fast_length))
+        ma_slow = indicators.ffill(indicators.sma(close, slow_length))
+
+        result = empty_series(len(close))
+        result['signal'] = np.where(ma_fast > ma_slow, 1, -1).astype(np.int8)
+        return result
@@ -0,0 +1,115 @@
+# strategies/registry.py
+import importlib
+import time
+from collections.abc import Mapping
+
+from .base_strategy import BaseStrategy
+
+
+class StrategyRegistry(Mapping):
+    """
+    策略名稱 -> 策略類別 的延遲載入對照表 (用法與原本的 STRATEGY_MAP dict 相同)
+    - 只記錄名稱與路徑 ("模組:類別" 或 "模組.類別")，第一次被取用時才 import
+    - 來源: 內建清單、config.STRATEGY_PATHS、套件的 entry points (group 預設 crypto_bot.strategies)
+    - ACTIVE_STRATEGIES 也可以直接寫完整路徑，例如 "my_pkg.my_module:MyStrategy"
+    - 每個策略的 import 耗時記錄在 import_times (ms)
+    """
+    def __init__(self, paths=None, entry_point_group=None):
+        self._paths = dict(paths or {})
+        self._classes = {}
+        self.import_times = {}
+        self.entry_point_group = entry_point_group
+        self._entry_points_loaded = entry_point_group is None
+
+    def register(self, name, target):
+        """註冊策略: target 可為路徑字串或類別本身"""
+        if isinstance(target, str):
+            self._paths[name] = target
+            self._classes.pop(name, None)
+        else:
+            self._classes[name] = target
+
+    def _discover_entry_points(self):
+        """讀取已安裝套件宣告的策略 (只讀 metadata，不 import 策略本身)"""
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+        try:
+            from importlib.metadata import entry_points
+            for ep in entry_points(group=self.entry_point_group):
+                self._paths.setdefault(ep.name, ep.value)
+        except Exception as e:
+            print(f"⚠️ 讀取策略 entry points 失敗: {e}")
+
+    @staticmethod
+    def _split(path):
+        if ':' in path:
+            return path.split(':', 1)
+        return path.rsplit('.', 1)
+
+    def _names(self):
+        self._discover_entry_points()
+        return list(dict.fromkeys(list(self._paths) + list(self._classes)))
+
+    def __getitem__(self, name):
+        if name in self._classes:
+            return self._classes[name]
+
+        self._discover_entry_points()
+        path = self._paths.get(name)
+        if path is None and ('.' in name or ':' in name):
+            path = name  # 直接寫完整路徑
+        if path is None:
+            raise KeyError(name)
+
+        module_name, class_name = self._split(path)
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        strategy_class = getattr(module, class_name)
+        self.import_times[name] = (time.perf_counter() - start) * 1000
+
+        if not (isinstance(strategy_class, type) and issubclass(strategy_class, BaseStrategy)):
+            raise TypeError(f"{path} 不是 BaseStrategy 的子類別")
+        self._classes[name] = strategy_class
+        return strategy_class
+
+    def get(self, name, default=None):
+        """找不到或載入失敗時回傳 default (載入失敗會印出原因)"""
+        try:
+            return self[name]
+        except KeyError:
+            return default
+        except Exception as e:
+            print(f"❌ 策略 {name} 載入失敗: {e}")
+            return default
+
+    def __contains__(self, name):
+        return name in self._classes or name in self._names() or ('.' in name or ':' in name)
+
+    def __iter__(self):
+        return iter(self._names())
+
+    def __len__(self):
+        return len(self._names())
+
+    def is_loaded(self, name):
+        return name in self._classes
+
+    def create(self, names):
+        """
+        依名稱清單 (例如 config.ACTIVE_STRATEGIES) 建立策略物件，只 import 用到的策略，並輸出各自的載入耗時
+        :return: 策略物件清單 (找不到的會被略過並提示)
+        """
+        strategies = []
+        timings = []
+        for name in names:
+            strategy_class = self.get(name)
+            if strategy_class is None:
+                print(f"⚠️ 警告: 找不到策略 {name}，請檢查拼字或 config.STRATEGY_PATHS")
+                continue
+            strategies.append(strategy_class())
+            if name in self.import_times:
+                timings.append(f"{strategy_class.__name__} {self.import_times[name]:.1f}ms")
+        if timings:
+            print(f"📦 策略載入耗時: " + " | ".join(timings))
+        return strategies
@@ -0,0 +1,110 @@
+# strategies/voting.py
+import numpy as np
+import config
+
+
+def combine_votes(votes, axis=0):
+    """
+    多策略投票規則 (TradingService 即時下單與回測共用)
+    - 同時有策略看多、有策略看空 -> 策略衝突，觀望 (0)
+    - 否則有人看多 -> LONG (1)，有人看空 -> SHORT (-1)，都沒有 -> NEUTRAL (0)
+    :param votes: 各策略的訊號編碼 (1/-1/0)，形狀 (K,) 或 (K, T)，K 為策略數
+    :return: 沿 axis 合併後的 int8 編碼 (純量陣列或 (T,))
+    """
+    votes = np.asarray(votes, dtype=np.int8)
+    has_long = (votes > 0).any(axis=axis)
+    has_short = (votes < 0).any(axis=axis)
+    return np.where(has_long & has_short, 0, np.where(has_long, 1, np.where(has_short, -1, 0))).astype(np.int8)
+
+
+class SignalEnsemble:
+    """
+    多策略訊號整合: 幣種 x 策略 的訊號矩陣一次算出所有幣種的決策 (即時下單與回測共用)
+    - 最後一個維度是策略 (K)，前面的維度不限: (S, K) 一個循環的所有幣種、(T, K) 回測的整段歷史
+    - 'veto': 原本的規則，多空衝突即觀望 (同 combine_votes)
+    - 'weighted': score = Σ(權重 x 信心 x 訊號) / Σ權重，|score| >= threshold 才依 score 的方向進場
+    - 'quorum': 同方向的權重合計 >= quorum 且多於反方向才進場
+    - 權重為 0 的策略不參與任何模式的決策；棄權 (逾時、出錯) 以訊號 0 表示
+    """
+    MODES = ('veto', 'weighted', 'quorum')
+
+    def __init__(self, strategy_names, mode='veto', weights=None, threshold=0.5, quorum=2):
+        """
+        :param strategy_names: 策略名稱，順序即矩陣的欄位順序
+        :param mode: 'veto' | 'weighted' | 'quorum'
+        :param weights: {策略名稱: 權重}，未列出的策略權重為 1
+        :param threshold: weighted 模式的進場門檻 (0~1)
+        :param quorum: quorum 模式同方向至少需要的權重合計 (權重都是 1 時即策略數)
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"未知的訊號整合模式: {mode}")
+        self.strategy_names = list(strategy_names)
+        self.mode = mode
+        weights = weights or {}
+        self.weights = np.array([float(weights.get(name, 1.0)) for name in self.strategy_names])
+        if (self.weights < 0).any():
+            raise ValueError(f"策略權重不可為負數: {weights}")
+        self.threshold = float(threshold)
+        self.quorum = float(quorum)
+
+    @classmethod
+    def from_config(cls, strategy_names):
+        """依 config 的 ENSEMBLE_* 設定建立"""
+        return cls(strategy_names,
+                   mode=getattr(config, 'ENSEMBLE_MODE', 'veto'),
+                   weights=getattr(config, 'ENSEMBLE_WEIGHTS', {}),
+                   threshold=getattr(config, 'ENSEMBLE_THRESHOLD', 0.5),
+                   quorum=getattr(config, 'ENSEMBLE_QUORUM', 2))
+
+    def _inputs(self, signals, confidence):
+        signals = np.asarray(signals, dtype=np.int8)
+        if signals.shape[-1] != len(self.strategy_names):
+            raise ValueError(f"訊號矩陣的策略數 {signals.shape[-1]} 與設定的 {len(self.strategy_names)} 不符")
+        if confidence is None:
+            confidence = np.ones(signals.shape)
+        else:
+            # 沒有提供信心的策略 (NaN) 視為 1，超出範圍的截斷到 0~1
+            confidence = np.clip(np.nan_to_num(np.asarray(confidence, dtype=np.float64), nan=1.0), 0.0, 1.0)
+        return signals, confidence
+
+    def scores(self, signals, confidence=None):
+        """
+        加權分數 Σ(權重 x 信心 x 訊號) / Σ權重，範圍 -1~1
+        :param signals: 訊號編碼矩陣 (..., K)
+        :param confidence: 與 signals 同形狀的信心 (0~1)，None 代表全部為 1
+        :return: float 陣列 (...)
+        """
+        signals, confidence = self._inputs(signals, confidence)
+        total = self.weights.sum()
+        if total <= 0:
+            return np.zeros(signals.shape[:-1])
+        return (signals * confidence) @ self.weights / total
+
+    def decide(self, signals, confidence=None):
+        """
+        :param signals: 訊號編碼矩陣 (..., K) (1=LONG, -1=SHORT, 0=NEUTRAL/棄權)
+        :param confidence: 與 signals 同形狀的信心 (0~1)，只有 weighted 模式使用
+        :return: int8 決策陣列 (...)
+        """
+        signals, confidence = self._inputs(signals, confidence)
+        active = self.weights > 0
+
+        if self.mode == 'veto':
+            return combine_votes(signals[..., active], axis=-1)
+
+        if self.mode == 'weighted':
+            score = self.scores(signals, confidence)
+            # 浮點誤差不應讓剛好落在門檻上的分數被拒絕
+            passed = np.abs(score) >= self.threshold - 1e-12
+            return np.where(passed, np.sign(score), 0).astype(np.int8)
+
+        long_weight = (signals > 0) @ self.weights
+        short_weight = (signals < 0) @ self.weights
+        quorum = self.quorum - 1e-12
+        return np.where((long_weight >= quorum) & (long_weight > short_weight), 1,
+                        np.where((short_weight >= quorum) & (short_weight > long_weight), -1, 0)).astype(np.int8)
+
+    def conflicted(self, signals):
+        """有參與決策的策略同時出現多空訊號 (用於顯示衝突理由)"""
+        signals = np.asarray(signals, dtype=np.int8)[..., self.weights > 0]
+        return (signals > 0).any(axis=-1) & (signals < 0).any(axis=-1)
@@ -0,0 +1,105 @@
+# test/helpers.py
+# 測試共用的假資料與假元件 (各測試檔以 from helpers import ... 使用)
+import sys
+import os
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+import config
+from strategies.base_strategy import BaseStrategy
+from services.trading_service import TradingService
+from utils.candle_clock import CandleClock
+from utils.lazy_context import LazyContext
+from utils.position_book import PositionBook
+
+
+def make_frame(periods=300, seed=0):
+    """隨機漫步的 15m K 線 (開盤價 = 上一根收盤價，價格取到小數一位)"""
+    np.random.seed(seed)
+    dates = pd.date_range(end='2025-06-01 13:00', periods=periods, freq='15min')
+    close = np.round(np.cumsum(np.random.randn(periods) * 10) + 3000, 1)
+    return pd.DataFrame({
+        'timestamp': dates,
+        'open': np.r_[close[0], close[:-1]],
+        'high': close + np.round(np.abs(np.random.randn(periods)) * 8, 1),
+        'low': close - np.round(np.abs(np.random.randn(periods)) * 8, 1),
+        'close': close,
+        'volume': np.abs(np.random.randn(periods) * 100) + 50
+    })
+
+
+class SymbolStrategy(BaseStrategy):
+    """測試用: 依 context['symbol'] 回傳固定訊號"""
+    def __init__(self, signals):
+        self.signals = signals
+
+    def analyze(self, df, context):
+        return {"signal": self.signals[context['symbol']], "reason": "test", "stop_loss": None, "take_profit": None}
+
+
+class FakeLoader:
+    """測試用: 回傳固定的 K 線，'BAD' 模擬抓取失敗"""
+    def fetch_data(self, timeframe, symbol, limit=200):
+        if symbol == 'BAD':
+            raise RuntimeError("boom")
+        return make_frame(50)
+
+
+class FakeMarketData:
+    """測試用: 延遲計算的 context (pivots 只有被讀取時才計算)"""
+    def analyze_technicals(self, df, **kwargs):
+        return LazyContext({'close': lambda ctx: 100.0, 'pivots': lambda ctx: [{'type': 'HIGH', 'price': 1.0}]})
+
+
+class FakeExecutor:
+    """測試用: 記錄下單並直接寫入倉位簿 (不產生 OrderTicket)"""
+    def __init__(self):
+        self.orders = []
+        self.positions = PositionBook()
+
+    def get_open_position(self, symbol):
+        return self.positions.side(symbol)
+
+    def place_order(self, side, symbol, amount, price=None, **kwargs):
+        self.orders.append((side, symbol))
+        self.positions.apply_fill(symbol, side, amount, price)
+        return None  # 不產生 OrderTicket，交易紀錄在成交回呼才寫入
+
+    def has_pending(self, symbol):
+        return False
+
+    def pending_symbols(self):
+        return set()
+
+
+class FakeLogger:
+    def __init__(self):
+        self.records = []
+
+    def log(self, action, price, amount, tag, **kwargs):
+        self.records.append((action, price, amount, kwargs.get('symbol')))
+
+
+def make_trader(symbols=('AAA', 'BBB', 'CCC'), strategies=(), schedule='interval', **kwargs):
+    """
+    不連線交易所的 TradingService
+    :param schedule: TRADING_SCHEDULE
+    :param kwargs: 傳給 TradingService (預設 FakeLoader / FakeMarketData / FakeExecutor / FakeLogger / 不同步的 CandleClock)
+    """
+    defaults = {
+        'loader': FakeLoader(),
+        'market_data_service': FakeMarketData(),
+        'executor': FakeExecutor(),
+        'trade_logger': FakeLogger(),
+        'clock': CandleClock(None, '15m', sync_interval=0),
+    }
+    defaults.update(kwargs)
+    with mock.patch.object(config, 'TRADING_SCHEDULE', schedule), \
+            mock.patch.object(config, 'TRADING_WORKERS', 0), \
+            mock.patch.object(config, 'STRATEGY_LATENCY_LOG', None):
+        return TradingService(symbols=list(symbols), strategies=list(strategies), **defaults)
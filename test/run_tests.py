@@ -120,13 +120,14 @@ class TestCryptoBot(unittest.TestCase):
         # 1. 測試下單
         order = executor.place_order('buy', self.symbol, 0.01)
         self.assertIsNotNone(order, "下單回傳不應為 None")
+        self.assertTrue(order.wait(5), "訂單應在送單佇列中成交")
         
         # 2. 測試查詢倉位 (模擬記憶體)
         pos = executor.get_open_position(self.symbol)
         self.assertEqual(pos, 'LONG', "模擬倉位應該是 LONG")
         
         # 3. 測試平倉
-        executor.close_position(self.symbol)
+        executor.close_position(self.symbol).wait(5)
         pos_after = executor.get_open_position(self.symbol)
         self.assertIsNone(pos_after, "平倉後倉位應為 None")
         
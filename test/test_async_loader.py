@@ -0,0 +1,150 @@
+# test/test_async_loader.py
+import unittest
+from unittest import mock
+import sys
+import os
+import asyncio
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+import config
+from utils.async_loader import TokenBucket, AsyncBingXLoader
+from utils.data_loader import BingXLoader
+from helpers import SymbolStrategy, make_trader
+
+TF_MS = 15 * 60 * 1000
+
+
+def make_rows(start_ts, count, base=100.0):
+    return [[start_ts + i * TF_MS, base + i, base + i + 1, base + i - 1, base + i + 0.5, 10.0] for i in range(count)]
+
+
+class FakeExchange:
+    """同步 loader 用的假交易所 (只提供時間)"""
+    def __init__(self, now_ms):
+        self.now_ms = now_ms
+
+    def milliseconds(self):
+        return self.now_ms
+
+
+class FakeAsyncExchange:
+    """測試用: 非同步 fetch_ohlcv，記錄 (symbol, since, limit)，delays 控制每個幣種的回應時間"""
+    def __init__(self, rows, delays=None):
+        self.rows = rows
+        self.delays = delays or {}
+        self.calls = []
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append((symbol, since, limit))
+        await asyncio.sleep(self.delays.get(symbol, 0))
+        rows = [r for r in self.rows if since is None or r[0] >= since]
+        return rows[-limit:] if since is None else rows[:limit]
+
+
+class RecordingBucket(TokenBucket):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.costs = []
+
+    async def acquire(self, cost=1):
+        self.costs.append(cost)
+        await super().acquire(cost)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_pacing_and_fifo(self):
+        async def scenario():
+            bucket = TokenBucket(rate=50, capacity=1)
+            order = []
+
+            async def request(i):
+                await bucket.acquire()
+                order.append((i, time.monotonic()))
+
+            await asyncio.gather(*(request(i) for i in range(5)))
+            return order
+
+        order = asyncio.run(scenario())
+        # 先到先服務
+        self.assertEqual([i for i, _ in order], list(range(5)))
+        # 容量 1 只有第一個請求不用等，其餘每個間隔約 1 / rate 秒
+        self.assertGreaterEqual(order[-1][1] - order[0][1], 4 / 50 * 0.9)
+
+    def test_weighted_cost(self):
+        async def scenario():
+            bucket = TokenBucket(rate=100, capacity=4)
+            start = time.monotonic()
+            await bucket.acquire(4)
+            await bucket.acquire(2)  # 需要等 2 個 token 補充
+            return time.monotonic() - start
+
+        self.assertGreaterEqual(asyncio.run(scenario()), 2 / 100 * 0.9)
+
+    def test_cost_above_capacity_raises(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(TokenBucket(10, 1).acquire(2))
+        with mock.patch.object(config, 'RATE_LIMIT_WEIGHTS', {'fetch_ohlcv': 50}), \
+                mock.patch.object(config, 'RATE_LIMIT_BURST', 20):
+            with self.assertRaises(ValueError):
+                AsyncBingXLoader(loader=None)
+
+
+class TestAsyncBingXLoader(unittest.TestCase):
+
+    def make_loader(self, rows, delays=None, weights=None):
+        loader = BingXLoader(exchange=FakeExchange(now_ms=rows[-1][0] + 10))
+        loader.store = None
+        aloader = AsyncBingXLoader(loader)
+        aloader.exchange = FakeAsyncExchange(rows, delays)  # 不透過 __aenter__ 建立連線
+        aloader.bucket = RecordingBucket(rate=1000, capacity=10)
+        aloader.weights = weights or {}
+        return aloader
+
+    def test_weights_and_incremental_fetch(self):
+        rows = make_rows(0, 300)
+        aloader = self.make_loader(rows, weights={'fetch_ohlcv': 3})
+
+        df = asyncio.run(aloader.fetch_data('15m', 'ETH-USDT', limit=200))
+        self.assertEqual(len(df), 200)
+        self.assertEqual(aloader.exchange.calls[-1], ('ETH/USDT', None, 200))
+
+        # 第二次只抓快取最後一根之後的 K 線 (與同步 loader 共用快取)
+        rows.append([300 * TF_MS, 1, 2, 0, 1.5, 10.0])
+        aloader.loader.exchange.now_ms = 300 * TF_MS + 10
+        df = asyncio.run(aloader.fetch_data('15m', 'ETH-USDT', limit=200))
+        self.assertEqual(aloader.exchange.calls[-1], ('ETH/USDT', 299 * TF_MS, 3))
+        self.assertEqual(int(df['timestamp'].iloc[-1].value // 1_000_000), 300 * TF_MS)
+        self.assertEqual(aloader.bucket.costs, [3, 3])
+
+    def test_symbols_processed_in_arrival_order(self):
+        rows = make_rows(0, 50)
+        delays = {'AAA/USDT': 0.15, 'BBB/USDT': 0.0, 'CCC/USDT': 0.05}
+        aloader = self.make_loader(rows, delays=delays)
+
+        class FakeAsyncLoader:
+            """_run_cycle_async 用: 直接回傳已建立好的 aloader"""
+            def __init__(self, loader, executor):
+                pass
+
+            async def __aenter__(self):
+                return aloader
+
+            async def __aexit__(self, *args):
+                pass
+
+        symbols = ['AAA-USDT', 'BBB-USDT', 'CCC-USDT']
+        trader = make_trader(symbols, [SymbolStrategy({s: 'LONG' for s in symbols})], loader=aloader.loader)
+
+        with mock.patch('services.trading_service.AsyncBingXLoader', FakeAsyncLoader):
+            asyncio.run(trader._run_cycle_async())
+        # 每個幣種都下單，順序就是處理順序
+        self.assertEqual([symbol for _, symbol in trader.executor.orders], ['BBB-USDT', 'CCC-USDT', 'AAA-USDT'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# test/test_backtest_service.py
+import unittest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from services.backtest_service import BacktestService, stop_exit
+from strategies import MACrossStrategy, HarmonicStrategy
+from strategies.base_strategy import BaseStrategy, empty_series
+from strategies.voting import combine_votes
+from helpers import make_frame
+
+
+class AlwaysLong(BaseStrategy):
+    """測試用: 每根 K 線都看多"""
+    def analyze(self, df, context):
+        return {"signal": "LONG", "reason": "", "stop_loss": None, "take_profit": None}
+
+    def analyze_series(self, df, params=None):
+        result = empty_series(len(df))
+        result['signal'][:] = 1
+        return result
+
+
+class LongWithStop(AlwaysLong):
+    """測試用: 看多並提供收盤價下方 1% 的止損價"""
+    def analyze(self, df, context):
+        result = super().analyze(df, context)
+        result['stop_loss'] = float(df['close'].iloc[-1]) * 0.99
+        return result
+
+    def analyze_series(self, df, params=None):
+        result = super().analyze_series(df, params)
+        result['stop_loss'] = df['close'].to_numpy(dtype=np.float64) * 0.99
+        return result
+
+
+class TestCombineVotes(unittest.TestCase):
+
+    def test_vote_rule(self):
+        self.assertEqual(combine_votes([1, 0]), 1)
+        self.assertEqual(combine_votes([0, -1]), -1)
+        self.assertEqual(combine_votes([1, -1]), 0)   # 多空衝突觀望
+        self.assertEqual(combine_votes([]), 0)
+        matrix = np.array([[1, 1, 0, -1], [0, -1, 0, -1]])
+        np.testing.assert_array_equal(combine_votes(matrix), [1, 0, 0, -1])
+
+
+class TestBacktestService(unittest.TestCase):
+
+    def test_event_mode_matches_vectorized(self):
+        df = make_frame()
+        strategies = [MACrossStrategy(), HarmonicStrategy()]
+        fast = BacktestService(strategies=strategies, mode='vectorized').run_symbol('BTC-USDT', df)
+        slow = BacktestService(strategies=strategies, mode='event').run_symbol('BTC-USDT', df)
+        self.assertGreater(len(fast['trades']), 0)
+        pd.testing.assert_frame_equal(fast['trades'], slow['trades'])
+        pd.testing.assert_series_equal(fast['equity'], slow['equity'])
+
+    def test_stop_loss_fee_and_leverage(self):
+        # 一路下跌: 開多後觸發止損，止損後同一根收盤再依訊號開倉
+        close = np.linspace(100, 80, 60)
+        df = pd.DataFrame({'timestamp': pd.date_range('2025-01-01', periods=60, freq='15min'),
+                           'open': np.r_[close[0], close[:-1]], 'high': close + 0.1, 'low': close - 0.1, 'close': close, 'volume': 1.0})
+        backtest = BacktestService(strategies=[AlwaysLong()], warmup=5, fee_rate=0.001, leverage=2,
+                                   stop_loss_pct=0.02, take_profit_pct=0.04)
+        result = backtest.run_symbol('X', df)
+        trades = result['trades']
+
+        first = trades.iloc[0]
+        self.assertEqual(first['exit_reason'], 'stop_loss')
+        self.assertAlmostEqual(first['exit_price'], first['entry_price'] * 0.98)
+        ratio = first['exit_price'] / first['entry_price']
+        self.assertAlmostEqual(first['return'], 2 * (ratio - 1) - 0.001 * 2 * (1 + ratio))
+        self.assertEqual(trades.iloc[1]['entry_time'], first['exit_time'])
+        self.assertEqual(trades.iloc[-1]['exit_reason'], 'end')
+
+        self.assertAlmostEqual(result['equity'].iloc[-1], 10000 + trades['pnl'].sum())
+        self.assertLess(result['stats']['max_drawdown'], 0)
+        self.assertEqual(result['attribution'].loc['AlwaysLong', 'trades'], len(trades))
+
+    def test_strategy_stop_level(self):
+        # 策略提供的止損價優先於 STOP_LOSS_PCT，兩種模式結果相同
+        close = np.linspace(100, 80, 60)
+        df = pd.DataFrame({'timestamp': pd.date_range('2025-01-01', periods=60, freq='15min'),
+                           'open': np.r_[close[0], close[:-1]], 'high': close + 0.1, 'low': close - 0.1, 'close': close, 'volume': 1.0})
+        kwargs = dict(warmup=30, stop_loss_pct=0.05, take_profit_pct=0.04, use_strategy_levels=True)
+        fast = BacktestService(strategies=[LongWithStop()], **kwargs).run_symbol('X', df)
+        slow = BacktestService(strategies=[LongWithStop()], mode='event', **kwargs).run_symbol('X', df)
+        first = fast['trades'].iloc[0]
+        self.assertEqual(first['exit_reason'], 'stop_loss')
+        self.assertAlmostEqual(first['exit_price'], first['entry_price'] * 0.99)
+        pd.testing.assert_frame_equal(fast['trades'], slow['trades'])
+
+        off = BacktestService(strategies=[LongWithStop()], **dict(kwargs, use_strategy_levels=False)).run_symbol('X', df)
+        self.assertAlmostEqual(off['trades'].iloc[0]['exit_price'], off['trades'].iloc[0]['entry_price'] * 0.95)
+
+    def test_stop_exit_gap_fills_at_open(self):
+        self.assertEqual(stop_exit(1, 95.0, 96.0, 94.0, 98.0, 104.0), ("stop_loss", 95.0))
+        self.assertEqual(stop_exit(-1, 97.0, 97.5, 95.0, 102.0, 96.0), ("take_profit", 96.0))
+        self.assertIsNone(stop_exit(1, 100.0, 101.0, 99.0, 98.0, 104.0))
+
+    def test_run_multiple_symbols(self):
+        backtest = BacktestService(strategies=[MACrossStrategy()])
+        result = backtest.run({'BTC-USDT': make_frame(seed=1), 'ETH-USDT': make_frame(seed=2), 'SOL-USDT': make_frame(20)})
+        self.assertEqual(set(result['symbols']), {'BTC-USDT', 'ETH-USDT'})  # 資料不足的幣種略過
+        self.assertEqual(result['stats']['trades'], len(result['trades']))
+        self.assertAlmostEqual(result['equity'].iloc[0], 20000)
+
+    def test_vectorized_requires_series(self):
+        class LiveOnly(BaseStrategy):
+            def analyze(self, df, context):
+                return {"signal": "NEUTRAL", "reason": "", "stop_loss": None, "take_profit": None}
+
+        with self.assertRaises(ValueError):
+            BacktestService(strategies=[LiveOnly()], mode='vectorized')
+        BacktestService(strategies=[LiveOnly()], mode='event')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# test/test_candle_clock.py
+import unittest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils.candle_clock import CandleClock
+from helpers import make_trader
+
+MINUTE = 60 * 1000
+
+
+class FakeExchange:
+    has = {'fetchTime': True}
+
+    def __init__(self, offset_ms):
+        self.offset_ms = offset_ms
+
+    def fetch_time(self):
+        import time
+        return int(time.time() * 1000) + self.offset_ms
+
+
+def make_frame(last_open_ms, periods=50):
+    opens = last_open_ms - np.arange(periods)[::-1] * 15 * MINUTE
+    close = np.linspace(100, 110, periods)
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(opens, unit='ms'),
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+        'volume': np.ones(periods)
+    })
+
+
+class TestCandleClock(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = CandleClock(None, '15m', delay=3, sync_interval=0, retry_delay=5, max_retries=2)
+        self.close = 1_700_000_100_000 // (15 * MINUTE) * (15 * MINUTE)
+
+    def test_sync_offset(self):
+        clock = CandleClock(FakeExchange(-5000), '15m')
+        self.assertAlmostEqual(clock.sync(), -5000, delta=200)
+        self.assertAlmostEqual(clock.now_ms() - CandleClock(None, '15m', sync_interval=0).now_ms(), -5000, delta=200)
+
+    def test_fires_after_close_plus_delay(self):
+        clock = self.clock
+        self.assertEqual(clock.due(self.close + 3000), self.close)
+        clock.done(self.close, now_ms=self.close + 3000)
+        self.assertIsNone(clock.due(self.close + 60 * 1000))
+        # 下一根收盤 + 3 秒之前都不觸發
+        next_close = self.close + 15 * MINUTE
+        self.assertIsNone(clock.due(next_close + 2999))
+        self.assertAlmostEqual(clock.seconds_until_due(next_close + 1000), 2.0)
+        self.assertEqual(clock.due(next_close + 3000), next_close)
+
+    def test_retry_until_complete(self):
+        clock = self.clock
+        now = self.close + 3000
+        clock.done(self.close, complete=False, now_ms=now)
+        self.assertIsNone(clock.due(now + 4000))
+        self.assertEqual(clock.due(now + 5000), self.close)
+        clock.done(self.close, complete=False, now_ms=now + 5000)
+        clock.done(self.close, complete=False, now_ms=now + 10000)  # 重試次數用完
+        self.assertIsNone(clock.due(now + 60 * 1000))
+        self.assertEqual(clock.due(self.close + 15 * MINUTE + 3000), self.close + 15 * MINUTE)
+
+    def test_new_close_does_not_inherit_retries(self):
+        clock = self.clock
+        now = self.close + 3000
+        clock.done(self.close, complete=False, now_ms=now)
+        clock.done(self.close, complete=False, now_ms=now + 5000)  # 這根 K 線已重試 2 次
+
+        # 重試還沒結束就換到下一根 K 線: 新的一根有自己的 max_retries 次重試
+        nxt = self.close + 15 * MINUTE
+        now = nxt + 3000
+        self.assertEqual(clock.due(now), nxt)
+        clock.done(nxt, complete=False, now_ms=now)
+        self.assertIsNone(clock.due(now + 4000))
+        self.assertEqual(clock.due(now + 5000), nxt)
+        clock.done(nxt, complete=False, now_ms=now + 5000)
+        self.assertEqual(clock.due(now + 10000), nxt)
+        clock.done(nxt, complete=False, now_ms=now + 10000)  # 第 3 次失敗才放棄
+        self.assertIsNone(clock.due(now + 60 * 1000))
+
+
+class TestSelectCandles(unittest.TestCase):
+
+    def make_trader(self, now_ms):
+        clock = CandleClock(None, '15m', sync_interval=0)
+        clock.now_ms = lambda: now_ms
+        return make_trader(schedule='candle_close', clock=clock)
+
+    def test_drops_forming_candle_and_skips_unchanged(self):
+        close = 1_700_000_100_000 // (15 * MINUTE) * (15 * MINUTE)
+        trader = self.make_trader(close + 4000)
+        df = make_frame(close)  # 最後一根是剛開始形成的 K 線
+
+        selected = trader._select_candles('BTC-USDT', df)
+        self.assertEqual(len(selected), len(df) - 1)
+        self.assertEqual(selected['timestamp'].iloc[-1], pd.Timestamp(close - 15 * MINUTE, unit='ms'))
+        self.assertFalse(trader._pending)
+
+        # 同一根收盤 K 線不再判斷
+        self.assertIsNone(trader._select_candles('BTC-USDT', df))
+
+    def test_missing_latest_candle_is_pending(self):
+        close = 1_700_000_100_000 // (15 * MINUTE) * (15 * MINUTE)
+        trader = self.make_trader(close + 4000)
+        df = make_frame(close - 30 * MINUTE)  # 交易所還沒產生剛收盤的 K 線
+
+        selected = trader._select_candles('ETH-USDT', df)
+        self.assertEqual(len(selected), len(df))
+        self.assertIn('ETH-USDT', trader._pending)
+        self.assertIsNone(trader._select_candles('ETH-USDT', None))
+
+    def test_decision_delay(self):
+        close = 1_700_000_100_000 // (15 * MINUTE) * (15 * MINUTE)
+        trader = self.make_trader(close + 4500)
+        trader._record_decision_delay([{'close_ms': close}, {'close_ms': close + 15 * MINUTE}, {'close_ms': None}])
+        self.assertEqual(trader._cycle_delays, [4.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
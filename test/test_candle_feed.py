@@ -0,0 +1,135 @@
+# test/test_candle_feed.py
+import unittest
+import sys
+import os
+import tempfile
+import asyncio
+from unittest import mock
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils.candle_store import CandleStore
+from utils.candle_feed import ReplayCandleFeed, WebSocketCandleFeed
+
+TF_MS = 15 * 60 * 1000
+
+
+def make_rows(start_ts, count, base):
+    return [[start_ts + i * TF_MS, base, base + 1, base - 1, base + i, 1.0] for i in range(count)]
+
+
+class TestReplayCandleFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = CandleStore(self.tmp_dir.name)
+        self.store.append('BTC-USDT', '15m', make_rows(0, 3, 100.0))
+        self.store.append('ETH-USDT', '15m', make_rows(TF_MS, 3, 10.0))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_replay_merges_symbols_by_time(self):
+        events = []
+        feed = ReplayCandleFeed(['BTC-USDT', 'ETH-USDT'], '15m', store=self.store)
+        feed.subscribe(events.append)
+        feed.run()
+
+        self.assertEqual(feed.emitted, 6)
+        timestamps = [e['candle'][0] for e in events]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertTrue(all(e['closed'] for e in events))
+        self.assertEqual([e['symbol'] for e in events[:2]], ['BTC-USDT', 'BTC-USDT'])
+
+    def test_replay_time_range(self):
+        events = []
+        feed = ReplayCandleFeed(['BTC-USDT'], '15m', store=self.store, start_ms=TF_MS, end_ms=2 * TF_MS)
+        feed.subscribe(events.append)
+        feed.run()
+        self.assertEqual([e['candle'][0] for e in events], [TF_MS])
+
+
+class FakeProExchange:
+    """測試用: 依序回傳 script 中的 K 線批次，例外代表 WebSocket 中斷；播完後停止 feed"""
+    def __init__(self, feed, script):
+        self.feed = feed
+        self.script = list(script)
+        self.calls = []
+        self.closed = False
+
+    async def watch_ohlcv(self, symbol, timeframe):
+        self.calls.append((symbol, timeframe))
+        await asyncio.sleep(0)
+        if not self.script:
+            self.feed.stop()
+            return []
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    async def close(self):
+        self.closed = True
+
+
+class TestWebSocketCandleFeed(unittest.TestCase):
+
+    def watch(self, script):
+        feed = WebSocketCandleFeed(['BTC-USDT'], '15m', reconnect_delay=0)
+        events = []
+        feed.subscribe(events.append)
+        exchange = FakeProExchange(feed, script)
+        asyncio.run(feed._watch_symbol(exchange, 'BTC-USDT'))
+        return events, exchange
+
+    def test_new_candle_closes_previous(self):
+        events, exchange = self.watch([
+            [[0, 1, 2, 0, 1.5, 10]],
+            [[0, 1, 3, 0, 2.5, 20]],                          # 同一根更新
+            [[0, 1, 3, 0, 2.6, 21], [TF_MS, 2.6, 3, 2, 2.8, 5]],  # 新 K 線開盤
+        ])
+        self.assertEqual(exchange.calls[0], ('BTC/USDT', '15m'))
+        self.assertEqual([(e['candle'][0], e['closed']) for e in events],
+                         [(0, False), (0, False), (0, False), (0, True), (TF_MS, False)])
+        # 收盤推送的是最後一次更新的內容
+        self.assertEqual(events[3]['candle'], [0.0, 1.0, 3.0, 0.0, 2.6, 21.0])
+        self.assertTrue(all(isinstance(x, float) for x in events[0]['candle']))
+        self.assertEqual(events[0]['timeframe'], '15m')
+
+    def test_older_candles_are_ignored(self):
+        events, _ = self.watch([
+            [[TF_MS, 1, 2, 0, 1.5, 10]],
+            [[0, 1, 2, 0, 1.0, 10], [TF_MS, 1, 2, 0, 1.6, 11]],
+        ])
+        self.assertEqual([(e['candle'][0], e['closed']) for e in events],
+                         [(TF_MS, False), (TF_MS, False)])
+
+    def test_reconnect_keeps_forming_candle(self):
+        events, exchange = self.watch([
+            [[0, 1, 2, 0, 1.5, 10]],
+            ConnectionError("socket closed"),
+            ConnectionError("socket closed"),
+            [[TF_MS, 1.5, 2, 1, 1.8, 3]],
+        ])
+        self.assertEqual(len(exchange.calls), 5)
+        # 中斷前形成中的 K 線在重連後的第一根新 K 線到達時收盤
+        self.assertEqual([(e['candle'][0], e['closed']) for e in events],
+                         [(0, False), (0, True), (TF_MS, False)])
+
+    def test_callback_error_does_not_stop_feed(self):
+        feed = WebSocketCandleFeed(['BTC-USDT', 'ETH-USDT'], '15m', reconnect_delay=0)
+        events = []
+        feed.subscribe(lambda event: 1 / 0)
+        feed.subscribe(events.append)
+        exchange = FakeProExchange(feed, [[[0, 1, 2, 0, 1.5, 10]], [[0, 1, 2, 0, 1.5, 10]]])
+
+        with mock.patch('ccxt.pro.bingx', return_value=exchange):
+            feed.run()
+        self.assertEqual(sorted(e['symbol'] for e in events), ['BTC-USDT', 'ETH-USDT'])
+        self.assertTrue(exchange.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+# test/test_data_loader.py
+import unittest
+import sys
+import os
+import tempfile
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils.data_loader import BingXLoader, CandleBuffer
+from utils.candle_store import CandleStore
+
+TF_MS = 15 * 60 * 1000
+
+
+def make_rows(start_ts, count, base=100.0):
+    return [[start_ts + i * TF_MS, base + i, base + i + 1, base + i - 1, base + i + 0.5, 10.0] for i in range(count)]
+
+
+class FakeExchange:
+    """只記錄呼叫參數的假交易所 (不打 API)"""
+    def __init__(self, rows, now_ms):
+        self.rows = rows
+        self.now_ms = now_ms
+        self.calls = []
+
+    def milliseconds(self):
+        return self.now_ms
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append((since, limit))
+        rows = [r for r in self.rows if since is None or r[0] >= since]
+        return rows[-limit:] if since is None else rows[:limit]
+
+
+class TestCandleBuffer(unittest.TestCase):
+
+    def test_append_and_wrap(self):
+        buffer = CandleBuffer(capacity=5)
+        buffer.merge(make_rows(0, 8))
+        data = buffer.to_array()
+        self.assertEqual(len(buffer), 5)
+        self.assertEqual(list(data[:, 0]), [i * TF_MS for i in range(3, 8)])
+
+    def test_replace_forming_candle(self):
+        buffer = CandleBuffer(capacity=5)
+        buffer.merge(make_rows(0, 3))
+        buffer.merge([[2 * TF_MS, 1, 2, 0.5, 1.5, 99.0], [3 * TF_MS, 2, 3, 1, 2, 1.0]])
+        data = buffer.to_array()
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(data[2, 5], 99.0)
+        self.assertEqual(buffer.last_timestamp, 3 * TF_MS)
+
+    def test_ignore_older_rows(self):
+        buffer = CandleBuffer(capacity=5)
+        buffer.merge(make_rows(TF_MS * 2, 2))
+        self.assertEqual(buffer.merge(make_rows(0, 1)), 0)
+        self.assertEqual(len(buffer), 2)
+
+    def test_last_closed_timestamp(self):
+        buffer = CandleBuffer(capacity=5)
+        buffer.merge(make_rows(0, 3))
+        # 最後一根 (2*TF) 尚未收盤
+        self.assertEqual(buffer.last_closed_timestamp(TF_MS, 2 * TF_MS + 10), TF_MS)
+        self.assertEqual(buffer.last_closed_timestamp(TF_MS, 3 * TF_MS), 2 * TF_MS)
+
+
+class TestIncrementalFetch(unittest.TestCase):
+
+    def test_second_fetch_is_incremental(self):
+        rows = make_rows(0, 300)
+        loader = BingXLoader(exchange=FakeExchange(rows, now_ms=299 * TF_MS + 10))
+        loader.store = None
+
+        df = loader.fetch_data('15m', 'ETH-USDT', limit=200)
+        self.assertEqual(len(df), 200)
+        self.assertEqual(loader.exchange.calls[-1], (None, 200))
+
+        # 新增一根 K 線，並更新原本形成中的那根
+        rows[-1] = [299 * TF_MS, 1, 2, 0.5, 42.0, 1.0]
+        rows.append([300 * TF_MS, 42, 43, 41, 42.5, 1.0])
+        loader.exchange.now_ms = 300 * TF_MS + 10
+
+        df = loader.fetch_data('15m', 'ETH-USDT', limit=200)
+        since, limit = loader.exchange.calls[-1]
+        self.assertEqual(since, 299 * TF_MS)
+        self.assertLessEqual(limit, 3)
+        self.assertEqual(len(df), 200)
+        self.assertEqual(df['close'].iloc[-2], 42.0)
+        self.assertEqual(df['close'].iloc[-1], 42.5)
+
+    def test_resample_beyond_fetch_limit_fetches_directly(self):
+        rows = make_rows(0, 400)
+        loader = BingXLoader(exchange=FakeExchange(rows, now_ms=399 * TF_MS + 10))
+        loader.store = None
+        loader.fetch_data('15m', 'ETH-USDT', limit=300)
+        buffer = loader.cache[('ETH-USDT', '15m')]
+
+        # 1h x 50 只需要 204 根 15m，由快取合成
+        loader.fetch_resampled('1h', 'ETH-USDT', limit=50, base_timeframe='15m')
+        self.assertLessEqual(loader.exchange.calls[-1][1], 3)
+
+        # 1d x 50 需要約 4.9k 根 15m，超過單次上限: 直接抓 1d，不動 15m 的快取
+        loader.fetch_resampled('1d', 'ETH-USDT', limit=50, base_timeframe='15m')
+        self.assertEqual(loader.exchange.calls[-1], (None, 50))
+        self.assertIs(loader.cache[('ETH-USDT', '15m')], buffer)
+        self.assertEqual(buffer.capacity, loader.cache_size)
+
+
+class TestCandleStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = CandleStore(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_append_dedup_and_fill_gap(self):
+        self.assertEqual(self.store.append('ETH-USDT', '15m', make_rows(0, 5)), 5)
+        # 重疊部分不重複寫入
+        self.assertEqual(self.store.append('ETH-USDT', '15m', make_rows(3 * TF_MS, 4)), 2)
+        # 補到最前面 (需要合併重寫)
+        self.assertEqual(self.store.append('ETH-USDT', '15m', make_rows(-2 * TF_MS, 3)), 2)
+
+        data = self.store.read('ETH-USDT', '15m')
+        self.assertEqual(list(data['timestamp']), [i * TF_MS for i in range(-2, 7)])
+        self.assertEqual(len(self.store.read('ETH-USDT', '15m', start_ms=0, end_ms=2 * TF_MS)), 2)
+
+    def test_next_missing_skips_contiguous_run(self):
+        self.store.append('ETH-USDT', '15m', make_rows(0, 3) + make_rows(5 * TF_MS, 2))
+        self.assertEqual(self.store.next_missing('ETH-USDT', '15m', 0, TF_MS), 3 * TF_MS)
+        self.assertEqual(self.store.next_missing('ETH-USDT', '15m', 5 * TF_MS, TF_MS), 7 * TF_MS)
+        self.assertEqual(self.store.next_missing('ETH-USDT', '15m', 4 * TF_MS, TF_MS), 4 * TF_MS)
+
+    def test_backfill_resumes_from_gap(self):
+        rows = make_rows(0, 50)
+        loader = BingXLoader(exchange=FakeExchange(rows, now_ms=50 * TF_MS))
+        loader.store = self.store
+        self.store.append('ETH-USDT', '15m', rows[:10] + rows[20:30])
+
+        added = loader.backfill('ETH-USDT', '15m', 0, page_limit=15)
+        data = self.store.read('ETH-USDT', '15m')
+        self.assertEqual(added, 30)
+        self.assertEqual(list(data['timestamp']), [r[0] for r in rows])
+        # 第一頁從缺口 (第 10 根) 開始
+        self.assertEqual(loader.exchange.calls[0][0], 10 * TF_MS)
+
+
+class TestStreamIngest(unittest.TestCase):
+
+    def test_read_waits_for_ingest_from_feed_thread(self):
+        """串流執行緒寫入快取到一半時，主迴圈的讀取要等寫入完成 (不會讀到合併到一半的緩衝區)"""
+        rows = make_rows(0, 61)
+        loader = BingXLoader(exchange=FakeExchange(rows, now_ms=0))
+        loader.store = None
+        loader.ingest_candles('ETH-USDT', '15m', rows[:60])
+
+        buffer = loader.cache[('ETH-USDT', '15m')]
+        merge, entered, release = buffer.merge, threading.Event(), threading.Event()
+
+        def slow_merge(new_rows):
+            entered.set()
+            release.wait(5)
+            return merge(new_rows)
+
+        buffer.merge = slow_merge
+        writer = threading.Thread(target=loader.ingest_candles, args=('ETH-USDT', '15m', rows[60:]))
+        writer.start()
+        self.assertTrue(entered.wait(5))
+
+        frames = []
+        reader = threading.Thread(target=lambda: frames.append(loader.get_cached_data('15m', 'ETH-USDT', limit=50)))
+        reader.start()
+        reader.join(0.2)
+        self.assertTrue(reader.is_alive())  # 寫入中，讀取被擋住
+
+        release.set()
+        writer.join(5)
+        reader.join(5)
+        ts = frames[0]['timestamp'].to_numpy(dtype='datetime64[ms]').astype('int64')
+        self.assertEqual(ts[-1], 60 * TF_MS)
+
+
+class TestAlignPanel(unittest.TestCase):
+
+    def test_align_skips_short_and_gapped_symbols(self):
+        frames = {
+            'BTC-USDT': BingXLoader.to_dataframe(make_rows(0, 20, 100.0)),
+            'ETH-USDT': BingXLoader.to_dataframe(make_rows(0, 20, 10.0)[5:]),
+            'NEW-USDT': BingXLoader.to_dataframe(make_rows(0, 20, 1.0)[15:]),
+            'GAP-USDT': BingXLoader.to_dataframe([r for i, r in enumerate(make_rows(0, 20, 5.0)) if i != 17]),
+        }
+        symbols, panel, skipped = BingXLoader.align_panel(frames, limit=10)
+        self.assertEqual(symbols, ['BTC-USDT', 'ETH-USDT'])
+        self.assertEqual(sorted(skipped), ['GAP-USDT', 'NEW-USDT'])
+        self.assertEqual(panel['close'].shape, (2, 10))
+        self.assertEqual(int(panel['timestamp'][0]), 10 * TF_MS)
+        self.assertEqual(panel['close'][1, -1], 10.0 + 19 + 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# test/test_exit_watcher_service.py
+import unittest
+from unittest import mock
+import sys
+import os
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+import config
+from utils.executor import BingXExecutor
+from utils.exit_rules import exit_levels, strategy_levels
+from services.exit_watcher_service import ExitWatcherService
+
+
+class FakeTickerExchange:
+    """測試用: 回傳固定報價並記錄 fetch_tickers 呼叫"""
+    def __init__(self):
+        self.quotes = {}
+        self.calls = []
+
+    def fetch_tickers(self, symbols=None):
+        self.calls.append(symbols)
+        return {s: {'symbol': f"{s}:USDT", 'bid': bid, 'ask': ask, 'last': (bid + ask) / 2}
+                for s, (bid, ask) in self.quotes.items() if symbols is None or s in symbols}
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.records = []
+
+    def log(self, action, price, amount, tag, **kwargs):
+        self.records.append((action, price, amount, kwargs.get('symbol')))
+
+
+class TestExitRules(unittest.TestCase):
+
+    def test_exit_levels(self):
+        self.assertEqual(exit_levels(1, 100.0, 0.02, 0.04), (98.0, 104.0))
+        self.assertEqual(exit_levels(-1, 100.0, 0.02, 0.04), (102.0, 96.0))
+        self.assertEqual(exit_levels(1, 100.0), (-np.inf, np.inf))
+        # 策略價位優先，但在進場價錯誤一側時改用百分比
+        self.assertEqual(exit_levels(1, 100.0, 0.02, 0.04, stop_price=95.0, take_price=99.0), (95.0, 104.0))
+
+    def test_strategy_levels(self):
+        stop, take = strategy_levels(1, [1, 1, -1], [0.5, 0.9, 1.0], [90.0, 95.0, 120.0], [110.0, np.nan, 80.0])
+        self.assertEqual((stop, take), (95.0, 110.0))
+        self.assertTrue(np.isnan(strategy_levels(-1, [1, 0], [1, 1], [90.0, 95.0], [110.0, 120.0])[0]))
+
+
+class TestExitWatcher(unittest.TestCase):
+
+    def setUp(self):
+        with mock.patch.object(config, 'DRY_RUN', True):
+            self.executor = BingXExecutor(None, async_orders=False)
+        self.exchange = FakeTickerExchange()
+        self.watcher = ExitWatcherService(self.executor, exchange=self.exchange, stop_loss_pct=0.02,
+                                          take_profit_pct=0.04, use_strategy_levels=True)
+
+    def test_no_positions_no_request(self):
+        self.assertEqual(self.watcher.check(), [])
+        self.assertEqual(self.exchange.calls, [])
+
+    def test_stop_loss_with_one_bulk_request(self):
+        self.executor.place_order('buy', 'BTC-USDT', 0.01, price=100.0)
+        self.executor.place_order('sell', 'ETH-USDT', 0.5, price=10.0)
+        self.exchange.quotes = {'BTC/USDT': (98.5, 98.6), 'ETH/USDT': (9.9, 10.0)}
+        self.assertEqual(self.watcher.check(), [])
+
+        self.exchange.quotes = {'BTC/USDT': (97.9, 98.0), 'ETH/USDT': (9.5, 9.6)}
+        exits = self.watcher.check()
+        self.assertEqual(len(self.exchange.calls), 2)  # 每次檢查只查一次報價
+        self.assertEqual(sorted(self.exchange.calls[-1]), ['BTC/USDT', 'ETH/USDT'])
+        self.assertEqual([(e['symbol'], e['reason']) for e in exits],
+                         [('BTC-USDT', 'stop_loss'), ('ETH-USDT', 'take_profit')])
+        self.assertTrue(all(e['latency_ms'] >= 0 for e in exits))
+        self.assertEqual(self.executor.positions.snapshot(), {})
+
+    def test_strategy_levels_take_priority(self):
+        self.executor.place_order('buy', 'BTC-USDT', 0.01, price=100.0)
+        self.executor.positions.set_levels('BTC-USDT', stop_price=99.5, take_price=None)
+        record = self.watcher.on_candle({'symbol': 'BTC-USDT', 'candle': [0, 100, 100, 99.4, 99.4, 1]})
+        self.assertEqual(record['reason'], 'stop_loss')
+        self.assertEqual(record['stop'], 99.5)
+        self.assertIsNone(self.watcher.on_price('BTC-USDT', 90.0))  # 已平倉
+
+    def test_close_logs_filled_amount(self):
+        self.watcher.trade_logger = RecordingLogger()
+        self.executor.place_order('buy', 'BTC-USDT', 0.01, price=100.0)
+        self.watcher.on_price('BTC-USDT', 97.0)
+        self.assertEqual(self.watcher.trade_logger.records, [('CLOSE', 97.0, 0.01, 'BTC-USDT')])
+
+
+if __name__ == '__main__':
+    unittest.main()
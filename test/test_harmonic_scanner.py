@@ -0,0 +1,84 @@
+# test/test_harmonic_scanner.py
+import unittest
+import sys
+import os
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils.harmonic_scanner import HarmonicScanner
+from strategies.harmonic_strategy import HarmonicStrategy
+
+
+def gartley(x=100.0, xa=100.0, bullish=True):
+    """理想比例的 Gartley 五點 (舊 -> 新)"""
+    s = 1.0 if bullish else -1.0
+    a = x + s * xa
+    b = a - s * 0.618 * xa
+    c = b + s * 0.618 * (0.618 * xa)
+    d = a - s * 0.786 * xa
+    types = ['LOW', 'HIGH'] if bullish else ['HIGH', 'LOW']
+    return [{'index': i * 10, 'price': p, 'type': types[i % 2], 'time': str(i)} for i, p in enumerate([x, a, b, c, d])]
+
+
+class TestHarmonicScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.scanner = HarmonicScanner()
+
+    def test_ideal_bullish_gartley(self):
+        matches = self.scanner.scan(gartley())
+        names = [self.scanner.pattern_names[m['pattern']] for m in matches]
+        self.assertEqual(names, ['Gartley'])
+        m = matches[0]
+        self.assertEqual(m['direction'], 1)
+        self.assertAlmostEqual(m['score'], 1.0)
+        self.assertAlmostEqual(m['prz_low'], 121.4)
+        self.assertAlmostEqual(m['stop_loss'], 100.0 * 0.995)
+        self.assertAlmostEqual(m['take_profit'], 121.4 + 78.6 * 0.618)
+
+    def test_bearish_mirror(self):
+        m = self.scanner.scan(gartley(x=300.0, bullish=False))[0]
+        self.assertEqual(m['direction'], -1)
+        self.assertAlmostEqual(m['prz_high'], 278.6)
+        self.assertGreater(m['stop_loss'], 300.0)
+        self.assertLess(m['take_profit'], m['d_price'])
+
+    def test_scan_full_history(self):
+        # 隨機轉折點中間埋入一個型態，掃描整段歷史要找到它的位置
+        rng = np.random.default_rng(0)
+        noise = []
+        price = 100.0
+        for i in range(400):
+            price += (1 if i % 2 else -1) * rng.uniform(1, 50)
+            noise.append({'index': i, 'price': price, 'type': 'HIGH' if i % 2 else 'LOW', 'time': ''})
+        pattern = gartley(x=noise[199]['price'] - 10.0)
+        pivots = noise[:200] + [dict(p, index=200 + k) for k, p in enumerate(pattern)]
+        matches = self.scanner.scan(pivots)
+        starts = matches['start'][matches['score'] == 1.0]
+        self.assertIn(200, starts)
+        self.assertEqual(len(self.scanner.scan(pivots, only_last=True)), 1)
+
+    def test_non_alternating_window_rejected(self):
+        pivots = gartley()
+        pivots[2]['type'] = 'HIGH'
+        self.assertEqual(len(self.scanner.scan(pivots)), 0)
+
+
+class TestHarmonicStrategy(unittest.TestCase):
+
+    def test_signal_from_latest_pattern(self):
+        result = HarmonicStrategy().analyze(None, {'pivots': gartley()})
+        self.assertEqual(result['signal'], 'LONG')
+        self.assertIn('Gartley', result['reason'])
+        self.assertAlmostEqual(result['stop_loss'], 99.5)
+
+    def test_not_enough_pivots(self):
+        result = HarmonicStrategy().analyze(None, {'pivots': gartley()[:4]})
+        self.assertEqual(result['signal'], 'NEUTRAL')
+
+
+if __name__ == '__main__':
+    unittest.main()
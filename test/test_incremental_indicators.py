@@ -0,0 +1,104 @@
+# test/test_incremental_indicators.py
+import unittest
+import sys
+import os
+import json
+import math
+import tempfile
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils import indicators
+from utils.incremental_indicators import IncrementalIndicators, OUTPUT_KEYS
+from services.market_data_service import MarketDataService
+from helpers import make_frame
+
+
+def frame_rows(df):
+    timestamps = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    return np.column_stack((timestamps.astype(np.float64), df['open'], df['high'], df['low'], df['close'], df['volume']))
+
+
+class TestIncrementalIndicators(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = make_frame()
+        cls.rows = frame_rows(cls.df)
+        cls.params = MarketDataService(engine='numpy').indicator_params
+        cls.batch = indicators.compute_indicators(
+            None, cls.rows[:, 2], cls.rows[:, 3], cls.rows[:, 4], cls.rows[:, 5],
+            cls.rows[:, 0].astype(np.int64), cls.params)
+
+    def assertValuesMatch(self, values, index):
+        for key in OUTPUT_KEYS:
+            expected = self.batch[key][index]
+            if math.isnan(expected):
+                self.assertTrue(math.isnan(values[key]), f"{key}@{index}")
+            else:
+                self.assertAlmostEqual(values[key], expected, delta=1e-6 * max(1.0, abs(expected)), msg=f"{key}@{index}")
+
+    def test_matches_batch_kernel_every_bar(self):
+        state = IncrementalIndicators(self.params)
+        for i, row in enumerate(self.rows):
+            self.assertValuesMatch(state.update(row), i)
+
+    def test_forming_candle_does_not_commit(self):
+        state = IncrementalIndicators(self.params)
+        for row in self.rows[:-1]:
+            state.update(row)
+        snapshot = json.dumps(state.to_dict())
+
+        # 形成中的 K 線更新多次，狀態不變
+        forming = self.rows[-1].copy()
+        for delta in (-5.0, 3.0, 0.0):
+            forming[4] = self.rows[-1][4] + delta
+            state.update(forming, closed=False)
+        self.assertEqual(json.dumps(state.to_dict()['state']), json.dumps(json.loads(snapshot)['state']))
+        self.assertValuesMatch(state.values, len(self.rows) - 1)
+
+        state.update(self.rows[-1], closed=True)
+        self.assertEqual(state.last_closed_ts, int(self.rows[-1][0]))
+        self.assertValuesMatch(state.values, len(self.rows) - 1)
+
+    def test_serialization_round_trip(self):
+        state = IncrementalIndicators(self.params)
+        for row in self.rows[:150]:
+            state.update(row)
+        restored = IncrementalIndicators.from_dict(json.loads(json.dumps(state.to_dict())))
+        for i in range(150, len(self.rows)):
+            self.assertValuesMatch(restored.update(self.rows[i]), i)
+
+
+class TestIncrementalEngine(unittest.TestCase):
+
+    def test_engine_matches_numpy_context(self):
+        df = make_frame()
+        numpy_ctx = MarketDataService(engine='numpy').analyze_technicals(df)
+        service = MarketDataService(engine='incremental')
+
+        # 先用前段暖機，再餵完整資料 (只會處理新的 K 線)
+        service.analyze_technicals(df.iloc[:250], symbol='BTC-USDT', timeframe='15m')
+        inc_ctx = service.analyze_technicals(df, symbol='BTC-USDT', timeframe='15m')
+        for key in ['close', 'rsi', 'kdj_k', 'kdj_j', 'ma_fast', 'ma_slow', 'macd_hist', 'atr', 'obv', 'mfi', 'vwap']:
+            self.assertAlmostEqual(inc_ctx[key], numpy_ctx[key], delta=1e-6 * max(1.0, abs(numpy_ctx[key])), msg=key)
+        self.assertEqual(inc_ctx['pivots'], numpy_ctx['pivots'])
+
+    def test_save_and_load_states(self):
+        df = make_frame(periods=120)
+        service = MarketDataService(engine='incremental')
+        service.analyze_technicals(df, symbol='BTC-USDT', timeframe='15m')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'indicator_states.json')
+            service.save_indicator_states(path)
+            restored = MarketDataService(engine='incremental')
+            self.assertEqual(restored.load_indicator_states(path), 1)
+        state = restored.incremental_states[('BTC-USDT', '15m')]
+        self.assertEqual(state.last_closed_ts, service.incremental_states[('BTC-USDT', '15m')].last_closed_ts)
+
+
+if __name__ == '__main__':
+    unittest.main()
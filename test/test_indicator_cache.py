@@ -0,0 +1,78 @@
+# test/test_indicator_cache.py
+import unittest
+import sys
+import os
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils.indicator_cache import IndicatorCache
+from utils.lazy_context import LazyContext
+from services.market_data_service import MarketDataService
+from helpers import make_frame
+
+
+class TestIndicatorCache(unittest.TestCase):
+
+    def test_lru_eviction_by_entries(self):
+        cache = IndicatorCache(max_entries=2)
+        cache.put('a', {'v': 1})
+        cache.put('b', {'v': 2})
+        cache.get('a')            # a 變成最近使用
+        cache.put('c', {'v': 3})  # 淘汰 b
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'v': 1})
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_memory_cap(self):
+        cache = IndicatorCache(max_entries=100, max_bytes=2000)
+        for i in range(20):
+            cache.put(i, {'text': 'x' * 200})
+        self.assertLessEqual(cache.current_bytes, 2000)
+        self.assertLess(len(cache), 20)
+
+    def test_get_returns_copy(self):
+        cache = IndicatorCache()
+        cache.put('k', {'close': 1.0})
+        cache.get('k')['symbol'] = 'BTC-USDT'
+        self.assertNotIn('symbol', cache.get('k'))
+
+    def test_lazy_entry_growth_is_counted(self):
+        cache = IndicatorCache(max_entries=100, max_bytes=12000)
+        resolvers = {'small': lambda ctx: 1.0, 'big': lambda ctx: np.zeros(1000)}
+        cache.put('a', LazyContext(resolvers).resolve(['small']))
+        before = cache.stats()['bytes']
+
+        # 命中後讀取的欄位寫回快取共用的 store，記憶體統計要跟著增加
+        cache.get('a')['big']
+        self.assertGreaterEqual(cache.stats()['bytes'], before + 8000)
+
+        # 超過上限時依實際大小淘汰
+        cache.put('b', LazyContext(resolvers).resolve(['small']))
+        cache.get('b')['big']
+        cache.put('c', LazyContext(resolvers).resolve(['small']))
+        self.assertIsNone(cache.get('a'))
+        self.assertLessEqual(cache.current_bytes, 12000)
+
+
+class TestAnalyzeTechnicalsCache(unittest.TestCase):
+
+    def test_repeated_call_hits_cache(self):
+        service = MarketDataService(engine='numpy')
+        df = make_frame(120, seed=7)
+        first = service.analyze_technicals(df, symbol='BTC-USDT', timeframe='15m')
+        second = service.analyze_technicals(df, symbol='BTC-USDT', timeframe='15m')
+        self.assertEqual(first['rsi'], second['rsi'])
+        stats = service.cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+        # 不同的資料起點 / 不指定幣種都不會命中
+        service.analyze_technicals(df.iloc[1:], symbol='BTC-USDT', timeframe='15m')
+        service.analyze_technicals(df)
+        self.assertEqual(service.cache_stats()['misses'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+# test/test_indicators.py
+import unittest
+import sys
+import os
+import warnings
+import numpy as np
+
+warnings.simplefilter(action='ignore', category=FutureWarning)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils import indicators
+from services.market_data_service import MarketDataService
+from helpers import make_frame
+
+try:
+    import pandas_ta as ta
+except ImportError:
+    ta = None
+
+RTOL = 1e-6
+ATOL = 1e-6
+
+
+@unittest.skipIf(ta is None, "未安裝 pandas_ta")
+class TestIndicatorParity(unittest.TestCase):
+    """numpy 指標核心 vs pandas_ta (相同參數，容許浮點誤差)"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = make_frame()
+        cls.indexed = cls.df.set_index('timestamp')
+        cls.h = cls.df['high'].to_numpy()
+        cls.l = cls.df['low'].to_numpy()
+        cls.c = cls.df['close'].to_numpy()
+        cls.v = cls.df['volume'].to_numpy()
+
+    def assertSeriesClose(self, actual, expected):
+        np.testing.assert_allclose(actual, np.asarray(expected, dtype=np.float64), rtol=RTOL, atol=ATOL, equal_nan=True)
+
+    def test_sma_ema(self):
+        self.assertSeriesClose(indicators.sma(self.c, 7), ta.sma(self.df['close'], length=7))
+        self.assertSeriesClose(indicators.ema(self.c, 12), ta.ema(self.df['close'], length=12))
+
+    def test_macd(self):
+        expected = ta.macd(self.df['close'], fast=12, slow=26, signal=9)
+        for i, actual in enumerate(indicators.macd(self.c, 12, 26, 9)):
+            self.assertSeriesClose(actual, expected.iloc[:, i])
+
+    def test_rsi(self):
+        self.assertSeriesClose(indicators.rsi(self.c, 14), ta.rsi(self.df['close'], length=14))
+
+    def test_kdj(self):
+        expected = ta.kdj(self.df['high'], self.df['low'], self.df['close'], length=9, signal=3)
+        for i, actual in enumerate(indicators.kdj(self.h, self.l, self.c, 9, 3)):
+            self.assertSeriesClose(actual, expected.iloc[:, i])
+
+    def test_bbands(self):
+        expected = ta.bbands(self.df['close'], length=20, std=2.0)
+        lower, mid, upper = indicators.bbands(self.c, 20, 2.0)
+        self.assertSeriesClose(lower, expected.iloc[:, 0])
+        self.assertSeriesClose(mid, expected.iloc[:, 1])
+        self.assertSeriesClose(upper, expected.iloc[:, 2])
+
+    def test_atr_obv_mfi(self):
+        df = self.df
+        self.assertSeriesClose(indicators.atr(self.h, self.l, self.c, 14), ta.atr(df['high'], df['low'], df['close'], length=14))
+        self.assertSeriesClose(indicators.obv(self.c, self.v), ta.obv(df['close'], df['volume']))
+        self.assertSeriesClose(indicators.mfi(self.h, self.l, self.c, self.v, 14),
+                               ta.mfi(df['high'], df['low'], df['close'], df['volume'], length=14))
+
+    def test_vwap(self):
+        d = self.indexed
+        timestamps_ms = self.df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        self.assertSeriesClose(indicators.vwap(self.h, self.l, self.c, self.v, timestamps_ms),
+                               ta.vwap(d['high'], d['low'], d['close'], d['volume']))
+
+    def test_analyze_technicals_engines_match(self):
+        numpy_ctx = MarketDataService(engine='numpy').analyze_technicals(self.df)
+        pandas_ctx = MarketDataService(engine='pandas_ta').analyze_technicals(self.df)
+        for key in ['close', 'rsi', 'kdj_k', 'kdj_j', 'ma_fast', 'ma_slow', 'macd_hist', 'atr', 'obv', 'mfi', 'vwap']:
+            self.assertAlmostEqual(numpy_ctx[key], pandas_ctx[key], delta=ATOL + RTOL * abs(pandas_ctx[key]), msg=key)
+        self.assertEqual(numpy_ctx['trend_signal'], pandas_ctx['trend_signal'])
+        self.assertEqual(numpy_ctx['pivots'], pandas_ctx['pivots'])
+
+
+class TestIndicatorKernel(unittest.TestCase):
+
+    def test_last_valid_matches_ffill(self):
+        values = np.array([np.nan, 1.0, np.nan, 3.0, np.nan])
+        self.assertEqual(indicators.last_valid(values), 3.0)
+        self.assertEqual(indicators.last_valid(values, offset=2), 1.0)
+        self.assertEqual(indicators.last_valid(np.array([np.nan, np.nan])), 0.0)
+
+    def test_panel_rows_match_single_series(self):
+        df = make_frame(periods=120)
+        close = df['close'].to_numpy()
+        panel = np.stack((close, close * 2.0))
+        np.testing.assert_allclose(indicators.rsi(panel, 14)[1], indicators.rsi(close * 2.0, 14), equal_nan=True)
+        np.testing.assert_allclose(indicators.ema(panel, 26)[0], indicators.ema(close, 26), equal_nan=True)
+
+    def test_analyze_panel_matches_single_symbol(self):
+        service = MarketDataService(engine='numpy')
+        frames = [make_frame(seed=1), make_frame(seed=2)]
+        frames[1]['timestamp'] = frames[0]['timestamp']
+        panel = {'timestamp': frames[0]['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64),
+                 'time': frames[0]['timestamp'].to_numpy()}
+        for name in ['open', 'high', 'low', 'close', 'volume']:
+            panel[name] = np.stack([f[name].to_numpy(dtype=np.float64) for f in frames])
+
+        contexts = service.analyze_panel(['A', 'B'], panel)
+        for symbol, df in zip(['A', 'B'], frames):
+            single = service.analyze_technicals(df)
+            for key in ['close', 'rsi', 'kdj_j', 'macd_hist', 'atr', 'obv', 'mfi', 'vwap']:
+                self.assertAlmostEqual(contexts[symbol][key], single[key], places=9, msg=key)
+            self.assertEqual(contexts[symbol]['pivots'], single['pivots'])
+
+    def test_lazy_context_matches_eager(self):
+        df = make_frame()
+        eager_service = MarketDataService(engine='numpy')
+        eager_service.lazy = False
+        eager = eager_service.analyze_technicals(df)
+        lazy = MarketDataService(engine='numpy').analyze_technicals(df)
+        self.assertEqual(list(lazy.keys()), list(eager.keys()))
+        for key in eager:
+            if key == 'pivot_pyramid':
+                np.testing.assert_array_equal(lazy[key], eager[key])
+            elif key != 'time':
+                self.assertEqual(lazy[key], eager[key], msg=key)
+
+    def test_lazy_context_computes_only_required(self):
+        service = MarketDataService(engine='numpy')
+        context = service.analyze_technicals(make_frame(), required=['trend_signal'])
+        self.assertTrue(context.is_computed('ma_slow'))
+        for key in ['rsi', 'pivots', 'technical_analysis_text', '_macd']:
+            self.assertFalse(context.is_computed(key), msg=key)
+        self.assertIsNone(context.peek('pivots'))
+
+        context['symbol'] = 'BTC-USDT'
+        self.assertIn('RSI', context['technical_analysis_text'])
+        self.assertTrue(context.is_computed('pivots'))
+
+    def test_dependency_graph_covers_resolvers(self):
+        from services.market_data_service import INDICATOR_DEPENDENCIES, resolve_dependencies
+        resolvers = MarketDataService(engine='numpy')._lazy_resolvers
+        self.assertEqual(set(resolvers), set(INDICATOR_DEPENDENCIES))
+        order = resolve_dependencies(['technical_analysis_text'])
+        self.assertLess(order.index('_macd'), order.index('macd_hist'))
+        self.assertEqual(order[-1], 'technical_analysis_text')
+
+    def test_numpy_engine_context(self):
+        context = MarketDataService(engine='numpy').analyze_technicals(make_frame())
+        self.assertTrue(0 <= context['rsi'] <= 100)
+        self.assertIn(context['trend_signal'], ['LONG', 'SHORT'])
+        self.assertIn('technical_analysis_text', context)
+
+
+if __name__ == '__main__':
+    unittest.main()
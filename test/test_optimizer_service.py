@@ -0,0 +1,105 @@
+# test/test_optimizer_service.py
+import unittest
+import sys
+import os
+import json
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils.shared_arrays import SharedArrays
+from services.optimizer_service import ParameterSweep, grid_candidates, random_candidates, load_results, sweep_fingerprint
+from services.backtest_service import BacktestService
+from strategies import MACrossStrategy, HarmonicStrategy
+from helpers import make_frame
+
+
+def sum_shared(manifest, name):
+    shared = SharedArrays.attach(manifest)
+    return float(shared[name].sum())
+
+
+class TestCandidates(unittest.TestCase):
+
+    def test_grid_skips_invalid(self):
+        grid = grid_candidates({'SMA_SHORT': [5, 30], 'SMA_LONG': [20, 40]})
+        self.assertEqual(grid, [{'SMA_LONG': 20, 'SMA_SHORT': 5}, {'SMA_LONG': 40, 'SMA_SHORT': 5},
+                                {'SMA_LONG': 40, 'SMA_SHORT': 30}])
+
+    def test_random_is_reproducible(self):
+        space = {'SMA_SHORT': [3, 5, 7, 9], 'SMA_LONG': [20, 25, 30], 'ZIGZAG_ORDER': [3, 4, 5]}
+        first = random_candidates(space, 10, seed=1)
+        self.assertEqual(first, random_candidates(space, 10, seed=1))
+        self.assertEqual(len({json.dumps(p, sort_keys=True) for p in first}), 10)
+
+
+class TestSharedArrays(unittest.TestCase):
+
+    def test_child_process_reads_without_copy(self):
+        data = {'a/close': np.arange(1000, dtype=np.float64), 'a/flag': np.array([1, 2, 3], dtype=np.int32)}
+        with SharedArrays.create(data) as shared:
+            np.testing.assert_array_equal(shared['a/flag'], [1, 2, 3])
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                self.assertEqual(pool.submit(sum_shared, shared.manifest, 'a/close').result(), data['a/close'].sum())
+
+
+class TestParameterSweep(unittest.TestCase):
+
+    def test_sweep_matches_backtest_and_resumes(self):
+        frames = {'BTC-USDT': make_frame(400, seed=1), 'ETH-USDT': make_frame(400, seed=2)}
+        sweep = ParameterSweep(frames, strategy_names=['MACrossStrategy', 'HarmonicStrategy'], workers=2)
+        space = sweep.prepare_space({'SMA_SHORT': [5, 7], 'SMA_LONG': [25], 'ZIGZAG_ORDER': [4], 'KDJ_LENGTH': [9, 14]})
+        self.assertNotIn('KDJ_LENGTH', space)  # 沒有策略使用
+
+        path = os.path.join(tempfile.mkdtemp(), "results.jsonl")
+        candidates = grid_candidates(space)
+        records = sweep.run(candidates, path)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(len(load_results(path)), 2)
+
+        # 與直接回測的結果相同
+        params = {'SMA_LONG': 25, 'SMA_SHORT': 5, 'ZIGZAG_ORDER': 4}
+        record = next(r for r in records if r['params'] == params)
+        backtest = BacktestService(
+            strategies=[MACrossStrategy(), HarmonicStrategy()], warmup=30,
+            strategy_params={'MACrossStrategy': {'ma_fast': 5, 'ma_slow': 25}, 'HarmonicStrategy': {'zigzag_order': 4}})
+        expected = backtest.combine({s: backtest.run_symbol(s, df) for s, df in frames.items()})
+        self.assertAlmostEqual(record['stats']['total_return'], expected['stats']['total_return'])
+        self.assertEqual(record['stats']['trades'], expected['stats']['trades'])
+
+        # 續跑: 加上一組新參數，只會執行新的那一組
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"key": "broken')  # 中斷時寫到一半的行
+        more = grid_candidates({'SMA_SHORT': [5, 7, 9], 'SMA_LONG': [25], 'ZIGZAG_ORDER': [4]})
+        records = sweep.run(more, path)
+        self.assertEqual(len(records), 3)
+        self.assertEqual(len(load_results(path)), 3)
+
+        # 不同的 K 線區間 / 策略 / 回測設定不能沿用同一個結果檔
+        shorter = {symbol: df.iloc[1:] for symbol, df in frames.items()}
+        for other in (ParameterSweep(shorter, strategy_names=['MACrossStrategy', 'HarmonicStrategy'], workers=1),
+                      ParameterSweep(frames, strategy_names=['MACrossStrategy'], workers=1),
+                      ParameterSweep(frames, strategy_names=['MACrossStrategy', 'HarmonicStrategy'], workers=1,
+                                     backtest_kwargs={'fee_rate': 0.01})):
+            with self.assertRaises(ValueError):
+                other.run(more, path)
+
+    def test_fingerprint_covers_data_and_settings(self):
+        frames = {'BTC-USDT': make_frame(400, seed=1)}
+        base = sweep_fingerprint(frames, ['MACrossStrategy'], {'warmup': 30})['fingerprint']
+        self.assertEqual(base, sweep_fingerprint(frames, ['MACrossStrategy'], {'warmup': 30})['fingerprint'])
+        changed = [
+            sweep_fingerprint({'ETH-USDT': frames['BTC-USDT']}, ['MACrossStrategy'], {'warmup': 30}),
+            sweep_fingerprint({'BTC-USDT': frames['BTC-USDT'].iloc[:-1]}, ['MACrossStrategy'], {'warmup': 30}),
+            sweep_fingerprint(frames, ['HarmonicStrategy'], {'warmup': 30}),
+            sweep_fingerprint(frames, ['MACrossStrategy'], {'warmup': 40}),
+        ]
+        self.assertTrue(all(header['fingerprint'] != base for header in changed))
+
+
+if __name__ == '__main__':
+    unittest.main()
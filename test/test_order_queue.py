@@ -0,0 +1,197 @@
+# test/test_order_queue.py
+import unittest
+import sys
+import os
+import time
+import ccxt
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils.order_queue import OrderQueue, OrderTicket, client_order_id, FILLED, FAILED
+from utils.position_book import PositionBook
+from helpers import FakeExecutor, SymbolStrategy, make_frame, make_trader
+
+
+class FakeOrderExchange:
+    """
+    測試用: 依序丟出 failures 中的例外 [(是否其實已送達, 例外)]
+    status='open' 時下單回報沒有成交資訊，需要 fetch_order 確認
+    """
+    def __init__(self, failures=(), delay=0.0, status='closed'):
+        self.failures = list(failures)
+        self.delay = delay
+        self.status = status
+        self.orders = []
+        self.calls = 0
+
+    def create_market_order(self, symbol, side, amount, params=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        cid = params['clientOrderId']
+        if any(order['clientOrderId'] == cid for order in self.orders):
+            raise ccxt.DuplicateOrderId("duplicate clientOrderID")
+        if self.failures:
+            delivered, error = self.failures.pop(0)
+            if delivered:
+                self._record(symbol, side, amount, cid)
+            raise error
+        return self._record(symbol, side, amount, cid)
+
+    def _record(self, symbol, side, amount, cid):
+        order = {'id': str(len(self.orders) + 1), 'clientOrderId': cid, 'symbol': symbol, 'side': side,
+                 'amount': amount, 'status': self.status}
+        if self.status == 'closed':
+            order.update(filled=amount, average=101.0)
+        self.orders.append(order)
+        return dict(order)
+
+    def fetch_open_orders(self, symbol):
+        return []
+
+    def fetch_closed_orders(self, symbol):
+        return [dict(order, status='closed', filled=order['amount'], average=101.0) for order in self.orders]
+
+    def fetch_order(self, id, symbol):
+        order = next(order for order in self.orders if order['id'] == id)
+        return dict(order, status='closed', filled=order['amount'], average=102.0)
+
+
+class TestOrderQueue(unittest.TestCase):
+
+    def make_queue(self, exchange, asynchronous=False):
+        book = PositionBook()
+        orders = OrderQueue(exchange, book, asynchronous=asynchronous, backoff=0.01, confirm_interval=0.01)
+        return orders, book
+
+    def test_client_order_id_is_deterministic(self):
+        cid = client_order_id('BTC-USDT', 'buy', 0.01, False, 1700000000000)
+        self.assertEqual(cid, client_order_id('BTC-USDT', 'buy', 0.01, False, 1700000000000))
+        self.assertNotEqual(cid, client_order_id('BTC-USDT', 'buy', 0.01, False, 1700000900000))
+        self.assertNotEqual(cid, client_order_id('BTC-USDT', 'sell', 0.01, True, 1700000000000))
+        self.assertLessEqual(len(cid), 40)  # BingX clientOrderID 上限
+
+    def test_enqueue_does_not_wait_for_exchange(self):
+        exchange = FakeOrderExchange(delay=0.3)
+        orders, book = self.make_queue(exchange, asynchronous=True)
+        start = time.perf_counter()
+        ticket = orders.submit(OrderTicket('BTC-USDT', 'buy', 0.01, price=100.0, intent=1))
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertTrue(orders.has_pending('BTC-USDT'))
+
+        self.assertTrue(ticket.wait(5))
+        self.assertEqual(ticket.status, FILLED)
+        self.assertEqual(book.get('BTC-USDT'), {'side': 'LONG', 'contracts': 0.01, 'entry_price': 101.0})
+        self.assertFalse(orders.has_pending('BTC-USDT'))
+        orders.stop()
+
+    def test_timeout_after_delivery_is_not_resent(self):
+        exchange = FakeOrderExchange(failures=[(True, ccxt.RequestTimeout("timeout"))])
+        orders, book = self.make_queue(exchange)
+        ticket = orders.submit(OrderTicket('BTC-USDT', 'buy', 0.01, intent=1))
+
+        self.assertEqual(ticket.status, FILLED)
+        self.assertEqual((exchange.calls, len(exchange.orders)), (1, 1))
+        self.assertEqual(book.get('BTC-USDT')['contracts'], 0.01)
+
+    def test_network_error_retries_with_same_id(self):
+        exchange = FakeOrderExchange(failures=[(False, ccxt.NetworkError("reset")), (False, ccxt.NetworkError("reset"))])
+        orders, book = self.make_queue(exchange)
+        ticket = orders.submit(OrderTicket('BTC-USDT', 'sell', 0.01, intent=1))
+
+        self.assertEqual(ticket.status, FILLED)
+        self.assertEqual(ticket.attempts, 3)
+        self.assertEqual(len(exchange.orders), 1)
+        self.assertEqual(exchange.orders[0]['clientOrderId'], ticket.client_order_id)
+
+    def test_same_intent_is_sent_once(self):
+        exchange = FakeOrderExchange()
+        orders, book = self.make_queue(exchange)
+        first = orders.submit(OrderTicket('BTC-USDT', 'buy', 0.01, intent=1))
+        second = orders.submit(OrderTicket('BTC-USDT', 'buy', 0.01, intent=1))
+
+        self.assertIs(first, second)
+        self.assertEqual(exchange.calls, 1)
+        self.assertEqual(book.get('BTC-USDT')['contracts'], 0.01)
+
+    def test_rejected_order_is_not_retried(self):
+        exchange = FakeOrderExchange(failures=[(False, ccxt.InsufficientFunds("margin"))])
+        orders, book = self.make_queue(exchange)
+        ticket = orders.submit(OrderTicket('BTC-USDT', 'buy', 0.01, intent=1))
+
+        self.assertEqual(ticket.status, FAILED)
+        self.assertEqual(exchange.calls, 1)
+        self.assertIsNone(book.get('BTC-USDT'))
+        # 失敗的訂單可以再送一次
+        self.assertEqual(orders.submit(OrderTicket('BTC-USDT', 'buy', 0.01, intent=1)).status, FILLED)
+
+    def test_fill_confirmed_later(self):
+        exchange = FakeOrderExchange(status='open')
+        orders, book = self.make_queue(exchange, asynchronous=True)
+        done = []
+        ticket = orders.submit(OrderTicket('ETH-USDT', 'buy', 0.5, price=100.0, intent=1, levels=(95.0, None)))
+        ticket.add_done_callback(done.append)
+
+        self.assertTrue(ticket.wait(5))
+        self.assertEqual(done, [ticket])
+        self.assertEqual(book.get('ETH-USDT')['entry_price'], 102.0)  # fetch_order 回報的成交均價
+        self.assertEqual(book.get_levels('ETH-USDT'), (95.0, None))
+        orders.stop()
+
+
+class TicketExecutor(FakeExecutor):
+    """測試用: 回傳尚未完成的 OrderTicket，由測試決定成交或失敗"""
+    def __init__(self):
+        super().__init__()
+        self.tickets = []
+
+    def place_order(self, side, symbol, amount, price=None, intent=None, levels=None):
+        ticket = OrderTicket(symbol, side, amount, price=price, intent=intent, levels=levels)
+        self.tickets.append(ticket)
+        return ticket
+
+
+class RecordingMail:
+    def __init__(self):
+        self.subjects = []
+        self.reports = []
+
+    def generate_entry_report(self, context):
+        self.reports.append(dict(context))
+        return "html"
+
+    def send_report(self, subject, html):
+        self.subjects.append(subject)
+
+
+class TestEntryNotification(unittest.TestCase):
+
+    def run_entry(self, finish):
+        mail = RecordingMail()
+        trader = make_trader(['AAA'], [SymbolStrategy({'AAA': 'LONG'})], executor=TicketExecutor(),
+                             report_service=mail, email_service=mail)
+        trader._process_symbols([('AAA', make_frame(50), None)])
+        ticket = trader.executor.tickets[0]
+        self.assertEqual(mail.subjects, [])  # 排入佇列時還不知道是否成交
+        finish(ticket)
+        return trader, mail
+
+    def test_report_sent_after_fill(self):
+        def fill(ticket):
+            ticket.filled, ticket.fill_price = ticket.amount, 101.5
+            ticket._finish(FILLED)
+
+        trader, mail = self.run_entry(fill)
+        self.assertEqual(len(mail.subjects), 1)
+        self.assertEqual(mail.reports[0]['price'], 101.5)
+        self.assertEqual(trader.logger.records[0][:2], ('BUY', 101.5))
+
+    def test_no_report_for_failed_order(self):
+        trader, mail = self.run_entry(lambda ticket: ticket._finish(FAILED, "rejected"))
+        self.assertEqual(mail.subjects, [])
+        self.assertEqual(trader.logger.records, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
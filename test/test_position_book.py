@@ -0,0 +1,176 @@
+# test/test_position_book.py
+import unittest
+from unittest import mock
+import sys
+import os
+import threading
+import time
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+import config
+from utils.position_book import PositionBook
+from utils.executor import BingXExecutor
+
+
+class FakeExchange:
+    """測試用: 記錄呼叫次數的交易所"""
+    def __init__(self, positions):
+        self.positions = positions
+        self.calls = []
+        self.orders = []
+
+    def fetch_positions(self, symbols=None):
+        self.calls.append(symbols)
+        return self.positions
+
+    def set_leverage(self, leverage, symbol):
+        pass
+
+    def create_market_order(self, symbol, side, amount, params=None):
+        self.orders.append((symbol, side, amount, params or {}))
+        return {'id': str(len(self.orders)), 'filled': amount, 'average': 101.0}
+
+
+class UnconfirmedExchange(FakeExchange):
+    """測試用: 下單回報沒有成交資訊，fetch_order 等到 release 才回報成交 (訂單停在未確認狀態)"""
+    def __init__(self, positions):
+        super().__init__(positions)
+        self.release = threading.Event()
+
+    def create_market_order(self, symbol, side, amount, params=None):
+        self.orders.append((symbol, side, amount, params or {}))
+        return {'id': str(len(self.orders)), 'status': 'open'}
+
+    def fetch_order(self, id, symbol):
+        self.release.wait(5)
+        return {'id': id, 'status': 'closed', 'filled': 0.01, 'average': 100.0}
+
+
+def position(symbol, side, contracts, entry=100.0):
+    return {'symbol': symbol, 'side': side, 'contracts': contracts, 'entryPrice': entry}
+
+
+class TestPositionBook(unittest.TestCase):
+
+    def test_fills(self):
+        book = PositionBook()
+        book.apply_fill('BTC-USDT', 'buy', 1.0, 100.0)
+        book.apply_fill('BTC-USDT', 'buy', 1.0, 110.0)
+        self.assertEqual(book.get('BTC-USDT'), {'side': 'LONG', 'contracts': 2.0, 'entry_price': 105.0})
+
+        book.apply_fill('BTC-USDT', 'sell', 0.5, 120.0)
+        self.assertEqual(book.get('BTC-USDT')['contracts'], 1.5)
+        # reduce_only 不會反向開倉
+        self.assertIsNone(book.apply_fill('BTC-USDT', 'sell', 3.0, 120.0, reduce_only=True))
+        self.assertIsNone(book.side('BTC-USDT'))
+
+        book.apply_fill('ETH-USDT', 'buy', 1.0, 10.0)
+        book.apply_fill('ETH-USDT', 'sell', 3.0, 12.0)
+        self.assertEqual(book.get('ETH-USDT'), {'side': 'SHORT', 'contracts': 2.0, 'entry_price': 12.0})
+
+    def test_load_reports_differences(self):
+        book = PositionBook()
+        self.assertEqual(book.load([position('BTC/USDT:USDT', 'long', 0.01)]), [])
+        self.assertEqual(book.get('BTC-USDT')['side'], 'LONG')
+
+        book.apply_fill('ETH-USDT', 'sell', 0.5, 2000.0)
+        diffs = book.load([position('BTC/USDT:USDT', 'long', 0.02), position('SOL/USDT:USDT', 'short', 0)])
+        self.assertEqual([d[0] for d in diffs], ['BTC-USDT', 'ETH-USDT'])
+        self.assertIsNone(book.get('ETH-USDT'))
+        self.assertIsNone(book.get('SOL-USDT'))  # 合約數為 0 不算倉位
+
+    def test_load_keeps_symbols_with_orders_in_flight(self):
+        book = PositionBook()
+        book.load([])
+        book.apply_fill('ETH-USDT', 'buy', 1.0, 10.0)
+        diffs = book.load([position('BTC/USDT:USDT', 'long', 0.01)], keep={'BTC-USDT', 'ETH-USDT'})
+        self.assertEqual(diffs, [])
+        self.assertIsNone(book.get('BTC-USDT'))
+        self.assertEqual(book.get('ETH-USDT')['contracts'], 1.0)
+
+        # 查詢期間才套用的成交也保留 (交易所資料可能比成交舊)
+        version = book.version
+        book.apply_fill('SOL-USDT', 'sell', 2.0, 5.0)
+        book.load([], since=version)
+        self.assertEqual(book.get('SOL-USDT')['contracts'], 2.0)
+
+
+class TestExecutorPositionBook(unittest.TestCase):
+
+    def make_executor(self, positions):
+        exchange = FakeExchange(positions)
+        with mock.patch.object(config, 'DRY_RUN', False):
+            executor = BingXExecutor(exchange, async_orders=False)
+        return executor, exchange
+
+    def test_one_bulk_call_for_all_symbols(self):
+        executor, exchange = self.make_executor([position('BTC/USDT:USDT', 'long', 0.003)])
+        sides = [executor.get_open_position(symbol) for symbol in ('BTC-USDT', 'ETH-USDT', 'SOL-USDT')]
+        self.assertEqual(sides, ['LONG', None, None])
+        self.assertEqual(exchange.calls, [None])
+
+        executor.sync_positions()
+        self.assertEqual(len(exchange.calls), 2)
+
+    def test_close_uses_actual_contracts(self):
+        executor, exchange = self.make_executor([position('BTC/USDT:USDT', 'short', 0.003)])
+        executor.sync_positions()
+        executor.close_position('BTC-USDT')
+
+        self.assertEqual(exchange.orders[0][:3], ('BTC/USDT', 'buy', 0.003))
+        self.assertTrue(exchange.orders[0][3]['reduceOnly'])
+        self.assertIsNone(executor.get_open_position('BTC-USDT'))
+        self.assertEqual(len(exchange.calls), 1)  # 平倉前後都不需要再查詢
+
+        # 開倉成交直接更新倉位簿
+        executor.place_order('buy', 'ETH-USDT', 0.5, price=100.0)
+        self.assertEqual(executor.positions.get('ETH-USDT'), {'side': 'LONG', 'contracts': 0.5, 'entry_price': 101.0})
+
+    def test_reload_does_not_double_count_unconfirmed_fill(self):
+        exchange = UnconfirmedExchange([])
+        with mock.patch.object(config, 'DRY_RUN', False):
+            executor = BingXExecutor(exchange, async_orders=True)
+        executor.orders.confirm_interval = 0.01
+        executor.sync_positions()
+        ticket = executor.place_order('buy', 'BTC-USDT', 0.01, price=100.0, intent=1)
+        deadline = time.time() + 5
+        while ticket.status != 'sent' and time.time() < deadline:
+            time.sleep(0.01)
+
+        # 交易所已成交，但訂單還沒確認: 對帳不能先把成交寫進倉位簿
+        exchange.positions = [position('BTC/USDT:USDT', 'long', 0.01)]
+        executor.sync_positions()
+        self.assertIsNone(executor.positions.get('BTC-USDT'))
+
+        exchange.release.set()
+        self.assertTrue(ticket.wait(5))
+        self.assertEqual(executor.positions.get('BTC-USDT')['contracts'], 0.01)
+        executor.sync_positions()
+        self.assertEqual(executor.positions.get('BTC-USDT')['contracts'], 0.01)
+        executor.shutdown()
+
+    def test_dry_run(self):
+        with mock.patch.object(config, 'DRY_RUN', True):
+            executor = BingXExecutor(None, async_orders=True)
+        self.assertTrue(executor.place_order('sell', 'BTC-USDT', 0.01, price=100.0).wait(5))
+        self.assertEqual(executor.get_open_position('BTC-USDT'), 'SHORT')
+        self.assertTrue(executor.close_position('BTC-USDT', price=90.0).wait(5))
+        self.assertIsNone(executor.get_open_position('BTC-USDT'))
+        executor.shutdown()
+
+    def test_reopened_position_with_same_size_is_closed(self):
+        with mock.patch.object(config, 'DRY_RUN', True):
+            executor = BingXExecutor(None, async_orders=False)
+        for close_ms in (1, 2):
+            # DRY_RUN 以參考價成交: 兩個倉位的方向、大小與開倉價都相同
+            executor.place_order('buy', 'BTC-USDT', 0.01, price=100.0, intent=close_ms)
+            ticket = executor.close_position('BTC-USDT', price=100.0)
+            self.assertTrue(ticket.ok)
+            self.assertIsNone(executor.get_open_position('BTC-USDT'))
+
+
+if __name__ == '__main__':
+    unittest.main()
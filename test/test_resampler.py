@@ -0,0 +1,60 @@
+# test/test_resampler.py
+import unittest
+import sys
+import os
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils.resampler import resample_ohlcv
+
+M15 = 15 * 60 * 1000
+H1 = 4 * M15
+
+
+def make_rows(start_ts, count):
+    rows = []
+    for i in range(count):
+        price = 100.0 + i
+        rows.append([start_ts + i * M15, price, price + 2, price - 2, price + 1, 1.0 + i])
+    return np.array(rows)
+
+
+class TestResampler(unittest.TestCase):
+
+    def test_full_buckets(self):
+        rows = make_rows(0, 8)
+        out = resample_ohlcv(rows, '15m', '1h')
+        self.assertEqual(out.shape, (2, 6))
+        np.testing.assert_array_equal(out[:, 0], [0, H1])
+        np.testing.assert_array_equal(out[0, 1:], [100, 105, 98, 104, 1 + 2 + 3 + 4])
+        np.testing.assert_array_equal(out[1, 1:], [104, 109, 102, 108, 5 + 6 + 7 + 8])
+
+    def test_leading_partial_bucket_dropped(self):
+        rows = make_rows(2 * M15, 6)  # 從 00:30 開始
+        out = resample_ohlcv(rows, '15m', '1h')
+        np.testing.assert_array_equal(out[:, 0], [H1])
+
+    def test_trailing_partial_bucket(self):
+        rows = make_rows(0, 6)  # 第二個小時只有 2 根
+        now_ms = 5 * M15 + 10
+        with_partial = resample_ohlcv(rows, '15m', '1h', now_ms=now_ms)
+        without_partial = resample_ohlcv(rows, '15m', '1h', now_ms=now_ms, include_partial=False)
+        self.assertEqual(len(with_partial), 2)
+        self.assertEqual(with_partial[-1, 4], rows[-1, 4])
+        self.assertEqual(len(without_partial), 1)
+
+    def test_last_bucket_still_forming(self):
+        rows = make_rows(0, 8)  # 最後一根 15m 尚未收盤
+        out = resample_ohlcv(rows, '15m', '1h', now_ms=7 * M15 + 10, include_partial=False)
+        self.assertEqual(len(out), 1)
+
+    def test_invalid_ratio(self):
+        with self.assertRaises(ValueError):
+            resample_ohlcv(make_rows(0, 4), '1h', '15m')
+
+
+if __name__ == '__main__':
+    unittest.main()
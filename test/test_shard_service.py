@@ -0,0 +1,162 @@
+# test/test_shard_service.py
+import unittest
+import sys
+import os
+import time
+import zlib
+from unittest import mock
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+import config
+from strategies.voting import SignalEnsemble
+from services.shard_service import ShardPool, shard_of, shard_symbols, portable_record, run_shard_cycle
+from utils.lazy_context import LazyContext
+from helpers import SymbolStrategy, make_trader
+
+
+def fake_shard(shard_id, symbols, conn, full_context=False):
+    """測試用的子程序: CRASH* 直接結束程序，SLOW* 從第二個循環開始卡住"""
+    while True:
+        cycle_id = conn.recv()
+        if cycle_id is None:
+            break
+        records = []
+        for symbol in symbols:
+            if symbol.startswith('CRASH'):
+                os._exit(1)
+            if symbol.startswith('SLOW') and cycle_id > 1:
+                time.sleep(30)
+            records.append({'symbol': symbol, 'decision': 1, 'pid': os.getpid(), 'context': {'close': 1.0}})
+        conn.send({'cycle': cycle_id, 'records': records, 'pending': [], 'stats': {}})
+
+
+def split_symbols(prefix, other, shards=2):
+    """找出一個 prefix 開頭、且與 other 不同分片的幣種"""
+    for i in range(100):
+        symbol = f"{prefix}{i}-USDT"
+        if all(shard_of(symbol, shards) != shard_of(s, shards) for s in other):
+            return symbol
+
+
+class FakeShards:
+    def __init__(self, result):
+        self.result = result
+
+    def run_cycle(self):
+        return self.result
+
+
+class TestSharding(unittest.TestCase):
+
+    def test_shard_of_is_stable(self):
+        symbols = [f"C{i}-USDT" for i in range(40)]
+        self.assertEqual(shard_of('BTC-USDT', 4), zlib.crc32(b'BTC-USDT') % 4)
+        groups = shard_symbols(symbols, 4)
+        self.assertEqual(sorted(s for group in groups for s in group), sorted(symbols))
+        for i, group in enumerate(groups):
+            self.assertTrue(all(shard_of(s, 4) == i for s in group))
+            # 保留 COIN_LIST 的順序
+            self.assertEqual(group, [s for s in symbols if s in group])
+
+    def test_portable_record_keeps_lazy_fields_lazy(self):
+        calls = []
+        context = LazyContext({'close': lambda ctx: 100.0, 'pivots': lambda ctx: calls.append('pivots') or [],
+                               'report': lambda ctx: calls.append('report') or 'text'})
+        context['symbol'] = 'AAA'
+        evaluation = {'context': context, 'signals': np.array([1], dtype=np.int8), 'close_ms': 1}
+
+        record = portable_record('AAA', evaluation, 1)
+        self.assertEqual(record['context'], {'symbol': 'AAA', 'close': 100.0})
+        self.assertEqual(calls, [])
+        self.assertEqual(record['decision'], 1)
+        self.assertEqual(record['close_ms'], 1)
+
+        # 進場報告需要完整的 context
+        record = portable_record('AAA', evaluation, 1, full_context=True)
+        self.assertEqual(record['context']['report'], 'text')
+
+
+class TestShardCycle(unittest.TestCase):
+
+    def make_service(self, symbols):
+        signals = {'AAA': 'LONG', 'BBB': 'SHORT', 'BAD': 'LONG'}
+        return make_trader(symbols, [SymbolStrategy(signals)], analysis_only=True, executor=None, trade_logger=None)
+
+    def test_symbol_error_does_not_stop_shard(self):
+        service = self.make_service(['AAA', 'BAD', 'BBB'])
+        reply = run_shard_cycle(service, 7)
+
+        self.assertEqual(reply['cycle'], 7)
+        self.assertEqual([(r['symbol'], r['decision']) for r in reply['records']], [('AAA', 1), ('BBB', -1)])
+        self.assertEqual(reply['stats']['SymbolStrategy']['calls'], 2)
+        # pivots 沒有被策略讀取，不會為了回傳而計算
+        self.assertNotIn('pivots', reply['records'][0]['context'])
+
+
+class TestCoordinator(unittest.TestCase):
+
+    def make_trader(self, records, stats=()):
+        shards = FakeShards({'records': records, 'pending': {'ZZZ'}, 'stats': list(stats)})
+        # 協調者不執行策略，決策由分片回傳 (策略 'A')
+        return make_trader(ensemble=SignalEnsemble(['A']), shards=shards)
+
+    @staticmethod
+    def record(symbol, decision):
+        return {'symbol': symbol, 'decision': decision, 'context': {'close': 10.0},
+                'signals': np.array([decision], dtype=np.int8), 'confidence': np.ones(1),
+                'levels': (np.full(1, np.nan), np.full(1, np.nan)), 'reasons': ['[A] test'], 'logs': [],
+                'close_ms': None}
+
+    def test_orders_and_risk_limit_in_coordinator(self):
+        stats = {'A': {'calls': 2, 'total_ms': 4.0, 'max_ms': 3.0, 'timeout': 0, 'error': 1, 'busy': 0}}
+        trader = self.make_trader([self.record('AAA', 1), self.record('BBB', -1), self.record('CCC', 0)],
+                                  stats=[stats, stats])
+        with mock.patch.object(config, 'MAX_OPEN_POSITIONS', 1, create=True):
+            trader._run_cycle_sharded()
+
+        self.assertEqual(trader.executor.orders, [('buy', 'AAA')])
+        self.assertEqual(trader._pending, {'ZZZ'})
+        merged = trader.strategy_runner.end_cycle()['A']
+        self.assertEqual((merged['calls'], merged['total_ms'], merged['max_ms'], merged['error']), (4, 8.0, 3.0, 2))
+
+
+class TestShardPool(unittest.TestCase):
+
+    def test_crashed_shard_is_isolated_and_restarted(self):
+        healthy = ['AAA-USDT', 'BBB-USDT']
+        healthy = [s for s in healthy if shard_of(s, 2) == shard_of(healthy[0], 2)]
+        crash = split_symbols('CRASH', healthy)
+        pool = ShardPool(healthy + [crash], 2, timeout=60, target=fake_shard)
+        try:
+            result = pool.run_cycle()
+            self.assertEqual([r['symbol'] for r in result['records']], healthy)
+            self.assertEqual(result['pending'], {crash})
+
+            crashed = next(shard for shard in pool.shards if crash in shard.symbols)
+            self.assertEqual(crashed.restarts, 1)
+            self.assertTrue(crashed.process.is_alive())
+            # 其他分片的子程序不受影響
+            pids = {r['pid'] for r in result['records']}
+            self.assertEqual(pids, {r['pid'] for r in pool.run_cycle()['records']})
+        finally:
+            pool.close()
+
+    def test_slow_shard_times_out(self):
+        slow = split_symbols('SLOW', ['AAA-USDT'])
+        pool = ShardPool(['AAA-USDT', slow], 2, timeout=60, target=fake_shard)
+        try:
+            self.assertEqual(len(pool.run_cycle()['records']), 2)  # 第一個循環包含子程序啟動
+            pool.timeout = 1
+            result = pool.run_cycle()
+            self.assertEqual([r['symbol'] for r in result['records']], ['AAA-USDT'])
+            self.assertEqual(result['pending'], {slow})
+        finally:
+            pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
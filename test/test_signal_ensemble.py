@@ -0,0 +1,121 @@
+# test/test_signal_ensemble.py
+import unittest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from strategies import MACrossStrategy, HarmonicStrategy
+from strategies.voting import SignalEnsemble, combine_votes
+from services.backtest_service import BacktestService
+from helpers import SymbolStrategy, make_frame, make_trader
+
+
+class LongA(SymbolStrategy):
+    pass
+
+
+class ShortB(SymbolStrategy):
+    pass
+
+
+class CountingEnsemble(SignalEnsemble):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shapes = []
+
+    def decide(self, signals, confidence=None):
+        self.shapes.append(np.shape(signals))
+        return super().decide(signals, confidence)
+
+
+class TestSignalEnsemble(unittest.TestCase):
+
+    def setUp(self):
+        self.names = ['A', 'B', 'C']
+        rng = np.random.default_rng(0)
+        self.signals = rng.integers(-1, 2, size=(50, 3)).astype(np.int8)
+
+    def test_veto_matches_combine_votes(self):
+        ensemble = SignalEnsemble(self.names)
+        np.testing.assert_array_equal(ensemble.decide(self.signals), combine_votes(self.signals.T))
+        # 回測的 (T, K) 與即時的 (S, K) 是同一個呼叫
+        self.assertEqual(ensemble.decide(self.signals[:1]).shape, (1,))
+
+    def test_zero_weight_does_not_vote(self):
+        ensemble = SignalEnsemble(self.names, weights={'C': 0})
+        np.testing.assert_array_equal(ensemble.decide([[1, 0, -1], [0, 0, -1], [1, -1, 1]]), [1, 0, 0])
+
+    def test_weighted_threshold_and_confidence(self):
+        ensemble = SignalEnsemble(self.names, mode='weighted', weights={'A': 2}, threshold=0.5)
+        signals = [[1, -1, 0], [1, 1, -1], [-1, 1, 1], [1, 0, 0]]
+        # score = (2a + b + c) / 4
+        np.testing.assert_allclose(ensemble.scores(signals), [0.25, 0.5, 0.0, 0.5])
+        np.testing.assert_array_equal(ensemble.decide(signals), [0, 1, 0, 1])
+
+        confidence = [[1, 1, 1], [1, 1, 1], [1, 1, 1], [0.5, 1, 1]]
+        np.testing.assert_array_equal(ensemble.decide(signals, confidence), [0, 1, 0, 0])
+        # NaN 視為沒有提供信心 (= 1)
+        np.testing.assert_array_equal(ensemble.decide(signals, np.full((4, 3), np.nan)), [0, 1, 0, 1])
+
+    def test_quorum(self):
+        ensemble = SignalEnsemble(self.names, mode='quorum', quorum=2)
+        np.testing.assert_array_equal(
+            ensemble.decide([[1, 1, 0], [1, 1, -1], [1, 0, 0], [-1, -1, -1], [1, -1, 0]]), [1, 1, 0, -1, 0])
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            SignalEnsemble(self.names, mode='majority')
+        with self.assertRaises(ValueError):
+            SignalEnsemble(self.names, weights={'A': -1})
+        with self.assertRaises(ValueError):
+            SignalEnsemble(self.names).decide([[1, 0]])
+
+
+class TestEnsembleInBacktest(unittest.TestCase):
+
+    def test_weighted_vectorized_matches_event(self):
+        """加權模式 (含諧波型態分數作為信心) 在兩種回測模式下結果相同"""
+        df = make_frame(260, seed=14)
+        names = ['MACrossStrategy', 'HarmonicStrategy']
+        ensemble = SignalEnsemble(names, mode='weighted', weights={'HarmonicStrategy': 3}, threshold=0.4)
+        kwargs = dict(stop_loss_pct=0.01, take_profit_pct=0.02, ensemble=ensemble)
+
+        vectorized = BacktestService([MACrossStrategy(), HarmonicStrategy()], **kwargs).run_symbol('ETH', df)
+        event = BacktestService([MACrossStrategy(), HarmonicStrategy()], mode='event', **kwargs).run_symbol('ETH', df)
+
+        self.assertGreater(len(vectorized['trades']), 0)
+        pd.testing.assert_frame_equal(vectorized['trades'], event['trades'])
+        pd.testing.assert_series_equal(vectorized['equity'], event['equity'])
+
+
+class TestEnsembleInTradingService(unittest.TestCase):
+
+    def make_trader(self):
+        signals = {'AAA': 'LONG', 'BBB': 'SHORT', 'CCC': 'LONG'}
+        strategies = [LongA(signals), ShortB({'AAA': 'LONG', 'BBB': 'LONG', 'CCC': 'SHORT'})]
+        return make_trader(strategies=strategies, ensemble=CountingEnsemble(['LongA', 'ShortB']))
+
+    def test_one_decision_call_per_cycle(self):
+        trader = self.make_trader()
+        frame = make_frame(50)
+        trader._process_symbols([(symbol, frame, None) for symbol in ('AAA', 'BBB', 'CCC')])
+
+        self.assertEqual(trader.ensemble.shapes, [(3, 2)])
+        # AAA 兩個策略都看多，BBB / CCC 多空衝突觀望
+        self.assertEqual(trader.executor.orders, [('buy', 'AAA')])
+
+    def test_conflict_reason(self):
+        trader = self.make_trader()
+        signal, reason, logs = trader._get_combined_signal(None, {'symbol': 'BBB'})
+        self.assertEqual(signal, "NEUTRAL")
+        self.assertIn("衝突", reason)
+        self.assertEqual(len(logs), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
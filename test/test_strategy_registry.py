@@ -0,0 +1,75 @@
+# test/test_strategy_registry.py
+import unittest
+import sys
+import os
+import subprocess
+import tempfile
+import textwrap
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from strategies import STRATEGY_MAP, BaseStrategy
+from strategies.registry import StrategyRegistry
+
+
+def write_module(name, body):
+    """在暫存目錄建立一個策略模組並加入 sys.path"""
+    folder = tempfile.mkdtemp()
+    with open(os.path.join(folder, f"{name}.py"), "w", encoding="utf-8") as f:
+        f.write(textwrap.dedent(body))
+    sys.path.insert(0, folder)
+
+
+class TestStrategyRegistry(unittest.TestCase):
+
+    def test_imports_only_on_access(self):
+        write_module("demo_lazy_strategy", """
+            from strategies.base_strategy import BaseStrategy
+
+            class DemoStrategy(BaseStrategy):
+                def analyze(self, df, context):
+                    return {"signal": "NEUTRAL", "reason": "", "stop_loss": None, "take_profit": None}
+        """)
+        registry = StrategyRegistry({"DemoStrategy": "demo_lazy_strategy:DemoStrategy"})
+        self.assertIn("DemoStrategy", registry)
+        self.assertNotIn("demo_lazy_strategy", sys.modules)
+        self.assertFalse(registry.is_loaded("DemoStrategy"))
+
+        strategies = registry.create(["DemoStrategy", "MissingStrategy"])
+        self.assertEqual([s.__class__.__name__ for s in strategies], ["DemoStrategy"])
+        self.assertIn("demo_lazy_strategy", sys.modules)
+        self.assertIn("DemoStrategy", registry.import_times)
+
+    def test_dotted_path_and_errors(self):
+        write_module("demo_bad_strategy", """
+            class NotAStrategy:
+                pass
+        """)
+        registry = StrategyRegistry()
+        self.assertTrue(issubclass(registry["strategies.ma_cross_strategy.MACrossStrategy"], BaseStrategy))
+        with self.assertRaises(TypeError):
+            registry["demo_bad_strategy:NotAStrategy"]
+        with self.assertRaises(KeyError):
+            registry["Unknown"]
+        self.assertIsNone(registry.get("no_such_module:Strategy"))  # 載入失敗回傳預設值
+
+    def test_package_import_is_lazy(self):
+        code = ("import sys; import strategies; "
+                "assert 'strategies.harmonic_strategy' not in sys.modules; "
+                "strategies.STRATEGY_MAP.create(['MACrossStrategy']); "
+                "assert 'strategies.harmonic_strategy' not in sys.modules; "
+                "from strategies import HarmonicStrategy; "
+                "assert 'strategies.harmonic_strategy' in sys.modules")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([project_root] + sys.path))
+        result = subprocess.run([sys.executable, "-c", code], cwd=project_root, env=env,
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_builtin_names(self):
+        self.assertTrue({"MACrossStrategy", "HarmonicStrategy"} <= set(STRATEGY_MAP))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# test/test_strategy_runner.py
+import unittest
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+from unittest import mock
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+import config
+from utils.strategy_runner import StrategyRunner, OK, TIMEOUT, ERROR, BUSY
+from strategies.base_strategy import BaseStrategy
+from helpers import make_trader
+
+
+class FixedStrategy(BaseStrategy):
+    def __init__(self, signal="LONG", delay=0.0, fail=False):
+        self.signal = signal
+        self.delay = delay
+        self.fail = fail
+
+    def analyze(self, df, context):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise ValueError("boom")
+        return {"signal": self.signal, "reason": "test", "stop_loss": None, "take_profit": None}
+
+
+class SlowStrategy(FixedStrategy):
+    pass
+
+
+class BrokenStrategy(FixedStrategy):
+    pass
+
+
+class BlockingStrategy(FixedStrategy):
+    """測試用: 一直卡住直到 release 被設定"""
+    def __init__(self):
+        super().__init__("SHORT")
+        self.release = threading.Event()
+
+    def analyze(self, df, context):
+        self.release.wait(5)
+        return super().analyze(df, context)
+
+
+class TestStrategyRunner(unittest.TestCase):
+
+    def test_inline_records_latency_and_errors(self):
+        runner = StrategyRunner([FixedStrategy(), BrokenStrategy(fail=True)])
+        runner.start_cycle()
+        outcomes = runner.evaluate(None, {})
+        self.assertEqual([o[2] for o in outcomes], [OK, ERROR])
+        stats = runner.end_cycle()
+        self.assertEqual(stats['FixedStrategy']['calls'], 1)
+        self.assertEqual(stats['BrokenStrategy']['error'], 1)
+        self.assertEqual(len(runner.history), 1)
+
+    def test_timeout_abstains_without_blocking(self):
+        slow = BlockingStrategy()
+        runner = StrategyRunner([FixedStrategy(), slow], workers=2, timeout=0.05)
+
+        start = time.perf_counter()
+        outcomes = runner.evaluate(None, {})
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual([o[2] for o in outcomes], [OK, TIMEOUT])
+
+        # 逾時的策略仍在執行，下一次直接棄權，不會堆積
+        self.assertEqual(runner.evaluate(None, {})[1][2], BUSY)
+        slow.release.set()
+
+        # 棄權只計入 busy，不算呼叫，也不拉低平均耗時
+        stats = runner.end_cycle()['BlockingStrategy']
+        self.assertEqual((stats['calls'], stats['busy']), (1, 1))
+        self.assertGreaterEqual(stats['avg_ms'], 50)
+        runner.shutdown()
+
+    def test_per_strategy_timeout_and_log(self):
+        path = os.path.join(tempfile.mkdtemp(), "latency.jsonl")
+        runner = StrategyRunner([FixedStrategy(), SlowStrategy(delay=0.1)], workers=2, timeout=0.01,
+                                timeouts={'SlowStrategy': 1.0}, log_path=path)
+        runner.start_cycle()
+        outcomes = runner.evaluate(None, {})
+        self.assertEqual([o[2] for o in outcomes], [OK, OK])
+        self.assertGreaterEqual(outcomes[1][3], 100)
+        runner.end_cycle()
+        with open(path, encoding='utf-8') as f:
+            record = json.loads(f.readline())
+        self.assertIn('SlowStrategy', record['strategies'])
+        runner.shutdown()
+
+
+class TestCombinedSignalWithRunner(unittest.TestCase):
+
+    def test_timed_out_strategy_does_not_vote(self):
+        with mock.patch.object(config, 'STRATEGY_EXECUTOR_WORKERS', 2), \
+                mock.patch.object(config, 'STRATEGY_TIMEOUT_SEC', 0.05), \
+                mock.patch.object(config, 'STRATEGY_TIMEOUTS', {}):
+            trader = make_trader(strategies=[FixedStrategy("LONG"), SlowStrategy("SHORT", delay=0.5)])
+        signal, reason, logs = trader._get_combined_signal(None, {})
+        self.assertEqual(signal, "LONG")  # 看空的策略逾時棄權，沒有造成衝突
+        self.assertTrue(any("TIMEOUT" in log for log in logs))
+        trader.strategy_runner.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# test/test_strategy_series.py
+import unittest
+import sys
+import os
+import io
+import contextlib
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from services.market_data_service import MarketDataService
+from strategies import MACrossStrategy, HarmonicStrategy
+from strategies.base_strategy import BaseStrategy, SIGNAL_CODES
+from helpers import make_frame
+
+
+def live_signals(strategy, df, start):
+    """逐根 K 線重跑即時流程 (analyze_technicals + analyze)"""
+    service = MarketDataService(engine='numpy')
+    service.cache = None
+    results = {}
+    for t in range(start, len(df)):
+        window = df.iloc[:t + 1]
+        with contextlib.redirect_stdout(io.StringIO()):  # 資料不足的警告
+            context = service.analyze_technicals(window)
+        results[t] = strategy.analyze(window, context)
+    return results
+
+
+class TestStrategySeries(unittest.TestCase):
+
+    def assert_matches_live(self, strategy, df, start=30):
+        series = strategy.analyze_series(df)
+        for name in ('signal', 'stop_loss', 'take_profit'):
+            self.assertEqual(len(series[name]), len(df))
+        for t, live in live_signals(strategy, df, start).items():
+            self.assertEqual(series['signal'][t], SIGNAL_CODES[live['signal']], t)
+            for name in ('stop_loss', 'take_profit'):
+                expected = np.nan if live[name] is None else live[name]
+                np.testing.assert_allclose(series[name][t], expected, err_msg=f"{name} @ {t}")
+        return series
+
+    def test_ma_cross_matches_live(self):
+        series = self.assert_matches_live(MACrossStrategy(), make_frame(260))
+        self.assertTrue(set(np.unique(series['signal'])) <= {1, -1})
+
+    def test_harmonic_matches_live(self):
+        series = self.assert_matches_live(HarmonicStrategy(), make_frame(260))
+        self.assertTrue((series['signal'] != 0).any())  # 這組資料中有出現型態
+
+    def test_params_override(self):
+        df = make_frame(260)
+        default = MACrossStrategy().analyze_series(df)['signal']
+        faster = MACrossStrategy().analyze_series(df, params={'ma_fast': 3, 'ma_slow': 10})['signal']
+        self.assertFalse(np.array_equal(default, faster))
+
+    def test_default_not_implemented(self):
+        class LiveOnly(BaseStrategy):
+            def analyze(self, df, context):
+                return {"signal": "NEUTRAL", "reason": "", "stop_loss": None, "take_profit": None}
+
+        self.assertFalse(LiveOnly().supports_series())
+        self.assertTrue(MACrossStrategy().supports_series())
+        with self.assertRaises(NotImplementedError):
+            LiveOnly().analyze_series(make_frame(periods=40))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# test/test_zigzag.py
+import unittest
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.append(project_root)
+
+from utils.zigzag import (ZigZagIdentifier, ZigZagTracker, PivotBuffer, enforce_alternation,
+                          find_pivot_pyramid, rolling_last_pivots, HIGH, LOW, TYPE_NAMES)
+
+
+def make_bars(periods=250, seed=3):
+    # 價格取整數，刻意製造相同高低點 (測試嚴格極值條件)
+    rng = np.random.default_rng(seed)
+    close = np.round(np.cumsum(rng.standard_normal(periods) * 3) + 100)
+    highs = close + rng.integers(0, 3, periods)
+    lows = close - rng.integers(0, 3, periods)
+    times = pd.date_range('2025-01-01', periods=periods, freq='15min').to_numpy()
+    return highs, lows, times
+
+
+class TestAlternation(unittest.TestCase):
+
+    def test_keeps_most_extreme_of_same_type(self):
+        pivots = [
+            {'index': 1, 'price': 10.0, 'type': 'HIGH'},
+            {'index': 3, 'price': 12.0, 'type': 'HIGH'},
+            {'index': 5, 'price': 8.0, 'type': 'LOW'},
+            {'index': 7, 'price': 9.0, 'type': 'LOW'},
+            {'index': 9, 'price': 11.0, 'type': 'HIGH'},
+        ]
+        result = enforce_alternation(pivots)
+        self.assertEqual([p['index'] for p in result], [3, 5, 9])
+
+    def test_batch_output_alternates(self):
+        highs, lows, times = make_bars()
+        pivots = ZigZagIdentifier(order=5).get_last_n_pivots_from_arrays(highs, lows, times, n=50)
+        types = [p['type'] for p in pivots]
+        self.assertTrue(all(a != b for a, b in zip(types, types[1:])))
+
+
+class TestZigZagTracker(unittest.TestCase):
+
+    def test_matches_batch_at_every_bar(self):
+        highs, lows, times = make_bars()
+        identifier = ZigZagIdentifier(order=5)
+        tracker = ZigZagTracker(order=5, capacity=16)
+        for t in range(len(highs)):
+            expected = identifier.get_last_n_pivots_from_arrays(highs[:t + 1], lows[:t + 1], times[:t + 1], n=5)
+            # 形成中的 K 線不寫入狀態，結果仍要相同
+            self.assertEqual(tracker.get_last_n_pivots(5, forming=(highs[t], lows[t], times[t])), expected, t)
+            tracker.update(highs[t], lows[t], times[t])
+            self.assertEqual(tracker.get_last_n_pivots(5), expected, t)
+
+    def test_confirmed_only(self):
+        highs, lows, times = make_bars(periods=80)
+        tracker = ZigZagTracker(order=5)
+        for h, l, t in zip(highs, lows, times):
+            tracker.update(h, l, t)
+        confirmed = tracker.get_last_n_pivots(50, include_tentative=False)
+        self.assertTrue(all(p['index'] <= tracker.count - 1 - 5 for p in confirmed))
+
+
+class TestPivotPyramid(unittest.TestCase):
+
+    def test_each_order_matches_identifier(self):
+        highs, lows, times = make_bars(periods=400, seed=11)
+        orders = [3, 5, 8, 13]
+        pyramid = find_pivot_pyramid(highs, lows, orders)
+        for order in orders:
+            expected = ZigZagIdentifier(order=order).get_last_n_pivots_from_arrays(highs, lows, times, n=len(highs))
+            level = pyramid[pyramid['order'] == order]
+            actual = [(int(p['index']), float(p['price']), TYPE_NAMES[int(p['type'])]) for p in level]
+            self.assertEqual(actual, [(p['index'], p['price'], p['type']) for p in expected], order)
+
+    def test_empty_and_short_input(self):
+        self.assertEqual(len(find_pivot_pyramid([], [], [3])), 0)
+        self.assertEqual(len(find_pivot_pyramid([1.0, 2.0], [0.5, 1.5], [3])), 0)
+
+
+class TestRollingLastPivots(unittest.TestCase):
+
+    def test_matches_batch_at_every_bar(self):
+        highs, lows, times = make_bars(periods=150, seed=5)
+        for order in (2, 5):
+            identifier = ZigZagIdentifier(order=order)
+            prices, types, indices = rolling_last_pivots(highs, lows, order)
+            for t in range(len(highs)):
+                expected = identifier.get_last_n_pivots_from_arrays(highs[:t + 1], lows[:t + 1], times[:t + 1], n=5)
+                actual = [(int(indices[t, j]), float(prices[t, j]), TYPE_NAMES[int(types[t, j])])
+                          for j in range(5) if types[t, j] != 0]
+                self.assertEqual(actual, [(p['index'], p['price'], p['type']) for p in expected], (order, t))
+
+
+class TestPivotBuffer(unittest.TestCase):
+
+    def test_ring_overwrites_oldest(self):
+        buffer = PivotBuffer(capacity=3)
+        for i in range(5):
+            buffer.append(i, float(i), HIGH if i % 2 else LOW, i)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(list(buffer.last()['index']), [2, 3, 4])
+        buffer.replace_last(9, 1.0, LOW, 9)
+        self.assertEqual(int(buffer.last(1)['index'][0]), 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import time
+import ccxt.async_support as ccxt_async
+import config
+
+
+class TokenBucket:
+    """
+    非同步 Token Bucket 速率限制器
+    所有請求共用同一個額度，每個請求依權重 (weight) 扣除 token
+    """
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)          # 每秒補充的 token 數
+        self.capacity = float(capacity)  # 最多可累積的 token (允許的瞬間併發量)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, cost=1):
+        # 超過容量的權重永遠等不到足夠的 token (且會一直佔住 Lock，卡死後面所有請求)
+        if cost > self.capacity:
+            raise ValueError(f"請求權重 {cost} 超過 Token Bucket 容量 {self.capacity:g} (RATE_LIMIT_BURST)")
+        # 用 Lock 讓等待者依序取得額度 (先到先服務)
+        async with self._lock:
+            self._refill()
+            while self.tokens < cost:
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= cost
+
+
+class AsyncBingXLoader:
+    """
+    非同步抓取模式 (ccxt.async_support)
+    - 與同步 BingXLoader 共用 K 線快取與本地資料庫，只把網路請求改為併發
+    - 所有請求共用同一個 TokenBucket，依 config.RATE_LIMIT_WEIGHTS 扣除額度
+    用法:
+        async with AsyncBingXLoader(loader, executor) as aloader:
+            df = await aloader.fetch_data('15m', 'BTC-USDT', limit=200)
+    """
+    def __init__(self, loader, executor=None):
+        self.loader = loader
+        self.executor = executor
+        self.weights = getattr(config, 'RATE_LIMIT_WEIGHTS', {})
+        self.bucket = TokenBucket(
+            rate=getattr(config, 'RATE_LIMIT_PER_SEC', 10),
+            capacity=getattr(config, 'RATE_LIMIT_BURST', 20)
+        )
+        too_heavy = {method: weight for method, weight in self.weights.items() if weight > self.bucket.capacity}
+        if too_heavy:
+            raise ValueError(f"RATE_LIMIT_WEIGHTS 超過 RATE_LIMIT_BURST ({self.bucket.capacity:g}): {too_heavy}")
+        self.exchange = None
+
+    async def __aenter__(self):
+        sync_exchange = self.loader.exchange
+        # 速率限制由 TokenBucket 統一控管，關閉 ccxt 內建的逐一排隊限速
+        self.exchange = ccxt_async.bingx({
+            'enableRateLimit': False,
+            'apiKey': sync_exchange.apiKey,
+            'secret': sync_exchange.secret,
+        })
+        # 沿用同步物件已載入的市場資訊，避免每輪重新 load_markets
+        if sync_exchange.markets:
+            self.exchange.set_markets(sync_exchange.markets, sync_exchange.currencies)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.exchange.close()
+
+    async def _call(self, method, *args, **kwargs):
+        await self.bucket.acquire(self.weights.get(method, 1))
+        return await getattr(self.exchange, method)(*args, **kwargs)
+
+    async def fetch_data(self, timeframe, symbol, limit=100):
+        """非同步版 BingXLoader.fetch_data (同樣只抓增量)"""
+        try:
+            since, fetch_limit = self.loader._plan_fetch(symbol, timeframe, limit)
+            ohlcv = await self._call('fetch_ohlcv', symbol.replace('-', '/'), timeframe, since=since, limit=fetch_limit)
+
+            if not ohlcv:
+                print(f"⚠️ {symbol} 獲取數據為空")
+                return None
+
+            return self.loader._merge_fetched(symbol, timeframe, ohlcv, limit, since)
+        except Exception as e:
+            print(f"❌ {symbol} 數據獲取失敗: {e}")
+            return None
+
+    async def fetch_position(self, symbol):
+        """
+        非同步版 BingXExecutor.get_open_position
+        倉位由 Executor 的倉位簿提供 (每個循環以一次 fetch_positions() 載入)，不再逐一幣種查詢
+        """
+        return self.executor.get_open_position(symbol) if self.executor else None
+
+    async def fetch_symbol(self, symbol, timeframe, limit=100):
+        """同時抓取單一幣種的 K 線與倉位"""
+        df, position = await asyncio.gather(
+            self.fetch_data(timeframe, symbol, limit=limit),
+            self.fetch_position(symbol)
+        )
+        return symbol, df, position
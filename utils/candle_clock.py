@@ -0,0 +1,110 @@
+import time
+import ccxt
+
+
+class CandleClock:
+    """
+    以交易所時鐘對齊 K 線收盤的排程器 (poll 模式的交易檢查)
+    - 以 exchange.fetch_time() 估計本機與交易所的時間差 (扣掉一半往返時間)，每 sync_interval 秒重新校正
+    - 每根 K 線收盤後再等 delay 秒 (交易所產生 K 線的延遲) 才觸發
+    - 觸發後還有幣種拿不到新 K 線時，每 retry_delay 秒重試，最多 max_retries 次
+    - K 線以 UTC 整點切齊 (適用於 1d 以下的時框)
+    """
+    def __init__(self, exchange, timeframe, delay=3.0, sync_interval=3600, retry_delay=5.0, max_retries=3):
+        """
+        :param exchange: ccxt 交易所物件 (None 代表直接使用本機時間)
+        :param timeframe: 時框 (例如 '15m')
+        :param delay: 收盤後等待的秒數
+        :param sync_interval: 重新校正時間差的間隔 (秒)，0 代表不校正
+        """
+        self.exchange = exchange
+        self.timeframe = timeframe
+        self.timeframe_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+        self.delay_ms = int(delay * 1000)
+        self.sync_interval = sync_interval
+        self.retry_delay_ms = int(retry_delay * 1000)
+        self.max_retries = max_retries
+
+        self.offset_ms = 0          # 交易所時間 - 本機時間
+        self._synced_at = None      # 上次校正的本機時間 (秒)
+        self._fired = None          # 已完成的收盤時間 (ms)
+        self._retry_close = None    # 重試中的收盤時間 (ms)，重試次數只屬於這根 K 線
+        self._retry_at = None       # 下次重試的交易所時間 (ms)
+        self._retries = 0
+
+    # ------------------------------------------------------------------
+    # 時鐘
+    # ------------------------------------------------------------------
+    def sync(self):
+        """校正本機與交易所的時間差 (失敗時沿用上次的結果)"""
+        self._synced_at = time.time()
+        if self.exchange is None or not self.exchange.has.get('fetchTime'):
+            return self.offset_ms
+        try:
+            sent = time.time() * 1000
+            server_ms = self.exchange.fetch_time()
+            received = time.time() * 1000
+            self.offset_ms = int(server_ms - (sent + received) / 2)
+        except Exception as e:
+            print(f"⚠️ 交易所時間校正失敗，沿用時間差 {self.offset_ms} ms: {e}")
+        return self.offset_ms
+
+    def now_ms(self):
+        """交易所目前時間 (ms)"""
+        if self.sync_interval and (self._synced_at is None or time.time() - self._synced_at >= self.sync_interval):
+            self.sync()
+        return int(time.time() * 1000) + self.offset_ms
+
+    def last_close_ms(self, now_ms=None):
+        """最近一根已收盤 K 線的收盤時間 (= 形成中 K 線的開盤時間)"""
+        now_ms = self.now_ms() if now_ms is None else now_ms
+        return now_ms // self.timeframe_ms * self.timeframe_ms
+
+    def is_closed(self, open_ms, now_ms=None):
+        """開盤時間為 open_ms 的 K 線是否已收盤"""
+        now_ms = self.now_ms() if now_ms is None else now_ms
+        return open_ms + self.timeframe_ms <= now_ms
+
+    # ------------------------------------------------------------------
+    # 排程
+    # ------------------------------------------------------------------
+    def due(self, now_ms=None):
+        """
+        是否該執行交易檢查
+        :return: 這次要處理的收盤時間 (ms)，還不到時間則為 None
+        """
+        now_ms = self.now_ms() if now_ms is None else now_ms
+        close_ms = self.last_close_ms(now_ms - self.delay_ms)
+        if close_ms == self._fired:
+            return None
+        if close_ms == self._retry_close and now_ms < self._retry_at:
+            return None  # 同一根 K 線的重試，還不到時間
+        # 新的收盤 (包含上一根還在重試時): 上一根的重試狀態在 done() 時重設
+        return close_ms
+
+    def done(self, close_ms, complete=True, now_ms=None):
+        """
+        回報這次的執行結果
+        :param complete: 所有幣種都已拿到 close_ms 的 K 線；False 時稍後重試
+        """
+        now_ms = self.now_ms() if now_ms is None else now_ms
+        if close_ms != self._retry_close:
+            # 新的 K 線不沿用上一根 (被取代、尚未重試完) 的重試次數
+            self._retry_close, self._retry_at, self._retries = close_ms, None, 0
+        if complete or self._retries >= self.max_retries:
+            if not complete:
+                print(f"⚠️ 重試 {self._retries} 次仍有幣種沒有新 K 線，等待下一根收盤")
+            self._fired, self._retry_close, self._retry_at, self._retries = close_ms, None, None, 0
+        else:
+            self._retries += 1
+            self._retry_at = now_ms + self.retry_delay_ms
+
+    def seconds_until_due(self, now_ms=None):
+        """距離下一次觸發 (收盤 + delay 或重試) 的秒數"""
+        now_ms = self.now_ms() if now_ms is None else now_ms
+        if self.due(now_ms) is not None:
+            return 0.0
+        if self._retry_close is not None:
+            return (self._retry_at - now_ms) / 1000
+        next_fire = self.last_close_ms(now_ms - self.delay_ms) + self.timeframe_ms + self.delay_ms
+        return (next_fire - now_ms) / 1000
@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+import config
+from utils.candle_store import CandleStore
+
+
+class BaseCandleFeed(ABC):
+    """
+    串流 K 線來源的共同介面
+    訂閱者會收到事件 dict:
+    {
+        "symbol": "BTC-USDT",
+        "timeframe": "15m",
+        "candle": [timestamp(ms), open, high, low, close, volume],
+        "closed": True | False   # True: 已收盤 / False: 形成中的更新
+    }
+    """
+    def __init__(self, symbols, timeframe):
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.callbacks = []
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+
+    def _emit(self, symbol, candle, closed):
+        event = {
+            "symbol": symbol,
+            "timeframe": self.timeframe,
+            "candle": candle,
+            "closed": closed,
+        }
+        for callback in self.callbacks:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"❌ K 線事件處理失敗 ({symbol}): {e}")
+
+    @abstractmethod
+    def run(self):
+        """阻塞執行直到 stop() 被呼叫或資料結束"""
+        pass
+
+    def stop(self):
+        self._stop_event.set()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def start_background(self):
+        """在背景執行緒啟動 (主迴圈可繼續處理 QA / 報告)"""
+        self._thread = threading.Thread(target=self.run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+class WebSocketCandleFeed(BaseCandleFeed):
+    """
+    交易所 WebSocket K 線串流 (ccxt.pro watch_ohlcv)
+    - 每次更新都推送形成中的 K 線
+    - 偵測到新 K 線開盤時，把上一根以「已收盤」推送
+    """
+    def __init__(self, symbols, timeframe, reconnect_delay=5):
+        super().__init__(symbols, timeframe)
+        self.reconnect_delay = reconnect_delay
+
+    def run(self):
+        asyncio.run(self._run_async())
+
+    async def _run_async(self):
+        import ccxt.pro as ccxt_pro
+        exchange = ccxt_pro.bingx({'enableRateLimit': True})
+        try:
+            await asyncio.gather(*[self._watch_symbol(exchange, symbol) for symbol in self.symbols])
+        finally:
+            await exchange.close()
+
+    async def _watch_symbol(self, exchange, symbol):
+        formatted_symbol = symbol.replace('-', '/')
+        forming = None  # 目前形成中的 K 線
+
+        while not self.stopped:
+            try:
+                candles = await exchange.watch_ohlcv(formatted_symbol, self.timeframe)
+            except Exception as e:
+                print(f"⚠️ {symbol} WebSocket 中斷，{self.reconnect_delay} 秒後重連: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            for candle in candles:
+                candle = [float(x) for x in candle[:6]]
+                if forming is not None and candle[0] < forming[0]:
+                    continue
+
+                if forming is not None and candle[0] > forming[0]:
+                    # 新 K 線開盤 -> 上一根收盤
+                    self._emit(symbol, forming, closed=True)
+
+                forming = candle
+                self._emit(symbol, forming, closed=False)
+
+
+class ReplayCandleFeed(BaseCandleFeed):
+    """
+    從本地 K 線資料庫重播已記錄的 K 線 (離線測試 / 壓力測試用)
+    :param speed: 重播倍速 (60 代表 1 秒播完 1 分鐘的行情)，0 代表不等待、全速播放
+    """
+    def __init__(self, symbols, timeframe, store=None, speed=0, start_ms=None, end_ms=None):
+        super().__init__(symbols, timeframe)
+        self.store = store or CandleStore()
+        self.speed = speed
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.emitted = 0
+
+    def _load_timeline(self):
+        """把多個幣種的 K 線依時間合併成單一時間軸"""
+        records, owners = [], []
+        for i, symbol in enumerate(self.symbols):
+            data = self.store.read(symbol, self.timeframe, self.start_ms, self.end_ms)
+            records.append(np.asarray(data))
+            owners.append(np.full(len(data), i, dtype=np.int32))
+
+        if not records:
+            return np.empty(0), np.empty(0, dtype=np.int32)
+
+        records = np.concatenate(records)
+        owners = np.concatenate(owners)
+        order = np.argsort(records['timestamp'], kind='stable')
+        return records[order], owners[order]
+
+    def run(self):
+        records, owners = self._load_timeline()
+        if len(records) == 0:
+            print("⚠️ 重播資料為空，請先執行 scripts/backfill_candles.py")
+            return
+
+        names = records.dtype.names
+        wall_start = time.monotonic()
+        data_start = int(records['timestamp'][0])
+
+        for record, owner in zip(records, owners):
+            if self.stopped:
+                break
+
+            if self.speed > 0:
+                # 依倍速等待到這根 K 線「應該出現」的時間
+                due = (int(record['timestamp']) - data_start) / 1000 / self.speed
+                delay = due - (time.monotonic() - wall_start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            self._emit(self.symbols[owner], [float(record[name]) for name in names], closed=True)
+            self.emitted += 1
+
+
+# 簡單測試用 (重播效能)
+if __name__ == "__main__":
+    feed = ReplayCandleFeed(config.COIN_LIST, config.TRADE_TIMEFRAME, speed=0)
+    feed.subscribe(lambda event: None)
+
+    start = time.time()
+    feed.run()
+    elapsed = max(time.time() - start, 1e-9)
+    print(f"✅ 重播 {feed.emitted} 根 K 線，耗時 {elapsed:.2f} 秒 ({feed.emitted / elapsed:.0f} 根/秒)")
@@ -0,0 +1,130 @@
+import os
+import numpy as np
+import config
+
+# 每根 K 線固定 48 bytes，直接以 memmap 讀取，不需解析
+CANDLE_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+
+
+class CandleStore:
+    """
+    本地 K 線資料庫 (一個 symbol/時框 對應一個二進位檔)
+    - 只存「已收盤」的 K 線，依時間排序且不重複
+    - 讀取為 memmap (零複製)，欄位可直接以 arr['close'] 取用
+    """
+    def __init__(self, root_dir=None):
+        self.root_dir = root_dir or getattr(config, 'CANDLE_STORE_DIR', 'data/candles')
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root_dir, f"{symbol.replace('/', '-')}_{timeframe}.bin")
+
+    def read(self, symbol, timeframe, start_ms=None, end_ms=None):
+        """
+        讀取 K 線 (memmap 視圖，不複製資料)
+        :param start_ms: 起始時間 (含)，None 代表從頭
+        :param end_ms: 結束時間 (不含)，None 代表到最後
+        """
+        path = self.path(symbol, timeframe)
+        if not os.path.exists(path) or os.path.getsize(path) < CANDLE_DTYPE.itemsize:
+            return np.empty(0, dtype=CANDLE_DTYPE)
+
+        data = np.memmap(path, dtype=CANDLE_DTYPE, mode='r')
+        if start_ms is None and end_ms is None:
+            return data
+
+        ts = data['timestamp']
+        lo = 0 if start_ms is None else int(np.searchsorted(ts, start_ms, side='left'))
+        hi = len(data) if end_ms is None else int(np.searchsorted(ts, end_ms, side='left'))
+        return data[lo:hi]
+
+    def read_tail(self, symbol, timeframe, count):
+        """讀取最後 count 根 K 線"""
+        data = self.read(symbol, timeframe)
+        return data[max(len(data) - int(count), 0):]
+
+    def last_timestamp(self, symbol, timeframe):
+        data = self.read(symbol, timeframe)
+        return int(data['timestamp'][-1]) if len(data) else None
+
+    @staticmethod
+    def to_rows(records):
+        """結構化陣列轉為 [timestamp, open, high, low, close, volume] 二維陣列"""
+        rows = np.empty((len(records), 6), dtype=np.float64)
+        for i, name in enumerate(CANDLE_DTYPE.names):
+            rows[:, i] = records[name]
+        return rows
+
+    @staticmethod
+    def _to_records(rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        records = np.empty(len(rows), dtype=CANDLE_DTYPE)
+        for i, name in enumerate(CANDLE_DTYPE.names):
+            records[name] = rows[:, i]
+        # 同一批內依時間排序並去重 (保留最後一筆)
+        _, last_idx = np.unique(records['timestamp'][::-1], return_index=True)
+        return records[::-1][last_idx]
+
+    def append(self, symbol, timeframe, rows):
+        """
+        寫入已收盤 K 線 (自動去重)
+        - 全部比現有資料新: 直接追加到檔尾
+        - 含有補洞/更早的資料: 合併後整檔重寫 (原子替換)
+        :return: 新增的筆數
+        """
+        if rows is None or len(rows) == 0:
+            return 0
+
+        os.makedirs(self.root_dir, exist_ok=True)
+        records = self._to_records(rows)
+        path = self.path(symbol, timeframe)
+        existing = self.read(symbol, timeframe)
+
+        if len(existing) == 0:
+            records.tofile(path)
+            return len(records)
+
+        stored_ts = existing['timestamp']
+        last_ts = stored_ts[-1]
+
+        # 已存在的 K 線不覆寫 (收盤後的數據不會再變)
+        pos = np.searchsorted(stored_ts, records['timestamp'])
+        found = (pos < len(stored_ts)) & (stored_ts[np.minimum(pos, len(stored_ts) - 1)] == records['timestamp'])
+        records = records[~found]
+        if len(records) == 0:
+            return 0
+
+        if records['timestamp'][0] > last_ts:
+            with open(path, 'ab') as f:
+                records.tofile(f)
+            return len(records)
+
+        merged = np.concatenate((np.asarray(existing), records))
+        merged = merged[np.argsort(merged['timestamp'], kind='stable')]
+        del existing, stored_ts
+
+        tmp_path = path + '.tmp'
+        merged.tofile(tmp_path)
+        os.replace(tmp_path, path)
+        return len(records)
+
+    def next_missing(self, symbol, timeframe, cursor_ms, timeframe_ms):
+        """
+        從 cursor_ms 開始，找出第一個本地缺少的 K 線時間
+        (若 cursor 之後已有連續資料，直接跳到連續區段的尾端)
+        """
+        ts = self.read(symbol, timeframe)['timestamp']
+        i = int(np.searchsorted(ts, cursor_ms, side='left'))
+        if i >= len(ts) or ts[i] != cursor_ms:
+            return int(cursor_ms)
+
+        gaps = np.flatnonzero(np.diff(ts[i:]) != timeframe_ms)
+        if len(gaps) == 0:
+            return int(ts[-1]) + timeframe_ms
+        return int(ts[i + gaps[0]]) + timeframe_ms
@@ -1,69 +1,401 @@
+import time
+import threading
 import ccxt
+import numpy as np
 import pandas as pd
 import config
+from utils.candle_store import CandleStore
+from utils.resampler import resample_ohlcv
+from utils.exchange_registry import get_exchange
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+
+class CandleBuffer:
+    """
+    固定容量的 K 線環形緩衝區 (Ring Buffer)
+    每列格式: [timestamp(ms), open, high, low, close, volume]，依時間由舊到新
+    """
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros((self.capacity, 6), dtype=np.float64)
+        self._start = 0  # 最舊一筆的位置
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def last_timestamp(self):
+        """最後一根 K 線 (可能仍在形成中) 的時間戳 (ms)"""
+        if self._size == 0:
+            return None
+        return int(self._data[(self._start + self._size - 1) % self.capacity, 0])
+
+    def last_closed_timestamp(self, timeframe_ms, now_ms):
+        """最後一根「已收盤」K 線的時間戳 (ms)"""
+        if self._size == 0:
+            return None
+        last_ts = self.last_timestamp
+        if last_ts + timeframe_ms <= now_ms:
+            return last_ts
+        if self._size < 2:
+            return None
+        return int(self._data[(self._start + self._size - 2) % self.capacity, 0])
+
+    def merge(self, rows):
+        """
+        合併新抓到的 K 線
+        - 時間戳等於最後一根: 覆寫 (更新形成中的 K 線)
+        - 時間戳較新: 追加 (緩衝區滿時覆蓋最舊的資料)
+        - 時間戳較舊: 忽略
+        :return: 實際寫入的筆數
+        """
+        written = 0
+        for row in rows:
+            ts = row[0]
+            last_ts = self.last_timestamp
+            if last_ts is not None and ts < last_ts:
+                continue
+
+            if last_ts is not None and ts == last_ts:
+                pos = (self._start + self._size - 1) % self.capacity
+            elif self._size < self.capacity:
+                pos = (self._start + self._size) % self.capacity
+                self._size += 1
+            else:
+                # 緩衝區已滿: 覆寫最舊的一筆，起點往前移
+                pos = self._start
+                self._start = (self._start + 1) % self.capacity
+
+            self._data[pos] = row[:6]
+            written += 1
+        return written
+
+    def to_array(self, limit=None):
+        """依時間順序回傳最後 limit 筆 (複本)"""
+        n = self._size if limit is None else min(int(limit), self._size)
+        if n == 0:
+            return np.empty((0, 6), dtype=np.float64)
+        first = (self._start + self._size - n) % self.capacity
+        end = first + n
+        if end <= self.capacity:
+            return self._data[first:end].copy()
+        return np.concatenate((self._data[first:], self._data[:end - self.capacity]))
+
 
 class BingXLoader:
-    def __init__(self):
-        # 初始化交易所物件
-        self.exchange = ccxt.bingx({
-            'enableRateLimit': True, # 啟用速率限制，避免被鎖 IP
+    def __init__(self, exchange=None):
+        # 交易所物件 (預設使用全程式共用的實例)
+        self.exchange = exchange if exchange is not None else get_exchange('bingx')
+
+        # 🔥 增量 K 線快取: {(symbol, timeframe): CandleBuffer}
+        self.use_cache = getattr(config, 'ENABLE_CANDLE_CACHE', True)
+        self.cache_size = getattr(config, 'CANDLE_CACHE_SIZE', 1000)
+        self.max_fetch = getattr(config, 'MAX_FETCH_LIMIT', 1000)
+        self.cache = {}
+        # 串流模式下 feed 執行緒 (ingest_candles) 與主迴圈 (fetch_data / 定期報告) 會同時讀寫快取
+        # 可重入: _plan_fetch 持有鎖時會呼叫 _seed_from_store
+        self._lock = threading.RLock()
+
+        # 🔥 本地 K 線資料庫: 冷啟動時先讀本地，收盤的 K 線寫回本地
+        self.store = CandleStore() if getattr(config, 'ENABLE_CANDLE_STORE', True) else None
+
+    def _resolve_symbol(self, symbol):
+        """處理 Symbol (優先使用傳入的參數，否則使用 config 預設)"""
+        if symbol is not None:
+            return symbol
+        if hasattr(config, 'SYMBOL'):
+            return config.SYMBOL
+        if hasattr(config, 'COIN_LIST') and config.COIN_LIST:
+            return config.COIN_LIST[0]
+        return None
+
+    @staticmethod
+    def timeframe_to_ms(timeframe):
+        """時框字串轉毫秒 (例如 '15m' -> 900000)"""
+        return ccxt.Exchange.parse_timeframe(timeframe) * 1000
+
+    @staticmethod
+    def to_dataframe(rows):
+        """將 OHLCV 陣列轉換為 DataFrame (與原本 fetch_data 的輸出格式一致)"""
+        df = pd.DataFrame(rows, columns=OHLCV_COLUMNS)
+
+        # 處理時間戳 (轉為人類可讀時間，方便除錯)
+        df['timestamp'] = pd.to_datetime(df['timestamp'].astype('int64'), unit='ms')
+
+        # 確保數據是 float 格式
+        df = df.astype({
+            'open': 'float',
+            'high': 'float',
+            'low': 'float',
+            'close': 'float',
+            'volume': 'float'
         })
+        return df
+
+    def _plan_fetch(self, symbol, timeframe, limit):
+        """
+        決定這次要向交易所要多少資料
+        :return: (since, fetch_limit)，since 為 None 代表完整重抓
+        """
+        key = (symbol, timeframe)
+        with self._lock:
+            if self.use_cache and key not in self.cache:
+                self._seed_from_store(symbol, timeframe, limit)
+
+            buffer = self.cache.get(key)
+            if not self.use_cache or buffer is None or len(buffer) < limit:
+                return None, limit
+            last_ts = buffer.last_timestamp
+
+        tf_ms = self.timeframe_to_ms(timeframe)
+        missing = (self.exchange.milliseconds() - last_ts) // tf_ms
+
+        # 斷線太久 (缺口超過緩衝區)，直接完整重抓比較單純
+        if missing >= buffer.capacity:
+            return None, limit
+
+        # 從最後一根 (可能是未收盤的) K 線開始抓，順便覆寫它
+        return last_ts, int(missing) + 2
+
+    def _seed_from_store(self, symbol, timeframe, limit):
+        """冷啟動: 用本地資料庫的最後幾根 K 線預先填滿快取"""
+        if self.store is None:
+            return
+        records = self.store.read_tail(symbol, timeframe, max(self.cache_size, limit))
+        if len(records) == 0:
+            return
+        buffer = CandleBuffer(max(self.cache_size, limit))
+        buffer.merge(CandleStore.to_rows(records))
+        with self._lock:
+            self.cache.setdefault((symbol, timeframe), buffer)
+
+    def _persist_closed(self, symbol, timeframe, ohlcv):
+        """只把已收盤的 K 線寫入本地資料庫 (形成中的 K 線還會變動)"""
+        if self.store is None or not ohlcv:
+            return 0
+        cutoff = self.exchange.milliseconds() - self.timeframe_to_ms(timeframe)
+        closed = [row for row in ohlcv if row[0] <= cutoff]
+        try:
+            # 先讀再寫 (去重)，兩個執行緒同時寫同一個檔案會重複追加
+            with self._lock:
+                return self.store.append(symbol, timeframe, closed)
+        except Exception as e:
+            print(f"⚠️ {symbol} 寫入本地 K 線失敗: {e}")
+            return 0
+
+    def _merge_fetched(self, symbol, timeframe, ohlcv, limit, since):
+        """將抓到的 K 線寫入快取並回傳最後 limit 筆的 DataFrame"""
+        self._persist_closed(symbol, timeframe, ohlcv)
+        if not self.use_cache:
+            return self.to_dataframe(ohlcv)
+
+        key = (symbol, timeframe)
+        with self._lock:
+            if since is None or key not in self.cache:
+                self.cache[key] = CandleBuffer(max(self.cache_size, limit))
+            buffer = self.cache[key]
+            buffer.merge(ohlcv)
+            rows = buffer.to_array(limit)
+        return self.to_dataframe(rows)
+
+    def ingest_candles(self, symbol, timeframe, rows):
+        """由串流來源推送的 K 線直接寫入快取 (不呼叫 API)"""
+        key = (symbol, timeframe)
+        with self._lock:
+            if key not in self.cache:
+                self._seed_from_store(symbol, timeframe, self.cache_size)
+            if key not in self.cache:
+                self.cache[key] = CandleBuffer(self.cache_size)
+            self.cache[key].merge(rows)
+        self._persist_closed(symbol, timeframe, rows)
+
+    def get_cached_data(self, timeframe, symbol, limit=100):
+        """只讀取快取中的 K 線 (不足 limit 根時回傳 None)"""
+        with self._lock:
+            buffer = self.cache.get((symbol, timeframe))
+            if buffer is None or len(buffer) < limit:
+                return None
+            rows = buffer.to_array(limit)
+        return self.to_dataframe(rows)
 
     def fetch_data(self, timeframe, symbol=None, limit=100):
         """
-        從 BingX 獲取 K 線數據
+        從 BingX 獲取 K 線數據 (啟用快取時只抓最後一根之後的新 K 線)
         :param timeframe: 時框 (例如 '15m', '1h')
         :param symbol: 交易對 (例如 'BTC-USDT')，如果為 None 則嘗試讀取 config
         :param limit: 獲取 K 線的數量
         """
-        # 1. 處理 Symbol (優先使用傳入的參數，否則使用 config 預設)
+        # 1. 處理 Symbol
+        symbol = self._resolve_symbol(symbol)
         if symbol is None:
-            if hasattr(config, 'SYMBOL'):
-                symbol = config.SYMBOL
-            elif hasattr(config, 'COIN_LIST') and config.COIN_LIST:
-                symbol = config.COIN_LIST[0]
-            else:
-                print("❌ 錯誤: 未指定 Symbol 且 Config 中找不到設定")
-                return None
+            print("❌ 錯誤: 未指定 Symbol 且 Config 中找不到設定")
+            return None
 
         # CCXT 通常需要 'BTC/USDT' 格式，而我們 config 可能寫 'BTC-USDT'
         formatted_symbol = symbol.replace('-', '/')
 
         try:
             # print(f"📥 正在獲取 {formatted_symbol} 的 {timeframe} K 線數據...")
-            
-            # 2. 呼叫 CCXT API
-            ohlcv = self.exchange.fetch_ohlcv(formatted_symbol, timeframe, limit=limit)
-            
+
+            # 2. 呼叫 CCXT API (有快取時只抓增量)
+            since, fetch_limit = self._plan_fetch(symbol, timeframe, limit)
+            ohlcv = self.exchange.fetch_ohlcv(formatted_symbol, timeframe, since=since, limit=fetch_limit)
+
             if not ohlcv:
                 print(f"⚠️ {symbol} 獲取數據為空")
                 return None
 
-            # 3. 轉換為 DataFrame
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            
-            # 處理時間戳 (轉為人類可讀時間，方便除錯)
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-            
-            # 確保數據是 float 格式
-            df = df.astype({
-                'open': 'float',
-                'high': 'float',
-                'low': 'float',
-                'close': 'float',
-                'volume': 'float'
-            })
-            
-            return df
+            # 3. 合併快取並轉換為 DataFrame
+            return self._merge_fetched(symbol, timeframe, ohlcv, limit, since)
 
         except Exception as e:
             print(f"❌ {symbol} 數據獲取失敗: {e}")
             return None
 
+    @staticmethod
+    def align_panel(frames, limit=None):
+        """
+        將多個幣種的 K 線對齊成 (幣種 x K 線) 的面板陣列
+        以最新的一個幣種最後 limit 根的時間為基準，缺少任何一根的幣種會被略過 (例如剛上市、資料有缺口)
+        :param frames: {symbol: DataFrame (to_dataframe 格式)}
+        :return: (symbols, panel, skipped)
+                 panel = {'timestamp': (T,) int64 ms, 'time': (T,) datetime64 (原 DataFrame 的時間欄),
+                          'open'/'high'/'low'/'close'/'volume': (S, T) float64}
+        """
+        times = {}
+        for symbol, df in frames.items():
+            if df is None or df.empty:
+                continue
+            times[symbol] = pd.to_datetime(df['timestamp']).to_numpy().astype('datetime64[ms]').astype(np.int64)
+        if not times:
+            return [], None, list(frames)
+
+        reference = max(times, key=lambda s: (times[s][-1], len(times[s])))
+        grid = times[reference] if limit is None else times[reference][-limit:]
+
+        grid_pos = len(times[reference]) - len(grid)
+        grid_time = pd.to_datetime(frames[reference]['timestamp']).to_numpy()[grid_pos:]
+
+        symbols, rows, skipped = [], [], []
+        for symbol, df in frames.items():
+            ts = times.get(symbol)
+            if ts is None or len(ts) < len(grid):
+                skipped.append(symbol)
+                continue
+            pos = np.searchsorted(ts, grid)
+            pos = np.minimum(pos, len(ts) - 1)
+            if not np.array_equal(ts[pos], grid):
+                skipped.append(symbol)
+                continue
+            symbols.append(symbol)
+            rows.append(df[OHLCV_COLUMNS[1:]].to_numpy(dtype=np.float64)[pos])
+
+        if not symbols:
+            return [], None, skipped
+        stacked = np.stack(rows)  # (S, T, 5)
+        panel = {'timestamp': grid, 'time': grid_time}
+        for i, name in enumerate(OHLCV_COLUMNS[1:]):
+            panel[name] = np.ascontiguousarray(stacked[:, :, i])
+        return symbols, panel, skipped
+
+    def fetch_panel(self, timeframe, symbols, limit=100, select=None):
+        """
+        抓取多個幣種並對齊成面板 (給 MarketDataService.analyze_panel 使用)
+        :param select: (選用) 對齊前篩選每個幣種的 K 線，(symbol, df) -> DataFrame 或 None (不參與這次計算)
+        :return: (symbols, panel, frames)，frames 保留原本每個幣種的 DataFrame (策略仍需要)
+        """
+        frames = {symbol: self.fetch_data(timeframe=timeframe, symbol=symbol, limit=limit) for symbol in symbols}
+        if select is not None:
+            frames = {symbol: select(symbol, df) for symbol, df in frames.items()}
+            frames = {symbol: df for symbol, df in frames.items() if df is not None}
+        aligned, panel, skipped = self.align_panel(frames, limit)
+        if skipped:
+            print(f"⚠️ 面板對齊略過 {len(skipped)} 個幣種: {skipped}")
+        return aligned, panel, frames
+
+    def fetch_resampled(self, timeframe, symbol=None, limit=100, base_timeframe=None, include_partial=True):
+        """
+        由基礎時框 (預設 config.TRADE_TIMEFRAME) 的快取 K 線合成大時框 K 線
+        例如用 15m 合成 1h/4h/1d，不需另外呼叫 API
+        若基礎 K 線不足，或需要的根數超過交易所單次上限 / 快取容量，退回直接抓取該時框
+        (不為了合成而把交易循環共用的基礎快取換成超大的緩衝區)
+        """
+        symbol = self._resolve_symbol(symbol)
+        base_timeframe = base_timeframe or getattr(config, 'TRADE_TIMEFRAME', '15m')
+        if timeframe == base_timeframe:
+            return self.fetch_data(timeframe, symbol=symbol, limit=limit)
+
+        ratio = self.timeframe_to_ms(timeframe) // self.timeframe_to_ms(base_timeframe)
+        # 多抓一段，確保捨棄開頭不完整區段後仍有 limit 根
+        base_limit = (limit + 1) * ratio
+        cap = min(self.max_fetch, self.cache_size) if self.use_cache else self.max_fetch
+        if base_limit > cap:
+            return self.fetch_data(timeframe, symbol=symbol, limit=limit)
+        base_df = self.fetch_data(base_timeframe, symbol=symbol, limit=base_limit)
+
+        if base_df is not None and not base_df.empty:
+            rows = base_df[OHLCV_COLUMNS].to_numpy(dtype=np.float64)
+            rows[:, 0] = base_df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+            resampled = resample_ohlcv(
+                rows, base_timeframe, timeframe,
+                now_ms=self.exchange.milliseconds(), include_partial=include_partial
+            )
+            if len(resampled) >= limit:
+                return self.to_dataframe(resampled[-limit:])
+
+        print(f"⚠️ {symbol} 基礎 K 線不足以合成 {timeframe}，改為直接抓取")
+        return self.fetch_data(timeframe, symbol=symbol, limit=limit)
+
+    def backfill(self, symbol, timeframe, since_ms, page_limit=1000):
+        """
+        分頁回補歷史 K 線到本地資料庫
+        - 以 since 游標往後翻頁，中斷後重跑會從第一個缺口接續
+        - 與本地重疊的部分自動去重
+        :return: 新增的 K 線筆數
+        """
+        if self.store is None:
+            print("⚠️ 未啟用本地 K 線資料庫 (ENABLE_CANDLE_STORE)，無法回補")
+            return 0
+
+        formatted_symbol = symbol.replace('-', '/')
+        tf_ms = self.timeframe_to_ms(timeframe)
+        cursor = self.store.next_missing(symbol, timeframe, since_ms, tf_ms)
+        total = 0
+
+        while cursor + tf_ms <= self.exchange.milliseconds():
+            try:
+                ohlcv = self.exchange.fetch_ohlcv(formatted_symbol, timeframe, since=cursor, limit=page_limit)
+            except Exception as e:
+                print(f"❌ {symbol} 回補失敗 (游標 {pd.to_datetime(cursor, unit='ms')}): {e}")
+                break
+
+            ohlcv = [row for row in (ohlcv or []) if row[0] >= cursor]
+            if not ohlcv:
+                break
+
+            total += self._persist_closed(symbol, timeframe, ohlcv)
+
+            # 下一頁: 從這頁之後第一個缺口開始 (已有的連續資料直接跳過)
+            next_cursor = self.store.next_missing(symbol, timeframe, int(ohlcv[-1][0]) + tf_ms, tf_ms)
+            if next_cursor <= cursor:
+                break
+            cursor = next_cursor
+            print(f"   📦 {symbol} {timeframe} 已回補至 {pd.to_datetime(ohlcv[-1][0], unit='ms')}")
+
+        return total
+
 # 簡單測試用
 if __name__ == "__main__":
     loader = BingXLoader()
     # 測試多幣種傳參
     df = loader.fetch_data(timeframe='15m', symbol='BTC-USDT')
     if df is not None:
-        print(f"✅ BTC-USDT 測試成功:\n{df.tail(2)}")
\ No newline at end of file
+        print(f"✅ BTC-USDT 測試成功:\n{df.tail(2)}")
+
+    # 第二次呼叫應該只會抓最新的 1~2 根 K 線
+    start = time.time()
+    df = loader.fetch_data(timeframe='15m', symbol='BTC-USDT')
+    if df is not None:
+        print(f"✅ 增量更新完成 ({(time.time() - start) * 1000:.0f} ms)，共 {len(df)} 筆")
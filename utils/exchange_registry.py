@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import time
+import ccxt
+import config
+
+# 全程式共用的交易所物件: {'bingx': ccxt.bingx(...)}
+_exchanges = {}
+_lock = threading.Lock()
+
+
+def _markets_cache_path(name):
+    cache_dir = getattr(config, 'MARKETS_CACHE_DIR', 'data')
+    return os.path.join(cache_dir, f"markets_{name}.json")
+
+
+def _load_cached_markets(name):
+    """讀取本地市場資訊 (超過 TTL 視為過期)"""
+    path = _markets_cache_path(name)
+    ttl = getattr(config, 'MARKETS_CACHE_TTL', 12 * 60 * 60)
+    if not os.path.exists(path) or time.time() - os.path.getmtime(path) > ttl:
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ 市場資訊快取讀取失敗，改為重新下載: {e}")
+        return None
+
+
+def _save_cached_markets(name, exchange):
+    path = _markets_cache_path(name)
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'markets': exchange.markets, 'currencies': exchange.currencies}, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"⚠️ 市場資訊快取寫入失敗: {e}")
+
+
+def _prepare_markets(name, exchange):
+    """
+    載入市場資訊: 優先使用本地快取 (warm start)，否則從交易所下載並寫入快取 (cold start)
+    :return: 'warm' | 'cold' | 'lazy' (下載失敗，交給 ccxt 第一次呼叫時再載入)
+    """
+    cached = _load_cached_markets(name)
+    if cached:
+        exchange.set_markets(cached['markets'], cached.get('currencies'))
+        return 'warm'
+
+    try:
+        exchange.load_markets()
+    except Exception as e:
+        print(f"⚠️ 市場資訊下載失敗 ({name}): {e}")
+        return 'lazy'
+
+    _save_cached_markets(name, exchange)
+    return 'cold'
+
+
+def get_exchange(name='bingx'):
+    """
+    取得共用的交易所物件 (第一次呼叫時建立)
+    BingXLoader 與 BingXExecutor 共用同一個物件，因此也共用同一個速率限制與市場資訊
+    """
+    with _lock:
+        exchange = _exchanges.get(name)
+        if exchange is not None:
+            return exchange
+
+        start = time.time()
+        exchange = getattr(ccxt, name)({
+            'apiKey': getattr(config, 'API_KEY', None),
+            'secret': getattr(config, 'SECRET_KEY', None),
+            'enableRateLimit': True, # 啟用速率限制，避免被鎖 IP
+        })
+        mode = _prepare_markets(name, exchange)
+
+        elapsed_ms = (time.time() - start) * 1000
+        label = {'warm': '快取啟動', 'cold': '冷啟動', 'lazy': '延遲載入'}[mode]
+        print(f"⚙️ [Exchange] {name} 初始化完成 ({label} {elapsed_ms:.0f} ms, {len(exchange.markets or {})} 個市場)")
+
+        _exchanges[name] = exchange
+        return exchange
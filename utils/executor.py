@@ -1,13 +1,32 @@
-import ccxt
 import config
+from utils.exchange_registry import get_exchange
+from utils.position_book import PositionBook
+from utils.order_queue import OrderQueue, OrderTicket
 
 class BingXExecutor:
-    def __init__(self, exchange):
-        self.exchange = exchange
+    def __init__(self, exchange=None, async_orders=None):
+        """
+        :param async_orders: 以送單執行緒非同步下單 (預設 config.ENABLE_ORDER_QUEUE)；False 時在呼叫端送出並等待成交
+        """
         self.dry_run = config.DRY_RUN
+        # 真實下單時未指定交易所物件，則使用全程式共用的實例
+        if exchange is None and not self.dry_run:
+            exchange = get_exchange('bingx')
+        self.exchange = exchange
         
-        # 模擬倉位儲存: {'BTC-USDT': 'LONG', ...}
-        self.simulated_positions = {} 
+        # 倉位簿: 每個交易循環以一次 fetch_positions() 載入所有幣種，之後由自己的成交更新
+        # (模擬模式只由模擬成交更新)；超過 POSITION_RECONCILE_SEC 沒載入時查詢倉位會自動重新對帳
+        self.positions = PositionBook()
+        self.reconcile_interval = getattr(config, 'POSITION_RECONCILE_SEC', 300)
+        # 送單佇列: 交易循環與止損監控只排入訂單，由專用執行緒依序送出、重試並確認成交
+        if async_orders is None:
+            async_orders = getattr(config, 'ENABLE_ORDER_QUEUE', True)
+        self.orders = OrderQueue(
+            self.exchange, self.positions, dry_run=self.dry_run, asynchronous=async_orders,
+            max_attempts=getattr(config, 'ORDER_MAX_ATTEMPTS', 4),
+            backoff=getattr(config, 'ORDER_RETRY_BACKOFF_SEC', 0.5),
+            confirm_timeout=getattr(config, 'ORDER_CONFIRM_TIMEOUT_SEC', 10),
+        )
         
         if not self.dry_run:
             print("⚙️ [Executor] 正在為監控清單設定槓桿...")
@@ -21,68 +40,83 @@ class BingXExecutor:
         except Exception as e:
             print(f"⚠️ 設定槓桿失敗 ({symbol}): {e}")
 
-    def get_open_position(self, symbol):
-        """回傳 'LONG', 'SHORT' 或 None"""
+    def sync_positions(self, force=True):
+        """
+        以一次 fetch_positions() 載入所有倉位 (取代每個幣種各查一次)，並列出與本地倉位簿不一致的幣種
+        :param force: False 時只有倉位簿從未載入或超過對帳間隔才查詢
+        :return: 是否成功 (失敗時沿用本地倉位簿)
+        """
         if self.dry_run:
-            return self.simulated_positions.get(symbol)
-
+            return True
+        if not force and not self.positions.is_stale(self.reconcile_interval):
+            return True
         try:
-            # 針對特定幣種查詢真實倉位
-            # 注意: CCXT BingX fetch_positions 可能需要 symbol 格式轉換
-            positions = self.exchange.fetch_positions([symbol.replace('-', '/')])
-            for pos in positions:
-                # 檢查合約數量 > 0
-                if float(pos['contracts']) > 0:
-                    return pos['side'].upper() # LONG / SHORT
-            return None
+            # 查詢前後都有在途訂單的幣種保留本地倉位: 交易所可能已成交、本地尚未套用，覆蓋後會重複計算
+            pending, version = self.pending_symbols(), self.positions.version
+            fetched = self.exchange.fetch_positions()
+            diffs = self.positions.load(fetched, keep=pending | self.pending_symbols(), since=version)
         except Exception as e:
-            print(f"⚠️ 讀取倉位失敗 ({symbol}): {e}")
-            return None
+            print(f"⚠️ 讀取倉位失敗: {e}")
+            return False
+        for symbol, local, remote in diffs:
+            print(f"🔄 [對帳] {symbol} 本地 {self._describe(local)} -> 交易所 {self._describe(remote)}")
+        return True
 
-    def place_order(self, side, symbol, amount):
-        if self.dry_run:
-            print(f"🧪 [模擬] {symbol} 下單: {side.upper()} {amount}")
-            # 更新模擬狀態
-            pos_type = 'LONG' if side == 'buy' else 'SHORT'
-            self.simulated_positions[symbol] = pos_type
-            return {'id': 'sim_order_id'}
+    @staticmethod
+    def _describe(position):
+        if not position:
+            return "無倉位"
+        return f"{position['side']} {position['contracts']:g}"
 
-        try:
-            print(f"⚡ [真實] {symbol} 下單: {side.upper()} {amount} ...")
-            order = self.exchange.create_market_order(symbol.replace('-', '/'), side, amount)
-            print(f"✅ 下單成功! ID: {order['id']}")
-            return order
-        except Exception as e:
-            print(f"❌ 下單失敗 ({symbol}): {e}")
+    def get_open_position(self, symbol):
+        """回傳 'LONG', 'SHORT' 或 None (讀取本地倉位簿，不另外查詢交易所)"""
+        self.sync_positions(force=False)
+        return self.positions.side(symbol)
+
+    @staticmethod
+    def parse_position_side(positions):
+        """從 fetch_positions 的結果取出持倉方向 ('LONG' / 'SHORT' / None)"""
+        for pos in positions or []:
+            # 檢查合約數量 > 0
+            if float(pos['contracts'] or 0) > 0:
+                return pos['side'].upper() # LONG / SHORT
+        return None
+
+    def place_order(self, side, symbol, amount, price=None, intent=None, levels=None):
+        """
+        市價開倉: 排入送單佇列後立即回傳 OrderTicket (成交後才更新倉位簿)
+        :param price: 參考價 (模擬成交價；交易所沒有回報成交均價時作為開倉價)
+        :param intent: 決策依據 (例如 K 線收盤時間)，決定 clientOrderId；同一個意圖只會送出一次
+        :param levels: 策略提供的 (止損價, 止盈價)，成交後記錄在倉位簿給止損監控使用
+        """
+        return self.orders.submit(OrderTicket(symbol, side, amount, price=price, intent=intent, levels=levels))
+
+    def close_position(self, symbol, price=None):
+        """
+        以倉位簿中的實際合約數量 reduceOnly 市價全平 (排入送單佇列)
+        :param price: 參考價 (模擬成交價)
+        :return: OrderTicket，沒有倉位時為 None
+        """
+        self.sync_positions(force=False)
+        position = self.positions.get(symbol)
+        if not position:
             return None
-        
-    def close_position(self, symbol):
-        if self.dry_run:
-            if self.simulated_positions.get(symbol):
-                print(f"🧪 [模擬] {symbol} 平倉成功")
-                self.simulated_positions[symbol] = None
-            return
 
-        try:
-            # 真實平倉：通常使用 reduceOnly 或查詢當前持倉量後反向操作
-            # 這裡簡單示範：先查方向，再反向市價全平
-            current_pos = self.get_open_position(symbol)
-            if not current_pos:
-                return
+        side = 'sell' if position['side'] == 'LONG' else 'buy'
+        # 平倉的意圖就是要平掉的這個倉位: 交易循環與止損監控同時平倉只會送出一次
+        # 加上最後一次成交的 version: 之後大小與開倉價都相同的新倉位 (例如 DRY_RUN 以收盤價成交) 不會拿到舊的平倉單
+        intent = (f"close:{position['side']}:{position['contracts']:g}:{position['entry_price']}:"
+                  f"{self.positions.fill_version(symbol)}")
+        return self.orders.submit(OrderTicket(symbol, side, position['contracts'], price=price,
+                                              reduce_only=True, intent=intent))
 
-            side = 'sell' if current_pos == 'LONG' else 'buy'
-            # 注意：BingX 平倉最好傳入 reduceOnly: True
-            # Amount 這裡暫時用 config 的設定，理想情況是讀取當前持倉數量
-            amount = config.ORDER_SIZES.get(symbol, config.ORDER_AMOUNT)
+    def has_pending(self, symbol):
+        """這個幣種是否有還沒成交 (或失敗) 的訂單"""
+        return self.orders.has_pending(symbol)
 
-            print(f"⚡ [真實] {symbol} 平倉: {side.upper()} ...")
-            self.exchange.create_market_order(
-                symbol.replace('-', '/'), 
-                side, 
-                amount, 
-                params={'reduceOnly': True} 
-            )
-            print(f"✅ {symbol} 平倉指令已發送")
-            
-        except Exception as e:
-            print(f"❌ 平倉失敗 ({symbol}): {e}")
\ No newline at end of file
+    def pending_symbols(self):
+        return self.orders.pending_symbols()
+
+    def shutdown(self, timeout=10.0):
+        """等待佇列中的訂單處理完畢後停止送單執行緒"""
+        self.orders.stop(timeout)
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+def stop_exit(side, open_, high, low, stop_price, take_price):
+    """
+    單根 K 線內是否觸發止損 / 止盈 (兩者同時觸發時視為先止損，較保守)
+    跳空越過價位時以開盤價成交；即時監控以最新價同時代入 open / high / low
+    :return: (出場原因, 成交價)，未觸發為 None
+    """
+    if side > 0:
+        if low <= stop_price:
+            return "stop_loss", min(open_, stop_price)
+        if high >= take_price:
+            return "take_profit", max(open_, take_price)
+    else:
+        if high >= stop_price:
+            return "stop_loss", max(open_, stop_price)
+        if low <= take_price:
+            return "take_profit", min(open_, take_price)
+    return None
+
+
+def exit_levels(side, entry_price, stop_loss_pct=0.0, take_profit_pct=0.0, stop_price=None, take_price=None):
+    """
+    止損 / 止盈價位 (即時監控與回測共用)
+    - 策略提供的價位優先 (例如諧波型態的 X 點外側)，但必須在進場價的正確一側，否則忽略
+    - 沒有策略價位時依 STOP_LOSS_PCT / TAKE_PROFIT_PCT 計算，百分比為 0 代表不啟用 (±inf)
+    :param side: 1 多 / -1 空
+    :return: (stop, take)
+    """
+    if stop_price is not None and np.isfinite(stop_price) and side * (entry_price - stop_price) > 0:
+        stop = float(stop_price)
+    elif stop_loss_pct:
+        stop = entry_price * (1 - side * stop_loss_pct)
+    else:
+        stop = -side * np.inf
+
+    if take_price is not None and np.isfinite(take_price) and side * (take_price - entry_price) > 0:
+        take = float(take_price)
+    elif take_profit_pct:
+        take = entry_price * (1 + side * take_profit_pct)
+    else:
+        take = side * np.inf
+    return stop, take
+
+
+def strategy_levels(side, signals, confidence, stops, takes):
+    """
+    與決策同方向、且有提供價位的策略中，信心最高者的止損 / 止盈 (同信心取順序在前者)
+    :param signals / confidence / stops / takes: 各策略的值 (K,)，沒有價位為 NaN
+    :return: (stop, take)，沒有則為 NaN
+    """
+    signals = np.asarray(signals)
+    confidence = np.asarray(confidence, dtype=np.float64)
+
+    def pick(levels):
+        levels = np.asarray(levels, dtype=np.float64)
+        candidates = np.flatnonzero((signals == side) & np.isfinite(levels))
+        if len(candidates) == 0:
+            return np.nan
+        return float(levels[candidates[np.argmax(confidence[candidates])]])
+
+    return pick(stops), pick(takes)
@@ -0,0 +1,166 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.zigzag import HIGH, LOW, TYPE_CODES
+
+# ==========================================
+# 諧波型態表 (比例區間，兩端相同代表單一比例)
+# - ab_xa: B 點回撤 XA 的比例
+# - bc_ab: C 點回撤 AB 的比例
+# - cd_bc: CD 相對 BC 的延伸比例
+# - ad_xa: D 點回撤 XA 的比例 (由 A 量起，>1 代表 D 超過 X)
+# - tolerance: 每個比例區間兩側各放寬的容許誤差
+# ==========================================
+HARMONIC_PATTERNS = {
+    'Gartley':   {'ab_xa': (0.618, 0.618), 'bc_ab': (0.382, 0.886), 'cd_bc': (1.272, 1.618), 'ad_xa': (0.786, 0.786), 'tolerance': 0.05},
+    'Bat':       {'ab_xa': (0.382, 0.500), 'bc_ab': (0.382, 0.886), 'cd_bc': (1.618, 2.618), 'ad_xa': (0.886, 0.886), 'tolerance': 0.05},
+    'Butterfly': {'ab_xa': (0.786, 0.786), 'bc_ab': (0.382, 0.886), 'cd_bc': (1.618, 2.240), 'ad_xa': (1.270, 1.618), 'tolerance': 0.05},
+    'Crab':      {'ab_xa': (0.382, 0.618), 'bc_ab': (0.382, 0.886), 'cd_bc': (2.240, 3.618), 'ad_xa': (1.618, 1.618), 'tolerance': 0.05},
+}
+
+RATIO_NAMES = ['ab_xa', 'bc_ab', 'cd_bc', 'ad_xa']
+# 計分權重: D 點位置 (PRZ) 最重要
+RATIO_WEIGHTS = np.array([1.0, 0.5, 0.5, 2.0])
+
+MATCH_DTYPE = np.dtype([
+    ('pattern', np.int8),       # HarmonicScanner.pattern_names 的位置
+    ('direction', np.int8),     # 1=看漲 (D 為低點)，-1=看跌 (D 為高點)
+    ('start', np.int64),        # X 點在轉折點陣列中的位置
+    ('x_index', np.int64), ('a_index', np.int64), ('b_index', np.int64), ('c_index', np.int64), ('d_index', np.int64),
+    ('d_price', np.float64),
+    ('ab_xa', np.float64), ('bc_ab', np.float64), ('cd_bc', np.float64), ('ad_xa', np.float64),
+    ('score', np.float64),      # 0~1，1 代表所有比例都落在標準區間內
+    ('prz_low', np.float64), ('prz_high', np.float64),
+    ('stop_loss', np.float64), ('take_profit', np.float64),
+])
+
+
+class HarmonicScanner:
+    """
+    掃描整段轉折點歷史中的諧波型態 (XABCD)
+    - 所有連續 5 個轉折點的視窗一次算出四個比例 (W x 4)
+    - 再與型態表 (F x 4 x 2) 廣播比較，得到每個型態、每個視窗的符合與分數
+    """
+    def __init__(self, patterns=None, tolerance=None, stop_buffer=0.005, take_profit_ratio=0.618):
+        """
+        :param patterns: 型態表 (預設 HARMONIC_PATTERNS)
+        :param tolerance: 統一覆蓋每個型態的容許誤差 (None 則使用型態表的設定)
+        :param stop_buffer: 止損放在 X 點 (或 PRZ 外緣) 再外側的比例
+        :param take_profit_ratio: 止盈為 D 往回 AD 距離的比例
+        """
+        patterns = patterns or HARMONIC_PATTERNS
+        self.pattern_names = list(patterns)
+        self.bands = np.array([[patterns[name][r] for r in RATIO_NAMES] for name in self.pattern_names], dtype=np.float64)
+        self.tolerances = np.array([
+            tolerance if tolerance is not None else patterns[name].get('tolerance', 0.05)
+            for name in self.pattern_names
+        ], dtype=np.float64)
+        self.stop_buffer = stop_buffer
+        self.take_profit_ratio = take_profit_ratio
+
+    @staticmethod
+    def _as_arrays(pivots):
+        """接受 dict 清單 (ZigZag 輸出) 或結構陣列 (PivotBuffer / pivot_pyramid 的單一 order)"""
+        if isinstance(pivots, np.ndarray):
+            return (pivots['price'].astype(np.float64), pivots['type'].astype(np.int8), pivots['index'].astype(np.int64))
+        prices = np.array([p['price'] for p in pivots], dtype=np.float64)
+        types = np.array([TYPE_CODES[p['type']] for p in pivots], dtype=np.int8)
+        indices = np.array([p['index'] for p in pivots], dtype=np.int64)
+        return prices, types, indices
+
+    def scan(self, pivots, only_last=False) -> np.ndarray:
+        """
+        :param pivots: 依時間排序的轉折點 (HIGH/LOW 交錯)
+        :param only_last: 只檢查 D 為最後一個轉折點的視窗 (即時交易用)
+        :return: MATCH_DTYPE 結構陣列，依 (D 位置, 型態) 排序
+        """
+        prices, types, indices = self._as_arrays(pivots)
+        if len(prices) < 5:
+            return np.zeros(0, dtype=MATCH_DTYPE)
+        if only_last:
+            offset = len(prices) - 5
+            prices, types, indices = prices[offset:], types[offset:], indices[offset:]
+        else:
+            offset = 0
+
+        P = sliding_window_view(prices, 5)   # (W, 5): X A B C D
+        T = sliding_window_view(types, 5)
+        I = sliding_window_view(indices, 5)
+        return self._match_windows(P, T, I, np.arange(len(P)) + offset)
+
+    def scan_windows(self, prices, types, indices) -> np.ndarray:
+        """
+        直接檢查已排好的 (W, 5) 視窗 (例如 rolling_last_pivots 每根 K 線當下的最後 5 個轉折點)
+        type 為 0 的空格視為不成立
+        :return: MATCH_DTYPE 結構陣列，start 為視窗 (列) 編號，依 (列, 型態) 排序
+        """
+        P = np.asarray(prices, dtype=np.float64)
+        T = np.asarray(types, dtype=np.int8)
+        I = np.asarray(indices, dtype=np.int64)
+        return self._match_windows(P, T, I, np.arange(len(P)))
+
+    def _match_windows(self, P, T, I, starts) -> np.ndarray:
+        # 方向: X 為低點 -> 看漲 (D 為低點)；並要求五點嚴格交錯
+        direction = np.where(T[:, 0] == LOW, 1, -1).astype(np.int8)
+        alternating = np.all(T[:, 1:] != T[:, :-1], axis=1) & np.all(T != 0, axis=1)
+
+        XA = np.abs(P[:, 1] - P[:, 0])
+        AB = np.abs(P[:, 2] - P[:, 1])
+        BC = np.abs(P[:, 3] - P[:, 2])
+        CD = np.abs(P[:, 4] - P[:, 3])
+        AD = np.abs(P[:, 4] - P[:, 1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.stack((AB / XA, BC / AB, CD / BC, AD / XA), axis=1)  # (W, 4)
+        valid = alternating & np.all(np.isfinite(ratios), axis=1)
+
+        # (F, W, 4): 落在區間外的距離 / 容許誤差
+        lo = self.bands[:, None, :, 0]
+        hi = self.bands[:, None, :, 1]
+        tol = self.tolerances[:, None, None]
+        r = ratios[None, :, :]
+        with np.errstate(invalid='ignore'):
+            outside = np.maximum(lo - r, 0.0) + np.maximum(r - hi, 0.0)
+            matched = np.all(outside <= tol, axis=2) & valid[None, :]
+            score = 1.0 - (outside / tol * RATIO_WEIGHTS).sum(axis=2) / RATIO_WEIGHTS.sum()
+
+        family, window = np.nonzero(matched)
+        if len(window) == 0:
+            return np.zeros(0, dtype=MATCH_DTYPE)
+        order = np.lexsort((family, window))
+        family, window = family[order], window[order]
+
+        out = np.zeros(len(window), dtype=MATCH_DTYPE)
+        out['pattern'] = family
+        out['direction'] = direction[window]
+        out['start'] = starts[window]
+        for k, name in enumerate(['x_index', 'a_index', 'b_index', 'c_index', 'd_index']):
+            out[name] = I[window, k]
+        for k, name in enumerate(RATIO_NAMES):
+            out[name] = ratios[window, k]
+        out['score'] = score[family, window]
+
+        x, a, d = P[window, 0], P[window, 1], P[window, 4]
+        xa = XA[window]
+        sign = out['direction'].astype(np.float64)  # 看漲時 D 在 A 下方
+        out['d_price'] = d
+
+        # PRZ: D 點回撤區間 (由 A 往 X 方向量 ad_xa 區間)
+        ad_lo = self.bands[family, 3, 0]
+        ad_hi = self.bands[family, 3, 1]
+        level_lo = a - sign * xa * ad_lo
+        level_hi = a - sign * xa * ad_hi
+        out['prz_low'] = np.minimum(level_lo, level_hi)
+        out['prz_high'] = np.maximum(level_lo, level_hi)
+
+        # 止損: X 點與 PRZ 外緣中較遠的一側，再放寬 stop_buffer
+        far_edge = np.where(sign > 0, np.minimum(x, out['prz_low']), np.maximum(x, out['prz_high']))
+        out['stop_loss'] = far_edge * (1.0 - sign * self.stop_buffer)
+        # 止盈: 由 D 往 A 方向回 AD 距離的 take_profit_ratio
+        out['take_profit'] = d + sign * np.abs(a - d) * self.take_profit_ratio
+        return out
+
+    def describe(self, match) -> str:
+        """單筆結果的文字描述，例如 Bullish Gartley (B=0.62, D=0.79, score=0.93)"""
+        side = "Bullish" if match['direction'] > 0 else "Bearish"
+        return (f"{side} {self.pattern_names[int(match['pattern'])]} "
+                f"(B={match['ab_xa']:.2f}, D={match['ad_xa']:.2f}, score={match['score']:.2f})")
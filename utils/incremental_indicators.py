@@ -0,0 +1,266 @@
+import math
+
+# 與 indicators.compute_indicators 相同的輸出欄位
+OUTPUT_KEYS = [
+    'close', 'ma_fast', 'ma_slow', 'bb_lower', 'bb_upper',
+    'macd_line', 'macd_hist', 'macd_signal', 'rsi',
+    'kdj_k', 'kdj_d', 'kdj_j', 'atr', 'obv', 'mfi', 'vwap'
+]
+
+NAN = float('nan')
+EPSILON = 2.220446049250313e-16
+
+
+# ==========================================
+# 遞迴式的狀態更新 (全部只看「上一個狀態 + 新 K 線」)
+# 狀態一律是 dict / list，方便複製與序列化
+# ==========================================
+
+def _rma_state():
+    return {'num': 0.0, 'den': 0.0, 'count': 0}
+
+
+def _rma_update(state, value, length):
+    """pandas_ta.rma (adjusted ewm)，value 為 NaN 時不更新"""
+    if value is None or math.isnan(value):
+        return NAN if state['count'] < length else state['num'] / state['den']
+    decay = 1.0 - 1.0 / length
+    state['num'] = value + decay * state['num']
+    state['den'] = 1.0 + decay * state['den']
+    state['count'] += 1
+    return state['num'] / state['den'] if state['count'] >= length else NAN
+
+
+def _ema_state():
+    return {'value': None, 'seed_sum': 0.0, 'count': 0}
+
+
+def _ema_update(state, value, length):
+    """pandas_ta.ema (presma): 前 length 個值取平均當種子，之後遞迴"""
+    if value is None or math.isnan(value):
+        return NAN if state['value'] is None else state['value']
+    state['count'] += 1
+    if state['value'] is None:
+        state['seed_sum'] += value
+        if state['count'] == length:
+            state['value'] = state['seed_sum'] / length
+        return NAN if state['value'] is None else state['value']
+    alpha = 2.0 / (length + 1)
+    state['value'] = alpha * value + (1.0 - alpha) * state['value']
+    return state['value']
+
+
+def _window_push(window, value, length):
+    window.append(value)
+    if len(window) > length:
+        del window[0]
+
+
+class IncrementalIndicators:
+    """
+    單一 (symbol, 時框) 的增量指標狀態
+    - update(candle, closed=True): K 線收盤，狀態前進一格 (O(1)，只依賴固定長度的視窗)
+    - update(candle, closed=False): 形成中的 K 線，只計算暫時數值，不改變已確認的狀態
+    - to_dict() / from_dict(): 序列化狀態 (重啟後可接續)
+    數值與 indicators.compute_indicators 逐根計算的結果一致
+    """
+    def __init__(self, params):
+        self.params = dict(params)
+        self.state = self._initial_state()
+        self.values = {key: NAN for key in OUTPUT_KEYS}
+        self.last_closed_ts = None
+        self.forming_ts = None
+
+    def _initial_state(self):
+        return {
+            'count': 0,
+            'prev_close': None,
+            'prev_tp': None,
+            'closes': [],
+            'highs': [],
+            'lows': [],
+            'pos_flows': [],
+            'neg_flows': [],
+            'ema_fast': _ema_state(),
+            'ema_slow': _ema_state(),
+            'ema_signal': _ema_state(),
+            'rsi_pos': _rma_state(),
+            'rsi_neg': _rma_state(),
+            'atr': _rma_state(),
+            'kdj_k': _rma_state(),
+            'kdj_d': _rma_state(),
+            'obv': 0.0,
+            'vwap_day': None,
+            'vwap_pv': 0.0,
+            'vwap_v': 0.0,
+            'filled': {},   # 每個指標最後一個有效值 (等同 ffill)
+            'prev_obv': None,
+        }
+
+    @staticmethod
+    def _copy_state(state):
+        """淺層複製 + 複製內部的 list/dict (狀態大小固定，為常數時間)"""
+        copied = {}
+        for key, value in state.items():
+            if isinstance(value, list):
+                copied[key] = list(value)
+            elif isinstance(value, dict):
+                copied[key] = dict(value)
+            else:
+                copied[key] = value
+        return copied
+
+    def _step(self, state, candle):
+        """以一根 K 線推進狀態，回傳這根 K 線的指標數值"""
+        p = self.params
+        ts, _, high, low, close, volume = [float(x) for x in candle[:6]]
+        out = {'close': close}
+
+        # --- 均線 / 布林帶 (固定長度視窗) ---
+        window_len = max(p['ma_fast'], p['ma_slow'], p['bb_length'])
+        _window_push(state['closes'], close, window_len)
+        closes = state['closes']
+
+        def window_mean(n):
+            return sum(closes[-n:]) / n if len(closes) >= n else NAN
+
+        out['ma_fast'] = window_mean(p['ma_fast'])
+        out['ma_slow'] = window_mean(p['ma_slow'])
+        mid = window_mean(p['bb_length'])
+        if math.isnan(mid):
+            out['bb_lower'] = out['bb_upper'] = NAN
+        else:
+            recent = closes[-p['bb_length']:]
+            std = math.sqrt(sum((x - mid) ** 2 for x in recent) / p['bb_length'])
+            out['bb_lower'] = mid - p['bb_std'] * std
+            out['bb_upper'] = mid + p['bb_std'] * std
+
+        # --- MACD ---
+        fast = _ema_update(state['ema_fast'], close, p['macd_fast'])
+        slow = _ema_update(state['ema_slow'], close, p['macd_slow'])
+        line = fast - slow
+        signal = _ema_update(state['ema_signal'], line, p['macd_signal'])
+        out['macd_line'] = line
+        out['macd_signal'] = signal
+        out['macd_hist'] = line - signal
+
+        # --- RSI / ATR (需要前一根收盤價) ---
+        prev_close = state['prev_close']
+        if prev_close is None:
+            change = NAN
+            tr = NAN
+        else:
+            change = close - prev_close
+            high_low = high - low if high != low else EPSILON
+            tr = max(abs(high_low), abs(high - prev_close), abs(prev_close - low))
+        pos_avg = _rma_update(state['rsi_pos'], max(change, 0.0) if not math.isnan(change) else NAN, p['rsi_length'])
+        neg_avg = _rma_update(state['rsi_neg'], min(change, 0.0) if not math.isnan(change) else NAN, p['rsi_length'])
+        denom = pos_avg + abs(neg_avg)
+        out['rsi'] = 100.0 * pos_avg / denom if denom and not math.isnan(denom) else NAN
+        out['atr'] = _rma_update(state['atr'], tr, p['atr_length'])
+
+        # --- KDJ ---
+        _window_push(state['highs'], high, p['kdj_length'])
+        _window_push(state['lows'], low, p['kdj_length'])
+        if len(state['highs']) >= p['kdj_length']:
+            highest, lowest = max(state['highs']), min(state['lows'])
+            span = highest - lowest if highest != lowest else EPSILON
+            fastk = 100.0 * (close - lowest) / span
+        else:
+            fastk = NAN
+        k = _rma_update(state['kdj_k'], fastk, p['kdj_signal'])
+        d = _rma_update(state['kdj_d'], k, p['kdj_signal'])
+        out['kdj_k'], out['kdj_d'], out['kdj_j'] = k, d, 3.0 * k - 2.0 * d
+
+        # --- OBV ---
+        if prev_close is None or close > prev_close:
+            state['obv'] += volume
+        elif close < prev_close:
+            state['obv'] -= volume
+        out['obv'] = state['obv']
+
+        # --- MFI ---
+        tp = (high + low + close) / 3.0
+        flow = tp * volume
+        prev_tp = state['prev_tp']
+        _window_push(state['pos_flows'], flow if prev_tp is not None and tp > prev_tp else 0.0, p['mfi_length'])
+        _window_push(state['neg_flows'], flow if prev_tp is not None and tp < prev_tp else 0.0, p['mfi_length'])
+        if len(state['pos_flows']) >= p['mfi_length']:
+            pos_sum, neg_sum = sum(state['pos_flows']), sum(state['neg_flows'])
+            out['mfi'] = 100.0 * pos_sum / (pos_sum + neg_sum) if pos_sum + neg_sum else NAN
+        else:
+            out['mfi'] = NAN
+
+        # --- VWAP (每日 UTC 重置) ---
+        day = int(ts) // 86_400_000
+        if day != state['vwap_day']:
+            state['vwap_day'], state['vwap_pv'], state['vwap_v'] = day, 0.0, 0.0
+        state['vwap_pv'] += tp * volume
+        state['vwap_v'] += volume
+        out['vwap'] = state['vwap_pv'] / state['vwap_v'] if state['vwap_v'] else NAN
+
+        state['prev_close'] = close
+        state['prev_tp'] = tp
+        state['count'] += 1
+        return out
+
+    def update(self, candle, closed=True):
+        """
+        :param candle: [timestamp(ms), open, high, low, close, volume]
+        :param closed: True 代表已收盤 (寫入狀態)，False 代表形成中 (只更新暫時數值)
+        :return: 目前的指標數值
+        """
+        ts = int(candle[0])
+        if self.last_closed_ts is not None and ts <= self.last_closed_ts:
+            return self.values  # 已處理過的 K 線
+
+        state = self._copy_state(self.state)
+        prev_obv = self.state['filled'].get('obv')
+        self.values = self._step(state, candle)
+
+        if closed:
+            for key, value in self.values.items():
+                if not math.isnan(value):
+                    state['filled'][key] = value
+            state['prev_obv'] = prev_obv
+            self.state = state
+            self.last_closed_ts = ts
+            self.forming_ts = None
+        else:
+            self.forming_ts = ts
+        return self.values
+
+    def latest(self):
+        """
+        最後一根的數值 (NaN 以前值補，全無則 0)，等同 df.ffill().fillna(0).iloc[-1]
+        :return: (指標 dict, 前一根 OBV)
+        """
+        filled = self.state['filled']
+        latest = {}
+        for key in OUTPUT_KEYS:
+            value = self.values.get(key, NAN)
+            latest[key] = value if not math.isnan(value) else filled.get(key, 0.0)
+
+        if self.forming_ts is not None:
+            prev_obv = filled.get('obv', latest['obv'])
+        else:
+            prev_obv = self.state['prev_obv'] if self.state['prev_obv'] is not None else latest['obv']
+        return latest, prev_obv
+
+    def to_dict(self):
+        return {
+            'params': self.params,
+            'state': self.state,
+            'values': self.values,
+            'last_closed_ts': self.last_closed_ts,
+            'forming_ts': self.forming_ts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        obj = cls(data['params'])
+        obj.state = data['state']
+        obj.values = {key: (NAN if value is None else value) for key, value in data['values'].items()}
+        obj.last_closed_ts = data['last_closed_ts']
+        obj.forming_ts = data.get('forming_ts')
+        return obj
@@ -0,0 +1,104 @@
+import sys
+import threading
+from collections import OrderedDict
+
+from utils.lazy_context import LazyContext
+
+
+def estimate_size(obj, _seen=None):
+    """粗略估計物件佔用的記憶體 (bytes)，會往下計算 dict/list 的內容"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    return size
+
+
+class IndicatorCache:
+    """
+    analyze_technicals 結果的 LRU 快取
+    - key 由呼叫端決定 (幣種、時框、最後收盤 K 線時間、形成中 K 線、參數)
+    - 超過筆數或記憶體上限時，從最久沒用到的開始淘汰
+    - get 回傳淺層複製 (.copy())，呼叫端加上 'symbol' 等欄位不會污染快取
+      LazyContext 的複製會共用已算好的指標，之後其他呼叫端讀取時不需重算
+      (快取中的項目在 put 之後還會變大: 透過 LazyContext.watch 只把新算出的值加到該項目的大小)
+    """
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (context, size)
+        self._lock = threading.Lock()  # 串流執行緒與主迴圈可能同時讀寫
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].copy()
+
+    def put(self, key, context):
+        size = estimate_size(context)
+        if size > self.max_bytes:
+            return  # 單筆就超過上限，不快取
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            cached = context.copy()
+            self._entries[key] = (cached, size)
+            self.current_bytes += size
+            self._evict()
+
+        if isinstance(cached, LazyContext):
+            cached.watch(lambda value: self._grow(key, cached, value))
+
+    def _grow(self, key, context, value):
+        """快取中的 LazyContext (或共用 store 的複本) 新算出一個欄位: 只更新這一筆的大小"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not context:
+                return  # 已被淘汰或取代
+            added = LazyContext.value_size(value)
+            self._entries[key] = (context, entry[1] + added)
+            self.current_bytes += added
+            self._evict()
+
+    def _evict(self):
+        """超過筆數或記憶體上限時從最久沒用到的開始淘汰 (呼叫端需持有 _lock)"""
+        while self._entries and (len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,253 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+# ==========================================
+# NumPy 指標核心
+# - 直接在連續的 float64 陣列上計算，不產生中間 DataFrame
+# - 所有函式都沿著最後一個維度 (時間軸) 計算，輸入可為 (T,) 或 (N, T)
+# - 計算方式與 pandas_ta 預設參數一致 (暖機期為 NaN)
+# ==========================================
+
+EPSILON = np.finfo(np.float64).eps
+
+
+def _as_float(x):
+    return np.ascontiguousarray(x, dtype=np.float64)
+
+
+def _pad_front(values, count):
+    """在時間軸前端補 count 個 NaN"""
+    pad = np.full(values.shape[:-1] + (count,), np.nan)
+    return np.concatenate((pad, values), axis=-1)
+
+
+def _diff(x, drift=1):
+    return _pad_front(x[..., drift:] - x[..., :-drift], drift)
+
+
+def _rolling(x, length, func):
+    x = _as_float(x)
+    if x.shape[-1] < length:
+        return np.full(x.shape, np.nan)
+    windows = sliding_window_view(x, length, axis=-1)
+    return _pad_front(func(windows, axis=-1), length - 1)
+
+
+def rolling_sum(x, length):
+    return _rolling(x, length, np.sum)
+
+
+def rolling_max(x, length):
+    return _rolling(x, length, np.max)
+
+
+def rolling_min(x, length):
+    return _rolling(x, length, np.min)
+
+
+def rma(x, length):
+    """
+    Wilder 平滑 (pandas_ta.rma): ewm(alpha=1/length, adjust=True, min_periods=length)
+    以 lfilter 計算遞迴式，分子分母各一次
+    """
+    x = _as_float(x)
+    alpha = 1.0 / length
+    valid = ~np.isnan(x)
+    decay = [1.0, -(1.0 - alpha)]
+    num = lfilter([1.0], decay, np.where(valid, x, 0.0), axis=-1)
+    den = lfilter([1.0], decay, valid.astype(np.float64), axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = num / den
+    out[np.cumsum(valid, axis=-1) < length] = np.nan
+    return out
+
+
+def sma(close, length):
+    return _rolling(close, length, np.mean)
+
+
+def ema(close, length):
+    """
+    pandas_ta.ema (presma=True): 第一個值為前 length 根的 SMA，之後 alpha=2/(length+1) 遞迴
+    開頭的 NaN 會被略過 (從第一個有效值開始算)
+    """
+    x = _as_float(close)
+    alpha = 2.0 / (length + 1)
+    valid = ~np.isnan(x)
+    first = np.argmax(valid, axis=-1)             # 每列第一個有效值的位置
+    seed_idx = first + length - 1                 # 每列 SMA 種子的位置
+    t = np.arange(x.shape[-1])
+
+    # 種子 = 第一段 length 根的平均
+    csum = np.cumsum(np.where(valid, x, 0.0), axis=-1)
+    seed_pos = np.minimum(seed_idx, x.shape[-1] - 1)
+    start_pos = first - 1
+    seed_sum = np.take_along_axis(csum, np.expand_dims(seed_pos, -1), -1)[..., 0]
+    before = np.where(start_pos >= 0,
+                      np.take_along_axis(csum, np.expand_dims(np.maximum(start_pos, 0), -1), -1)[..., 0],
+                      0.0)
+    seed = (seed_sum - before) / length
+
+    # 在種子位置放入 seed/alpha，讓 lfilter 的輸出恰好從 seed 開始遞迴
+    seed_idx_b = np.expand_dims(seed_idx, -1)
+    z = np.where(t > seed_idx_b, x, 0.0)
+    z = np.where(t == seed_idx_b, np.expand_dims(seed, -1) / alpha, z)
+    out = lfilter([alpha], [1.0, -(1.0 - alpha)], z, axis=-1)
+    out[t < seed_idx_b] = np.nan
+    out[(seed_idx >= x.shape[-1]) | ~valid.any(axis=-1)] = np.nan
+    return out
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """回傳 (macd_line, histogram, signal_line)，與 pandas_ta.macd 欄位順序相同"""
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, line - signal_line, signal_line
+
+
+def rsi(close, length=14):
+    change = _diff(_as_float(close))
+    positive = np.where(change > 0, change, 0.0)
+    negative = np.where(change < 0, change, 0.0)
+    positive[..., 0] = np.nan
+    negative[..., 0] = np.nan
+    positive_avg = rma(positive, length)
+    negative_avg = rma(negative, length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100.0 * positive_avg / (positive_avg + np.abs(negative_avg))
+
+
+def _non_zero_range(high, low):
+    diff = high - low
+    return np.where(diff == 0, diff + EPSILON, diff)
+
+
+def kdj(high, low, close, length=9, signal=3):
+    """回傳 (K, D, J)"""
+    highest_high = rolling_max(high, length)
+    lowest_low = rolling_min(low, length)
+    fastk = 100.0 * (_as_float(close) - lowest_low) / _non_zero_range(highest_high, lowest_low)
+    k = rma(fastk, signal)
+    d = rma(k, signal)
+    return k, d, 3.0 * k - 2.0 * d
+
+
+def bbands(close, length=20, std=2.0):
+    """回傳 (lower, mid, upper)，標準差 ddof=0"""
+    mid = sma(close, length)
+    deviation = _rolling(close, length, np.std)
+    return mid - std * deviation, mid, mid + std * deviation
+
+
+def true_range(high, low, close):
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    prev_close = _pad_front(close[..., :-1], 1)
+    ranges = np.stack((_non_zero_range(high, low), high - prev_close, prev_close - low))
+    tr = np.max(np.abs(ranges), axis=0)
+    tr[..., 0] = np.nan
+    return tr
+
+
+def atr(high, low, close, length=14):
+    return rma(true_range(high, low, close), length)
+
+
+def obv(close, volume):
+    sign = np.sign(_diff(_as_float(close)))
+    sign[..., 0] = 1.0
+    return np.cumsum(sign * _as_float(volume), axis=-1)
+
+
+def mfi(high, low, close, volume, length=14):
+    typical_price = (_as_float(high) + _as_float(low) + _as_float(close)) / 3.0
+    raw_money_flow = typical_price * _as_float(volume)
+    change = _diff(typical_price)
+    positive_flow = np.where(change > 0, raw_money_flow, 0.0)
+    negative_flow = np.where(change < 0, raw_money_flow, 0.0)
+    positive_sum = rolling_sum(positive_flow, length)
+    negative_sum = rolling_sum(negative_flow, length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100.0 * positive_sum / (positive_sum + negative_sum)
+
+
+def vwap(high, low, close, volume, timestamps_ms):
+    """每日 (UTC) 重新累積的 VWAP，等同 pandas_ta.vwap(anchor='D')"""
+    typical_price = (_as_float(high) + _as_float(low) + _as_float(close)) / 3.0
+    volume = _as_float(volume)
+    day = np.asarray(timestamps_ms, dtype=np.int64) // 86_400_000
+
+    weighted = np.cumsum(typical_price * volume, axis=-1)
+    total_volume = np.cumsum(volume, axis=-1)
+
+    # 每天第一根之前的累積值 (用來扣除前一天)
+    new_day = np.ones(day.shape, dtype=bool)
+    new_day[..., 1:] = day[..., 1:] != day[..., :-1]
+    t = np.broadcast_to(np.arange(day.shape[-1]), day.shape)
+    day_start = np.maximum.accumulate(np.where(new_day, t, 0), axis=-1)
+    prev_idx = day_start - 1
+    has_prev = prev_idx >= 0
+    prev_idx = np.maximum(prev_idx, 0)
+
+    weighted = weighted - np.where(has_prev, np.take_along_axis(weighted, prev_idx, -1), 0.0)
+    total_volume = total_volume - np.where(has_prev, np.take_along_axis(total_volume, prev_idx, -1), 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return weighted / total_volume
+
+
+def compute_indicators(open_, high, low, close, volume, timestamps_ms, params):
+    """
+    一次算出 MarketDataService 需要的全部指標
+    :param params: {'ma_fast', 'ma_slow', 'bb_length', 'bb_std', 'macd_fast', 'macd_slow', 'macd_signal',
+                    'rsi_length', 'kdj_length', 'kdj_signal', 'atr_length', 'mfi_length'}
+    :return: {指標名稱: 陣列}，欄位名稱與 analyze_technicals 的 DataFrame 欄位相同
+    """
+    out = {
+        'close': _as_float(close),
+        'ma_fast': sma(close, params['ma_fast']),
+        'ma_slow': sma(close, params['ma_slow']),
+    }
+    out['bb_lower'], _, out['bb_upper'] = bbands(close, params['bb_length'], params['bb_std'])
+    out['macd_line'], out['macd_hist'], out['macd_signal'] = macd(
+        close, params['macd_fast'], params['macd_slow'], params['macd_signal'])
+    out['rsi'] = rsi(close, params['rsi_length'])
+    out['kdj_k'], out['kdj_d'], out['kdj_j'] = kdj(high, low, close, params['kdj_length'], params['kdj_signal'])
+    out['atr'] = atr(high, low, close, params['atr_length'])
+    out['obv'] = obv(close, volume)
+    out['mfi'] = mfi(high, low, close, volume, params['mfi_length'])
+    if timestamps_ms is not None:
+        out['vwap'] = vwap(high, low, close, volume, timestamps_ms)
+    else:
+        # 沒有時間資訊無法分日，與 pandas_ta 失敗時的降級方式相同
+        out['vwap'] = out['ma_slow']
+    return out
+
+
+def ffill(values):
+    """
+    沿時間軸以前值補 NaN，開頭仍為 NaN 的位置補 0
+    等同 df.ffill().fillna(0)，即每個位置的 last_valid
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    idx = np.where(valid, np.arange(values.shape[-1]), 0)
+    np.maximum.accumulate(idx, axis=-1, out=idx)
+    out = np.take_along_axis(values, idx, axis=-1)
+    return np.where(np.isnan(out), 0.0, out)
+
+
+def last_valid(values, offset=0):
+    """
+    取時間軸上倒數第 (offset+1) 個位置的值，NaN 以前值補 (ffill)，全無則為 0
+    等同 df.ffill().fillna(0).iloc[-1 - offset]
+    """
+    values = np.asarray(values, dtype=np.float64)
+    end = values.shape[-1] - offset
+    if end <= 0:
+        return np.zeros(values.shape[:-1]) if values.ndim > 1 else 0.0
+    head = values[..., :end]
+    valid = ~np.isnan(head)
+    idx = end - 1 - np.argmax(valid[..., ::-1], axis=-1)
+    result = np.take_along_axis(head, np.expand_dims(idx, -1), -1)[..., 0]
+    result = np.where(valid.any(axis=-1), result, 0.0)
+    return float(result) if values.ndim == 1 else result
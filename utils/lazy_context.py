@@ -0,0 +1,103 @@
+import sys
+from collections.abc import MutableMapping
+
+
+class LazyContext(MutableMapping):
+    """
+    延遲計算的 context (用法與 dict 相同)
+    - 每個欄位對應一個 resolver(ctx)，第一次讀取時才計算，之後直接回傳
+    - resolver 內可以讀取其他欄位，相依的指標會跟著被計算
+    - '_' 開頭的欄位為內部中間結果 (例如 MACD 三條線)，不會出現在 keys() 中
+    - 呼叫端寫入的欄位 (例如 'symbol') 另外保存，copy() 後互不影響，但已算好的指標共用
+    - watch(fn): 共用的 store 新增計算結果時呼叫 fn(value) (IndicatorCache 用來追蹤記憶體)，copy() 之間共用
+    """
+    def __init__(self, resolvers, store=None, overrides=None, watchers=None):
+        self._resolvers = resolvers
+        self._store = store if store is not None else {}
+        self._overrides = dict(overrides or {})
+        self._deleted = set()
+        self._watchers = watchers if watchers is not None else []
+
+    def __getitem__(self, key):
+        if key in self._overrides:
+            return self._overrides[key]
+        if key in self._deleted:
+            raise KeyError(key)
+        if key in self._store:
+            return self._store[key]
+        resolver = self._resolvers.get(key)
+        if resolver is None:
+            raise KeyError(key)
+        value = resolver(self)
+        self._store[key] = value
+        for fn in self._watchers:
+            fn(value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._overrides[key] = value
+        self._deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._overrides.pop(key, None)
+        self._deleted.add(key)
+
+    def __contains__(self, key):
+        # 不觸發計算
+        if key in self._overrides:
+            return True
+        return key not in self._deleted and (key in self._resolvers or key in self._store)
+
+    def _public_keys(self):
+        keys = [k for k in list(self._resolvers) + list(self._store) if not str(k).startswith('_')]
+        keys += list(self._overrides)
+        return [k for k in dict.fromkeys(keys) if k in self]
+
+    def __iter__(self):
+        return iter(self._public_keys())
+
+    def __len__(self):
+        return len(self._public_keys())
+
+    def peek(self, key, default=None):
+        """只讀取已經算好的值 (不觸發計算)"""
+        if key in self._overrides:
+            return self._overrides[key]
+        if key in self._deleted:
+            return default
+        return self._store.get(key, default)
+
+    def is_computed(self, key):
+        return key in self._overrides or key in self._store
+
+    def resolve(self, keys):
+        """依序計算指定的欄位 (keys 通常已依相依關係排序)"""
+        for key in keys:
+            self[key]
+        return self
+
+    def watch(self, fn):
+        self._watchers.append(fn)
+
+    def copy(self):
+        copied = LazyContext(self._resolvers, self._store, self._overrides, self._watchers)
+        copied._deleted = set(self._deleted)
+        return copied
+
+    @staticmethod
+    def value_size(value):
+        """單一欄位值的記憶體估計 (numpy 陣列以 nbytes 計)"""
+        return getattr(value, 'nbytes', 0) or sys.getsizeof(value)
+
+    def __sizeof__(self):
+        # 給 IndicatorCache 估計記憶體用: 只計算已經存在的值
+        size = object.__sizeof__(self)
+        for value in list(self._store.values()) + list(self._overrides.values()):
+            size += self.value_size(value)
+        return size
+
+    def __repr__(self):
+        computed = [k for k in self._public_keys() if self.is_computed(k)]
+        return f"LazyContext(computed={computed}, pending={len(self) - len(computed)})"
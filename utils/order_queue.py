@@ -0,0 +1,333 @@
+import hashlib
+import queue
+import threading
+import time
+import ccxt
+
+QUEUED = "queued"
+SENT = "sent"
+FILLED = "filled"
+FAILED = "failed"
+
+
+def client_order_id(symbol, side, amount, reduce_only, intent):
+    """
+    由下單意圖決定的 clientOrderId (同一個意圖永遠得到同一個 ID)
+    重送時交易所會拒絕重複的 ID，逾時後重試不會造成重複進場
+    """
+    key = f"{symbol}|{side}|{float(amount):g}|{int(bool(reduce_only))}|{intent}"
+    return "cb" + hashlib.sha1(key.encode('utf-8')).hexdigest()[:30]
+
+
+class OrderTicket:
+    """
+    一筆排入佇列的市價單 (下單後立即回傳給呼叫端，送單與成交確認在送單執行緒完成)
+    - status: queued -> sent -> filled / failed
+    - add_done_callback: 成交或失敗後呼叫 (已完成時立即呼叫)
+    """
+    def __init__(self, symbol, side, amount, price=None, reduce_only=False, intent=None, levels=None):
+        """
+        :param price: 參考價 (模擬成交價；交易所沒有回報成交均價時作為成交價)
+        :param intent: 這筆訂單的決策依據 (例如 K 線收盤時間)，None 時以目前分鐘代替
+        :param levels: 策略提供的 (止損價, 止盈價)，成交後記錄在倉位簿
+        """
+        self.symbol = symbol
+        self.side = side
+        self.amount = float(amount)
+        self.price = price
+        self.reduce_only = reduce_only
+        self.levels = levels
+        if intent is None:
+            intent = int(time.time() // 60)
+        self.client_order_id = client_order_id(symbol, side, amount, reduce_only, intent)
+
+        self.status = QUEUED
+        self.order = None        # 交易所回報的訂單
+        self.error = None
+        self.attempts = 0
+        self.filled = None       # 成交數量
+        self.fill_price = None   # 成交均價
+        self.created_at = time.perf_counter()
+        self.sent_at = None      # 交易所接受訂單的時間 (perf_counter)
+        self.finished_at = None
+
+        self._done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def ok(self):
+        return self.status == FILLED
+
+    @property
+    def order_id(self):
+        return self.order.get('id') if self.order else None
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """等待成交或失敗，:return: 是否已完成"""
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, fn):
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _finish(self, status, error=None):
+        with self._lock:
+            self.status = status
+            self.error = error
+            self.finished_at = time.perf_counter()
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn(self)
+            except Exception as e:
+                print(f"❌ 訂單回呼失敗 ({self.symbol}): {e}")
+
+    def __repr__(self):
+        return f"OrderTicket({self.symbol} {self.side} {self.amount:g}, {self.status}, {self.client_order_id})"
+
+
+class OrderQueue:
+    """
+    非同步送單: 交易循環與止損監控只負責排入訂單，專用的送單執行緒依序送出
+    - 每筆訂單帶固定的 clientOrderId；同一個 ID 還在處理中 (或剛成交) 時不會再送一次
+    - 網路錯誤 / 逾時: 先以 clientOrderId 查詢訂單是否其實已送達，沒有才以指數退避重送 (同一個 ID)
+    - 交易所直接拒絕 (保證金不足等) 不重試
+    - 成交確認: 回報沒有成交資訊時，送單執行緒在空檔以 fetch_order 查詢，成交後才更新倉位簿
+    - asynchronous=False 時在呼叫端的執行緒完成送單與確認 (行為與原本的同步下單相同)
+    """
+    def __init__(self, exchange, positions, dry_run=False, asynchronous=True, max_attempts=4, backoff=0.5,
+                 max_backoff=8.0, confirm_interval=0.5, confirm_timeout=10.0, dedup_ttl=900):
+        """
+        :param positions: PositionBook，成交後更新
+        :param max_attempts: 網路錯誤時最多送出幾次
+        :param backoff: 第一次重試前等待的秒數 (之後每次加倍，最多 max_backoff)
+        :param confirm_interval: 查詢成交狀態的間隔 (秒)
+        :param confirm_timeout: 超過這個秒數仍查不到成交資訊，以參考價視為全部成交 (下次對帳修正)
+        :param dedup_ttl: 已完成的訂單保留多久 (秒)，期間內同一個 ID 不會再送出
+        """
+        self.exchange = exchange
+        self.positions = positions
+        self.dry_run = dry_run
+        self.asynchronous = asynchronous
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.confirm_interval = confirm_interval
+        self.confirm_timeout = confirm_timeout
+        self.dedup_ttl = dedup_ttl
+
+        self._queue = queue.Queue()
+        self._tickets = {}       # clientOrderId -> OrderTicket
+        self._unconfirmed = []   # [(ticket, 確認期限)] 已送出但還不知道成交結果
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # 排入 / 查詢
+    # ------------------------------------------------------------------
+    def submit(self, ticket):
+        """
+        排入訂單 (同一個 clientOrderId 處理中或剛成交時回傳原本的 ticket，不會重複送出)
+        :return: OrderTicket
+        """
+        with self._lock:
+            self._forget_finished()
+            existing = self._tickets.get(ticket.client_order_id)
+            if existing is not None and existing.status != FAILED:
+                print(f"   ♻️ {ticket.symbol} 相同的訂單已送出 ({existing.status})，不重複下單")
+                return existing
+            self._tickets[ticket.client_order_id] = ticket
+
+        if not self.asynchronous:
+            self._process(ticket)
+            while not ticket.done():
+                time.sleep(self.confirm_interval)
+                self._poll_unconfirmed()
+            return ticket
+
+        self._ensure_thread()
+        self._queue.put(ticket)
+        return ticket
+
+    def pending_symbols(self):
+        """有未完成訂單的幣種"""
+        with self._lock:
+            return {ticket.symbol for ticket in self._tickets.values() if not ticket.done()}
+
+    def has_pending(self, symbol):
+        return symbol in self.pending_symbols()
+
+    def _forget_finished(self):
+        now = time.perf_counter()
+        for cid, ticket in list(self._tickets.items()):
+            if ticket.done() and now - ticket.finished_at > self.dedup_ttl:
+                del self._tickets[cid]
+
+    # ------------------------------------------------------------------
+    # 送單執行緒
+    # ------------------------------------------------------------------
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                ticket = self._queue.get(timeout=self.confirm_interval)
+            except queue.Empty:
+                self._poll_unconfirmed()
+                continue
+            try:
+                self._process(ticket)
+            except Exception as e:
+                print(f"❌ 送單執行緒錯誤 ({ticket.symbol}): {e}")
+                if not ticket.done():
+                    ticket._finish(FAILED, e)
+            finally:
+                self._queue.task_done()
+            if self._queue.empty():
+                self._poll_unconfirmed()
+
+    def stop(self, timeout=10.0):
+        """等待佇列中的訂單送出與確認 (最多 timeout 秒) 後停止送單執行緒"""
+        deadline = time.time() + timeout
+        while self.pending_symbols() and time.time() < deadline:
+            time.sleep(0.1)
+        self._stop_event.set()
+
+    # ------------------------------------------------------------------
+    # 送單
+    # ------------------------------------------------------------------
+    def _process(self, ticket):
+        order = self._send(ticket)
+        if order is None:
+            return
+        ticket.order = order
+        ticket.status = SENT
+        ticket.sent_at = time.perf_counter()
+        action = "平倉" if ticket.reduce_only else "下單"
+        print(f"✅ {ticket.symbol} {action}成功! ID: {order.get('id')} "
+              f"(排隊→送出 {(ticket.sent_at - ticket.created_at) * 1000:.0f} ms, 第 {ticket.attempts} 次)")
+
+        if self._is_complete(order, ticket.amount):
+            self._fill(ticket, order)
+        else:
+            with self._lock:
+                self._unconfirmed.append((ticket, time.time() + self.confirm_timeout))
+
+    def _send(self, ticket):
+        """送出訂單 (網路錯誤時查詢後以同一個 clientOrderId 重送)，:return: 訂單或 None (失敗)"""
+        side = ticket.side.upper()
+        action = "平倉" if ticket.reduce_only else "下單"
+        for attempt in range(1, self.max_attempts + 1):
+            ticket.attempts = attempt
+            try:
+                if self.dry_run:
+                    print(f"🧪 [模擬] {ticket.symbol} {action}: {side} {ticket.amount:g}")
+                    return {'id': f"sim_{ticket.client_order_id}", 'clientOrderId': ticket.client_order_id,
+                            'status': 'closed', 'filled': ticket.amount, 'average': ticket.price}
+                print(f"⚡ [真實] {ticket.symbol} {action}: {side} {ticket.amount:g} ...")
+                params = {'clientOrderId': ticket.client_order_id}
+                if ticket.reduce_only:
+                    params['reduceOnly'] = True
+                return self.exchange.create_market_order(ticket.symbol.replace('-', '/'), ticket.side,
+                                                         ticket.amount, params=params)
+            except ccxt.DuplicateOrderId:
+                # 之前逾時的那一次其實已送達
+                order = self._lookup(ticket)
+                if order is not None:
+                    return order
+                error = "clientOrderId 重複但查不到訂單"
+            except ccxt.NetworkError as e:
+                # 逾時不代表沒送達: 先查詢，找到就不重送
+                order = self._lookup(ticket)
+                if order is not None:
+                    return order
+                error = e
+                if attempt < self.max_attempts:
+                    delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+                    print(f"⚠️ {ticket.symbol} {action}失敗 ({e})，{delay:g} 秒後重試 (第 {attempt} 次)")
+                    time.sleep(delay)
+                    continue
+            except Exception as e:
+                # 交易所拒絕 (保證金不足、數量錯誤等)，重送也不會成功
+                error = e
+            print(f"❌ {action}失敗 ({ticket.symbol}): {error}")
+            ticket._finish(FAILED, error)
+            return None
+
+    def _lookup(self, ticket):
+        """以 clientOrderId 找出已送達的訂單 (查不到或查詢失敗為 None)"""
+        if self.dry_run or self.exchange is None:
+            return None
+        market = ticket.symbol.replace('-', '/')
+        try:
+            orders = self.exchange.fetch_open_orders(market) + self.exchange.fetch_closed_orders(market)
+        except Exception as e:
+            print(f"⚠️ 查詢 {ticket.symbol} 訂單失敗: {e}")
+            return None
+        for order in orders:
+            cid = order.get('clientOrderId') or (order.get('info') or {}).get('clientOrderID')
+            if cid == ticket.client_order_id:
+                return order
+        return None
+
+    # ------------------------------------------------------------------
+    # 成交確認
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _is_complete(order, amount):
+        if order.get('status') in ('closed', 'canceled', 'rejected', 'expired'):
+            return True
+        filled = order.get('filled')
+        return filled is not None and float(filled) >= amount * (1 - 1e-9)
+
+    def _poll_unconfirmed(self):
+        with self._lock:
+            waiting, self._unconfirmed = self._unconfirmed, []
+        still_waiting = []
+        for ticket, deadline in waiting:
+            order = ticket.order
+            try:
+                order = self.exchange.fetch_order(ticket.order_id, ticket.symbol.replace('-', '/'))
+            except Exception as e:
+                print(f"⚠️ 查詢 {ticket.symbol} 成交狀態失敗: {e}")
+            if self._is_complete(order, ticket.amount) or time.time() >= deadline:
+                if not self._is_complete(order, ticket.amount):
+                    print(f"⚠️ {ticket.symbol} 超過 {self.confirm_timeout:g} 秒查不到成交資訊，以參考價記錄 (下次對帳修正)")
+                self._fill(ticket, order)
+            else:
+                still_waiting.append((ticket, deadline))
+        with self._lock:
+            self._unconfirmed.extend(still_waiting)
+
+    @staticmethod
+    def fill_of(order, amount, price):
+        """訂單回報的成交數量與均價 (沒有成交資訊時，視為以參考價全部成交)"""
+        filled = order.get('filled') or amount
+        fill_price = order.get('average') or order.get('price') or price
+        return float(filled), (float(fill_price) if fill_price else None)
+
+    def _fill(self, ticket, order):
+        ticket.order = order
+        if order.get('status') in ('canceled', 'rejected', 'expired') and not order.get('filled'):
+            print(f"❌ {ticket.symbol} 訂單未成交 ({order.get('status')})")
+            ticket._finish(FAILED, order.get('status'))
+            return
+        ticket.filled, ticket.fill_price = self.fill_of(order, ticket.amount, ticket.price)
+        self.positions.apply_fill(ticket.symbol, ticket.side, ticket.filled, ticket.fill_price,
+                                  reduce_only=ticket.reduce_only)
+        if ticket.levels is not None:
+            self.positions.set_levels(ticket.symbol, *ticket.levels)
+        ticket._finish(FILLED)
@@ -0,0 +1,171 @@
+import threading
+import time
+
+# 合約數量的比較誤差 (浮點數)
+EPSILON = 1e-12
+
+
+class PositionBook:
+    """
+    本地倉位簿: 每個幣種的方向、實際合約數量與平均開倉價
+    - load: 以一次 fetch_positions() 的結果整批覆蓋 (每個交易循環一次，或超過對帳間隔時)
+    - apply_fill: 自己的成交直接更新，不需要再向交易所查詢
+    - 手動下單、強平、交易所端止損等造成的差異，在下一次 load 時列出並以交易所為準
+    - 還有訂單在途 (已送出但成交尚未套用) 的幣種，load 時保留本地倉位，避免同一筆成交被算兩次
+    """
+    def __init__(self):
+        self._positions = {}  # symbol -> {'side': 'LONG'/'SHORT', 'contracts': float, 'entry_price': float 或 None}
+        self._levels = {}     # symbol -> (方向, 策略止損價, 策略止盈價)，方向改變或平倉後失效
+        self._lock = threading.Lock()
+        self.synced_at = None  # 上次以交易所資料載入的時間 (秒)
+        self.version = 0       # 每次本地成交 +1 (load 時判斷查詢期間有沒有新成交)
+        self._touched = {}     # symbol -> 最後一次本地成交時的 version
+
+    @staticmethod
+    def to_symbol(market_symbol):
+        """CCXT 的市場代號轉成 config 的格式 (例如 'BTC/USDT:USDT' -> 'BTC-USDT')"""
+        return market_symbol.split(':')[0].replace('/', '-')
+
+    def is_stale(self, max_age):
+        """從未載入，或距離上次載入超過 max_age 秒"""
+        return self.synced_at is None or time.time() - self.synced_at >= max_age
+
+    # ------------------------------------------------------------------
+    # 載入 / 對帳
+    # ------------------------------------------------------------------
+    def load(self, positions, keep=(), since=None):
+        """
+        以交易所的倉位整批覆蓋本地倉位簿
+        :param positions: CCXT fetch_positions() 的結果
+        :param keep: 保留本地倉位的幣種 (有在途訂單，交易所可能已成交、本地尚未套用)
+        :param since: 查詢前的 version，查詢期間有本地成交的幣種同樣保留 (交易所資料可能比成交舊)
+        :return: 與本地不一致的幣種 [(symbol, 本地倉位, 交易所倉位)]，第一次載入時為空 (不含保留的幣種)
+        """
+        fresh = {}
+        for pos in positions or []:
+            contracts = float(pos.get('contracts') or 0)
+            if contracts <= 0:
+                continue
+            symbol = self.to_symbol(pos['symbol'])
+            if symbol in fresh:
+                continue  # 同一幣種有多筆 (雙向持倉) 時取第一筆，與 parse_position_side 相同
+            fresh[symbol] = {
+                'side': pos['side'].upper(),
+                'contracts': contracts,
+                'entry_price': float(pos['entryPrice']) if pos.get('entryPrice') else None,
+            }
+
+        with self._lock:
+            keep = set(keep)
+            if since is not None:
+                keep.update(symbol for symbol, version in self._touched.items() if version > since)
+            for symbol in keep:
+                fresh.pop(symbol, None)
+                if symbol in self._positions:
+                    fresh[symbol] = self._positions[symbol]
+
+            diffs = []
+            if self.synced_at is not None:
+                for symbol in sorted(set(fresh) | set(self._positions)):
+                    local, remote = self._positions.get(symbol), fresh.get(symbol)
+                    if symbol not in keep and not self._same(local, remote):
+                        diffs.append((symbol, local, remote))
+            self._positions = fresh
+            self._drop_stale_levels()
+            self.synced_at = time.time()
+        return diffs
+
+    @staticmethod
+    def _same(a, b):
+        if a is None or b is None:
+            return a is b
+        return a['side'] == b['side'] and abs(a['contracts'] - b['contracts']) <= EPSILON * max(1.0, b['contracts'])
+
+    # ------------------------------------------------------------------
+    # 本地成交
+    # ------------------------------------------------------------------
+    def apply_fill(self, symbol, side, amount, price=None, reduce_only=False):
+        """
+        依自己的成交更新倉位
+        :param side: 'buy' | 'sell'
+        :param amount: 成交合約數量
+        :param price: 成交均價 (開倉時用來計算平均開倉價)
+        :param reduce_only: 只減倉 (超過持倉的部分不會反向開倉)
+        :return: 更新後的倉位 (已無倉位為 None)
+        """
+        direction = 'LONG' if side == 'buy' else 'SHORT'
+        amount = float(amount)
+        with self._lock:
+            pos = self._positions.get(symbol)
+            if pos is None:
+                pos = None if reduce_only else {'side': direction, 'contracts': amount, 'entry_price': price}
+            elif pos['side'] == direction:
+                # 加倉: 重新計算平均開倉價
+                total = pos['contracts'] + amount
+                if price is not None and pos['entry_price'] is not None:
+                    pos['entry_price'] = (pos['entry_price'] * pos['contracts'] + price * amount) / total
+                pos['contracts'] = total
+            else:
+                # 減倉 / 平倉 (非 reduce_only 時多出來的部分反向開倉)
+                remaining = pos['contracts'] - amount
+                if remaining > EPSILON * max(1.0, pos['contracts']):
+                    pos['contracts'] = remaining
+                elif remaining < -EPSILON * max(1.0, pos['contracts']) and not reduce_only:
+                    pos = {'side': direction, 'contracts': -remaining, 'entry_price': price}
+                else:
+                    pos = None
+
+            if pos is None:
+                self._positions.pop(symbol, None)
+            else:
+                self._positions[symbol] = pos
+            self.version += 1
+            self._touched[symbol] = self.version
+            self._drop_stale_levels()
+            return dict(pos) if pos else None
+
+    # ------------------------------------------------------------------
+    # 策略提供的止損 / 止盈價位
+    # ------------------------------------------------------------------
+    def set_levels(self, symbol, stop_price=None, take_price=None):
+        """記錄開倉時策略提供的止損 / 止盈價 (給 ExitWatcherService 使用)"""
+        with self._lock:
+            pos = self._positions.get(symbol)
+            if pos is not None:
+                self._levels[symbol] = (pos['side'], stop_price, take_price)
+
+    def get_levels(self, symbol):
+        """:return: (策略止損價, 策略止盈價)，沒有為 (None, None)"""
+        with self._lock:
+            levels = self._levels.get(symbol)
+            return (levels[1], levels[2]) if levels else (None, None)
+
+    def _drop_stale_levels(self):
+        for symbol in list(self._levels):
+            pos = self._positions.get(symbol)
+            if pos is None or pos['side'] != self._levels[symbol][0]:
+                del self._levels[symbol]
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+    def get(self, symbol):
+        """{'side', 'contracts', 'entry_price'} 的複本，無倉位為 None"""
+        with self._lock:
+            pos = self._positions.get(symbol)
+            return dict(pos) if pos else None
+
+    def side(self, symbol):
+        """'LONG' / 'SHORT' / None"""
+        pos = self.get(symbol)
+        return pos['side'] if pos else None
+
+    def fill_version(self, symbol):
+        """這個幣種最後一次本地成交時的 version (從未有本地成交為 0)，用來區分大小相同的前後兩個倉位"""
+        with self._lock:
+            return self._touched.get(symbol, 0)
+
+    def snapshot(self):
+        """所有倉位的複本 {symbol: 倉位}"""
+        with self._lock:
+            return {symbol: dict(pos) for symbol, pos in self._positions.items()}
@@ -0,0 +1,72 @@
+import ccxt
+import numpy as np
+
+# 交易所週線從週一 00:00 (UTC) 開始，而 1970-01-01 是週四
+WEEK_OFFSET_MS = 4 * 24 * 60 * 60 * 1000
+
+
+def timeframe_to_ms(timeframe):
+    return ccxt.Exchange.parse_timeframe(timeframe) * 1000
+
+
+def bucket_starts(timestamps, target_timeframe):
+    """每根 K 線所屬的大時框 K 線開盤時間 (ms，UTC 對齊)"""
+    if target_timeframe.endswith('M'):
+        raise ValueError(f"不支援月線重採樣: {target_timeframe}")
+    target_ms = timeframe_to_ms(target_timeframe)
+    offset = WEEK_OFFSET_MS if target_timeframe.endswith('w') else 0
+    ts = np.asarray(timestamps, dtype=np.int64)
+    return (ts - offset) // target_ms * target_ms + offset
+
+
+def resample_ohlcv(rows, base_timeframe, target_timeframe, now_ms=None, include_partial=True):
+    """
+    將小時框 K 線合成為大時框 K 線 (向量化 reduceat，不逐根迴圈)
+    :param rows: [timestamp(ms), open, high, low, close, volume] 二維陣列，依時間排序
+    :param now_ms: 目前時間 (判斷最後一根是否已收盤)，None 代表全部視為已收盤
+    :param include_partial: 是否保留最後一根尚未收盤的大時框 K 線 (與交易所的「形成中 K 線」相同)
+    :return: 同格式的二維陣列
+
+    不完整區段的處理:
+    - 第一段: 若資料不是從大時框的開盤時間開始 (歷史被截斷)，其開高低都不正確，直接捨棄
+    - 最後一段: 尚未走完的大時框視為形成中的 K 線，依 include_partial 決定是否保留
+    - 中間段: 交易所偶有缺 K，仍保留 (時間上已收盤)
+    """
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+    base_ms = timeframe_to_ms(base_timeframe)
+    target_ms = timeframe_to_ms(target_timeframe)
+    if target_ms < base_ms or target_ms % base_ms != 0:
+        raise ValueError(f"{target_timeframe} 無法由 {base_timeframe} 合成")
+    if len(rows) == 0:
+        return np.empty((0, 6), dtype=np.float64)
+
+    ts = rows[:, 0].astype(np.int64)
+    buckets = bucket_starts(ts, target_timeframe)
+
+    # 每個區段的起點 / 終點
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(rows)] - 1
+
+    out = np.empty((len(starts), 6), dtype=np.float64)
+    out[:, 0] = buckets[starts]
+    out[:, 1] = rows[starts, 1]
+    out[:, 2] = np.maximum.reduceat(rows[:, 2], starts)
+    out[:, 3] = np.minimum.reduceat(rows[:, 3], starts)
+    out[:, 4] = rows[ends, 4]
+    out[:, 5] = np.add.reduceat(rows[:, 5], starts)
+
+    keep = np.ones(len(out), dtype=bool)
+
+    # 第一段從中間開始 -> 捨棄
+    if ts[0] != buckets[0]:
+        keep[0] = False
+
+    # 最後一段尚未走完 -> 形成中
+    last_bucket_end = buckets[-1] + target_ms
+    last_closed = ts[-1] + base_ms == last_bucket_end
+    if now_ms is not None:
+        last_closed = last_closed and now_ms >= last_bucket_end
+    if not last_closed and not include_partial:
+        keep[-1] = False
+
+    return out[keep]
@@ -0,0 +1,67 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class SharedArrays:
+    """
+    把多個 NumPy 陣列放進同一塊 shared memory，讓子程序零複製讀取 (不必每個任務 pickle 一次)
+    - 主程序: SharedArrays.create({'BTC-USDT/close': arr, ...})，用完 close() + unlink()
+    - 子程序: SharedArrays.attach(manifest)，manifest 只有名稱、dtype、shape、offset，傳遞成本很小
+    """
+    ALIGN = 64  # 每個陣列的起點對齊 cache line
+
+    def __init__(self, shm, manifest, owner):
+        self.shm = shm
+        self.manifest = manifest
+        self.owner = owner
+
+    @classmethod
+    def create(cls, arrays):
+        layout = {}
+        offset = 0
+        for name, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            layout[name] = (arr.dtype.str, arr.shape, offset)
+            offset += arr.nbytes
+            offset = -(-offset // cls.ALIGN) * cls.ALIGN
+
+        shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        shared = cls(shm, {'name': shm.name, 'arrays': layout}, owner=True)
+        for name, arr in arrays.items():
+            shared[name][...] = arr
+        return shared
+
+    @classmethod
+    def attach(cls, manifest):
+        return cls(shared_memory.SharedMemory(name=manifest['name']), manifest, owner=False)
+
+    def __getitem__(self, name):
+        dtype, shape, offset = self.manifest['arrays'][name]
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.shm.buf, offset=offset)
+
+    def __contains__(self, name):
+        return name in self.manifest['arrays']
+
+    def keys(self):
+        return self.manifest['arrays'].keys()
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    def close(self):
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # 仍有陣列參照這塊記憶體，交給程序結束時釋放
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        self.unlink()
@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+
+OK = "ok"
+TIMEOUT = "timeout"
+ERROR = "error"
+BUSY = "busy"  # 上一次的執行還沒結束 (逾時後仍在背景跑)，這次直接棄權
+
+
+class StrategyRunner:
+    """
+    執行多個策略的 analyze 並記錄每個策略的耗時
+    - workers = 0: 依序在目前執行緒執行 (只計時，不設期限)
+    - workers > 0: 同時丟進 ThreadPoolExecutor，每個策略有自己的期限，逾時視為棄權不阻塞整個循環
+      (Python 執行緒無法強制中止，逾時的策略會在背景跑完；跑完前該策略的後續呼叫直接棄權，避免堆積)
+    - 策略需要的指標已由 analyze_technicals(required=...) 先算好，多個策略同時讀取 context 不會重複計算
+    """
+    def __init__(self, strategies, workers=0, timeout=None, timeouts=None, history_size=100, log_path=None):
+        """
+        :param workers: 執行緒數量 (0 代表不使用執行緒)
+        :param timeout: 預設每個策略的期限 (秒)，None 代表不限
+        :param timeouts: {策略名稱: 秒數}，個別覆蓋
+        :param history_size: 保留最近幾個循環的耗時統計
+        :param log_path: 每個循環的耗時統計附加寫入的 JSONL 檔 (None 不寫檔)
+        """
+        self.strategies = list(strategies)
+        self.names = [s.__class__.__name__ for s in self.strategies]
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="strategy") if workers else None
+
+        self._running = {}  # 策略名稱 -> 尚未結束的 future
+        self._lock = threading.Lock()
+        self._cycle = None
+        self.history = deque(maxlen=history_size)
+        self.log_path = log_path
+
+    def deadline_for(self, name):
+        return self.timeouts.get(name, self.timeout)
+
+    # ------------------------------------------------------------------
+    # 執行
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _timed(strategy, df, context):
+        start = time.perf_counter()
+        result = strategy.analyze(df, context)
+        return result, (time.perf_counter() - start) * 1000
+
+    def evaluate(self, df, context):
+        """
+        :return: [(策略名稱, 結果 dict 或 None, 狀態, 耗時 ms, 錯誤訊息)]，順序與 strategies 相同
+        """
+        if self.executor is None:
+            outcomes = []
+            for name, strategy in zip(self.names, self.strategies):
+                start = time.perf_counter()
+                try:
+                    result = strategy.analyze(df, context)
+                    outcomes.append((name, result, OK, (time.perf_counter() - start) * 1000, None))
+                except Exception as e:
+                    outcomes.append((name, None, ERROR, (time.perf_counter() - start) * 1000, e))
+        else:
+            outcomes = self._evaluate_parallel(df, context)
+
+        for name, _, status, latency, _ in outcomes:
+            self._record(name, status, latency)
+        return outcomes
+
+    def _evaluate_parallel(self, df, context):
+        submitted = time.perf_counter()
+        futures = {}
+        with self._lock:
+            for name, strategy in zip(self.names, self.strategies):
+                running = self._running.get(name)
+                if running is not None and not running.done():
+                    continue
+                future = self.executor.submit(self._timed, strategy, df, context)
+                self._running[name] = future
+                futures[name] = future
+
+        outcomes = []
+        for name in self.names:
+            future = futures.get(name)
+            if future is None:
+                outcomes.append((name, None, BUSY, 0.0, None))
+                continue
+
+            deadline = self.deadline_for(name)
+            remaining = None if deadline is None else max(0.0, submitted + deadline - time.perf_counter())
+            try:
+                result, latency = future.result(timeout=remaining)
+                outcomes.append((name, result, OK, latency, None))
+            except FutureTimeout:
+                future.cancel()  # 還沒開始跑的話直接取消
+                outcomes.append((name, None, TIMEOUT, (time.perf_counter() - submitted) * 1000, None))
+            except Exception as e:
+                outcomes.append((name, None, ERROR, (time.perf_counter() - submitted) * 1000, e))
+        return outcomes
+
+    # ------------------------------------------------------------------
+    # 耗時統計 (每個循環)
+    # ------------------------------------------------------------------
+    def start_cycle(self):
+        self._cycle = {'start': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'strategies': {}}
+
+    def _record(self, name, status, latency):
+        if self._cycle is None:
+            self.start_cycle()
+        with self._lock:
+            stats = self._cycle['strategies'].setdefault(
+                name, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, TIMEOUT: 0, ERROR: 0, BUSY: 0})
+            if status == BUSY:
+                # 上一次還在執行、這次沒有呼叫，不算入呼叫次數與耗時
+                stats[BUSY] += 1
+                return
+            stats['calls'] += 1
+            stats['total_ms'] += latency
+            stats['max_ms'] = max(stats['max_ms'], latency)
+            if status != OK:
+                stats[status] += 1
+
+    def merge(self, strategies):
+        """
+        合併其他程序 (分片子程序) 同一個循環的耗時統計
+        :param strategies: 子程序 end_cycle() 的回傳值 {策略名稱: 統計}
+        """
+        if self._cycle is None:
+            self.start_cycle()
+        with self._lock:
+            for name, other in strategies.items():
+                stats = self._cycle['strategies'].setdefault(
+                    name, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, TIMEOUT: 0, ERROR: 0, BUSY: 0})
+                for key in ('calls', 'total_ms', TIMEOUT, ERROR, BUSY):
+                    stats[key] += other[key]
+                stats['max_ms'] = max(stats['max_ms'], other['max_ms'])
+
+    def end_cycle(self, extra=None):
+        """
+        結束目前循環，回傳 {策略名稱: 統計}，並保留在 history / 寫入 log
+        :param extra: 其他要一起記錄的循環資訊 (例如收盤到決策的延遲)
+        """
+        cycle, self._cycle = self._cycle, None
+        if not cycle or not cycle['strategies']:
+            return {}
+        for stats in cycle['strategies'].values():
+            stats['avg_ms'] = stats['total_ms'] / stats['calls'] if stats['calls'] else 0.0
+        if extra:
+            cycle.update(extra)
+        self.history.append(cycle)
+
+        if self.log_path:
+            try:
+                log_dir = os.path.dirname(self.log_path)
+                if log_dir:
+                    os.makedirs(log_dir, exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(cycle, ensure_ascii=False) + "\n")
+            except Exception as e:
+                print(f"❌ [Log] 策略耗時寫入失敗: {e}")
+        return cycle['strategies']
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,9 +1,13 @@
 import json
 import os
+import threading
 from datetime import datetime
 import config
 
 class TradeLogger:
+    # 交易循環與止損監控執行緒可能同時寫入，讀取-附加-寫回需要互斥
+    _lock = threading.Lock()
+
     def __init__(self, filename="logs/trade_history.json"):
         self.filename = filename
         
@@ -38,25 +42,26 @@ class TradeLogger:
             "balance": float(balance)
         }
 
-        # 讀取現有紀錄
-        history = []
-        if os.path.exists(self.filename):
-            try:
-                with open(self.filename, "r", encoding="utf-8") as f:
-                    history = json.load(f)
-            except Exception:
-                history = []
+        with self._lock:
+            # 讀取現有紀錄
+            history = []
+            if os.path.exists(self.filename):
+                try:
+                    with open(self.filename, "r", encoding="utf-8") as f:
+                        history = json.load(f)
+                except Exception:
+                    history = []
 
-        # 加入新紀錄
-        history.append(record)
+            # 加入新紀錄
+            history.append(record)
 
-        # 寫回檔案
-        try:
-            with open(self.filename, "w", encoding="utf-8") as f:
-                json.dump(history, f, indent=4, ensure_ascii=False)
-            print(f"📝 [Log] {symbol} 交易紀錄已更新: {action} @ {price}")
-        except Exception as e:
-            print(f"❌ [Log] 寫入失敗: {e}")
+            # 寫回檔案
+            try:
+                with open(self.filename, "w", encoding="utf-8") as f:
+                    json.dump(history, f, indent=4, ensure_ascii=False)
+                print(f"📝 [Log] {symbol} 交易紀錄已更新: {action} @ {price}")
+            except Exception as e:
+                print(f"❌ [Log] 寫入失敗: {e}")
 
 # 測試用
 if __name__ == "__main__":
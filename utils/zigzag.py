@@ -1,28 +1,433 @@
 import numpy as np
 import pandas as pd
+from collections import deque
+from numpy.lib.stride_tricks import sliding_window_view
 from scipy.signal import argrelextrema
 
+HIGH = 1
+LOW = -1
+TYPE_NAMES = {HIGH: 'HIGH', LOW: 'LOW'}
+TYPE_CODES = {'HIGH': HIGH, 'LOW': LOW}
+
+# 轉折點紀錄 (一筆 32 bytes)
+PIVOT_DTYPE = np.dtype([('index', np.int64), ('price', np.float64), ('type', np.int8), ('time', np.int64)])
+
+# 多階層轉折點 (find_pivot_pyramid 的輸出)
+PYRAMID_DTYPE = np.dtype([('order', np.int32), ('index', np.int64), ('price', np.float64), ('type', np.int8)])
+
+
+def enforce_alternation(pivots: list) -> list:
+    """
+    強制 HIGH/LOW 交錯 (諧波型態假設相鄰轉折點方向相反)
+    連續同方向的轉折點只保留最極端的一個 (高點取最高、低點取最低，相同時保留較早的)
+    :param pivots: 依 index 排序的轉折點 dict
+    """
+    result = []
+    for p in pivots:
+        if result and result[-1]['type'] == p['type']:
+            last = result[-1]
+            if (p['type'] == 'HIGH' and p['price'] > last['price']) or (p['type'] == 'LOW' and p['price'] < last['price']):
+                result[-1] = p
+            continue
+        result.append(p)
+    return result
+
+
+def _blocking_distances(x: np.ndarray, max_order: int):
+    """
+    每根 K 線往左、往右第一個 >= 自己的 K 線距離 (超過 max_order 或超出資料範圍時為 max_order + 1)
+    以一個 (N, 2*max_order+1) 的滑動視窗一次算出
+    """
+    padded = np.concatenate((np.full(max_order, -np.inf), x, np.full(max_order, -np.inf)))
+    windows = sliding_window_view(padded, 2 * max_order + 1)  # 第 i 列的中心就是 x[i]
+    blocking = windows >= x[:, None]
+
+    # 右側: 距離 1..max_order；左側: 距離 1..max_order (由近到遠)
+    right = blocking[:, max_order + 1:]
+    left = blocking[:, max_order - 1::-1]
+    no_block = max_order + 1
+    right_dist = np.where(right.any(axis=1), right.argmax(axis=1) + 1, no_block)
+    left_dist = np.where(left.any(axis=1), left.argmax(axis=1) + 1, no_block)
+    return left_dist, right_dist
+
+
+def pivot_distances(highs: np.ndarray, lows: np.ndarray, max_order: int) -> dict:
+    """
+    高點 / 低點左右兩側的阻擋距離 (與 order 無關，算一次可供所有 order <= max_order 共用)
+    :return: {'max_order', 'high_left', 'high_right', 'low_left', 'low_right'}
+    """
+    high_left, high_right = _blocking_distances(np.asarray(highs, dtype=np.float64), max_order)
+    low_left, low_right = _blocking_distances(-np.asarray(lows, dtype=np.float64), max_order)
+    return {'max_order': max_order, 'high_left': high_left, 'high_right': high_right,
+            'low_left': low_left, 'low_right': low_right}
+
+
+def pivot_strength(values: np.ndarray, max_order: int, kind: int) -> np.ndarray:
+    """
+    每根 K 線「最多」可以是幾階的轉折點 (0 代表不是轉折點)
+    i 是 order=k 的高點 <=> 左右各 k 根內沒有 >= values[i] 的 K 線 (與 argrelextrema 的嚴格比較、邊界截斷相同)
+    """
+    x = np.asarray(values, dtype=np.float64)
+    if kind == LOW:
+        x = -x
+    n = len(x)
+    if n < 3:
+        return np.zeros(n, dtype=np.int32)
+
+    left_dist, right_dist = _blocking_distances(x, max_order)
+    strength = np.minimum(left_dist, right_dist) - 1
+    strength[[0, -1]] = 0  # 第一根與最後一根永遠不是轉折點 (argrelextrema 會拿自己比較)
+    return strength.astype(np.int32)
+
+
+def _fold_step(prices, types, indices, mask, new_price, new_type, new_index):
+    """
+    向量化的 enforce_alternation 單步: 每一列 (固定 n 格，最新在右) 加入一個轉折點
+    同方向時較極端才取代最後一格；不同方向時整列左移後放在最後一格
+    """
+    last_type = types[:, -1]
+    last_price = prices[:, -1]
+    same = mask & (last_type == new_type)
+    more_extreme = ((new_type == HIGH) & (new_price > last_price)) | ((new_type == LOW) & (new_price < last_price))
+    replace = same & more_extreme
+    append = mask & ~same
+
+    for arr in (prices, types, indices):
+        arr[append, :-1] = arr[append, 1:]
+    for arr, value in ((prices, new_price), (types, new_type), (indices, new_index)):
+        arr[replace | append, -1] = value[replace | append]
+
+
+def rolling_last_pivots(highs: np.ndarray, lows: np.ndarray, order: int, n: int = 5, distances: dict = None):
+    """
+    每一根 K 線「當下」看到的最後 n 個轉折點 (只使用該根以前的資料)
+    第 t 列等同 ZigZagIdentifier(order).get_last_n_pivots_from_arrays(highs[:t+1], lows[:t+1], ...)
+    (包含右側還不滿 order 根的暫定轉折點，並強制 HIGH/LOW 交錯)
+    :param distances: pivot_distances 的結果 (max_order >= order 時直接使用，參數搜尋時共用)
+    :return: (prices, types, indices)，形狀皆為 (T, n)，不足 n 個時左側為 NaN / 0 / -1
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    total = len(highs)
+    prices = np.full((total, n), np.nan)
+    types = np.zeros((total, n), dtype=np.int8)
+    indices = np.full((total, n), -1, dtype=np.int64)
+    if total < 3:
+        return prices, types, indices
+
+    idx = np.arange(total)
+    if distances is None or distances['max_order'] < order:
+        distances = pivot_distances(highs, lows, order)
+    h_left, h_right = distances['high_left'], distances['high_right']
+    l_left, l_right = distances['low_left'], distances['low_right']
+    h_left_ok = (idx >= 1) & (h_left > order)
+    l_left_ok = (idx >= 1) & (l_left > order)
+
+    # 1. 已確認的轉折點 (在 i + order 時確認)，依 index 排序、同 index 高點在前
+    conf_h = np.flatnonzero(h_left_ok & (h_right > order) & (idx + order <= total - 1))
+    conf_l = np.flatnonzero(l_left_ok & (l_right > order) & (idx + order <= total - 1))
+    c_index = np.concatenate((conf_h, conf_l))
+    c_type = np.concatenate((np.full(len(conf_h), HIGH, np.int8), np.full(len(conf_l), LOW, np.int8)))
+    c_price = np.concatenate((highs[conf_h], lows[conf_l]))
+    sort = np.lexsort((-c_type, c_index))
+    c_index, c_type, c_price = c_index[sort], c_type[sort], c_price[sort]
+    conf_times = c_index + order
+
+    # 每確認一個轉折點後的交錯結果: 只有最後一個會被取代，之前的都已固定
+    # 所以只需記錄每一步的長度與當時的最後一個 (轉折點數量遠少於 K 線數量)
+    m = len(c_index)
+    types_list, prices_list = c_type.tolist(), c_price.tolist()  # 純量迴圈用 list 較快
+    folded = []             # 交錯後序列 (存 c_* 的位置)
+    lengths = [0] * (m + 1)
+    last_ids = [0] * (m + 1)
+    for j in range(m):
+        if folded and types_list[folded[-1]] == types_list[j]:
+            last = prices_list[folded[-1]]
+            if (types_list[j] == HIGH and prices_list[j] > last) or (types_list[j] == LOW and prices_list[j] < last):
+                folded[-1] = j
+        else:
+            folded.append(j)
+        lengths[j + 1] = len(folded)
+        last_ids[j + 1] = folded[-1]
+    folded = np.array(folded, dtype=np.int64)
+    lengths = np.array(lengths, dtype=np.int64)
+    last_ids = np.array(last_ids, dtype=np.int64)
+
+    # (m+1, n): 第 j 列為確認 j 個轉折點後的最後 n 個，右側對齊
+    slots = lengths[:, None] - n + np.arange(n)
+    filled = slots >= 0
+    ids = np.zeros(slots.shape, dtype=np.int64)
+    if m:
+        ids = folded[np.maximum(slots, 0)]
+        ids[:, -1] = last_ids
+        c_index, c_type, c_price = c_index[ids], c_type[ids], c_price[ids]
+    tail_p = np.where(filled, c_price if m else np.nan, np.nan)
+    tail_t = np.where(filled, c_type if m else 0, 0).astype(np.int8)
+    tail_i = np.where(filled, c_index if m else -1, -1)
+
+    confirmed_count = np.searchsorted(conf_times, idx, side='right')
+    prices, types, indices = tail_p[confirmed_count], tail_t[confirmed_count], tail_i[confirmed_count]
+
+    # 2. 暫定轉折點: t - order < i < t，左側條件成立且 (i, t] 內沒有更高 (低) 的 K 線；每根最多一高一低
+    tent_h = np.full(total, -1, dtype=np.int64)
+    tent_l = np.full(total, -1, dtype=np.int64)
+    for d in range(1, order):
+        t = idx[d:]
+        i = t - d
+        tent_h[d:] = np.where(h_left_ok[i] & (h_right[i] > d), i, tent_h[d:])
+        tent_l[d:] = np.where(l_left_ok[i] & (l_right[i] > d), i, tent_l[d:])
+
+    # 依 index 順序 (同 index 高點在前) 加入兩個暫定轉折點
+    has_h, has_l = tent_h >= 0, tent_l >= 0
+    high_first = has_h & (~has_l | (tent_h <= tent_l))
+    first_is_high = np.where(has_h & has_l, high_first, has_h)
+    for step_is_high in (first_is_high, ~first_is_high):
+        use_high = step_is_high
+        mask = np.where(use_high, has_h, has_l)
+        new_index = np.where(use_high, tent_h, tent_l)
+        safe = np.maximum(new_index, 0)
+        new_price = np.where(use_high, highs[safe], lows[safe])
+        new_type = np.where(use_high, HIGH, LOW).astype(np.int8)
+        _fold_step(prices, types, indices, mask, new_price, new_type, new_index)
+
+    return prices, types, indices
+
+
+def find_pivot_pyramid(highs: np.ndarray, lows: np.ndarray, orders) -> np.ndarray:
+    """
+    一次算出多個 order 的 ZigZag 轉折點 (例如 3/5/8/13)
+    - 轉折強度只算一次 (pivot_strength)，各 order 只是取 strength >= order 的子集合
+    - 每個 order 內強制 HIGH/LOW 交錯 (規則同 enforce_alternation)，以排序 + 分組向量化處理
+    :return: PYRAMID_DTYPE 結構陣列，依 (order, index) 排序；單一 order 的結果與 ZigZagIdentifier 相同
+    """
+    orders = sorted(set(int(k) for k in orders))
+    if not orders or len(highs) == 0:
+        return np.zeros(0, dtype=PYRAMID_DTYPE)
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    max_order = orders[-1]
+
+    high_strength = pivot_strength(highs, max_order, HIGH)
+    low_strength = pivot_strength(lows, max_order, LOW)
+    high_idx = np.flatnonzero(high_strength)
+    low_idx = np.flatnonzero(low_strength)
+
+    # 所有 (order, 轉折點) 組合
+    order_arr = np.asarray(orders, dtype=np.int32)
+    high_mask = high_strength[high_idx][None, :] >= order_arr[:, None]
+    low_mask = low_strength[low_idx][None, :] >= order_arr[:, None]
+    h_order, h_pos = np.nonzero(high_mask)
+    l_order, l_pos = np.nonzero(low_mask)
+
+    out = np.zeros(len(h_pos) + len(l_pos), dtype=PYRAMID_DTYPE)
+    out['order'] = np.concatenate((order_arr[h_order], order_arr[l_order]))
+    out['index'] = np.concatenate((high_idx[h_pos], low_idx[l_pos]))
+    out['type'] = np.concatenate((np.full(len(h_pos), HIGH, np.int8), np.full(len(l_pos), LOW, np.int8)))
+    out['price'] = np.where(out['type'] == HIGH, highs[out['index']], lows[out['index']])
+    if len(out) == 0:
+        return out
+
+    # 依 (order, index, 高點在前) 排序
+    out = out[np.lexsort((-out['type'], out['index'], out['order']))]
+
+    # 連續同方向 (且同 order) 為一組，每組保留最極端的一個 (相同時取最早)
+    new_run = np.ones(len(out), dtype=bool)
+    new_run[1:] = (out['type'][1:] != out['type'][:-1]) | (out['order'][1:] != out['order'][:-1])
+    run_id = np.cumsum(new_run)
+    extremeness = out['price'] * out['type']
+    best = np.lexsort((np.arange(len(out)), -extremeness, run_id))
+    _, first = np.unique(run_id[best], return_index=True)
+    return out[np.sort(best[first])]
+
+
 class ZigZagIdentifier:
     def __init__(self, order: int = 5):
         self.order = order
 
     def find_pivots(self, df: pd.DataFrame) -> dict:
         if df is None or df.empty: return {}
-        highs = df['high'].values
-        lows = df['low'].values
-        timestamps = df.index.values
+        return self.find_pivots_from_arrays(df['high'].values, df['low'].values, df.index.values)
 
+    def find_pivots_from_arrays(self, highs: np.ndarray, lows: np.ndarray, timestamps: np.ndarray) -> dict:
         high_idx = argrelextrema(highs, np.greater, order=self.order)[0]
         low_idx = argrelextrema(lows, np.less, order=self.order)[0]
-        
+
         high_points = [{'index': int(i), 'price': float(highs[i]), 'type': 'HIGH', 'time': str(timestamps[i])} for i in high_idx]
         low_points = [{'index': int(i), 'price': float(lows[i]), 'type': 'LOW', 'time': str(timestamps[i])} for i in low_idx]
-            
+
         return {'highs': high_points, 'lows': low_points}
-    
+
     def get_last_n_pivots(self, df: pd.DataFrame, n: int = 5) -> list:
-        pivots = self.find_pivots(df)
+        return self._merge_last_n(self.find_pivots(df), n)
+
+    def get_last_n_pivots_from_arrays(self, highs: np.ndarray, lows: np.ndarray, timestamps: np.ndarray, n: int = 5) -> list:
+        if len(highs) == 0: return []
+        return self._merge_last_n(self.find_pivots_from_arrays(highs, lows, timestamps), n)
+
+    def _merge_last_n(self, pivots: dict, n: int) -> list:
         if not pivots: return []
         all_pivots = pivots['highs'] + pivots['lows']
         all_pivots.sort(key=lambda x: x['index'])
-        return all_pivots[-n:]
\ No newline at end of file
+        return enforce_alternation(all_pivots)[-n:]
+
+
+class PivotBuffer:
+    """以 numpy 結構陣列實作的環狀轉折點紀錄 (固定容量，最舊的會被覆蓋)"""
+    def __init__(self, capacity: int = 256):
+        self._data = np.zeros(capacity, dtype=PIVOT_DTYPE)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _pos(self, i):
+        return (self._start + i) % len(self._data)
+
+    def append(self, index, price, kind, time):
+        capacity = len(self._data)
+        if self._size < capacity:
+            pos = self._pos(self._size)
+            self._size += 1
+        else:
+            pos = self._start
+            self._start = (self._start + 1) % capacity
+        self._data[pos] = (index, price, kind, time)
+
+    def replace_last(self, index, price, kind, time):
+        self._data[self._pos(self._size - 1)] = (index, price, kind, time)
+
+    def last(self, count=None):
+        """最後 count 筆 (舊 -> 新)"""
+        count = self._size if count is None else min(count, self._size)
+        positions = [self._pos(i) for i in range(self._size - count, self._size)]
+        return self._data[positions]
+
+    def to_array(self):
+        return self.last()
+
+
+class ZigZagTracker:
+    """
+    串流式 ZigZag: 每根收盤 K 線 O(1) (攤銷) 更新
+    - 已確認轉折點: 左右各 order 根都已出現，且為視窗內唯一最高/最低 (與 argrelextrema 相同條件)
+    - 暫定轉折點: 右側 K 線還不滿 order 根，但目前為止仍是極值 (查詢時計算，不寫入紀錄)
+    - 轉折點一律 HIGH/LOW 交錯 (見 enforce_alternation)
+    get_last_n_pivots() 的結果與 ZigZagIdentifier.get_last_n_pivots_from_arrays 對同一段資料的輸出相同
+    """
+    def __init__(self, order: int = 5, capacity: int = 256):
+        self.order = order
+        self.count = 0                  # 已收盤的 K 線數量 (下一根的 index)
+        self.pivots = PivotBuffer(capacity)
+        self._tail = deque(maxlen=2 * order + 1)  # 最近的 (high, low, time)
+        self._time_unit = None
+
+        # 單調佇列 (index, value): 同值時 *_last 保留最新的、*_first 保留最早的
+        # 兩者的最前端都是同一個 index 時，代表該值是視窗內唯一的極值
+        self._max_last, self._max_first = deque(), deque()
+        self._min_last, self._min_first = deque(), deque()
+
+    def _encode_time(self, time):
+        if isinstance(time, (np.datetime64, pd.Timestamp)):
+            time = np.datetime64(time)
+            if self._time_unit is None:
+                self._time_unit = np.datetime_data(time.dtype)[0]
+            return int(time.astype(f'datetime64[{self._time_unit}]').astype(np.int64))
+        return int(time)
+
+    def _decode_time(self, value):
+        if self._time_unit is None:
+            return str(value)
+        return str(np.datetime64(int(value), self._time_unit))
+
+    @staticmethod
+    def _push(queue, index, value, should_pop):
+        while queue and should_pop(queue[-1][1], value):
+            queue.pop()
+        queue.append((index, value))
+
+    def update(self, high: float, low: float, time) -> None:
+        """加入一根已收盤的 K 線"""
+        t = self.count
+        high, low = float(high), float(low)
+        self._tail.append((high, low, self._encode_time(time)))
+
+        self._push(self._max_last, t, high, lambda back, new: back <= new)
+        self._push(self._max_first, t, high, lambda back, new: back < new)
+        self._push(self._min_last, t, low, lambda back, new: back >= new)
+        self._push(self._min_first, t, low, lambda back, new: back > new)
+
+        # 視窗 [t - 2*order, t]，中心 i = t - order
+        oldest = t - 2 * self.order
+        for queue in (self._max_last, self._max_first, self._min_last, self._min_first):
+            while queue[0][0] < oldest:
+                queue.popleft()
+
+        i = t - self.order
+        if i >= 1:
+            center_time = self._tail[-(self.order + 1)][2]
+            if self._max_last[0][0] == i and self._max_first[0][0] == i:
+                self._add_confirmed(i, self._max_last[0][1], HIGH, center_time)
+            if self._min_last[0][0] == i and self._min_first[0][0] == i:
+                self._add_confirmed(i, self._min_last[0][1], LOW, center_time)
+
+        self.count += 1
+
+    def _add_confirmed(self, index, price, kind, time):
+        if len(self.pivots):
+            last = self.pivots.last(1)[0]
+            if last['type'] == kind:
+                if (kind == HIGH and price > last['price']) or (kind == LOW and price < last['price']):
+                    self.pivots.replace_last(index, price, kind, time)
+                return
+        self.pivots.append(index, price, kind, time)
+
+    def _scan(self, bars, first_index, lo, hi, end):
+        """
+        在 bars (index 從 first_index 開始) 中找 [lo, hi] 範圍內的轉折點
+        條件同 argrelextrema: 嚴格大於 (小於) [i - order, end] 內所有其他 K 線
+        """
+        found = []
+        for i in range(max(lo, 1), hi + 1):
+            start = max(i - self.order, 0, first_index)
+            window = bars[start - first_index:end - first_index + 1]
+            high, low, time = bars[i - first_index]
+            others = [b for k, b in enumerate(window) if start + k != i]
+            if all(high > b[0] for b in others):
+                found.append({'index': i, 'price': high, 'type': 'HIGH', 'time': self._decode_time(time)})
+            if all(low < b[1] for b in others):
+                found.append({'index': i, 'price': low, 'type': 'LOW', 'time': self._decode_time(time)})
+        return found
+
+    def get_last_n_pivots(self, n: int = 5, forming=None, include_tentative: bool = True) -> list:
+        """
+        :param forming: 形成中的 K 線 (high, low, time)，只用於這次查詢，不寫入狀態
+        :param include_tentative: 是否加入尚未確認的暫定轉折點
+        :return: 與 ZigZagIdentifier 相同格式的 dict 清單 (舊 -> 新)，index 為串流中的序號
+        """
+        pivots = [
+            {'index': int(p['index']), 'price': float(p['price']), 'type': TYPE_NAMES[int(p['type'])],
+             'time': self._decode_time(p['time'])}
+            for p in self.pivots.last(n)
+        ]
+
+        bars = list(self._tail)
+        if forming is not None:
+            high, low, time = forming
+            bars.append((float(high), float(low), self._encode_time(time)))
+        if not bars:
+            return pivots
+
+        last_index = self.count if forming is not None else self.count - 1
+        first_index = last_index - len(bars) + 1
+        candidates = []
+        if forming is not None:
+            # 形成中的 K 線可能讓 order 根之前的 K 線成為確認的轉折點
+            center = last_index - self.order
+            candidates += self._scan(bars, first_index, center, center, last_index)
+        if include_tentative:
+            candidates += self._scan(bars, first_index, last_index - self.order + 1, last_index - 1, last_index)
+
+        if candidates:
+            pivots = enforce_alternation(pivots + candidates)
+        return pivots[-n:]